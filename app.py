@@ -1,71 +1,290 @@
-from flask import Flask, request, render_template, jsonify, send_from_directory
+from flask import Flask, request, render_template, jsonify, send_from_directory, Response, stream_with_context
 import os
+import sys
 import subprocess
+import threading
+import uuid
 import time
 import json
+import signal
+import argparse
 from datetime import datetime
+from collections import deque
+from itertools import islice
+from src.utils.upload_utils import ChunkedUploadManager, UploadError, safe_filename, parse_int
+from src.utils.cache_utils import LRUFileCache, ResultsIndex
+from src.utils.json_index import JSONPageIndex
+from src.retrieval.index import load_index, index_exists, INDEX_META_FILE
+from src.retrieval.retrieval import embedder_for_index
+from src.retrieval.hybrid import HybridSearcher, SEARCH_MODES
+from src.pipeline.scheduler import PriorityScheduler, PRIORITY_CLASSES, DEFAULT_PRIORITY
+from src.service.service import DaemonClient, DaemonError, daemon_available, DEFAULT_SOCKET_PATH
 
 app = Flask(__name__, static_folder='frontend/static', template_folder='frontend/templates')
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'output'
-app.config['ALLOWED_EXTENSIONS'] = {'txt', 'pdf', 'md', 'docx', 'xlsx'}
+app.config['ALLOWED_EXTENSIONS'] = {'txt', 'pdf', 'md', 'markdown', 'docx', 'xlsx', 'pptx', 'html', 'htm', 'csv', 'json'}
+# SSE推送中保留的块事件上限，超出部分只计数，通过分页接口查看
+app.config['SSE_CHUNK_LIMIT'] = 200
+# SSE空闲时发送心跳的间隔（秒）
+app.config['SSE_KEEPALIVE'] = 15
+# 每个任务保留的最近事件数（日志、进度和块事件），更早的事件被丢弃，重连时从仍保留的最早事件继续
+app.config['JOB_EVENT_LIMIT'] = 1000
+# 已结束的任务保留的时间（秒）和最多保留的个数，超出后在提交新任务时移除
+app.config['JOB_TTL'] = 3600
+app.config['MAX_FINISHED_JOBS'] = 1000
+# /json 分页接口的默认与最大每页块数
+app.config['JSON_PAGE_SIZE'] = 50
+app.config['JSON_MAX_PAGE_SIZE'] = 500
+# 单个请求体上限；大文件需走分片上传接口
+app.config['UPLOAD_PART_SIZE'] = 8 * 1024 * 1024
+app.config['MAX_CONTENT_LENGTH'] = 64 * 1024 * 1024
+app.config['MAX_UPLOAD_SIZE'] = 2 * 1024 * 1024 * 1024
+# 分片上传会话超过该时间（秒）没有新分片即被清理
+app.config['UPLOAD_SESSION_TTL'] = 24 * 3600
+# 已解析结果JSON的缓存容量（按文件字节数计）
+app.config['JSON_CACHE_MAX_BYTES'] = 256 * 1024 * 1024
+# 分页读取用的块偏移索引缓存容量（按被索引文件的字节数计，索引本身每个块只占16字节）
+app.config['JSON_INDEX_CACHE_MAX_BYTES'] = 16 * 1024 * 1024 * 1024
+# 单个处理子进程的最长运行时间（秒），超时后终止整个进程组，避免一个坏文件长期占住工作线程
+app.config['PROCESS_TIMEOUT'] = 600
+# 常驻处理服务（main.py serve）的套接字；服务在线时交给服务处理，省去每个文件启动解释器和加载模型的开销
+app.config['DAEMON_SOCKET'] = DEFAULT_SOCKET_PATH
+# 服务不在线时本进程同时运行的处理子进程数；批量任务最多占用 PROCESS_WORKERS-1 个，为交互上传留出槽位
+app.config['PROCESS_WORKERS'] = os.cpu_count() or 1
+# 向量索引目录（由 main.py index 命令建立）和检索默认返回的块数
+app.config['VECTOR_INDEX_FOLDER'] = os.path.join(app.config['OUTPUT_FOLDER'], 'index')
+app.config['QUERY_TOP_K'] = 5
+app.config['QUERY_MAX_TOP_K'] = 100
+# 查询结果缓存的条目数和有效期（秒）；索引更新后缓存自动失效
+app.config['QUERY_CACHE_SIZE'] = 1024
+app.config['QUERY_CACHE_TTL'] = 300
 
 # 确保目录存在
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+upload_manager = ChunkedUploadManager(app.config['UPLOAD_FOLDER'],
+                                      part_size=app.config['UPLOAD_PART_SIZE'],
+                                      max_upload_size=app.config['MAX_UPLOAD_SIZE'],
+                                      session_ttl=app.config['UPLOAD_SESSION_TTL'])
+
+# 加载JSON文件内容
+def load_json_file(file_path):
+    try:
+        with open(file_path, 'r', encoding='utf-8-sig') as f:
+            return json.load(f)
+    except Exception as e:
+        return {'error': str(e)}
+
+# 结果目录索引和已解析JSON的缓存，避免每次请求都遍历输出目录、重新解析文件
+results_index = ResultsIndex(app.config['OUTPUT_FOLDER'])
+json_cache = LRUFileCache(load_json_file, max_bytes=app.config['JSON_CACHE_MAX_BYTES'])
+# 分页请求只读取所需块的字节区间，不解析整个结果文件
+json_page_cache = LRUFileCache(JSONPageIndex, max_bytes=app.config['JSON_INDEX_CACHE_MAX_BYTES'])
+# 已加载的向量索引及其检索器，以index.meta的签名判断索引是否被更新，更新后重新加载（查询缓存随之丢弃），
+# 被替换或淘汰的检索器随即关闭其线程池；
+# 向量本身是内存映射，不计入容量
+def load_searcher(meta_path):
+    vector_index = load_index(os.path.dirname(meta_path))
+    return HybridSearcher(vector_index, embedder_for_index(vector_index),
+                          cache_size=app.config['QUERY_CACHE_SIZE'], cache_ttl=app.config['QUERY_CACHE_TTL'])
+
+searcher_cache = LRUFileCache(load_searcher, max_bytes=1024 * 1024, on_evict=lambda searcher: searcher.close())
+# 索引版本号在重启后会重新计数，ETag中加入启动标识避免与旧缓存冲突
+INDEX_EPOCH = uuid.uuid4().hex[:8]
+
+# 根据main.py的日志判断处理进度
+STAGE_PROGRESS = [
+    ('步骤1/3', 10, '解析/加载文件'),
+    ('步骤2/3', 50, '分块处理'),
+    ('分块结果保存至', 80, '保存结果'),
+    ('完整流程完成', 95, '生成最终结果')
+]
+
+class ProcessJob:
+    """
+    后台处理任务，保存最近的事件供SSE按序推送
+    事件按序号编号，只保留最近event_limit条；结束事件总是最后一条，不会被丢弃
+    """
+    def __init__(self, job_id, file_path, options, event_limit=None):
+        self.job_id = job_id
+        self.file_path = file_path
+        self.options = options
+        self.status = 'queued'
+        self.result = None
+        self.events = deque(maxlen=event_limit)
+        # 仍保留的最早事件的序号
+        self.first_event = 0
+        self.chunk_count = 0
+        self.created_at = datetime.now().isoformat()
+        self.finished_at = None
+        self.condition = threading.Condition()
+
+    @property
+    def next_event(self):
+        return self.first_event + len(self.events)
+
+    def _append(self, event, data):
+        if len(self.events) == self.events.maxlen:
+            self.first_event += 1
+        self.events.append((event, data))
+
+    def emit(self, event, data):
+        """追加事件并唤醒等待中的SSE连接"""
+        with self.condition:
+            self._append(event, data)
+            self.condition.notify_all()
+
+    def finish(self, result):
+        with self.condition:
+            self.result = result
+            self.status = 'done' if result.get('success') else 'failed'
+            self.finished_at = time.time()
+            self._append('done' if result.get('success') else 'error', result)
+            self.condition.notify_all()
+
+    def wait_events(self, start, timeout):
+        """
+        返回 (首个事件的序号, 从start开始的新事件, 状态)；没有新事件时最多等待timeout秒
+        start对应的事件已被丢弃时从仍保留的最早事件开始
+        """
+        with self.condition:
+            if start >= self.next_event and self.status in ('queued', 'running'):
+                self.condition.wait(timeout)
+            start = max(start, self.first_event)
+            return start, list(islice(self.events, start - self.first_event, None)), self.status
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'file_path': self.file_path,
+            'options': self.options,
+            'chunk_count': self.chunk_count,
+            'created_at': self.created_at,
+            'result': self.result
+        }
+
+jobs = {}
+jobs_lock = threading.Lock()
+# 子进程处理的调度器（交给常驻服务时由服务调度）
+scheduler = PriorityScheduler(app.config['PROCESS_WORKERS'])
+
 # 检查文件扩展名是否允许
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
-# 运行处理命令
-def run_process(file_path, chunk_type='paragraph', chunk_size=1000, overlap=100):
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    output_dir = os.path.join(app.config['OUTPUT_FOLDER'], f'web_process_{timestamp}')
-    os.makedirs(output_dir, exist_ok=True)
-
-    # 构建命令
+# 构建处理命令
+def build_process_command(file_path, output_dir, chunk_type='paragraph', chunk_size=1000, overlap=100, emit_chunks=False):
     cmd = [
-            'python', 'main.py', 'process',
+            sys.executable, 'main.py', 'process',
             file_path,
             '--output_dir', output_dir,
             '--chunk_strategy', chunk_type,
             '--chunk_size', str(chunk_size),
             '--chunk_overlap', str(overlap)
         ]
+    if emit_chunks:
+        cmd.append('--emit_chunks')
+    return cmd
 
+def kill_process_tree(process):
+    """终止处理子进程及其派生的解析子进程"""
     try:
-        # 运行命令
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-
-        # 查找生成的JSON文件
-        json_files = []
-        for root, dirs, files in os.walk(output_dir):
-            for file in files:
-                if file.endswith('.json'):
-                    # 计算相对于输出目录的路径
-                    relative_path = os.path.relpath(os.path.join(root, file), app.config['OUTPUT_FOLDER'])
-                    json_files.append(relative_path)
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def popen_process(cmd, **kwargs):
+    env = {**os.environ, 'PYTHONIOENCODING': 'utf-8'}
+    # 独立进程组，超时时可以连同解析子进程一起终止
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                            encoding='utf-8', env=env, start_new_session=True, **kwargs)
+
+def new_output_dir():
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_dir = os.path.join(app.config['OUTPUT_FOLDER'], f'web_process_{timestamp}_{uuid.uuid4().hex[:6]}')
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
 
+def daemon_client():
+    """常驻服务在线时返回客户端，否则返回None（回退到启动子进程）"""
+    socket_path = app.config.get('DAEMON_SOCKET')
+    if socket_path and daemon_available(socket_path):
+        return DaemonClient(socket_path, timeout=app.config['PROCESS_TIMEOUT'])
+    return None
+
+def file_size(file_path):
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+def process_with_daemon(client, file_path, output_dir, options, on_event=None):
+    return client.process(file_path, output_dir, on_event=on_event, chunk_strategy=options['chunk_type'],
+                          chunk_size=options['chunk_size'], chunk_overlap=options['overlap'],
+                          priority=options.get('priority', DEFAULT_PRIORITY),
+                          stream_chunks=on_event is not None, chunk_limit=app.config['SSE_CHUNK_LIMIT'])
+
+# 运行处理命令（同步，供脚本调用）
+def run_process(file_path, chunk_type='paragraph', chunk_size=1000, overlap=100, priority=DEFAULT_PRIORITY):
+    output_dir = new_output_dir()
+
+    client = daemon_client()
+    if client is not None:
+        options = {'chunk_type': chunk_type, 'chunk_size': chunk_size, 'overlap': overlap, 'priority': priority}
+        try:
+            result = process_with_daemon(client, file_path, output_dir, options)
+        except DaemonError as e:
+            return {'success': False, 'message': f'处理失败: {e}', 'stdout': '', 'stderr': str(e)}
         return {
             'success': True,
             'message': '文件处理成功',
             'output_dir': output_dir,
-            'json_files': json_files,
-            'stdout': result.stdout,
-            'stderr': result.stderr
+            'json_files': results_index.register(output_dir),
+            'timings': result['timings'],
+            'stdout': '',
+            'stderr': ''
         }
-    except subprocess.CalledProcessError as e:
+
+    # 构建命令
+    cmd = build_process_command(file_path, output_dir, chunk_type, chunk_size, overlap)
+
+    try:
+        # 运行命令
+        with scheduler.slot(priority, file_size(file_path)):
+            process = popen_process(cmd)
+            try:
+                stdout, stderr = process.communicate(timeout=app.config['PROCESS_TIMEOUT'])
+            except subprocess.TimeoutExpired:
+                kill_process_tree(process)
+                stdout, stderr = process.communicate()
+                return {
+                    'success': False,
+                    'message': f"处理超时: 超过 {app.config['PROCESS_TIMEOUT']} 秒",
+                    'stdout': stdout,
+                    'stderr': stderr
+                }
+
+        if process.returncode != 0:
+            return {
+                'success': False,
+                'message': f'处理失败: 返回码 {process.returncode}',
+                'stdout': stdout,
+                'stderr': stderr
+            }
+
         return {
-            'success': False,
-            'message': f'处理失败: {str(e)}',
-            'stdout': e.stdout,
-            'stderr': e.stderr
+            'success': True,
+            'message': '文件处理成功',
+            'output_dir': output_dir,
+            'json_files': results_index.register(output_dir),
+            'stdout': stdout,
+            'stderr': stderr
         }
     except Exception as e:
         return {
@@ -75,13 +294,193 @@ def run_process(file_path, chunk_type='paragraph', chunk_size=1000, overlap=100)
             'stderr': str(e)
         }
 
-# 加载JSON文件内容
-def load_json_file(file_path):
+def run_daemon_job(job, client, output_dir):
+    """交给常驻服务处理，服务推送的进度、日志和块转为任务事件"""
+    log_lines = []
+
+    def on_event(event):
+        if event['event'] == 'progress':
+            if job.status == 'queued':
+                job.status = 'running'
+                job.emit('progress', {'progress': 2, 'stage': '任务已启动'})
+            job.emit('progress', {'progress': event['progress'], 'stage': event['label']})
+        elif event['event'] == 'log':
+            log_lines.append(event['message'])
+            job.emit('log', {'message': event['message']})
+        elif event['event'] == 'chunk':
+            job.chunk_count += 1
+            job.emit('chunk', event['chunk'])
+
     try:
-        with open(file_path, 'r', encoding='utf-8-sig') as f:
-            return json.load(f)
+        result = process_with_daemon(client, job.file_path, output_dir, job.options, on_event=on_event)
+    except DaemonError as e:
+        job.finish({'success': False, 'message': f'处理失败: {e}', 'stderr': '\n'.join(log_lines)})
+        return
+    job.emit('progress', {'progress': 100, 'stage': '完成'})
+    job.finish({
+        'success': True,
+        'message': '文件处理成功',
+        'output_dir': output_dir,
+        'json_files': results_index.register(output_dir),
+        'total_chunks': result['total_chunks'],
+        'timings': result['timings']
+    })
+
+# 后台运行处理任务，并将进度和块实时推送到任务事件中
+def run_process_job(job):
+    output_dir = new_output_dir()
+    job.emit('progress', {'progress': 1, 'stage': '排队中'})
+    client = daemon_client()
+    if client is not None:
+        run_daemon_job(job, client, output_dir)
+        return
+    # 按优先级排队，分到槽位后才启动子进程
+    with scheduler.slot(job.options.get('priority', DEFAULT_PRIORITY), file_size(job.file_path)):
+        run_subprocess_job(job, output_dir)
+
+def run_subprocess_job(job, output_dir):
+    options = job.options
+    cmd = build_process_command(job.file_path, output_dir, options['chunk_type'],
+                                options['chunk_size'], options['overlap'], emit_chunks=True)
+    job.status = 'running'
+    job.emit('progress', {'progress': 2, 'stage': '任务已启动'})
+
+    stderr_lines = []
+
+    def read_stderr(stream):
+        # main.py的日志输出在stderr，用于推断进度
+        for line in stream:
+            line = line.rstrip('\n')
+            stderr_lines.append(line)
+            job.emit('log', {'message': line})
+            for marker, progress, stage in STAGE_PROGRESS:
+                if marker in line:
+                    job.emit('progress', {'progress': progress, 'stage': stage})
+
+    timed_out = threading.Event()
+
+    def on_timeout():
+        timed_out.set()
+        kill_process_tree(process)
+
+    try:
+        process = popen_process(cmd)
+        watchdog = threading.Timer(app.config['PROCESS_TIMEOUT'], on_timeout)
+        watchdog.daemon = True
+        watchdog.start()
+        stderr_thread = threading.Thread(target=read_stderr, args=(process.stderr,), daemon=True)
+        stderr_thread.start()
+
+        # stdout为逐行的块JSON，超过上限后只计数，避免任务和浏览器内存无限增长；最后一行为处理结果
+        process_result = {}
+        for line in process.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                chunk = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if 'process_result' in chunk:
+                process_result = chunk['process_result']
+                continue
+            job.chunk_count += 1
+            if job.chunk_count <= app.config['SSE_CHUNK_LIMIT']:
+                job.emit('chunk', chunk)
+
+        returncode = process.wait()
+        watchdog.cancel()
+        stderr_thread.join()
+        stderr_text = '\n'.join(stderr_lines)
+        if timed_out.is_set():
+            job.finish({
+                'success': False,
+                'message': f"处理超时: 超过 {app.config['PROCESS_TIMEOUT']} 秒，已终止",
+                'stderr': stderr_text
+            })
+            return
+        # main.py捕获异常后只记录日志，需要结合日志判断是否失败
+        if returncode != 0 or '处理过程中出错' in stderr_text:
+            job.finish({
+                'success': False,
+                'message': f'处理失败: 返回码 {returncode}',
+                'stderr': stderr_text
+            })
+            return
+
+        job.emit('progress', {'progress': 100, 'stage': '完成'})
+        job.finish({
+            'success': True,
+            'message': '文件处理成功',
+            'output_dir': output_dir,
+            'json_files': results_index.register(output_dir),
+            'total_chunks': job.chunk_count,
+            'timings': process_result.get('timings')
+        })
     except Exception as e:
-        return {'error': str(e)}
+        job.finish({
+            'success': False,
+            'message': f'发生错误: {str(e)}',
+            'stderr': str(e)
+        })
+
+def prune_jobs(now=None):
+    """移除结束超过JOB_TTL秒的任务；已结束的任务超过MAX_FINISHED_JOBS个时先移除最早结束的"""
+    now = time.time() if now is None else now
+    with jobs_lock:
+        finished = sorted((job for job in jobs.values() if job.finished_at is not None),
+                          key=lambda job: job.finished_at)
+        excess = len(finished) - app.config['MAX_FINISHED_JOBS']
+        for position, job in enumerate(finished):
+            if position < excess or now - job.finished_at > app.config['JOB_TTL']:
+                del jobs[job.job_id]
+
+def submit_job(file_path, options):
+    prune_jobs()
+    job = ProcessJob(uuid.uuid4().hex, file_path, options, event_limit=app.config['JOB_EVENT_LIMIT'])
+    with jobs_lock:
+        jobs[job.job_id] = job
+    threading.Thread(target=run_process_job, args=(job,), daemon=True).start()
+    return job
+
+# 从表单或JSON中读取处理选项
+def parse_process_options(source):
+    priority = source.get('priority') or DEFAULT_PRIORITY
+    if priority not in PRIORITY_CLASSES:
+        raise UploadError(f'未知的优先级: {priority}')
+    chunk_size = parse_int(source.get('chunk_size', 1000), 'chunk_size', minimum=1)
+    overlap = parse_int(source.get('overlap', 100), 'overlap', minimum=0, maximum=chunk_size - 1)
+    return {
+        'chunk_type': source.get('chunk_type', 'paragraph'),
+        'chunk_size': chunk_size,
+        'overlap': overlap,
+        'priority': priority
+    }
+
+def format_sse(event, data, event_id=None):
+    message = ''
+    if event_id is not None:
+        message += f'id: {event_id}\n'
+    message += f'event: {event}\n'
+    message += f'data: {json.dumps(data, ensure_ascii=False)}\n\n'
+    return message
+
+# 分页读取结果JSON中的块
+def load_json_page(data, offset, limit):
+    if not isinstance(data, dict) or 'error' in data or not isinstance(data.get('chunks'), list):
+        return data, None
+
+    chunks = data['chunks']
+    page = {key: value for key, value in data.items() if key not in ('chunks', 'page_content')}
+    page['page_content_length'] = len(data.get('page_content') or '')
+    page['chunks'] = chunks[offset:offset + limit]
+    pagination = {
+        'offset': offset,
+        'limit': limit,
+        'total': len(chunks),
+        'has_more': offset + limit < len(chunks)
+    }
+    return page, pagination
 
 # 路由
 @app.route('/')
@@ -102,50 +501,205 @@ def upload_file():
 
     # 如果文件允许
     if file and allowed_file(file.filename):
-        filename = file.filename
+        filename = safe_filename(file.filename)
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(file_path)
 
         # 获取处理选项
-        chunk_type = request.form.get('chunk_type', 'paragraph')
-        chunk_size = int(request.form.get('chunk_size', 1000))
-        overlap = int(request.form.get('overlap', 100))
+        options = parse_process_options(request.form)
 
-        # 运行处理
-        result = run_process(file_path, chunk_type, chunk_size, overlap)
-        return jsonify(result)
+        # 后台处理，立即返回任务ID，进度通过 /events/<job_id> 推送
+        job = submit_job(file_path, options)
+        return jsonify({
+            'success': True,
+            'message': '文件已上传，正在处理',
+            'job_id': job.job_id,
+            'events_url': f'/events/{job.job_id}'
+        })
 
     return jsonify({'success': False, 'message': '不允许的文件类型'})
 
+@app.errorhandler(UploadError)
+def handle_upload_error(error):
+    return jsonify({'success': False, 'message': error.message}), error.status_code
+
+@app.route('/upload/init', methods=['POST'])
+def init_chunked_upload():
+    payload = request.get_json(silent=True) or {}
+    filename = payload.get('filename', '')
+    if not allowed_file(filename):
+        return jsonify({'success': False, 'message': '不允许的文件类型'}), 400
+
+    status = upload_manager.init_upload(
+        filename,
+        payload.get('size'),
+        options=parse_process_options(payload),
+        part_size=payload.get('part_size')
+    )
+    return jsonify({'success': True, **status})
+
+@app.route('/upload/<upload_id>', methods=['GET'])
+def get_chunked_upload(upload_id):
+    # 客户端续传前查询已收到的分片
+    return jsonify({'success': True, **upload_manager.get_status(upload_id)})
+
+@app.route('/upload/<upload_id>/part/<int:part_number>', methods=['PUT'])
+def put_upload_part(upload_id, part_number):
+    part = upload_manager.write_part(upload_id, part_number, request.stream,
+                                     expected_sha256=request.headers.get('X-Part-SHA256'))
+    return jsonify({'success': True, **part})
+
+@app.route('/upload/<upload_id>/finalize', methods=['POST'])
+def finalize_chunked_upload(upload_id):
+    upload = upload_manager.finalize(upload_id)
+    job = submit_job(upload['file_path'], upload['options'])
+    return jsonify({
+        'success': True,
+        'message': '文件已上传，正在处理',
+        'file_path': upload['file_path'],
+        'sha256': upload['sha256'],
+        'deduplicated': upload['deduplicated'],
+        'job_id': job.job_id,
+        'events_url': f'/events/{job.job_id}'
+    })
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': '任务不存在'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/scheduler')
+def scheduler_status():
+    """各优先级的运行数、队列深度和等待时间；常驻服务在线时同时返回服务的调度状态"""
+    client = daemon_client()
+    daemon = None
+    if client is not None:
+        try:
+            daemon = client.ping()['scheduler']
+        except DaemonError:
+            pass
+    return jsonify({'success': True, 'local': scheduler.stats(), 'daemon': daemon})
+
+@app.route('/events/<job_id>')
+def stream_events(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': '任务不存在'}), 404
+
+    # 断线重连时浏览器会带上Last-Event-ID，从下一条事件继续推送
+    last_event_id = request.headers.get('Last-Event-ID')
+    start = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+    keepalive = app.config['SSE_KEEPALIVE']
+
+    def generate():
+        cursor = start
+        while True:
+            cursor, events, status = job.wait_events(cursor, keepalive)
+            if not events:
+                if status in ('done', 'failed'):
+                    break
+                yield ': keepalive\n\n'
+                continue
+            for event, data in events:
+                yield format_sse(event, data, event_id=cursor)
+                cursor += 1
+            if status in ('done', 'failed') and cursor >= job.next_event:
+                break
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/results/<path:output_dir>')
 def get_results(output_dir):
-    full_path = os.path.join(app.config['OUTPUT_FOLDER'], output_dir)
-    if not os.path.exists(full_path):
+    json_files, version = results_index.list_files(output_dir)
+    if json_files is None:
         return jsonify({'success': False, 'message': '结果目录不存在'})
 
-    # 查找JSON文件
-    json_files = []
-    for root, dirs, files in os.walk(full_path):
-        for file in files:
-            if file.endswith('.json'):
-                relative_path = os.path.relpath(os.path.join(root, file), app.config['OUTPUT_FOLDER'])
-                json_files.append(relative_path)
-
-    return jsonify({'success': True, 'json_files': json_files})
+    response = jsonify({'success': True, 'json_files': json_files})
+    response.set_etag(f'{INDEX_EPOCH}-{version}-{output_dir}')
+    return response.make_conditional(request)
 
 @app.route('/json/<path:file_path>')
 def get_json(file_path):
-    full_path = os.path.join(app.config['OUTPUT_FOLDER'], file_path)
-    if not os.path.exists(full_path):
+    full_path = resolve_output_path(file_path)
+    if full_path is None or not os.path.isfile(full_path):
         return jsonify({'success': False, 'message': 'JSON文件不存在'})
 
-    data = load_json_file(full_path)
-    return jsonify({'success': True, 'data': data})
+    # 文件未改动时直接返回304，不读取也不解析
+    mtime_ns, size = LRUFileCache.file_signature(full_path)
+    etag = f'{mtime_ns:x}-{size:x}-{request.query_string.decode()}'
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    # 未指定分页参数时保持原有行为，返回完整JSON
+    if 'offset' not in request.args and 'limit' not in request.args:
+        data, _ = json_cache.get(full_path)
+        response = jsonify({'success': True, 'data': data})
+    else:
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = request.args.get('limit', app.config['JSON_PAGE_SIZE'], type=int)
+        limit = min(max(limit, 1), app.config['JSON_MAX_PAGE_SIZE'])
+        try:
+            page_index, _ = json_page_cache.get(full_path)
+            page, pagination = page_index.read_page(offset, limit)
+        except ValueError:
+            # 不是带chunks数组的文档（或文件刚被改写），按原方式完整解析
+            data, _ = json_cache.get(full_path)
+            page, pagination = load_json_page(data, offset, limit)
+        response = jsonify({'success': True, 'data': page, 'pagination': pagination})
+    response.set_etag(etag)
+    return response
+
+# 用户指定的输出目录内的相对路径；绝对路径或经 .. 跳出输出目录时返回None
+def resolve_output_path(relative_path):
+    root = os.path.realpath(app.config['OUTPUT_FOLDER'])
+    full_path = os.path.realpath(os.path.join(root, relative_path))
+    if os.path.isabs(relative_path) or os.path.commonpath([root, full_path]) != root:
+        return None
+    return full_path
+
+@app.route('/query', methods=['GET', 'POST'])
+def query_chunks():
+    source = request.get_json(silent=True) or request.values
+    query = (source.get('q') or '').strip()
+    if not query:
+        return jsonify({'success': False, 'message': '缺少查询文本'})
+    index_dir = app.config['VECTOR_INDEX_FOLDER']
+    if source.get('index'):
+        index_dir = resolve_output_path(source.get('index'))
+        if index_dir is None:
+            return jsonify({'success': False, 'message': '索引路径必须位于输出目录内'}), 400
+    if not index_exists(index_dir):
+        return jsonify({'success': False, 'message': '向量索引不存在'})
+    try:
+        top_k = min(max(int(source.get('top_k') or app.config['QUERY_TOP_K']), 1), app.config['QUERY_MAX_TOP_K'])
+        nprobe = int(source['nprobe']) if source.get('nprobe') else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'top_k和nprobe必须为整数'})
+    mode = source.get('mode') or 'hybrid'
+    if mode not in SEARCH_MODES:
+        return jsonify({'success': False, 'message': f"mode必须为 {'/'.join(SEARCH_MODES)} 之一"})
+
+    start = time.time()
+    searcher, _ = searcher_cache.get(os.path.join(index_dir, INDEX_META_FILE))
+    search_kwargs = {'nprobe': nprobe} if nprobe else {}
+    results = searcher.search(query, top_k=top_k, mode=mode, **search_kwargs)
+    return jsonify({'success': True, 'query': query, 'mode': mode, 'results': results,
+                    'index_type': searcher.index.index_type, 'elapsed': time.time() - start})
 
 @app.route('/output/<path:file_path>')
 def serve_output(file_path):
     return send_from_directory(app.config['OUTPUT_FOLDER'], file_path)
 
 if __name__ == '__main__':
-    print('启动Web服务器，访问 http://localhost:5000')
-    app.run(debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='RAG框架Web服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=5000, help='监听端口')
+    parser.add_argument('--debug', action='store_true', help='调试模式（自动重载和调试器），压测和部署时不要开启')
+    args = parser.parse_args()
+    print(f'启动Web服务器，访问 http://localhost:{args.port}')
+    app.run(host=args.host, port=args.port, debug=args.debug, threaded=True)
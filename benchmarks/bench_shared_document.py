@@ -0,0 +1,102 @@
+"""
+延迟OCR时解析结果的交接基准：pickle传递文档 vs 共享内存传递句柄
+模拟批处理中有图像的文件：工作进程解析 -> 主进程OCR -> 工作进程追加OCR文本后分块
+统计交接到分块前的耗时和接收方的Python内存峰值（共享内存本身不计入）
+用法: python benchmarks/bench_shared_document.py --size_mb 32 --images 20
+"""
+import os
+import sys
+import time
+import pickle
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.models import Document, Chunk
+from src.utils.shared_text import SharedDocument, SharedDocumentView, ensure_resource_tracker
+from src.parsers.parsers import format_image_texts
+from src.pipeline.batch import apply_ocr_results
+
+PARAGRAPH = "第{}段：扫描件中的正文与图像需要分别处理。Deferred OCR keeps the event loop responsive.\n\n"
+
+def make_document(size_bytes: int) -> Document:
+    parts, total, index = [], 0, 0
+    while total < size_bytes:
+        paragraph = PARAGRAPH.format(index)
+        parts.append(paragraph)
+        total += len(paragraph.encode('utf-8'))
+        index += 1
+    text = ''.join(parts)
+    table = Chunk(chunk_id='table_0', page_content='| a | b |\n| - | - |\n| 1 | 2 |', metadata={'atomic': True},
+                  chunk_size=29, chunk_overlap=0, chunk_method='table')
+    return Document(
+        page_content=text, document_id='bench', file_name='bench.pdf', file_type='pdf', file_path='/tmp/bench.pdf',
+        chunks=[Chunk(chunk_id='chunk_bench_0', page_content=text, metadata={}, chunk_size=len(text),
+                      chunk_overlap=0, chunk_method='initial_parser'), table],
+        total_chunks=2, total_size=len(text) + 29, metadata={'pending_ocr_images': 1},
+        loader_used='bench', loader_params={}
+    )
+
+def pickled_handoff(document: Document, ocr_results):
+    """工作进程 -> 主进程 -> 分块工作进程，各经过一次pickle往返，再追加OCR文本"""
+    in_main = pickle.loads(pickle.dumps(document))
+    in_worker = pickle.loads(pickle.dumps(in_main))
+    del in_main
+    return apply_ocr_results(in_worker, ocr_results)
+
+def shared_handoff(handle, ocr_results):
+    """句柄经过两次pickle往返，分块工作进程从共享内存解码正文后追加OCR文本"""
+    handle = pickle.loads(pickle.dumps(pickle.loads(pickle.dumps(handle))))
+    with SharedDocumentView(handle) as view:
+        document = view.document()
+    return apply_ocr_results(document, ocr_results)
+
+def separate_append(handle, ocr_results):
+    """共享内存交接，正文和初始块分别逐段拼接OCR文本（每次拼接都复制整段正文）"""
+    handle = pickle.loads(pickle.dumps(pickle.loads(pickle.dumps(handle))))
+    with SharedDocumentView(handle) as view:
+        document = view.document()
+    image_text = format_image_texts(ocr_results)
+    first = document.chunks[0]
+    content = first.page_content + "\n\n" + image_text
+    return document.copy(update={
+        'page_content': document.page_content + "\n\n" + image_text,
+        'chunks': [first.copy(update={'page_content': content})] + document.chunks[1:]
+    })
+
+def bench(name, func, args, expected, repeat):
+    best, peak = float('inf'), 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        assert result.page_content == expected and result.chunks[0].page_content == expected
+        del result
+        best = min(best, elapsed)
+    print(f"{name:<36} {best * 1000:>10.1f} ms {peak / (1024 * 1024):>12.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description='延迟OCR交接基准')
+    parser.add_argument('--size_mb', type=float, default=32, help='正文大小(MB, UTF-8)')
+    parser.add_argument('--images', type=int, default=20, help='OCR结果数量')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数，耗时取最快一次，内存取最大')
+    args = parser.parse_args()
+
+    ensure_resource_tracker()
+    document = make_document(int(args.size_mb * 1024 * 1024))
+    ocr_results = [f"第{i}张图像中识别出的文字。" * 20 for i in range(args.images)]
+    expected = document.page_content + "\n\n" + format_image_texts(ocr_results)
+    print(f"正文: {args.size_mb} MB, 字符数: {len(document.page_content)}, OCR结果: {args.images}")
+    print(f"{'交接方式':<32} {'耗时':>13} {'接收方内存峰值':>11}")
+
+    bench('pickle 文档', pickled_handoff, (document, ocr_results), expected, args.repeat)
+    with SharedDocument(document) as shared:
+        bench('共享内存（正文与初始块分别拼接）', separate_append, (shared.handle, ocr_results), expected, args.repeat)
+        bench('共享内存', shared_handoff, (shared.handle, ocr_results), expected, args.repeat)
+
+if __name__ == '__main__':
+    main()
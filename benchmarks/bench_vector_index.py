@@ -0,0 +1,72 @@
+"""
+向量检索基准：精确扫描与IVF在不同nprobe下的召回率和单次查询延迟
+用法: python benchmarks/bench_vector_index.py --rows 200000 --dimension 256 --nlist 512
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.retrieval.index import ExactIndex, IVFIndex, normalize
+
+def generate_vectors(rows: int, dimension: int, clusters: int, noise: float, seed: int = 42) -> np.ndarray:
+    """带聚类结构的随机向量，近似真实嵌入的分布"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, rows)
+    return centers[labels] + noise * rng.normal(size=(rows, dimension)).astype(np.float32)
+
+def ground_truth(vectors: np.ndarray, queries: np.ndarray, top_k: int) -> np.ndarray:
+    normalized = normalize(vectors)
+    return np.stack([np.argsort(-(normalized @ query))[:top_k] for query in normalize(queries)])
+
+def bench(name: str, index: ExactIndex, queries: np.ndarray, expected: np.ndarray, top_k: int, **kwargs):
+    latencies, hits = [], 0
+    for query, truth in zip(queries, expected):
+        start = time.perf_counter()
+        results = index.search(query, top_k, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        hits += len({int(result['chunk_id']) for result in results} & set(truth.tolist()))
+    latencies = np.array(latencies) * 1000
+    print(f"{name:<24} {hits / expected.size:>10.3f} {np.percentile(latencies, 50):>10.2f} ms "
+          f"{np.percentile(latencies, 95):>10.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description='向量检索基准')
+    parser.add_argument('--rows', type=int, default=200000, help='向量数')
+    parser.add_argument('--dimension', type=int, default=256, help='向量维度')
+    parser.add_argument('--clusters', type=int, default=1000, help='生成数据的簇数')
+    parser.add_argument('--noise', type=float, default=1.0, help='簇内噪声强度，越大簇越分散、近似检索越难')
+    parser.add_argument('--nlist', type=int, default=None, help='IVF聚类数，默认约为向量数的平方根')
+    parser.add_argument('--queries', type=int, default=200, help='查询数')
+    parser.add_argument('--top_k', type=int, default=10, help='每个查询返回的结果数')
+    args = parser.parse_args()
+
+    vectors = generate_vectors(args.rows, args.dimension, args.clusters, args.noise)
+    # 查询取自同一分布：在随机选取的向量上加噪声
+    rng = np.random.default_rng(7)
+    queries = vectors[rng.integers(0, args.rows, args.queries)] + \
+        args.noise * rng.normal(size=(args.queries, args.dimension)).astype(np.float32)
+    ids = [str(row) for row in range(args.rows)]
+    expected = ground_truth(vectors, queries, args.top_k)
+    print(f"向量数: {args.rows}, 维度: {args.dimension}, 查询数: {args.queries}, top_k: {args.top_k}")
+
+    exact = ExactIndex(args.dimension)
+    exact.add(ids, vectors)
+    ivf = IVFIndex(args.dimension, nlist=args.nlist)
+    ivf.add(ids, vectors)
+    start = time.perf_counter()
+    ivf.train()
+    print(f"IVF训练耗时: {time.perf_counter() - start:.2f}s, 聚类数: {ivf.centroids.shape[0]}")
+
+    print(f"{'方法':<22} {'召回率':>8} {'p50延迟':>12} {'p95延迟':>12}")
+    bench('精确扫描', exact, queries, expected, args.top_k)
+    for nprobe in (1, 4, 8, 16, 32, 64):
+        if nprobe <= ivf.centroids.shape[0]:
+            bench(f'IVF nprobe={nprobe}', ivf, queries, expected, args.top_k, nprobe=nprobe)
+
+if __name__ == '__main__':
+    main()
@@ -7,10 +7,19 @@ $(document).ready(function() {
     const resultsSection = $('.results-section');
     const progressBar = $('#progress-bar');
     const processingLog = $('#processing-log');
+    const chunkPreview = $('#chunk-preview');
     const resultsSummary = $('#results-summary');
     const resultsFiles = $('#results-files');
     const resultsContent = $('#results-content');
 
+    // 处理过程中最多展示的块数量，避免大文档占满浏览器内存
+    const MAX_PREVIEW_CHUNKS = 50;
+    // 查看JSON时每页的块数量
+    const PAGE_SIZE = 50;
+
+    let eventSource = null;
+    let streamedChunks = 0;
+
     // 表单提交事件
     uploadForm.on('submit', function(e) {
         e.preventDefault();
@@ -29,72 +38,190 @@ $(document).ready(function() {
         // 重置进度条和日志
         progressBar.width('0%');
         processingLog.empty();
+        chunkPreview.empty();
         resultsSummary.empty();
         resultsFiles.empty();
         resultsContent.empty();
+        streamedChunks = 0;
 
-        // 创建FormData对象
-        const formData = new FormData(this);
+        // 分片上传，完成后服务端返回任务ID
+        const file = fileInput[0].files[0];
+        const options = {
+            chunk_type: $('#chunk-type').val(),
+            chunk_size: parseInt($('#chunk-size').val(), 10),
+            overlap: parseInt($('#overlap').val(), 10)
+        };
+        uploadInParts(file, options)
+            .then(function(response) {
+                if (response.deduplicated) {
+                    addLog('服务器已有相同内容的文件，跳过重复保存');
+                }
+                addLog('文件上传成功，开始处理...');
+                listenJobEvents(response.events_url);
+            })
+            .catch(function(error) {
+                addLog('上传失败: ' + error.message);
+                backToUpload();
+            });
+    });
 
-        // 模拟进度更新
-        let progress = 0;
-        const progressInterval = setInterval(function() {
-            progress += Math.random() * 10;
-            if (progress > 90) progress = 90;
-            progressBar.width(progress + '%');
-        }, 500);
+    // 用于断点续传的本地记录键
+    function uploadKey(file) {
+        return `upload:${file.name}:${file.size}:${file.lastModified}`;
+    }
 
-        // 发送文件上传请求
-        $.ajax({
-            url: '/upload',
-            type: 'POST',
-            data: formData,
-            processData: false,
-            contentType: false,
-            success: function(response) {
-                clearInterval(progressInterval);
-                progressBar.width('100%');
+    function requestJson(url, method, body) {
+        return fetch(url, {
+            method: method,
+            headers: body ? {'Content-Type': 'application/json'} : {},
+            body: body ? JSON.stringify(body) : undefined
+        }).then(function(res) {
+            return res.json().then(function(data) {
+                if (!res.ok || !data.success) {
+                    throw new Error(data.message || res.statusText);
+                }
+                return data;
+            });
+        });
+    }
 
-                if (response.success) {
-                    addLog('文件处理成功！');
-                    setTimeout(function() {
-                        processingSection.addClass('hidden');
-                        resultsSection.removeClass('hidden');
-                        displayResults(response);
-                    }, 1000);
-                } else {
-                    addLog('处理失败: ' + response.message);
-                    addLog('错误详情: ' + response.stderr);
-                    setTimeout(function() {
-                        processingSection.addClass('hidden');
-                        uploadSection.removeClass('hidden');
-                    }, 2000);
+    // 获取可续传的会话，没有时新建
+    function openUploadSession(file, options) {
+        const key = uploadKey(file);
+        const savedId = localStorage.getItem(key);
+        const create = function() {
+            return requestJson('/upload/init', 'POST', Object.assign({filename: file.name, size: file.size}, options))
+                .then(function(status) {
+                    localStorage.setItem(key, status.upload_id);
+                    return status;
+                });
+        };
+        if (!savedId) {
+            return create();
+        }
+        return requestJson('/upload/' + savedId, 'GET').catch(create);
+    }
+
+    // 上传单个分片，失败时重试
+    function putPart(uploadId, partNumber, blob, retries) {
+        return fetch(`/upload/${uploadId}/part/${partNumber}`, {method: 'PUT', body: blob})
+            .then(function(res) {
+                if (!res.ok) {
+                    throw new Error('分片 ' + partNumber + ' 上传失败: ' + res.status);
                 }
-            },
-            error: function(xhr, status, error) {
-                clearInterval(progressInterval);
-                addLog('请求失败: ' + error);
-                setTimeout(function() {
-                    processingSection.addClass('hidden');
-                    uploadSection.removeClass('hidden');
-                }, 2000);
+                return res.json();
+            })
+            .catch(function(error) {
+                if (retries <= 0) {
+                    throw error;
+                }
+                return new Promise(function(resolve) { setTimeout(resolve, 1000); })
+                    .then(function() { return putPart(uploadId, partNumber, blob, retries - 1); });
+            });
+    }
+
+    async function uploadInParts(file, options) {
+        const status = await openUploadSession(file, options);
+        const missing = status.missing_parts;
+        if (status.received_parts.length > 0) {
+            addLog(`继续上次的上传，已完成 ${status.received_parts.length}/${status.total_parts} 个分片`);
+        }
+
+        for (let i = 0; i < missing.length; i++) {
+            const partNumber = missing[i];
+            const start = partNumber * status.part_size;
+            await putPart(status.upload_id, partNumber, file.slice(start, start + status.part_size), 3);
+            const done = status.total_parts - missing.length + i + 1;
+            // 上传阶段占进度条的前一部分
+            progressBar.width(Math.round(done / status.total_parts * 30) + '%');
+        }
+
+        const response = await requestJson(`/upload/${status.upload_id}/finalize`, 'POST');
+        localStorage.removeItem(uploadKey(file));
+        return response;
+    }
+
+    // 通过SSE接收处理进度和块
+    function listenJobEvents(eventsUrl) {
+        if (eventSource) {
+            eventSource.close();
+        }
+        eventSource = new EventSource(eventsUrl);
+
+        eventSource.addEventListener('progress', function(e) {
+            const data = JSON.parse(e.data);
+            progressBar.width(data.progress + '%');
+            addLog(`进度 ${data.progress}%: ${data.stage}`);
+        });
+
+        eventSource.addEventListener('log', function(e) {
+            addLog(JSON.parse(e.data).message);
+        });
+
+        eventSource.addEventListener('chunk', function(e) {
+            streamedChunks += 1;
+            if (streamedChunks <= MAX_PREVIEW_CHUNKS) {
+                appendChunkPreview(JSON.parse(e.data));
             }
         });
-    });
+
+        eventSource.addEventListener('done', function(e) {
+            eventSource.close();
+            const response = JSON.parse(e.data);
+            progressBar.width('100%');
+            addLog('文件处理成功！');
+            setTimeout(function() {
+                processingSection.addClass('hidden');
+                resultsSection.removeClass('hidden');
+                displayResults(response);
+            }, 1000);
+        });
+
+        eventSource.addEventListener('error', function(e) {
+            // 服务端的error事件带有数据；连接错误时EventSource会自动重连
+            if (!e.data) {
+                return;
+            }
+            eventSource.close();
+            showFailure(JSON.parse(e.data));
+        });
+    }
+
+    function showFailure(response) {
+        addLog('处理失败: ' + response.message);
+        addLog('错误详情: ' + (response.stderr || ''));
+        backToUpload();
+    }
+
+    function backToUpload() {
+        setTimeout(function() {
+            processingSection.addClass('hidden');
+            uploadSection.removeClass('hidden');
+        }, 2000);
+    }
 
     // 添加日志函数
     function addLog(message) {
         const timestamp = new Date().toLocaleTimeString();
-        processingLog.append(`[${timestamp}] ${message}\n`);
+        processingLog.append(document.createTextNode(`[${timestamp}] ${message}\n`));
         processingLog.scrollTop(processingLog[0].scrollHeight);
     }
 
+    // 实时展示已生成的块
+    function appendChunkPreview(chunk) {
+        const item = $('<div class="chunk-item"></div>');
+        item.append($('<h4></h4>').text(`块 ${chunk.chunk_index + 1} (${chunk.chunk_size} 字符)`));
+        item.append($('<pre></pre>').text(chunk.page_content));
+        chunkPreview.append(item);
+    }
+
     // 显示结果函数
     function displayResults(response) {
         // 显示摘要
         resultsSummary.html(`
             <p><strong>状态:</strong> 处理成功</p>
             <p><strong>输出目录:</strong> ${response.output_dir}</p>
+            <p><strong>总块数:</strong> ${response.total_chunks}</p>
             <p><strong>生成文件数:</strong> ${response.json_files.length}</p>
         `);
 
@@ -114,23 +241,19 @@ $(document).ready(function() {
         // 绑定查看JSON按钮事件
         $('.view-json').on('click', function() {
             const file = $(this).data('file');
-            viewJsonFile(file);
+            viewJsonFile(file, 0);
         });
     }
 
-    // 查看JSON文件函数
-    function viewJsonFile(filePath) {
+    // 分页查看JSON文件函数
+    function viewJsonFile(filePath, offset) {
         $.ajax({
             url: '/json/' + filePath,
             type: 'GET',
+            data: {offset: offset, limit: PAGE_SIZE},
             success: function(response) {
                 if (response.success) {
-                    // 格式化JSON
-                    const formattedJson = JSON.stringify(response.data, null, 2);
-                    resultsContent.html(`
-                        <h3>文件内容: ${filePath.split('/').pop()}</h3>
-                        <pre><code>${formattedJson}</code></pre>
-                    `);
+                    renderJsonPage(filePath, response);
                 } else {
                     resultsContent.html(`<p class="error">无法加载文件: ${response.message}</p>`);
                 }
@@ -140,4 +263,32 @@ $(document).ready(function() {
             }
         });
     }
-});
\ No newline at end of file
+
+    function renderJsonPage(filePath, response) {
+        // 格式化JSON
+        const formattedJson = JSON.stringify(response.data, null, 2);
+        resultsContent.empty();
+        resultsContent.append($('<h3></h3>').text(`文件内容: ${filePath.split('/').pop()}`));
+
+        const pagination = response.pagination;
+        if (pagination) {
+            const start = pagination.total === 0 ? 0 : pagination.offset + 1;
+            const end = Math.min(pagination.offset + pagination.limit, pagination.total);
+            const pager = $('<div class="btn-group"></div>');
+            const prev = $('<button class="btn-secondary">上一页</button>');
+            const next = $('<button class="btn-secondary">下一页</button>');
+            prev.prop('disabled', pagination.offset === 0);
+            next.prop('disabled', !pagination.has_more);
+            prev.on('click', function() {
+                viewJsonFile(filePath, Math.max(pagination.offset - pagination.limit, 0));
+            });
+            next.on('click', function() {
+                viewJsonFile(filePath, pagination.offset + pagination.limit);
+            });
+            pager.append(prev, $('<span></span>').text(`块 ${start}-${end} / ${pagination.total}`), next);
+            resultsContent.append(pager);
+        }
+
+        resultsContent.append($('<pre></pre>').append($('<code></code>').text(formattedJson)));
+    }
+});
@@ -1,11 +1,37 @@
+import sys
+import json
 import logging
+import time
+import signal
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from src.loaders.loaders import load_file
 from src.chunkers.chunkers import chunk_document
 from src.parsers.parsers import parse_file
 from src.utils.file_utils import JSONFileHandler
+from src.utils.corpus import merge_corpus, read_manifest, iter_documents
 from src.utils.models import Document
+from src.utils.catalog import iter_catalog, matches, summarize_catalog, parse_date
+from src.pipeline.sweep import run_sweep, format_sweep_table, load_source_document
+from src.chunkers.incremental import rechunk_document, DEFAULT_LINEAGE_DIR, INCREMENTAL_STRATEGIES
+from src.pipeline.batch import run_batch
+from src.pipeline.process import process_file, chunk_events
+from src.service.service import ProcessingDaemon, DaemonClient, DaemonError, DEFAULT_SOCKET_PATH, DEFAULT_WORKERS
+from src.pipeline.scheduler import PRIORITY_CLASSES, DEFAULT_PRIORITY
+from src.service.loadtest import (run_load_test, parse_mix, compare_reports, format_report, format_comparison,
+                                  start_local_server, stop_local_server, free_port, DOCUMENT_KINDS)
+from src.pipeline.ledger import JobLedger, format_status, LEDGER_FILE_NAME
+from src.pipeline.governance import DEFAULT_TIME_BUDGET, DEFAULT_MEMORY_BUDGET_MB, DEFAULT_OCR_TIMEOUT
+from src.utils.resource_limits import ResourceBudget
+from src.utils.chunk_stats import annotate_chunk_stats, format_chunk_stats, ChunkStatsAggregator, compute_chunk_stats
+from src.embeddings.embeddings import (EmbedderFactory, embed_document, DEFAULT_BATCH_TOKENS, DEFAULT_BATCH_SIZE,
+                                       DEFAULT_CONCURRENCY, DEFAULT_HASH_DIMENSION, DEFAULT_OPENAI_MODEL)
+from src.embeddings.vector_cache import EmbeddingCache
+from src.retrieval.index import load_index, DEFAULT_NPROBE
+from src.retrieval.retrieval import update_index, embedder_for_index
+from src.retrieval.hybrid import HybridSearcher, run_query_load, sample_queries, SEARCH_MODES, DEFAULT_CANDIDATES
 
 # 配置日志
 logging.basicConfig(
@@ -15,6 +41,50 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def budget_from_args(args) -> ResourceBudget:
+    """由命令行参数构造资源预算，0表示不限"""
+    return ResourceBudget(time_limit=args.time_budget or None, memory_limit_mb=args.memory_budget_mb or None)
+
+def add_budget_arguments(subparser):
+    subparser.add_argument('--time_budget', type=float, default=DEFAULT_TIME_BUDGET,
+                           help='单个文件每条解析路径的时间上限(秒)，0表示不限')
+    subparser.add_argument('--memory_budget_mb', type=int, default=DEFAULT_MEMORY_BUDGET_MB,
+                           help='单个文件每条解析路径的内存上限(MB)，0表示不限')
+    subparser.add_argument('--ocr_timeout', type=float, default=DEFAULT_OCR_TIMEOUT, help='单张图像OCR超时(秒)')
+
+def add_embedding_arguments(subparser):
+    subparser.add_argument('--backend', default='hash', choices=['hash', 'openai'],
+                           help='嵌入后端: hash（本地确定性，用于测试）或 openai（OpenAI兼容接口）')
+    subparser.add_argument('--model', default=DEFAULT_OPENAI_MODEL, help='openai后端的模型名')
+    subparser.add_argument('--base_url', default=None, help='OpenAI兼容接口地址，默认读取环境变量OPENAI_BASE_URL')
+    subparser.add_argument('--api_key', default=None, help='接口密钥，默认读取环境变量OPENAI_API_KEY')
+    subparser.add_argument('--dimension', type=int, default=None,
+                           help=f'向量维度；hash后端默认{DEFAULT_HASH_DIMENSION}，openai后端默认由模型决定')
+    subparser.add_argument('--batch_tokens', type=int, default=DEFAULT_BATCH_TOKENS, help='单个请求的近似token上限')
+    subparser.add_argument('--batch_size', type=int, default=DEFAULT_BATCH_SIZE, help='单个请求的最大条数')
+    subparser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='同时进行的请求数')
+    subparser.add_argument('--cache_dir', default=None, help='向量缓存目录，默认为输出目录下的embeddings')
+
+def embedder_from_args(args):
+    if args.backend == 'hash':
+        return EmbedderFactory.get_embedder('hash', dimension=args.dimension or DEFAULT_HASH_DIMENSION)
+    return EmbedderFactory.get_embedder('openai', model=args.model, base_url=args.base_url,
+                                        api_key=args.api_key, dimension=args.dimension)
+
+def embed_with_args(document: Document, embedder, cache: EmbeddingCache, args) -> Document:
+    embedded = embed_document(document, embedder, cache, max_batch_tokens=args.batch_tokens,
+                              max_batch_size=args.batch_size, concurrency=args.concurrency)
+    info = embedded.metadata['embedding']
+    logger.info(f"嵌入完成({info['model']}): 块数 {info['embedded_chunks']}, 缓存命中 {info['cache_hits']}, "
+                f"新嵌入 {info['embedded']}, 请求批次 {info['batches']}, 耗时 {info['elapsed']:.2f}s")
+    return embedded
+
+def emit_chunks(document: Document):
+    """将块逐行输出为JSON（stdout），供Web端在写盘前流式获取"""
+    for record in chunk_events(document):
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+        sys.stdout.flush()
+
 def main():
     parser = argparse.ArgumentParser(description='RAG框架文件处理工具')
     subparsers = parser.add_subparsers(dest='command', required=True)
@@ -28,10 +98,13 @@ def main():
     # 分块文件命令
     chunk_parser = subparsers.add_parser('chunk', help='对已加载的文件进行分块处理')
     chunk_parser.add_argument('json_path', help='已加载文件的JSON路径')
-    chunk_parser.add_argument('--strategy', default='fixed_size', help='分块策略: fixed_size 或 paragraph')
+    chunk_parser.add_argument('--strategy', default='fixed_size', help='分块策略: fixed_size、sentence、paragraph 或 hierarchical')
     chunk_parser.add_argument('--chunk_size', type=int, default=1000, help='块大小')
     chunk_parser.add_argument('--chunk_overlap', type=int, default=200, help='块重叠大小')
-    chunk_parser.add_argument('--unit', default='characters', help='单位: characters 或 tokens')
+    chunk_parser.add_argument('--unit', default='characters', choices=['characters', 'tokens', 'auto'],
+                              help='块大小单位: characters、tokens（CJK字符或英文单词）或 auto（按文档语言选择）')
+    chunk_parser.add_argument('--language', default='auto', choices=['auto', 'cjk', 'latin'],
+                              help='文档主要语言，决定分隔符；auto按加载时检测的结果')
     chunk_parser.add_argument('--output_dir', default='output/chunked', help='输出目录')
 
     # 解析文件命令
@@ -49,6 +122,171 @@ def main():
     full_parser.add_argument('--chunk_strategy', default='fixed_size', help='分块策略')
     full_parser.add_argument('--chunk_size', type=int, default=1000, help='块大小')
     full_parser.add_argument('--chunk_overlap', type=int, default=200, help='块重叠大小')
+    full_parser.add_argument('--emit_chunks', action='store_true', help='分块完成后立即将每个块以JSON行形式输出到stdout')
+    add_budget_arguments(full_parser)
+    full_parser.add_argument('--embed', action='store_true', help='分块后嵌入各块，向量写入缓存目录')
+    add_embedding_arguments(full_parser)
+
+    # 常驻处理服务命令
+    serve_parser = subparsers.add_parser('serve', help='启动常驻处理服务：预热解析器和分块器，在Unix套接字上接收处理请求')
+    serve_parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH, help='Unix套接字路径')
+    serve_parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='同时处理的文件数')
+    serve_parser.add_argument('--no_warmup', action='store_true', help='跳过启动时的预热')
+    serve_parser.add_argument('--bulk_limit', type=int, default=None,
+                              help='批量任务最多占用的槽位数，默认比workers少一个，为交互任务留出槽位')
+    add_budget_arguments(serve_parser)
+
+    # 向常驻服务提交文件命令
+    submit_parser = subparsers.add_parser('submit', help='把文件提交给常驻处理服务执行完整流程，流式接收进度和分块结果')
+    submit_parser.add_argument('files', nargs='+', help='要处理的文件路径')
+    submit_parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH, help='服务的Unix套接字路径')
+    submit_parser.add_argument('--output_dir', default='output/full_process', help='输出目录')
+    submit_parser.add_argument('--chunk_strategy', default='fixed_size', help='分块策略')
+    submit_parser.add_argument('--chunk_size', type=int, default=1000, help='块大小')
+    submit_parser.add_argument('--chunk_overlap', type=int, default=200, help='块重叠大小')
+    submit_parser.add_argument('--emit_chunks', action='store_true', help='将服务返回的每个块以JSON行形式输出到stdout')
+    submit_parser.add_argument('--concurrency', type=int, default=1, help='同时提交的文件数')
+    submit_parser.add_argument('--priority', default=DEFAULT_PRIORITY, choices=PRIORITY_CLASSES,
+                               help='优先级类别：interactive（小文件优先）或 bulk（批量导入，不占用交互任务的槽位）')
+
+    # 常驻服务队列状态命令
+    queue_parser = subparsers.add_parser('queue', help='查看常驻处理服务各优先级的运行数、队列深度和等待时间')
+    queue_parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH, help='服务的Unix套接字路径')
+    queue_parser.add_argument('--json', action='store_true', help='以JSON格式输出')
+
+    # 嵌入命令
+    embed_parser = subparsers.add_parser('embed', help='嵌入已分块文档中的块，向量以float16缓存在磁盘上')
+    embed_parser.add_argument('inputs', nargs='+', help='已分块文档的JSON文件或包含JSON文件的目录')
+    embed_parser.add_argument('--output_dir', default='output/embedded', help='输出目录')
+    add_embedding_arguments(embed_parser)
+
+    # 建立向量索引命令
+    index_parser = subparsers.add_parser('index', help='把已嵌入文档的块加入向量索引，同一文档再次加入时替换旧块')
+    index_parser.add_argument('inputs', nargs='+', help='已嵌入文档的JSON文件或包含JSON文件的目录')
+    index_parser.add_argument('--index_dir', default='output/index', help='索引目录')
+    index_parser.add_argument('--index_type', default='exact', choices=['exact', 'ivf'],
+                              help='新建索引的类型: exact（精确扫描）或 ivf（倒排聚类，近似检索）；索引已存在时沿用原类型')
+    index_parser.add_argument('--nlist', type=int, default=None, help='ivf聚类数，默认约为向量数的平方根')
+    index_parser.add_argument('--nprobe', type=int, default=DEFAULT_NPROBE, help='ivf查询时默认探测的聚类数')
+    index_parser.add_argument('--cache_dir', default=None, help='向量缓存目录，默认使用文档元数据中记录的目录')
+
+    # 向量检索命令
+    query_parser = subparsers.add_parser('query', help='在向量索引中检索与查询文本最相似的块')
+    query_parser.add_argument('queries', nargs='+', help='查询文本')
+    query_parser.add_argument('--index_dir', default='output/index', help='索引目录')
+    query_parser.add_argument('--top_k', type=int, default=5, help='每个查询返回的块数')
+    query_parser.add_argument('--nprobe', type=int, default=None, help='ivf索引探测的聚类数，越大越准越慢')
+    query_parser.add_argument('--base_url', default=None, help='OpenAI兼容接口地址，默认读取环境变量OPENAI_BASE_URL')
+    query_parser.add_argument('--api_key', default=None, help='接口密钥，默认读取环境变量OPENAI_API_KEY')
+    query_parser.add_argument('--mode', default='hybrid', choices=SEARCH_MODES,
+                              help='hybrid（关键词与向量并发检索后按排名融合）、vector 或 keyword')
+    query_parser.add_argument('--candidates', type=int, default=DEFAULT_CANDIDATES, help='每种检索取回的候选数')
+    query_parser.add_argument('--json', action='store_true', help='以JSON行形式输出结果')
+
+    # 检索压测命令
+    query_bench_parser = subparsers.add_parser('query_bench', help='并发压测检索，报告吞吐量、延迟分位数和缓存命中率')
+    query_bench_parser.add_argument('--index_dir', default='output/index', help='索引目录')
+    query_bench_parser.add_argument('--queries_file', default=None, help='查询文本文件（每行一个），默认从索引中的块文本随机截取')
+    query_bench_parser.add_argument('--distinct', type=int, default=200, help='从索引截取的不同查询数')
+    query_bench_parser.add_argument('--requests', type=int, default=2000, help='总查询次数')
+    query_bench_parser.add_argument('--concurrency', type=int, default=8, help='并发线程数')
+    query_bench_parser.add_argument('--top_k', type=int, default=5, help='每个查询返回的块数')
+    query_bench_parser.add_argument('--mode', default='hybrid', choices=SEARCH_MODES, help='检索方式')
+    query_bench_parser.add_argument('--nprobe', type=int, default=None, help='ivf索引探测的聚类数')
+    query_bench_parser.add_argument('--no_cache', action='store_true', help='关闭查询结果缓存，测量实际检索延迟')
+    query_bench_parser.add_argument('--base_url', default=None, help='OpenAI兼容接口地址，默认读取环境变量OPENAI_BASE_URL')
+    query_bench_parser.add_argument('--api_key', default=None, help='接口密钥，默认读取环境变量OPENAI_API_KEY')
+
+    # Web服务压测命令
+    loadtest_parser = subparsers.add_parser('loadtest', help='并发上传生成的文档压测Web服务，报告吞吐量、各接口延迟分位数、错误率和服务端各阶段耗时')
+    loadtest_parser.add_argument('--base_url', default=None, help='Web服务地址，如 http://127.0.0.1:5000')
+    loadtest_parser.add_argument('--start_server', action='store_true', help='在本机随机端口启动一个非调试模式的Web服务实例并压测')
+    loadtest_parser.add_argument('--requests', type=int, default=50, help='上传的文档总数')
+    loadtest_parser.add_argument('--concurrency', type=int, default=4, help='同时处理中的文档数')
+    loadtest_parser.add_argument('--mix', default=None,
+                                 help=f"文档组合及权重，如 txt_small=6,pdf_small=1（可选: {', '.join(DOCUMENT_KINDS)}）")
+    loadtest_parser.add_argument('--chunk_type', default='fixed_size', help='分块方式')
+    loadtest_parser.add_argument('--chunk_size', type=int, default=1000, help='分块大小')
+    loadtest_parser.add_argument('--overlap', type=int, default=100, help='分块重叠')
+    loadtest_parser.add_argument('--priority', default=DEFAULT_PRIORITY, choices=PRIORITY_CLASSES, help='上传任务的优先级')
+    loadtest_parser.add_argument('--seed', type=int, default=0, help='随机种子，相同种子生成相同的文档序列')
+    loadtest_parser.add_argument('--label', default=None, help='报告名称，默认为当前时间')
+    loadtest_parser.add_argument('--output', default=None, help='将压测报告保存为JSON文件')
+    loadtest_parser.add_argument('--compare', default=None, help='与之前保存的压测报告比较')
+
+    # 语料合并命令
+    merge_parser = subparsers.add_parser('merge', help='流式合并多个已处理文档，输出带清单的分片文件')
+    merge_parser.add_argument('inputs', nargs='+', help='文档JSON文件或包含JSON文件的目录')
+    merge_parser.add_argument('--output_dir', default='output/corpus', help='分片输出目录')
+    merge_parser.add_argument('--shard_size_mb', type=int, default=64, help='单个分片的大小上限(MB)')
+    merge_parser.add_argument('--rechunk', action='store_true', help='跨文档边界重新分块')
+    merge_parser.add_argument('--chunk_strategy', default='fixed_size', help='再分块策略')
+    merge_parser.add_argument('--chunk_size', type=int, default=1000, help='块大小')
+    merge_parser.add_argument('--chunk_overlap', type=int, default=200, help='块重叠大小')
+
+    # 分块参数扫描命令
+    sweep_parser = subparsers.add_parser('sweep', help='每个文件只解析一次，按参数网格并行分块并汇总统计')
+    sweep_parser.add_argument('file_paths', nargs='+', help='要扫描的文件路径')
+    sweep_parser.add_argument('--strategies', nargs='+', default=['fixed_size'], help='分块策略列表')
+    sweep_parser.add_argument('--chunk_sizes', nargs='+', type=int, default=[500, 1000, 1500], help='块大小列表')
+    sweep_parser.add_argument('--chunk_overlaps', nargs='+', type=int, default=[0, 100, 200], help='块重叠大小列表')
+    sweep_parser.add_argument('--workers', type=int, default=None, help='并行进程数，默认为CPU核数')
+    sweep_parser.add_argument('--output', default=None, help='将汇总结果另存为JSON文件')
+
+    # 批量处理命令
+    batch_parser = subparsers.add_parser('batch', help='批量执行完整流程，异步模式下读取/OCR/写出与解析分块重叠')
+    batch_parser.add_argument('inputs', nargs='+', help='要处理的文件或目录')
+    batch_parser.add_argument('--output_dir', default='output/batch', help='输出目录')
+    batch_parser.add_argument('--mode', default='async', choices=['async', 'sync'], help='执行模式')
+    batch_parser.add_argument('--chunk_strategy', default='fixed_size', help='分块策略')
+    batch_parser.add_argument('--chunk_size', type=int, default=1000, help='块大小')
+    batch_parser.add_argument('--chunk_overlap', type=int, default=200, help='块重叠大小')
+    batch_parser.add_argument('--workers', type=int, default=None, help='解析/分块进程数，默认为CPU核数')
+    batch_parser.add_argument('--prefetch', type=int, default=4, help='预读的文件数')
+    batch_parser.add_argument('--ocr_concurrency', type=int, default=2, help='同时运行的tesseract进程数')
+    batch_parser.add_argument('--spool_dir', default=None, help='先把输入复制到该本地目录再解析（适用于网络存储）')
+    batch_parser.add_argument('--tesseract_config', default=r'--oem 3 --psm 6', help='Tesseract OCR配置')
+    batch_parser.add_argument('--report', default=None, help='将处理结果另存为JSON文件')
+    add_budget_arguments(batch_parser)
+    batch_parser.add_argument('--ledger', default=None, help=f'任务台账路径，默认为输出目录下的{LEDGER_FILE_NAME}')
+    batch_parser.add_argument('--no_ledger', action='store_true', help='不使用任务台账（每次全部重新处理）')
+    batch_parser.add_argument('--max_retries', type=int, default=2, help='失败文件的最大重试次数')
+    batch_parser.add_argument('--retry_backoff', type=float, default=2.0, help='首次重试前等待的秒数，之后每次加倍')
+    batch_parser.add_argument('--retry_failed', action='store_true', help='重新处理之前已用完重试次数的失败文件')
+
+    # 批处理进度命令
+    status_parser = subparsers.add_parser('status', help='查看批处理任务台账中的进度、失败文件和预计剩余时间')
+    status_parser.add_argument('--ledger', default=f'output/batch/{LEDGER_FILE_NAME}', help='任务台账路径')
+    status_parser.add_argument('--json', action='store_true', help='以JSON格式输出')
+
+    # 增量分块命令
+    rechunk_parser = subparsers.add_parser('rechunk', help='与上一版本比较文本，只对改动部分重新分块')
+    rechunk_parser.add_argument('file_path', help='要处理的文件路径')
+    rechunk_parser.add_argument('--strategy', default='fixed_size', choices=INCREMENTAL_STRATEGIES,
+                                help='分块策略: fixed_size、sentence 或 paragraph（层级分块不支持增量）')
+    rechunk_parser.add_argument('--chunk_size', type=int, default=1000, help='块大小')
+    rechunk_parser.add_argument('--chunk_overlap', type=int, default=200, help='块重叠大小')
+    rechunk_parser.add_argument('--lineage_dir', default=DEFAULT_LINEAGE_DIR, help='保存各版本原文和分块结果的目录')
+    rechunk_parser.add_argument('--lineage_id', default=None, help='谱系ID，默认由文件路径生成')
+    rechunk_parser.add_argument('--output_dir', default='output/rechunked', help='输出目录')
+
+    # 输出目录编目命令
+    catalog_parser = subparsers.add_parser('catalog', help='列出已处理文档的元数据（读取sidecar，不加载整个文档），可按类型、加载器和日期过滤')
+    catalog_parser.add_argument('inputs', nargs='*', default=['output'], help='文档JSON文件或包含JSON文件的目录')
+    catalog_parser.add_argument('--file_type', default=None, help='只列出该文件类型，如 pdf')
+    catalog_parser.add_argument('--loader', default=None, help='只列出该加载器处理的文档，如 PDFLoader')
+    catalog_parser.add_argument('--since', default=None, help='创建时间不早于该日期，如 2025-07-01')
+    catalog_parser.add_argument('--until', default=None, help='创建时间早于该日期')
+    catalog_parser.add_argument('--prefix', default=None, help='只包含文件名以此开头的文档，如 final')
+    catalog_parser.add_argument('--backfill', action='store_true', help='为没有sidecar的旧文档补写sidecar')
+    catalog_parser.add_argument('--json', action='store_true', help='以JSON行格式输出每个文档')
+    catalog_parser.add_argument('--output', default=None, help='将匹配的条目和汇总另存为JSON文件')
+
+    # 分块统计命令
+    stats_parser = subparsers.add_parser('stats', help='汇总一批已分块文档的块长度分布和质量统计')
+    stats_parser.add_argument('inputs', nargs='+', help='文档JSON文件或包含JSON文件的目录')
+    stats_parser.add_argument('--recompute', action='store_true', help='忽略文档中已有的chunk_stats，重新计算')
+    stats_parser.add_argument('--output', default=None, help='将汇总结果另存为JSON文件')
 
     args = parser.parse_args()
 
@@ -78,11 +316,14 @@ def main():
                 chunking_strategy=args.strategy,
                 chunk_size=args.chunk_size,
                 chunk_overlap=args.chunk_overlap,
-                unit=args.unit
+                unit=args.unit,
+                language=args.language
             )
+            annotate_chunk_stats(chunked_doc)
             output_path = JSONFileHandler.save_document(chunked_doc, args.output_dir, prefix='chunked_doc')
             logger.info(f"分块处理完成，已保存至: {output_path}")
             logger.info(f"原始块数: {len(document.chunks)}, 新块数: {len(chunked_doc.chunks)}")
+            logger.info(f"分块统计: {format_chunk_stats(chunked_doc.metadata['chunk_stats'])}")
 
         elif args.command == 'parse':
             logger.info(f"开始解析文件: {args.file_path}")
@@ -98,44 +339,310 @@ def main():
             logger.info(f"提取图像数量: {parsed_doc.metadata.get('extracted_images', 0)}")
 
         elif args.command == 'process':
-            logger.info(f"开始完整流程处理: {args.file_path}")
-            file_ext = Path(args.file_path).suffix.lower()
-
-            # 1. 解析文件（如果是PDF或Markdown）
-            if file_ext in ['.pdf', '.md', '.markdown']:
-                logger.info("步骤1/3: 解析文件...")
-                parsed_doc = parse_file(
-                    args.file_path,
-                    extract_tables=True,
-                    extract_images=True
-                )
-                parsed_path = JSONFileHandler.save_document(parsed_doc, f"{args.output_dir}/step1_parsed")
-                logger.info(f"解析结果保存至: {parsed_path}")
-                current_doc = parsed_doc
+            def after_chunking(chunked_doc: Document) -> Document:
+                if args.emit_chunks:
+                    emit_chunks(chunked_doc)
+                if args.embed:
+                    embedder = embedder_from_args(args)
+                    cache = EmbeddingCache(args.cache_dir or f"{args.output_dir}/embeddings", embedder.model_name)
+                    chunked_doc = embed_with_args(chunked_doc, embedder, cache, args)
+                return chunked_doc
+
+            result = process_file(args.file_path, args.output_dir, chunk_strategy=args.chunk_strategy,
+                                  chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+                                  budget=budget_from_args(args), ocr_timeout=args.ocr_timeout,
+                                  on_chunked=after_chunking)
+            if args.emit_chunks:
+                # 最后一行输出处理结果（含各阶段耗时），Web端据此记录服务端耗时
+                sys.stdout.write(json.dumps({'process_result': result}, ensure_ascii=False) + '\n')
+                sys.stdout.flush()
+
+        elif args.command == 'serve':
+            daemon = ProcessingDaemon(args.socket, workers=args.workers, budget=budget_from_args(args),
+                                      ocr_timeout=args.ocr_timeout, warm=not args.no_warmup,
+                                      class_limits={'bulk': args.bulk_limit} if args.bulk_limit else None)
+            daemon.start()
+            for component, result in daemon.warmup_results.items():
+                if result['ok']:
+                    logger.info(f"预热 {component}: {result['seconds']:.2f}s")
+                else:
+                    logger.warning(f"预热 {component} 失败({result['seconds']:.2f}s): {result['error']}")
+            logger.info(f"处理服务已启动: {daemon.socket_path}, 并发数 {daemon.workers}, "
+                        f"批量任务上限 {daemon.scheduler.class_limits['bulk']}")
+            signal.signal(signal.SIGTERM, lambda signum, frame: daemon.shutdown())
+            try:
+                daemon.serve_forever()
+            except KeyboardInterrupt:
+                logger.info("处理服务已停止")
+
+        elif args.command == 'submit':
+            client = DaemonClient(args.socket)
+            output_lock = threading.Lock()
+
+            def submit(file_path: str) -> bool:
+                def on_event(event):
+                    with output_lock:
+                        if event['event'] == 'chunk' and args.emit_chunks:
+                            sys.stdout.write(json.dumps(event['chunk'], ensure_ascii=False) + '\n')
+                            sys.stdout.flush()
+                        elif event['event'] == 'progress':
+                            logger.info(f"{file_path}: {event['label']}({event['progress']}%)")
+                try:
+                    result = client.process(file_path, args.output_dir, on_event=on_event,
+                                            chunk_strategy=args.chunk_strategy, chunk_size=args.chunk_size,
+                                            chunk_overlap=args.chunk_overlap, stream_chunks=args.emit_chunks,
+                                            priority=args.priority)
+                except DaemonError as e:
+                    logger.error(f"{file_path} 处理失败: {e}")
+                    return False
+                timings = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result['timings'].items())
+                logger.info(f"{file_path} 完成: 块数 {result['total_chunks']}, 最终结果 {result['final_path']}（{timings}）")
+                return True
+
+            with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+                succeeded = sum(executor.map(submit, args.files))
+            logger.info(f"提交完成: 成功 {succeeded}/{len(args.files)}")
+
+        elif args.command == 'queue':
+            scheduler = DaemonClient(args.socket).ping()['scheduler']
+            if args.json:
+                print(json.dumps(scheduler, ensure_ascii=False, indent=2))
             else:
-                # 对于纯文本文件，直接加载
-                logger.info("步骤1/3: 加载文件...")
-                current_doc = load_file(args.file_path)
-                loaded_path = JSONFileHandler.save_document(current_doc, f"{args.output_dir}/step1_loaded")
-                logger.info(f"加载结果保存至: {loaded_path}")
-
-            # 2. 分块处理
-            logger.info("步骤2/3: 分块处理...")
-            chunked_doc = chunk_document(
-                current_doc,
+                print(f"槽位: {scheduler['running']}/{scheduler['workers']} 运行中")
+                for priority, queue in scheduler['classes'].items():
+                    print(f"{priority:<12} 运行 {queue['running']}/{queue['limit']}, 排队 {queue['queued']} "
+                          f"({queue['queued_bytes']} 字节, 最久 {queue['oldest_wait']:.1f}s), 已完成 {queue['completed']}, "
+                          f"等待p50/p95/max {queue['wait_p50']:.2f}/{queue['wait_p95']:.2f}/{queue['wait_max']:.2f}s")
+
+        elif args.command == 'embed':
+            logger.info(f"开始嵌入: {len(args.inputs)} 个输入")
+            embedder = embedder_from_args(args)
+            cache = EmbeddingCache(args.cache_dir or f"{args.output_dir}/embeddings", embedder.model_name)
+            documents = 0
+            for document in iter_documents(args.inputs):
+                embedded = embed_with_args(document, embedder, cache, args)
+                output_path = JSONFileHandler.save_document(embedded, args.output_dir, prefix='embedded_doc')
+                logger.info(f"已保存至: {output_path}")
+                documents += 1
+            logger.info(f"嵌入完成: 文档数 {documents}, 缓存向量数 {len(cache)}, 缓存目录 {cache.directory}")
+
+        elif args.command == 'index':
+            logger.info(f"开始更新索引: {len(args.inputs)} 个输入")
+            index_kwargs = {'nlist': args.nlist, 'nprobe': args.nprobe} if args.index_type == 'ivf' else {}
+            stats = update_index(args.index_dir, iter_documents(args.inputs), index_type=args.index_type,
+                                 cache_dir=args.cache_dir, **index_kwargs)
+            logger.info(f"索引更新完成({stats['index_type']}, {stats['model']}): 文档数 {stats['documents']}, "
+                        f"新增块 {stats['added']}, 替换旧块 {stats['removed']}, 索引块数 {stats['size']}")
+            if stats['skipped_documents'] or stats['missing_vectors']:
+                logger.warning(f"跳过文档: {stats['skipped_documents']}, 缺失向量: {stats['missing_vectors']}")
+            logger.info(f"索引目录: {stats['index_dir']}")
+
+        elif args.command == 'query':
+            index = load_index(args.index_dir)
+            embedder = embedder_for_index(index, base_url=args.base_url, api_key=args.api_key)
+            searcher = HybridSearcher(index, embedder, candidates=args.candidates)
+            search_kwargs = {'nprobe': args.nprobe} if args.nprobe else {}
+            for query in args.queries:
+                hits = searcher.search(query, top_k=args.top_k, mode=args.mode, **search_kwargs)
+                if args.json:
+                    print(json.dumps({'query': query, 'results': hits}, ensure_ascii=False))
+                    continue
+                print(f"查询: {query}")
+                for rank, hit in enumerate(hits, 1):
+                    preview = hit['text'][:80].replace('\n', ' ')
+                    print(f"  {rank}. [{hit['score']:.4f} 向量#{hit['vector_rank'] or '-'} 关键词#{hit['keyword_rank'] or '-'}] "
+                          f"{hit['file_name']} {hit['chunk_id']}: {preview}")
+            searcher.close()
+
+        elif args.command == 'query_bench':
+            index = load_index(args.index_dir)
+            searcher = HybridSearcher(index, embedder_for_index(index, base_url=args.base_url, api_key=args.api_key),
+                                      cache_size=0 if args.no_cache else 1024)
+            if args.queries_file:
+                with open(args.queries_file, 'r', encoding='utf-8') as f:
+                    queries = [line.strip() for line in f if line.strip()]
+            else:
+                queries = sample_queries(index, args.distinct)
+            if not queries:
+                raise ValueError("没有可用的查询文本")
+            # 预热：建立关键词索引，避免计入第一个查询的延迟
+            searcher.keyword_index()
+            search_kwargs = {'nprobe': args.nprobe} if args.nprobe else {}
+            logger.info(f"开始压测: 索引块数 {len(index)}, 查询 {len(queries)} 种, 共 {args.requests} 次, 并发 {args.concurrency}")
+            report = run_query_load(searcher, queries, requests=args.requests, concurrency=args.concurrency,
+                                    top_k=args.top_k, mode=args.mode, **search_kwargs)
+            searcher.close()
+            logger.info(f"吞吐量: {report['throughput']:.1f} 次/秒, 耗时 {report['elapsed']:.2f}s, 错误 {report['errors']}")
+            logger.info(f"延迟p50/p95/p99/max: {report['p50_ms']:.2f}/{report['p95_ms']:.2f}/"
+                        f"{report['p99_ms']:.2f}/{report['max_ms']:.2f} ms, 缓存命中率 {report['cache_hit_rate']:.1%}")
+
+        elif args.command == 'merge':
+            logger.info(f"开始合并语料: {len(args.inputs)} 个输入")
+            manifest_path = merge_corpus(
+                args.inputs,
+                args.output_dir,
+                shard_max_bytes=args.shard_size_mb * 1024 * 1024,
+                rechunk=args.rechunk,
+                chunking_strategy=args.chunk_strategy,
+                chunk_size=args.chunk_size,
+                chunk_overlap=args.chunk_overlap
+            )
+            manifest = read_manifest(manifest_path)
+            logger.info(f"合并完成，清单保存至: {manifest_path}")
+            logger.info(f"文档数: {manifest['total_documents']}, 记录数: {manifest['total_records']}, 分片数: {manifest['total_shards']}")
+
+        elif args.command == 'sweep':
+            logger.info(f"开始参数扫描: {len(args.file_paths)} 个文件")
+            summaries = run_sweep(
+                args.file_paths,
+                strategies=args.strategies,
+                chunk_sizes=args.chunk_sizes,
+                chunk_overlaps=args.chunk_overlaps,
+                workers=args.workers
+            )
+            print(format_sweep_table(summaries))
+            if args.output:
+                Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    json.dump(summaries, f, ensure_ascii=False, indent=2)
+                logger.info(f"扫描结果保存至: {args.output}")
+
+        elif args.command == 'batch':
+            logger.info(f"开始批量处理({args.mode}): {len(args.inputs)} 个输入")
+            summary = run_batch(
+                args.inputs,
+                args.output_dir,
+                mode=args.mode,
                 chunking_strategy=args.chunk_strategy,
+                workers=args.workers,
+                prefetch=args.prefetch,
+                ocr_concurrency=args.ocr_concurrency,
+                spool_dir=args.spool_dir,
+                tesseract_config=args.tesseract_config,
+                budget=budget_from_args(args),
+                ocr_timeout=args.ocr_timeout,
+                ledger_path=None if args.no_ledger else (args.ledger or str(Path(args.output_dir) / LEDGER_FILE_NAME)),
+                max_retries=args.max_retries,
+                retry_backoff=args.retry_backoff,
+                retry_failed=args.retry_failed,
                 chunk_size=args.chunk_size,
                 chunk_overlap=args.chunk_overlap
             )
-            chunked_path = JSONFileHandler.save_document(chunked_doc, f"{args.output_dir}/step2_chunked")
-            logger.info(f"分块结果保存至: {chunked_path}")
-
-            # 3. 最终输出
-            final_path = JSONFileHandler.save_document(chunked_doc, args.output_dir, prefix='final')
-            logger.info(f"完整流程完成！最终结果保存至: {final_path}")
-            logger.info(f"文档ID: {chunked_doc.document_id}")
-            logger.info(f"总块数: {len(chunked_doc.chunks)}")
-            logger.info(f"总字符数: {chunked_doc.total_size}")
+            logger.info(f"批量处理完成: 文件数 {summary['files']}, 成功 {summary['succeeded']}, "
+                        f"跳过(已完成) {summary['skipped']}, 失败 {summary['failed']}, "
+                        f"耗时 {summary['elapsed']:.2f}s, {summary['files_per_second']:.2f} 文件/秒")
+            logger.info(f"各阶段累计耗时: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in summary['stage_seconds'].items()))
+            if args.report:
+                Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+                with open(args.report, 'w', encoding='utf-8') as f:
+                    json.dump(summary, f, ensure_ascii=False, indent=2)
+                logger.info(f"处理结果保存至: {args.report}")
+
+        elif args.command == 'status':
+            if not Path(args.ledger).exists():
+                raise FileNotFoundError(f"任务台账不存在: {args.ledger}")
+            with JobLedger(args.ledger) as ledger:
+                status = ledger.status()
+            if args.json:
+                print(json.dumps(status, ensure_ascii=False, indent=2))
+            else:
+                print(format_status(status))
+
+        elif args.command == 'rechunk':
+            logger.info(f"开始增量分块: {args.file_path}")
+            document = load_source_document(args.file_path)
+            chunked_doc = rechunk_document(
+                document,
+                chunking_strategy=args.strategy,
+                lineage_dir=args.lineage_dir,
+                lineage_id=args.lineage_id,
+                chunk_size=args.chunk_size,
+                chunk_overlap=args.chunk_overlap
+            )
+            annotate_chunk_stats(chunked_doc)
+            output_path = JSONFileHandler.save_document(chunked_doc, args.output_dir, prefix='rechunked_doc')
+            incremental = chunked_doc.metadata['incremental']
+            logger.info(f"增量分块完成，已保存至: {output_path}")
+            logger.info(f"版本: {incremental['version']}, 复用块数: {incremental['reused_chunks']}, "
+                        f"新块数: {incremental['new_chunks']}, 移除块数: {len(incremental['removed_chunk_ids'])}, "
+                        f"重新分块字符数: {incremental['rechunked_chars']}")
+
+        elif args.command == 'catalog':
+            start = time.perf_counter()
+            since, until = parse_date(args.since), parse_date(args.until)
+            scanned, entries = 0, []
+            for entry in iter_catalog(args.inputs, backfill=args.backfill, prefix=args.prefix):
+                scanned += 1
+                if 'error' in entry:
+                    logger.warning(f"无法读取 {entry['path']}: {entry['error']}")
+                if not matches(entry, args.file_type, args.loader, since, until):
+                    continue
+                entries.append(entry)
+                if args.json:
+                    print(json.dumps(entry, ensure_ascii=False))
+                else:
+                    print(f"{(entry.get('created_at') or '-')[:19]}  {entry.get('file_type') or '-':<6}{entry.get('loader_used') or '-':<24}"
+                          f"{entry.get('total_chunks') or 0:>7} 块  {entry.get('file_name')}  {entry['path']}")
+            summary = summarize_catalog(entries)
+            logger.info(f"扫描 {scanned} 个文档，匹配 {summary['documents']} 个（{time.perf_counter() - start:.2f}s）: "
+                        f"块数 {summary['total_chunks']}, 字符数 {summary['total_size']}, "
+                        f"类型 {summary['file_types']}, 加载器 {summary['loaders']}")
+            if args.output:
+                Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    json.dump({'summary': summary, 'documents': entries}, f, ensure_ascii=False, indent=2)
+                logger.info(f"编目结果保存至: {args.output}")
+
+        elif args.command == 'stats':
+            logger.info(f"开始汇总分块统计: {len(args.inputs)} 个输入")
+            aggregator = ChunkStatsAggregator()
+            for document in iter_documents(args.inputs):
+                stats = document.metadata.get('chunk_stats')
+                if args.recompute or not stats:
+                    stats = compute_chunk_stats(document)
+                aggregator.add(stats, document.document_id)
+            summary = aggregator.summary()
+            logger.info(f"文档数: {summary['documents']}, 块数: {summary['chunk_count']}, 总字符数: {summary['total_chars']}")
+            logger.info(f"块长度p50/p95(估算)/max: {summary['p50_estimate']:.0f}/{summary['p95_estimate']:.0f}/{summary['max']}")
+            logger.info(f"重叠率: {summary['overlap_ratio']:.1%}, 重复率: {summary['duplicate_ratio']:.1%}, "
+                        f"空块: {summary['empty_chunks']}, 过小块: {summary['tiny_chunks']}, 丢弃段落: {summary['dropped_paragraphs']}")
+            logger.info(f"长度直方图: {summary['histogram']}")
+            if summary['warning_counts']:
+                logger.warning(f"告警文档数: {summary['warning_counts']}")
+            if args.output:
+                Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    json.dump(summary, f, ensure_ascii=False, indent=2)
+                logger.info(f"统计结果保存至: {args.output}")
+
+        elif args.command == 'loadtest':
+            if not args.base_url and not args.start_server:
+                raise ValueError("需要指定 --base_url 或 --start_server")
+            server = None
+            base_url = args.base_url
+            if args.start_server:
+                port = free_port()
+                server = start_local_server(port)
+                base_url = f'http://127.0.0.1:{port}'
+                logger.info(f"已启动Web服务: {base_url}")
+            try:
+                logger.info(f"开始压测 {base_url}: {args.requests} 个文档, 并发 {args.concurrency}")
+                report = run_load_test(base_url, requests=args.requests, concurrency=args.concurrency,
+                                       mix=parse_mix(args.mix), chunk_type=args.chunk_type, chunk_size=args.chunk_size,
+                                       overlap=args.overlap, priority=args.priority, seed=args.seed, label=args.label)
+            finally:
+                if server:
+                    stop_local_server(server)
+            print(format_report(report))
+            if args.compare:
+                with open(args.compare, 'r', encoding='utf-8') as f:
+                    baseline = json.load(f)
+                print(format_comparison(compare_reports(baseline, report), baseline['label'], report['label']))
+            if args.output:
+                Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    json.dump(report, f, ensure_ascii=False, indent=2)
+                logger.info(f"压测报告保存至: {args.output}")
 
     except Exception as e:
         logger.error(f"处理过程中出错: {str(e)}", exc_info=True)
@@ -1,10 +1,36 @@
-from typing import List, Dict, Any, Optional
+import re
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import hashlib
 from abc import ABC, abstractmethod
 from langchain.text_splitter import RecursiveCharacterTextSplitter, MarkdownTextSplitter
 from langchain_core.documents import Document as LangChainDocument
 from src.utils.models import Document as RAGDocument, Chunk
+from src.chunkers.sentence_splitter import SentenceTextSplitter, CJK_AWARE_SEPARATORS, LATIN_SEPARATORS
+from src.utils.text_detection import detect_language, count_tokens
+from src.utils.page_map import inherited_metadata, annotate_chunk_pages
+
+def resolve_language(document: RAGDocument) -> str:
+    """文档的主要语言（cjk/latin）：优先使用加载时写入的元数据，否则对正文采样判断"""
+    language = document.metadata.get('language')
+    if language in ('cjk', 'latin'):
+        return language
+    return detect_language(document.page_content)['language']
+
+def separators_for_language(language: str) -> List[str]:
+    """CJK或无法判断时使用中英文混合分隔符"""
+    return LATIN_SEPARATORS if language == 'latin' else CJK_AWARE_SEPARATORS
+
+def resolve_unit(unit: str, language: str) -> str:
+    """auto：CJK文本按字符计，拉丁字母文本按词（近似token）计"""
+    if unit == 'auto':
+        return 'tokens' if language == 'latin' else 'characters'
+    if unit not in ('characters', 'tokens'):
+        raise ValueError(f"Unsupported unit: {unit}")
+    return unit
+
+def length_function_for_unit(unit: str):
+    return count_tokens if unit == 'tokens' else len
 
 class BaseChunker(ABC):
     """分块器的抽象基类"""
@@ -18,25 +44,65 @@ class BaseChunker(ABC):
         """分块文档并返回更新后的文档"""
         pass
 
+    @abstractmethod
+    def split_text(self, text: str) -> List[str]:
+        """只切分文本、不构造块对象，供流式再分块和增量分块使用"""
+        pass
+
     def _generate_chunk_id(self, document_id: str, chunk_index: int) -> str:
         """生成唯一的块ID"""
         chunk_hash = hashlib.md5(f"{document_id}_{chunk_index}_{datetime.now().isoformat()}".encode()).hexdigest()
         return f"chunk_{chunk_hash[:12]}"
 
+    @staticmethod
+    def _split_atomic_chunks(document: RAGDocument):
+        """区分普通文本块和原子块（如表格），原子块不参与再分块"""
+        text_chunks = [chunk for chunk in document.chunks if not chunk.metadata.get('atomic')]
+        atomic_chunks = [chunk for chunk in document.chunks if chunk.metadata.get('atomic')]
+        return text_chunks, atomic_chunks
+
+    @staticmethod
+    def _append_atomic_chunks(new_chunks: List[Chunk], atomic_chunks: List[Chunk]) -> List[Chunk]:
+        """将原子块原样追加到分块结果末尾，并更新其块序号"""
+        result = list(new_chunks)
+        for chunk in atomic_chunks:
+            result.append(chunk.copy(update={'metadata': {**chunk.metadata, 'chunk_index': len(result)}}))
+        return result
+
 class LangChainChunker(BaseChunker):
     def __init__(self,** kwargs):
         super().__init__(**kwargs)
         self.chunking_strategy = kwargs.get('chunking_strategy', 'recursive_character')
-        self.text_splitter = self._create_text_splitter()
+        # language为auto时按文档的主要语言选择分隔符；unit为auto时同时选择长度单位
+        self.language = kwargs.get('language', 'auto')
+        self.unit = kwargs.get('unit', 'characters')
+        self._splitters = {}
+        self.text_splitter = self._splitter_for('cjk' if self.language == 'auto' else self.language)
+
+    def _splitter_for(self, language: str):
+        """每种语言只创建一次分割器"""
+        if language not in self._splitters:
+            self._splitters[language] = self._create_text_splitter(language)
+        return self._splitters[language]
 
-    def _create_text_splitter(self):
+    def _create_text_splitter(self, language: str = 'cjk'):
         """根据分块策略创建对应的LangChain文本分割器"""
+        length_function = self.kwargs.get('length_function') or \
+            length_function_for_unit(resolve_unit(self.unit, language))
         if self.chunking_strategy == 'recursive_character':
+            # 默认分隔符包含中文标点，标点保留在前一块末尾，避免中文文本退化为逐字符切分
             return RecursiveCharacterTextSplitter(
                 chunk_size=self.chunk_size,
                 chunk_overlap=self.chunk_overlap,
-                separators=self.kwargs.get('separators', ['\n\n', '\n', '. ', '! ', '? ', ' ', '']),
-                length_function=self.kwargs.get('length_function', len)
+                separators=self.kwargs.get('separators') or separators_for_language(language),
+                keep_separator=self.kwargs.get('keep_separator', 'end'),
+                length_function=length_function
+            )
+        elif self.chunking_strategy == 'sentence':
+            return SentenceTextSplitter(
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                length_function=length_function
             )
         elif self.chunking_strategy == 'markdown':
             return MarkdownTextSplitter(
@@ -46,12 +112,25 @@ class LangChainChunker(BaseChunker):
         else:
             raise ValueError(f"Unsupported chunking strategy: {self.chunking_strategy}")
 
+    def _language_of(self, text: str) -> str:
+        if self.language != 'auto':
+            return self.language
+        return detect_language(text)['language']
+
+    def split_text(self, text: str) -> List[str]:
+        return self._splitter_for(self._language_of(text)).split_text(text)
+
     def chunk_documents(self, documents: List[LangChainDocument]) -> List[LangChainDocument]:
         """使用LangChain文本分割器分块文档"""
         return self.text_splitter.split_documents(documents)
 
     def chunk_document(self, rag_document: RAGDocument) -> RAGDocument:
         """分块RAGDocument对象并返回更新后的文档"""
+        _, atomic_chunks = self._split_atomic_chunks(rag_document)
+        language = self.language if self.language != 'auto' else resolve_language(rag_document)
+        unit = resolve_unit(self.unit, language)
+        text_splitter = self._splitter_for(language)
+
         # 将RAGDocument转换为LangChain文档列表
         langchain_docs = [LangChainDocument(
             page_content=rag_document.page_content,
@@ -59,27 +138,29 @@ class LangChainChunker(BaseChunker):
         )]
 
         # 分块文档
-        split_docs = self.chunk_documents(langchain_docs)
+        split_docs = text_splitter.split_documents(langchain_docs)
         chunk_method = f"langchain_{self.chunking_strategy}_size_{self.chunk_size}_overlap_{self.chunk_overlap}"
 
         # 创建新的块列表
         new_chunks = []
         for i, split_doc in enumerate(split_docs):
             chunk_metadata = {
-                **rag_document.metadata,
+                **inherited_metadata(rag_document.metadata),
                 'chunk_index': i,
                 'chunk_method': chunk_method,
                 'original_document_id': rag_document.document_id,
                 'chunk_size': len(split_doc.page_content),
                 'chunk_overlap': self.chunk_overlap,
-                'langchain_splitter': self.text_splitter.__class__.__name__
+                'langchain_splitter': text_splitter.__class__.__name__
             }
 
             # 添加分块器参数
             chunk_metadata['chunking_params'] = {
                 'chunk_size': self.chunk_size,
                 'chunk_overlap': self.chunk_overlap,
-                'strategy': self.chunking_strategy
+                'strategy': self.chunking_strategy,
+                'unit': unit,
+                'language': language
             }
 
             new_chunks.append(Chunk(
@@ -91,6 +172,7 @@ class LangChainChunker(BaseChunker):
                 metadata=chunk_metadata,
                 file_path=rag_document.file_path
             ))
+        new_chunks = self._append_atomic_chunks(new_chunks, atomic_chunks)
 
         # 更新RAGDocument
         return RAGDocument(
@@ -104,7 +186,8 @@ class LangChainChunker(BaseChunker):
             total_size=sum(len(chunk.page_content) for chunk in new_chunks),
             loader_used=rag_document.loader_used,
             loader_params=rag_document.loader_params,
-            metadata={**rag_document.metadata, 'chunking_strategy': self.chunking_strategy}
+            metadata={**rag_document.metadata, 'chunking_strategy': self.chunking_strategy,
+                      'chunking_language': language, 'chunking_unit': unit}
         )
 
     def _generate_chunk_id(self, document_id: str, chunk_index: int) -> str:
@@ -157,20 +240,31 @@ class ParagraphChunker(BaseChunker):
     def __init__(self,** kwargs):
         super().__init__(**kwargs)
         self.paragraph_separators = kwargs.get('paragraph_separators', ['\n\n', '\r\n\r\n', '\n\r\n'])
+        # 设置后，超过该长度的段落按句子边界再拆分
+        self.max_paragraph_length = kwargs.get('max_paragraph_length')
+        self.sentence_splitter = SentenceTextSplitter(
+            chunk_size=self.max_paragraph_length,
+            chunk_overlap=0
+        ) if self.max_paragraph_length else None
 
     def chunk_document(self, document: RAGDocument) -> RAGDocument:
-        content = "\n\n".join([chunk.page_content for chunk in document.chunks])
+        text_chunks, atomic_chunks = self._split_atomic_chunks(document)
+        content = "\n\n".join([chunk.page_content for chunk in text_chunks])
         chunks = self._split_into_paragraphs(content)
         chunk_method = "paragraph_based"
 
         new_chunks = []
+        dropped_paragraphs = 0
+        dropped_chars = 0
         for i, chunk_content in enumerate(chunks):
-            # 过滤掉过短的段落
+            # 过滤掉过短的段落，并记录丢弃数量供统计使用
             if len(chunk_content) < self.kwargs.get('min_paragraph_length', 10):
+                dropped_paragraphs += 1
+                dropped_chars += len(chunk_content)
                 continue
 
             chunk_metadata = {
-                **document.metadata,
+                **inherited_metadata(document.metadata),
                 'chunk_index': i,
                 'chunk_method': chunk_method,
                 'original_document_id': document.document_id,
@@ -185,6 +279,7 @@ class ParagraphChunker(BaseChunker):
                 chunk_overlap=0,
                 chunk_method=chunk_method
             ))
+        new_chunks = self._append_atomic_chunks(new_chunks, atomic_chunks)
 
         return RAGDocument(
             page_content=document.page_content,
@@ -193,13 +288,18 @@ class ParagraphChunker(BaseChunker):
             file_type=document.file_type,
             file_path=document.file_path,
             chunks=new_chunks,
-            metadata={**document.metadata, 'chunking_params': self.kwargs},
+            metadata={**document.metadata, 'chunking_params': self.kwargs,
+                      'dropped_paragraphs': dropped_paragraphs, 'dropped_chars': dropped_chars},
             total_chunks=len(new_chunks),
             total_size=sum(len(chunk.page_content) for chunk in new_chunks),
             loader_used=document.loader_used,
             loader_params=document.loader_params
         )
 
+    def split_text(self, text: str) -> List[str]:
+        min_length = self.kwargs.get('min_paragraph_length', 10)
+        return [para for para in self._split_into_paragraphs(text) if len(para) >= min_length]
+
     def _split_into_paragraphs(self, content: str) -> List[str]:
         """将文本拆分为段落"""
         # 首先使用最常见的段落分隔符拆分
@@ -211,7 +311,225 @@ class ParagraphChunker(BaseChunker):
             paragraphs = new_paragraphs
 
         # 过滤空段落
-        return [para.strip() for para in paragraphs if para.strip()]
+        paragraphs = [para.strip() for para in paragraphs if para.strip()]
+        if self.sentence_splitter is None:
+            return paragraphs
+
+        result = []
+        for para in paragraphs:
+            if len(para) > self.max_paragraph_length:
+                result.extend(self.sentence_splitter.split_text(para))
+            else:
+                result.append(para)
+        return result
+
+class HierarchicalChunker(BaseChunker):
+    """
+    层级分块器：一次遍历page_content，同时生成 章节 -> 段落 -> 窗口 三级块
+    只有叶子窗口块保存文本，章节和段落块只记录在原文中的偏移和父子关系，不重复存储文本
+    块按先序排列（章节、其下的段落、段落下的窗口），顺序遍历即可得到全部层级
+    """
+    # Markdown标题或“第X章/节”形式的中文标题作为章节起点
+    HEADING_PATTERN = re.compile(
+        r'^(?:#{1,6}\s+\S.*|第[一二三四五六七八九十百千\d]+[章节部分篇](?:[ \t　:：].{0,40})?)$', re.MULTILINE
+    )
+    PARAGRAPH_BREAK = re.compile(r'\n[ \t\u3000]*\n\s*')
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # 超过该长度的章节按段落边界拆成多个章节
+        self.section_size = kwargs.get('section_size', max(self.chunk_size * 4, 2000))
+        # 过短的段落（如标题行）并入下一段
+        self.min_paragraph_length = kwargs.get('min_paragraph_length', 10)
+        # 窗口大小与LangChainChunker一样按unit/length_function计量；章节和段落的拆分仍按字符
+        self.language = kwargs.get('language', 'auto')
+        self.unit = kwargs.get('unit', 'characters')
+        self._window_splitters = {}
+
+    def _length_function(self, language: str):
+        return self.kwargs.get('length_function') or length_function_for_unit(resolve_unit(self.unit, language))
+
+    def _window_splitter(self, language: str) -> SentenceTextSplitter:
+        """每种语言只创建一次窗口分割器"""
+        if language not in self._window_splitters:
+            self._window_splitters[language] = SentenceTextSplitter(
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                length_function=self._length_function(language)
+            )
+        return self._window_splitters[language]
+
+    def _section_spans(self, text: str) -> List[Tuple[int, int]]:
+        starts = [match.start() for match in self.HEADING_PATTERN.finditer(text)]
+        if not starts or starts[0] != 0:
+            starts.insert(0, 0)
+        bounds = starts + [len(text)]
+        spans = []
+        pending_start = None
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            content = text[start:end].strip()
+            if not content:
+                continue
+            if pending_start is not None:
+                start, pending_start = pending_start, None
+            # 只有标题行、没有正文的章节并入下一章节
+            if '\n' not in content and end < len(text):
+                pending_start = start
+                continue
+            spans.append((start, end))
+        if pending_start is not None:
+            spans.append((pending_start, len(text)))
+        return spans
+
+    def _paragraph_spans(self, text: str, start: int, end: int) -> List[Tuple[int, int]]:
+        spans = []
+        cursor = start
+        for match in self.PARAGRAPH_BREAK.finditer(text, start, end):
+            spans.append((cursor, match.start()))
+            cursor = match.end()
+        spans.append((cursor, end))
+
+        merged = []
+        pending_start = None
+        last_end = start
+        for para_start, para_end in spans:
+            # 去掉首尾空白后的区间
+            content = text[para_start:para_end]
+            stripped_start = para_start + len(content) - len(content.lstrip())
+            stripped_end = para_end - (len(content) - len(content.rstrip()))
+            if stripped_start >= stripped_end:
+                continue
+            last_end = stripped_end
+            if pending_start is not None:
+                stripped_start = pending_start
+                pending_start = None
+            if stripped_end - stripped_start < self.min_paragraph_length:
+                pending_start = stripped_start
+                continue
+            merged.append((stripped_start, stripped_end))
+        if pending_start is not None:
+            # 末尾的短段落并入上一段
+            if merged:
+                merged[-1] = (merged[-1][0], last_end)
+            else:
+                merged.append((pending_start, last_end))
+        return merged
+
+    def _group_sections(self, text: str) -> List[Tuple[int, int, List[Tuple[int, int]]]]:
+        """章节及其段落；超长章节按段落边界拆开"""
+        sections = []
+        for section_start, section_end in self._section_spans(text):
+            paragraphs = self._paragraph_spans(text, section_start, section_end)
+            group: List[Tuple[int, int]] = []
+            for paragraph in paragraphs:
+                if group and paragraph[1] - group[0][0] > self.section_size:
+                    sections.append((group[0][0], group[-1][1], group))
+                    group = []
+                group.append(paragraph)
+            if group:
+                sections.append((group[0][0], group[-1][1], group))
+        return sections
+
+    def _window_spans(self, text: str, start: int, end: int, language: str) -> List[Tuple[int, int]]:
+        paragraph = text[start:end]
+        if self._length_function(language)(paragraph) <= self.chunk_size:
+            return [(start, end)]
+        spans = []
+        cursor = 0
+        for window in self._window_splitter(language).split_text(paragraph):
+            position = paragraph.find(window, cursor)
+            if position == -1:
+                position = cursor
+            spans.append((start + position, start + position + len(window)))
+            # 重叠按unit计量，不能换算成字符数，只保证下一个窗口从本窗口起点之后开始查找
+            cursor = position + 1
+        return spans
+
+    def _language_of(self, text: str) -> str:
+        if self.language != 'auto':
+            return self.language
+        return detect_language(text)['language']
+
+    def split_text(self, text: str) -> List[str]:
+        """只返回叶子窗口的文本"""
+        language = self._language_of(text)
+        return [text[window_start:window_end]
+                for _, _, paragraphs in self._group_sections(text)
+                for para_start, para_end in paragraphs
+                for window_start, window_end in self._window_spans(text, para_start, para_end, language)]
+
+    def _make_chunk(self, document: RAGDocument, level: str, start: int, end: int,
+                    parent_id: Optional[str], index: int, chunk_method: str) -> Chunk:
+        is_leaf = level == 'window'
+        content = document.page_content[start:end] if is_leaf else ''
+        return Chunk(
+            chunk_id=self._generate_chunk_id(document.document_id, index),
+            page_content=content,
+            chunk_size=end - start,
+            chunk_overlap=self.chunk_overlap if is_leaf else 0,
+            chunk_method=chunk_method,
+            metadata={
+                **inherited_metadata(document.metadata),
+                'chunk_index': index,
+                'chunk_method': chunk_method,
+                'original_document_id': document.document_id,
+                'hierarchy_level': level,
+                'is_leaf': is_leaf,
+                'parent_id': parent_id,
+                'children_ids': [],
+                'start_offset': start,
+                'end_offset': end
+            }
+        )
+
+    def chunk_document(self, document: RAGDocument) -> RAGDocument:
+        _, atomic_chunks = self._split_atomic_chunks(document)
+        text = document.page_content
+        language = self.language if self.language != 'auto' else resolve_language(document)
+        unit = resolve_unit(self.unit, language)
+        chunk_method = f"hierarchical_size_{self.chunk_size}_overlap_{self.chunk_overlap}"
+
+        new_chunks: List[Chunk] = []
+        level_counts = {'section': 0, 'paragraph': 0, 'window': 0}
+        for section_start, section_end, paragraphs in self._group_sections(text):
+            section = self._make_chunk(document, 'section', section_start, section_end, None,
+                                       len(new_chunks), chunk_method)
+            new_chunks.append(section)
+            level_counts['section'] += 1
+            for para_start, para_end in paragraphs:
+                paragraph = self._make_chunk(document, 'paragraph', para_start, para_end, section.chunk_id,
+                                             len(new_chunks), chunk_method)
+                new_chunks.append(paragraph)
+                section.metadata['children_ids'].append(paragraph.chunk_id)
+                level_counts['paragraph'] += 1
+                for window_start, window_end in self._window_spans(text, para_start, para_end, language):
+                    window = self._make_chunk(document, 'window', window_start, window_end, paragraph.chunk_id,
+                                              len(new_chunks), chunk_method)
+                    new_chunks.append(window)
+                    paragraph.metadata['children_ids'].append(window.chunk_id)
+                    level_counts['window'] += 1
+        new_chunks = self._append_atomic_chunks(new_chunks, atomic_chunks)
+
+        return RAGDocument(
+            page_content=document.page_content,
+            document_id=document.document_id,
+            file_name=document.file_name,
+            file_type=document.file_type,
+            file_path=document.file_path,
+            chunks=new_chunks,
+            total_chunks=len(new_chunks),
+            total_size=sum(len(chunk.page_content) for chunk in new_chunks),
+            loader_used=document.loader_used,
+            loader_params=document.loader_params,
+            metadata={**document.metadata, 'chunking_strategy': 'hierarchical', 'hierarchy_levels': level_counts,
+                      'chunking_language': language, 'chunking_unit': unit}
+        )
+
+def chunk_text(document: RAGDocument, chunk: Chunk) -> str:
+    """返回块的文本；层级分块中的父块不存文本，按偏移从原文中取出"""
+    if chunk.page_content or chunk.metadata.get('is_leaf', True):
+        return chunk.page_content
+    return document.page_content[chunk.metadata['start_offset']:chunk.metadata['end_offset']]
 
 class ChunkerFactory:
     @staticmethod
@@ -219,12 +537,17 @@ class ChunkerFactory:
         """根据分块策略返回相应的分块器实例"""
         if chunking_strategy == 'fixed_size':
             return LangChainChunker(**kwargs)
+        elif chunking_strategy == 'sentence':
+            return LangChainChunker(**{**kwargs, 'chunking_strategy': 'sentence'})
         elif chunking_strategy == 'paragraph':
             return ParagraphChunker(**kwargs)
+        elif chunking_strategy == 'hierarchical':
+            return HierarchicalChunker(**kwargs)
         else:
             raise ValueError(f"Unsupported chunking strategy: {chunking_strategy}")
 
 # 主函数用于直接调用
 def chunk_document(document: RAGDocument, chunking_strategy: str,** kwargs) -> RAGDocument:
     chunker = ChunkerFactory.get_chunker(chunking_strategy, **kwargs)
-    return chunker.chunk_document(document)
\ No newline at end of file
+    # 文档带页边界表时为每个块写入起止页码
+    return annotate_chunk_pages(chunker.chunk_document(document))
\ No newline at end of file
@@ -0,0 +1,346 @@
+import json
+import bisect
+import hashlib
+from itertools import accumulate
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from src.utils.models import Document as RAGDocument, Chunk
+from src.utils.file_utils import datetime_encoder
+from src.utils.chunk_stats import locate_chunk_offsets
+from src.utils.page_map import inherited_metadata, annotate_chunk_pages
+from src.chunkers.chunkers import ChunkerFactory, BaseChunker
+
+DEFAULT_LINEAGE_DIR = 'output/lineage'
+# 支持增量分块的策略：只需按区间切分文本；层级分块的父子结构无法按区间局部重建，不支持
+INCREMENTAL_STRATEGIES = ('fixed_size', 'sentence', 'paragraph')
+
+def _line_offsets(lines: List[str]) -> List[int]:
+    """每一行在原文中的起始字符位置，末尾追加全文长度"""
+    return [0] + list(accumulate(len(line) for line in lines))
+
+def _unique_anchors(old_lines: List[str], new_lines: List[str], old_lo: int, old_hi: int,
+                    new_lo: int, new_hi: int) -> List[Tuple[int, int]]:
+    """
+    在两段行区间中找出各自只出现一次的相同行，取其中位置单调递增的最长序列作为锚点（patience diff）
+    重复行（空行、模板行）不参与匹配，避免SequenceMatcher在大量重复行上退化为平方复杂度
+    """
+    old_counts: Dict[str, int] = {}
+    for i in range(old_lo, old_hi):
+        old_counts[old_lines[i]] = old_counts.get(old_lines[i], 0) + 1
+    new_positions: Dict[str, int] = {}
+    new_counts: Dict[str, int] = {}
+    for j in range(new_lo, new_hi):
+        line = new_lines[j]
+        new_counts[line] = new_counts.get(line, 0) + 1
+        new_positions[line] = j
+    pairs = [(i, new_positions[old_lines[i]]) for i in range(old_lo, old_hi)
+             if old_counts[old_lines[i]] == 1 and new_counts.get(old_lines[i]) == 1]
+
+    # 按新文本位置求最长递增子序列
+    tails: List[int] = []
+    tail_index: List[int] = []
+    previous: List[int] = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        position = bisect.bisect_left(tails, j)
+        if position == len(tails):
+            tails.append(j)
+            tail_index.append(k)
+        else:
+            tails[position] = j
+            tail_index[position] = k
+        previous[k] = tail_index[position - 1] if position else -1
+    anchors = []
+    k = tail_index[-1] if tail_index else -1
+    while k != -1:
+        anchors.append(pairs[k])
+        k = previous[k]
+    anchors.reverse()
+    return anchors
+
+def _match_lines(old_lines: List[str], new_lines: List[str]) -> List[Tuple[int, int]]:
+    """返回两份行列表中相互匹配的行号对，按行号递增"""
+    matches: List[Tuple[int, int]] = []
+    stack = [(0, len(old_lines), 0, len(new_lines))]
+    while stack:
+        old_lo, old_hi, new_lo, new_hi = stack.pop()
+        # 先匹配公共的首尾行
+        while old_lo < old_hi and new_lo < new_hi and old_lines[old_lo] == new_lines[new_lo]:
+            matches.append((old_lo, new_lo))
+            old_lo += 1
+            new_lo += 1
+        while old_lo < old_hi and new_lo < new_hi and old_lines[old_hi - 1] == new_lines[new_hi - 1]:
+            old_hi -= 1
+            new_hi -= 1
+            matches.append((old_hi, new_hi))
+        if old_lo == old_hi or new_lo == new_hi:
+            continue
+        anchors = _unique_anchors(old_lines, new_lines, old_lo, old_hi, new_lo, new_hi)
+        if not anchors:
+            # 没有可作锚点的唯一行，整段视为改动
+            continue
+        bounds = [(old_lo - 1, new_lo - 1)] + anchors + [(old_hi, new_hi)]
+        for (i0, j0), (i1, j1) in zip(bounds[:-1], bounds[1:]):
+            if (i1, j1) != (old_hi, new_hi):
+                matches.append((i1, j1))
+            if i1 - i0 > 1 and j1 - j0 > 1:
+                stack.append((i0 + 1, i1, j0 + 1, j1))
+    matches.sort()
+    return matches
+
+def diff_equal_blocks(old_text: str, new_text: str) -> List[Tuple[int, int, int]]:
+    """
+    以行为单位比较新旧文本，返回未改动的区间 (旧文本起点, 旧文本终点, 新文本起点)
+    公共首尾行线性跳过，中间部分用唯一行作锚点递归比较，整体开销接近线性
+    """
+    old_lines = old_text.splitlines(keepends=True)
+    new_lines = new_text.splitlines(keepends=True)
+    old_offsets = _line_offsets(old_lines)
+    new_offsets = _line_offsets(new_lines)
+
+    blocks: List[Tuple[int, int, int]] = []
+    run_start = None
+    previous = None
+    for i, j in _match_lines(old_lines, new_lines):
+        if previous is not None and (i, j) == (previous[0] + 1, previous[1] + 1):
+            previous = (i, j)
+            continue
+        if run_start is not None:
+            blocks.append((old_offsets[run_start[0]], old_offsets[previous[0] + 1], new_offsets[run_start[1]]))
+        run_start = previous = (i, j)
+    if run_start is not None:
+        blocks.append((old_offsets[run_start[0]], old_offsets[previous[0] + 1], new_offsets[run_start[1]]))
+    return blocks
+
+def _chunk_method(chunker: BaseChunker) -> str:
+    strategy = getattr(chunker, 'chunking_strategy', None)
+    if strategy is None:
+        return "paragraph_based"
+    return f"langchain_{strategy}_size_{chunker.chunk_size}_overlap_{chunker.chunk_overlap}"
+
+class LineageStore:
+    """
+    保存每个内容谱系（默认按源文件路径区分）最近一次分块时的原文和分块结果
+    目录结构: <root>/<lineage_id>/source.txt、document.json、state.json
+    """
+    def __init__(self, root: str = DEFAULT_LINEAGE_DIR):
+        self.root = Path(root)
+
+    @staticmethod
+    def lineage_id_for(file_path: str) -> str:
+        return hashlib.md5(str(Path(file_path).resolve()).encode()).hexdigest()[:16]
+
+    def load(self, lineage_id: str) -> Optional[Dict[str, Any]]:
+        """读取谱系的上一版本，不存在时返回None"""
+        lineage_dir = self.root / lineage_id
+        state_path = lineage_dir / 'state.json'
+        if not state_path.exists():
+            return None
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        with open(lineage_dir / 'source.txt', 'r', encoding='utf-8', newline='') as f:
+            state['text'] = f.read()
+        with open(lineage_dir / 'document.json', 'r', encoding='utf-8') as f:
+            state['document'] = RAGDocument(**json.load(f))
+        return state
+
+    def save(self, lineage_id: str, document: RAGDocument, chunking_strategy: str,
+             chunking_params: Dict[str, Any], version: int):
+        lineage_dir = self.root / lineage_id
+        lineage_dir.mkdir(parents=True, exist_ok=True)
+        with open(lineage_dir / 'source.txt', 'w', encoding='utf-8', newline='') as f:
+            f.write(document.page_content)
+        with open(lineage_dir / 'document.json', 'w', encoding='utf-8') as f:
+            json.dump(document.to_json(), f, ensure_ascii=False, default=datetime_encoder)
+        # state.json最后写入，作为本版本完整写出的标志
+        with open(lineage_dir / 'state.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                'lineage_id': lineage_id,
+                'document_id': document.document_id,
+                'file_path': document.file_path,
+                'chunking_strategy': chunking_strategy,
+                'chunking_params': chunking_params,
+                'version': version,
+                'updated_at': datetime.now().isoformat()
+            }, f, ensure_ascii=False, indent=2)
+
+class IncrementalRechunker:
+    """
+    增量分块：与同一谱系的上一版本比较文本，只对改动区域重新分块
+    完全落在未改动区间内的旧块原样保留（块ID不变），两个保留块之间的文本交给分块器重新切分
+    """
+    def __init__(self, chunking_strategy: str = 'fixed_size', lineage_dir: str = DEFAULT_LINEAGE_DIR, **kwargs):
+        if chunking_strategy not in INCREMENTAL_STRATEGIES:
+            raise ValueError(f"增量分块不支持分块策略 {chunking_strategy}（可选: {', '.join(INCREMENTAL_STRATEGIES)}）")
+        self.chunking_strategy = chunking_strategy
+        self.chunking_params = {key: value for key, value in kwargs.items()
+                                if isinstance(value, (str, int, float, bool))}
+        self.chunker = ChunkerFactory.get_chunker(chunking_strategy, **kwargs)
+        self.store = LineageStore(lineage_dir)
+
+    def _text_chunks_with_offsets(self, document: RAGDocument) -> List[Tuple[Chunk, int]]:
+        text_chunks, _ = BaseChunker._split_atomic_chunks(document)
+        offsets = [chunk.metadata.get('start_offset', -1) for chunk in text_chunks]
+        if any(offset is None or offset < 0 for offset in offsets):
+            offsets = locate_chunk_offsets(document.page_content, [chunk.page_content for chunk in text_chunks],
+                                           self.chunker.chunk_overlap).tolist()
+        return list(zip(text_chunks, offsets))
+
+    def _new_chunk(self, document: RAGDocument, document_id: str, content: str, start: int) -> Chunk:
+        chunk_method = _chunk_method(self.chunker)
+        return Chunk(
+            page_content=content,
+            chunk_id=self.chunker._generate_chunk_id(document_id, start),
+            chunk_size=len(content),
+            chunk_overlap=self.chunker.chunk_overlap,
+            chunk_method=chunk_method,
+            metadata={
+                **inherited_metadata(document.metadata),
+                'chunk_method': chunk_method,
+                'original_document_id': document_id,
+                'chunk_size': len(content),
+                'chunk_overlap': self.chunker.chunk_overlap,
+                'chunking_params': {
+                    'chunk_size': self.chunker.chunk_size,
+                    'chunk_overlap': self.chunker.chunk_overlap,
+                    'strategy': self.chunking_strategy
+                }
+            }
+        )
+
+    def _chunk_region(self, document: RAGDocument, document_id: str, start: int, end: int) -> List[Tuple[Chunk, int]]:
+        """切分新文本中 [start, end) 区间，返回新块及其在全文中的起点"""
+        region = document.page_content[start:end]
+        if not region.strip():
+            return []
+        result = []
+        cursor = 0
+        for content in self.chunker.split_text(region):
+            position = region.find(content, cursor)
+            if position == -1:
+                position = cursor
+            result.append((self._new_chunk(document, document_id, content, start + position), start + position))
+            cursor = max(position + 1, position + len(content) - self.chunker.chunk_overlap)
+        return result
+
+    def _full_chunk(self, document: RAGDocument, document_id: str) -> List[Tuple[Chunk, int]]:
+        return self._chunk_region(document, document_id, 0, len(document.page_content))
+
+    def _reuse_chunks(self, previous: Dict[str, Any], document: RAGDocument,
+                      document_id: str) -> Tuple[List[Tuple[Chunk, int]], Dict[str, Any]]:
+        old_text = previous['text']
+        new_text = document.page_content
+        blocks = diff_equal_blocks(old_text, new_text)
+        block_starts = [block[0] for block in blocks]
+
+        # 找出完全落在未改动区间内的旧块，换算到新文本中的位置
+        anchors: List[Tuple[Chunk, int]] = []
+        removed_chunk_ids = []
+        for chunk, old_start in self._text_chunks_with_offsets(previous['document']):
+            old_end = old_start + len(chunk.page_content)
+            index = bisect.bisect_right(block_starts, old_start) - 1
+            if old_start >= 0 and index >= 0 and old_end <= blocks[index][1]:
+                new_start = old_start - blocks[index][0] + blocks[index][2]
+                if not anchors or new_start >= anchors[-1][1]:
+                    anchors.append((chunk, new_start))
+                    continue
+            removed_chunk_ids.append(chunk.chunk_id)
+
+        # 相邻保留块之间若有非空白文本，说明是改动区域（或新增内容），重新分块
+        chunks: List[Tuple[Chunk, int]] = []
+        cursor = 0
+        rechunked_chars = 0
+        for chunk, new_start in anchors:
+            if new_start > cursor:
+                region_chunks = self._chunk_region(document, document_id, cursor, new_start)
+                if region_chunks:
+                    rechunked_chars += new_start - cursor
+                chunks.extend(region_chunks)
+            chunks.append((chunk, new_start))
+            cursor = max(cursor, new_start + len(chunk.page_content))
+        if cursor < len(new_text):
+            region_chunks = self._chunk_region(document, document_id, cursor, len(new_text))
+            if region_chunks:
+                rechunked_chars += len(new_text) - cursor
+            chunks.extend(region_chunks)
+
+        unchanged_chars = sum(block[1] - block[0] for block in blocks)
+        stats = {
+            'reused_chunks': len(anchors),
+            'removed_chunk_ids': removed_chunk_ids,
+            'changed_chars': max(len(old_text), len(new_text)) - unchanged_chars,
+            'rechunked_chars': rechunked_chars
+        }
+        return chunks, stats
+
+    def rechunk(self, document: RAGDocument, lineage_id: Optional[str] = None) -> RAGDocument:
+        """
+        对新加载的文档做增量分块，并把结果记录为谱系的新版本
+        :param document: 新加载/解析得到的文档
+        :param lineage_id: 谱系ID，默认由源文件路径生成
+        :return: 分块后的文档，metadata['incremental']记录复用情况
+        """
+        lineage_id = lineage_id or LineageStore.lineage_id_for(document.file_path)
+        previous = self.store.load(lineage_id)
+        _, atomic_chunks = BaseChunker._split_atomic_chunks(document)
+
+        compatible = previous is not None and \
+            previous['chunking_strategy'] == self.chunking_strategy and \
+            previous['chunking_params'] == self.chunking_params
+        document_id = previous['document_id'] if previous else document.document_id
+        if compatible:
+            chunks, stats = self._reuse_chunks(previous, document, document_id)
+        else:
+            chunks = self._full_chunk(document, document_id)
+            stats = {
+                'reused_chunks': 0,
+                'removed_chunk_ids': [chunk.chunk_id for chunk in previous['document'].chunks] if previous else [],
+                'changed_chars': len(document.page_content),
+                'rechunked_chars': len(document.page_content)
+            }
+        reused_ids = {chunk.chunk_id for chunk in previous['document'].chunks} if compatible else set()
+
+        text_chunks = []
+        for index, (chunk, start) in enumerate(chunks):
+            text_chunks.append(chunk.copy(update={'metadata': {
+                **chunk.metadata,
+                'chunk_index': index,
+                'start_offset': start,
+                'end_offset': start + len(chunk.page_content)
+            }}))
+        new_chunks = BaseChunker._append_atomic_chunks(text_chunks, atomic_chunks)
+        version = previous['version'] + 1 if previous else 1
+
+        result = RAGDocument(
+            page_content=document.page_content,
+            document_id=document_id,
+            file_name=document.file_name,
+            file_type=document.file_type,
+            file_path=document.file_path,
+            chunks=new_chunks,
+            total_chunks=len(new_chunks),
+            total_size=sum(len(chunk.page_content) for chunk in new_chunks),
+            loader_used=document.loader_used,
+            loader_params=document.loader_params,
+            metadata={
+                **document.metadata,
+                'chunking_strategy': self.chunking_strategy,
+                'incremental': {
+                    'lineage_id': lineage_id,
+                    'version': version,
+                    'full_rechunk': not compatible,
+                    'new_chunks': sum(1 for chunk in text_chunks if chunk.chunk_id not in reused_ids),
+                    **stats
+                }
+            }
+        )
+        # 复用的块偏移可能已变化，页码按新偏移重新计算
+        annotate_chunk_pages(result)
+        self.store.save(lineage_id, result, self.chunking_strategy, self.chunking_params, version)
+        return result
+
+def rechunk_document(document: RAGDocument, chunking_strategy: str = 'fixed_size',
+                     lineage_dir: str = DEFAULT_LINEAGE_DIR, lineage_id: Optional[str] = None,
+                     **kwargs) -> RAGDocument:
+    rechunker = IncrementalRechunker(chunking_strategy, lineage_dir=lineage_dir, **kwargs)
+    return rechunker.rechunk(document, lineage_id=lineage_id)
@@ -0,0 +1,115 @@
+import re
+from typing import List, Tuple, Iterable, Optional, Any
+from langchain.text_splitter import TextSplitter, RecursiveCharacterTextSplitter
+
+# 中文句末标点及可以紧跟其后的右引号/右括号
+CJK_TERMINATORS = '。！？；…'
+CLOSING_PUNCTUATION = '”’」』）》】)]"\''
+
+# 句点后不视为句子结束的常见英文缩写（小写，不含句点）
+DEFAULT_ABBREVIATIONS = frozenset({
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'vs', 'etc', 'e.g', 'i.e', 'cf', 'al',
+    'inc', 'ltd', 'co', 'corp', 'dept', 'fig', 'figs', 'no', 'nos', 'vol', 'vols', 'pp', 'p',
+    'jan', 'feb', 'mar', 'apr', 'jun', 'jul', 'aug', 'sep', 'sept', 'oct', 'nov', 'dec',
+    'u.s', 'u.k', 'u.n', 'ph.d', 'a.m', 'p.m', 'approx', 'est', 'eq', 'sec'
+})
+
+# 可用于RecursiveCharacterTextSplitter的中英文分隔符，按优先级排列
+CJK_AWARE_SEPARATORS = ['\n\n', '\n', '。', '！', '？', '；', '. ', '! ', '? ', '; ', '，', ', ', ' ', '']
+# 以拉丁字母为主的文本使用的分隔符（不含中文标点）
+LATIN_SEPARATORS = ['\n\n', '\n', '. ', '! ', '? ', '; ', ': ', ', ', ' ', '']
+# 超长句子在句内继续切分时使用的分隔符
+CLAUSE_SEPARATORS = ['，', '、', ', ', ' ', '']
+
+class SentenceSplitter:
+    """
+    中英文混合文本的断句器
+    用一个预编译正则一次扫描出所有候选边界，再对英文句点做缩写、首字母和小数判断
+    """
+    # 一次扫描：连续的句末标点/换行 + 右引号 + 之后的空白；是否真的断句在spans中判断
+    _BOUNDARY = re.compile(
+        rf"(?P<punct>[{CJK_TERMINATORS}!?.\n]+)(?P<closing>[{re.escape(CLOSING_PUNCTUATION)}]*)(?P<space>[ \t\r\n\u3000]*)"
+    )
+    # 句点前的单词
+    _WORD_BEFORE = re.compile(r"([A-Za-z][A-Za-z.]*)$")
+
+    def __init__(self, abbreviations: Optional[Iterable[str]] = None, newline_is_boundary: bool = True):
+        self.abbreviations = frozenset(a.lower().rstrip('.') for a in abbreviations) \
+            if abbreviations is not None else DEFAULT_ABBREVIATIONS
+        self.newline_is_boundary = newline_is_boundary
+
+    def _is_abbreviation(self, text: str, dot_start: int) -> bool:
+        match = self._WORD_BEFORE.search(text, max(0, dot_start - 16), dot_start)
+        if not match:
+            return False
+        word = match.group(1)
+        # 单个大写字母视为姓名首字母，例如 "J. Smith"
+        if len(word) == 1 and word.isupper():
+            return True
+        return word.lower().rstrip('.') in self.abbreviations
+
+    def _is_boundary(self, text: str, punct: str, punct_start: int, end: int, has_space: bool) -> bool:
+        # 中文句末标点都是非ASCII字符
+        if not punct.isascii():
+            return True
+        if '\n' in punct:
+            return self.newline_is_boundary or punct.strip('\n') != ''
+        # 英文标点后必须是空白、文本结尾或非ASCII字符，排除 3.14、a.b 之类
+        if not has_space and end < len(text) and text[end].isascii():
+            return False
+        # 单个句点才需要判断缩写，省略号"..."直接视为边界
+        if punct == '.':
+            return not self._is_abbreviation(text, punct_start)
+        return True
+
+    def spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        返回每个句子在原文中的 (start, end) 区间
+        区间首尾相接覆盖全文，句子后的空白归入该句，便于无损拼接
+        """
+        spans = []
+        start = 0
+        is_boundary = self._is_boundary
+        for match in self._BOUNDARY.finditer(text):
+            punct, _, space = match.groups()
+            end = match.end()
+            if end <= start or not is_boundary(text, punct, match.start(), end, bool(space)):
+                continue
+            spans.append((start, end))
+            start = end
+        if start < len(text):
+            spans.append((start, len(text)))
+        return spans
+
+    def split(self, text: str) -> List[str]:
+        """断句并返回句子列表（保留句末空白，''.join(result) == text）"""
+        return [text[start:end] for start, end in self.spans(text)]
+
+class SentenceTextSplitter(TextSplitter):
+    """
+    以句子为最小单位的LangChain文本分割器
+    句子按chunk_size打包，重叠部分也以整句计算；超长句子再按字符切分
+    """
+    def __init__(self, sentence_splitter: Optional[SentenceSplitter] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.sentence_splitter = sentence_splitter or SentenceSplitter()
+        self._clause_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self._chunk_size,
+            chunk_overlap=0,
+            separators=CLAUSE_SEPARATORS,
+            keep_separator='end',
+            length_function=self._length_function,
+            strip_whitespace=False
+        )
+
+    def _split_long_sentence(self, sentence: str) -> List[str]:
+        return self._clause_splitter.split_text(sentence)
+
+    def split_text(self, text: str) -> List[str]:
+        pieces = []
+        for sentence in self.sentence_splitter.split(text):
+            if self._length_function(sentence) > self._chunk_size:
+                pieces.extend(self._split_long_sentence(sentence))
+            else:
+                pieces.append(sentence)
+        return self._merge_splits(pieces, '')
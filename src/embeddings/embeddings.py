@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import urllib.error
+import urllib.request
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+import numpy as np
+from src.utils.models import Document as RAGDocument
+from src.utils.text_detection import TOKEN_PATTERN, CJK_PATTERN, count_tokens
+from src.embeddings.vector_cache import EmbeddingCache, content_hash
+
+logger = logging.getLogger(__name__)
+
+# 单个请求的近似token上限和条数上限
+DEFAULT_BATCH_TOKENS = 8000
+DEFAULT_BATCH_SIZE = 256
+# 同时进行的嵌入请求数
+DEFAULT_CONCURRENCY = 4
+DEFAULT_HASH_DIMENSION = 256
+DEFAULT_OPENAI_MODEL = 'text-embedding-3-small'
+DEFAULT_OPENAI_BASE_URL = 'https://api.openai.com/v1'
+# 需要重试的HTTP状态码
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class EmbeddingError(Exception):
+    """嵌入请求失败"""
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+class BaseEmbedder(ABC):
+    """嵌入后端的抽象基类"""
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.model_name = ''
+        self.dimension: Optional[int] = None
+
+    @abstractmethod
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """嵌入一批文本，返回形状为 (len(texts), 维度) 的float32数组"""
+        pass
+
+@lru_cache(maxsize=1 << 16)
+def _feature_slot(feature: str, dimension: int) -> Tuple[int, float]:
+    digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+    return digest % dimension, 1.0 if digest >> 63 else -1.0
+
+class HashEmbedder(BaseEmbedder):
+    """
+    本地确定性嵌入：词（英文按单词，CJK按单字和相邻二字）带符号哈希到固定维度后归一化
+    不需要模型文件和网络，相同文本总得到相同向量，词汇重叠越多余弦相似度越高，用于测试和离线环境
+    """
+    def __init__(self, dimension: int = DEFAULT_HASH_DIMENSION, **kwargs):
+        super().__init__(**kwargs)
+        self.dimension = int(dimension)
+        self.model_name = f'hash-{self.dimension}'
+
+    def _features(self, text: str) -> List[str]:
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        bigrams = [first + second for first, second in zip(tokens, tokens[1:])
+                   if CJK_PATTERN.fullmatch(first) and CJK_PATTERN.fullmatch(second)]
+        return tokens + bigrams
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                slot, sign = _feature_slot(feature, self.dimension)
+                vectors[row, slot] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+class OpenAICompatibleEmbedder(BaseEmbedder):
+    """
+    调用OpenAI兼容的 /embeddings 接口（OpenAI、vLLM、Ollama、本地测试桩等）
+    只使用标准库发送请求；限流和服务端错误按指数退避重试，请求过大时由调用方拆分批次
+    """
+    def __init__(self, model: str = DEFAULT_OPENAI_MODEL, base_url: Optional[str] = None,
+                 api_key: Optional[str] = None, dimension: Optional[int] = None, timeout: float = 60,
+                 max_retries: int = 3, **kwargs):
+        super().__init__(**kwargs)
+        self.model_name = model
+        self.base_url = (base_url or os.environ.get('OPENAI_BASE_URL') or DEFAULT_OPENAI_BASE_URL).rstrip('/')
+        self.api_key = api_key or os.environ.get('OPENAI_API_KEY', '')
+        self.dimension = int(dimension) if dimension else None
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def _request(self, texts: List[str]) -> Dict[str, Any]:
+        body = {'model': self.model_name, 'input': texts}
+        if self.dimension:
+            body['dimensions'] = self.dimension
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        request = urllib.request.Request(f'{self.base_url}/embeddings', data=json.dumps(body).encode('utf-8'),
+                                         headers=headers, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            try:
+                payload = self._request(texts)
+                break
+            except urllib.error.HTTPError as e:
+                message = e.read().decode('utf-8', errors='replace')[:500]
+                if e.code not in RETRY_STATUS or attempt == self.max_retries:
+                    raise EmbeddingError(f"嵌入请求失败 (HTTP {e.code}): {message}", status=e.code)
+            except (urllib.error.URLError, TimeoutError) as e:
+                if attempt == self.max_retries:
+                    raise EmbeddingError(f"嵌入服务不可用: {e}")
+            logger.warning(f"嵌入请求失败，{delay:.0f}s 后重试")
+            time.sleep(delay)
+            delay *= 2
+        data = sorted(payload['data'], key=lambda item: item['index'])
+        if len(data) != len(texts):
+            raise EmbeddingError(f"嵌入服务返回 {len(data)} 条结果，请求 {len(texts)} 条")
+        return np.asarray([item['embedding'] for item in data], dtype=np.float32)
+
+class EmbedderFactory:
+    @staticmethod
+    def get_embedder(backend: str, **kwargs) -> BaseEmbedder:
+        """根据后端名称获取嵌入器：hash（本地确定性）或 openai（OpenAI兼容接口）"""
+        embedders = {
+            'hash': HashEmbedder,
+            'openai': OpenAICompatibleEmbedder
+        }
+        if backend not in embedders:
+            raise ValueError(f"Unsupported embedding backend: {backend}")
+        return embedders[backend](**kwargs)
+
+def plan_batches(texts: Sequence[str], max_batch_tokens: int = DEFAULT_BATCH_TOKENS,
+                 max_batch_size: int = DEFAULT_BATCH_SIZE) -> List[List[int]]:
+    """
+    按近似token数把文本分成批次：每批token总数不超过max_batch_tokens、条数不超过max_batch_size
+    单条超过上限的文本独占一批
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for index, text in enumerate(texts):
+        tokens = max(count_tokens(text), 1)
+        if current and (current_tokens + tokens > max_batch_tokens or len(current) >= max_batch_size):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def _embed_batch(embedder: BaseEmbedder, texts: List[str]) -> np.ndarray:
+    """请求体过大（413，或400且多于一条）时拆成两半重试"""
+    try:
+        return embedder.embed_texts(texts)
+    except EmbeddingError as e:
+        if len(texts) > 1 and e.status in (400, 413):
+            middle = len(texts) // 2
+            logger.warning(f"嵌入批次过大({len(texts)}条)，拆分后重试")
+            return np.concatenate([_embed_batch(embedder, texts[:middle]), _embed_batch(embedder, texts[middle:])])
+        raise
+
+def embed_texts(texts: Sequence[str], embedder: BaseEmbedder, cache: Optional[EmbeddingCache] = None,
+                max_batch_tokens: int = DEFAULT_BATCH_TOKENS, max_batch_size: int = DEFAULT_BATCH_SIZE,
+                concurrency: int = DEFAULT_CONCURRENCY) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    嵌入文本：先查缓存，只把未命中且去重后的文本按token数分批，在线程池中并发请求，结果写回缓存
+    :return: (形状为 (len(texts), 维度) 的float32数组, {'cache_hits', 'embedded', 'batches'})
+    """
+    keys = [content_hash(text) for text in texts]
+    missing = cache.get_many(keys)[1] if cache is not None else list(range(len(texts)))
+
+    # 同一内容只请求一次
+    pending: Dict[str, List[int]] = {}
+    for position in missing:
+        pending.setdefault(keys[position], []).append(position)
+    pending_keys = list(pending)
+    pending_texts = [texts[pending[key][0]] for key in pending_keys]
+    batches = plan_batches(pending_texts, max_batch_tokens, max_batch_size)
+
+    new_vectors: Dict[str, np.ndarray] = {}
+    if batches:
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(batches)))) as executor:
+            futures = [executor.submit(_embed_batch, embedder, [pending_texts[i] for i in batch])
+                       for batch in batches]
+            # 在调用线程中按提交顺序写缓存，缓存只有一个写入方
+            for batch, future in zip(batches, futures):
+                batch_vectors = future.result()
+                batch_keys = [pending_keys[i] for i in batch]
+                if cache is not None:
+                    cache.put_many(batch_keys, batch_vectors)
+                else:
+                    new_vectors.update(zip(batch_keys, batch_vectors))
+
+    if cache is not None:
+        # 统一从缓存读取，新向量与命中的向量同样经过float16存储，结果与是否命中无关
+        vectors, _ = cache.get_many(keys)
+    else:
+        dimension = next(iter(new_vectors.values())).shape[0] if new_vectors else (embedder.dimension or 0)
+        vectors = np.zeros((len(texts), dimension), dtype=np.float32)
+        for key, positions in pending.items():
+            vectors[positions] = new_vectors[key]
+    stats = {'cache_hits': len(texts) - len(missing), 'embedded': len(pending_keys), 'batches': len(batches)}
+    return vectors, stats
+
+def embeddable_chunks(document: RAGDocument) -> List[int]:
+    """需要嵌入的块序号：有文本的叶子块（层级分块中的父块不存文本，不嵌入）"""
+    return [index for index, chunk in enumerate(document.chunks)
+            if chunk.page_content.strip() and chunk.metadata.get('is_leaf', True)]
+
+def embed_document(document: RAGDocument, embedder: BaseEmbedder, cache: EmbeddingCache,
+                   max_batch_tokens: int = DEFAULT_BATCH_TOKENS, max_batch_size: int = DEFAULT_BATCH_SIZE,
+                   concurrency: int = DEFAULT_CONCURRENCY) -> RAGDocument:
+    """
+    嵌入文档中的块，向量写入缓存；块元数据记录embedding_key（内容哈希）和embedding_model，
+    文档元数据的embedding字段记录模型、维度、缓存目录和命中情况
+    内容未变的块直接命中缓存，重复嵌入同一语料不产生请求
+    """
+    start = time.perf_counter()
+    indices = embeddable_chunks(document)
+    texts = [document.chunks[index].page_content for index in indices]
+    _, stats = embed_texts(texts, embedder, cache, max_batch_tokens, max_batch_size, concurrency)
+
+    chunks = list(document.chunks)
+    for index, text in zip(indices, texts):
+        chunk = chunks[index]
+        chunks[index] = chunk.copy(update={'metadata': {
+            **chunk.metadata, 'embedding_key': content_hash(text), 'embedding_model': embedder.model_name
+        }})
+    metadata = {**document.metadata, 'embedding': {
+        'model': embedder.model_name,
+        'dimension': cache.dimension,
+        'cache_dir': str(cache.directory),
+        'embedded_chunks': len(indices),
+        **stats,
+        'elapsed': round(time.perf_counter() - start, 4)
+    }}
+    return document.copy(update={'chunks': chunks, 'metadata': metadata})
@@ -0,0 +1,138 @@
+import re
+import json
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+VECTOR_FILE_NAME = 'vectors.f16'
+KEYS_FILE_NAME = 'keys.txt'
+# 不使用.json扩展名，避免输出目录下的文档遍历（iter_documents等）把它当作文档
+META_FILE_NAME = 'cache.meta'
+VECTOR_DTYPE = np.float16
+
+def content_hash(text: str) -> str:
+    """块文本的内容哈希，作为向量缓存的键"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+def model_dir_name(model: str) -> str:
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', model)
+
+class EmbeddingCache:
+    """
+    向量磁盘缓存，每个模型一个目录
+    - vectors.f16：按行追加的float16向量，以内存映射方式读取，只有被访问的行才会读入内存
+    - keys.txt：逐行记录对应行的内容哈希
+    - cache.meta：模型名和向量维度（JSON，首次写入时确定）
+    只追加不修改；先写向量再写键，进程中途退出时多出的向量行或不完整的键行在下次打开时截断
+    同一目录同时只应有一个写入方
+    """
+    def __init__(self, cache_dir: str, model: str):
+        self.model = model
+        self.directory = Path(cache_dir) / model_dir_name(model)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.vector_path = self.directory / VECTOR_FILE_NAME
+        self.keys_path = self.directory / KEYS_FILE_NAME
+        self.meta_path = self.directory / META_FILE_NAME
+        self.dimension: Optional[int] = None
+        self._rows: Dict[str, int] = {}
+        self._memmap: Optional[np.memmap] = None
+        self._load()
+
+    def _load(self):
+        if not self.meta_path.exists():
+            return
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta['model'] != self.model:
+            raise ValueError(f"缓存目录 {self.directory} 属于模型 {meta['model']}")
+        self.dimension = meta['dimension']
+        keys: List[str] = []
+        if self.keys_path.exists():
+            with open(self.keys_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            # 最后一行没有换行符说明写到一半
+            keys = content.split('\n')[:-1]
+        row_bytes = self.dimension * np.dtype(VECTOR_DTYPE).itemsize
+        stored_rows = self.vector_path.stat().st_size // row_bytes if self.vector_path.exists() else 0
+        keys = keys[:stored_rows]
+        self._rows = {key: row for row, key in enumerate(keys)}
+        self._truncate(len(keys), row_bytes)
+
+    def _truncate(self, rows: int, row_bytes: int):
+        """丢弃没有对应键的向量行和不完整的键行"""
+        if self.vector_path.exists() and self.vector_path.stat().st_size != rows * row_bytes:
+            with open(self.vector_path, 'r+b') as f:
+                f.truncate(rows * row_bytes)
+        keys_text = ''.join(f'{key}\n' for key in list(self._rows)[:rows])
+        if self.keys_path.exists() and self.keys_path.stat().st_size != len(keys_text.encode('utf-8')):
+            with open(self.keys_path, 'w', encoding='utf-8') as f:
+                f.write(keys_text)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def row_of(self, key: str) -> Optional[int]:
+        return self._rows.get(key)
+
+    def vectors(self) -> np.ndarray:
+        """全部向量的只读内存映射，形状为 (行数, 维度)，类型float16"""
+        if not self._rows:
+            return np.zeros((0, self.dimension or 0), dtype=VECTOR_DTYPE)
+        if self._memmap is None or self._memmap.shape[0] != len(self._rows):
+            self._memmap = np.memmap(self.vector_path, dtype=VECTOR_DTYPE, mode='r',
+                                     shape=(len(self._rows), self.dimension))
+        return self._memmap
+
+    def get_many(self, keys: Sequence[str]) -> Tuple[np.ndarray, List[int]]:
+        """
+        批量读取向量
+        :return: (形状为 (len(keys), 维度) 的float32数组，未命中的行为0；未命中键的位置列表)
+        """
+        if self.dimension is None:
+            return np.zeros((len(keys), 0), dtype=np.float32), list(range(len(keys)))
+        result = np.zeros((len(keys), self.dimension), dtype=np.float32)
+        positions, rows, missing = [], [], []
+        for position, key in enumerate(keys):
+            row = self._rows.get(key)
+            if row is None:
+                missing.append(position)
+            else:
+                positions.append(position)
+                rows.append(row)
+        if rows:
+            result[positions] = self.vectors()[rows]
+        return result, missing
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray):
+        """追加向量；已存在的键跳过"""
+        vectors = np.asarray(vectors)
+        if vectors.ndim != 2 or vectors.shape[0] != len(keys):
+            raise ValueError(f"向量形状 {vectors.shape} 与键数量 {len(keys)} 不一致")
+        if self.dimension is None:
+            self.dimension = int(vectors.shape[1])
+            with open(self.meta_path, 'w', encoding='utf-8') as f:
+                json.dump({'model': self.model, 'dimension': self.dimension,
+                           'dtype': np.dtype(VECTOR_DTYPE).name}, f)
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(f"向量维度 {vectors.shape[1]} 与缓存维度 {self.dimension} 不一致")
+
+        new_keys, new_positions = [], []
+        seen = set()
+        for position, key in enumerate(keys):
+            if key not in self._rows and key not in seen:
+                seen.add(key)
+                new_keys.append(key)
+                new_positions.append(position)
+        if not new_keys:
+            return
+        with open(self.vector_path, 'ab') as f:
+            f.write(np.ascontiguousarray(vectors[new_positions], dtype=VECTOR_DTYPE).tobytes())
+        with open(self.keys_path, 'a', encoding='utf-8') as f:
+            f.write(''.join(f'{key}\n' for key in new_keys))
+        start = len(self._rows)
+        for offset, key in enumerate(new_keys):
+            self._rows[key] = start + offset
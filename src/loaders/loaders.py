@@ -1,22 +1,124 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Type
 from pathlib import Path
 from datetime import datetime
+from html.parser import HTMLParser
 import hashlib
-from typing import Dict, List, Any
+import zipfile
+import re
+import xml.etree.ElementTree as ET
 from langchain_core.document_loaders import BaseLoader
 from langchain_core.documents import Document as LangChainDocument
 from langchain_community.document_loaders import (PyPDFLoader, Docx2txtLoader,
                                                UnstructuredMarkdownLoader, UnstructuredExcelLoader,
                                                UnstructuredPowerPointLoader, TextLoader as LangChainTextLoader)
 from src.utils.models import Document as RAGDocument, Chunk
+from src.utils.text_detection import detect_text_profile, detect_language
+from src.utils.page_map import join_pages, inherited_metadata, PAGE_MAP_KEY
+from src.loaders.pdf_pages import PDFPageExtractor, PDF_PAGE_WORKERS, DEFAULT_TESSERACT_CONFIG, DEFAULT_PAGE_OCR_TIMEOUT
+
+# 文件类型嗅探时读取的字节数
+SNIFF_BYTES = 8192
+# 流式读取文本文件时每次读取的字符数
+STREAM_READ_SIZE = 64 * 1024
+
+# 文件类型 -> 加载器类
+LOADER_REGISTRY: Dict[str, Type['LangChainFileLoader']] = {}
+
+# 扩展名 -> 文件类型
+EXTENSION_ALIASES = {
+    'markdown': 'md',
+    'htm': 'html',
+}
+
+# 可以通过内容识别的二进制格式，以内容为准；纯文本类格式以扩展名为准
+BINARY_FILE_TYPES = {'pdf', 'docx', 'doc', 'xlsx', 'xls', 'pptx', 'ppt'}
+
+# 旧版Office二进制格式（OLE复合文档），没有可用的加载器，加载时直接拒绝
+LEGACY_OFFICE_TYPES = ('doc', 'xls', 'ppt')
+
+def register_loader(*file_types: str):
+    """类装饰器：将加载器注册到指定的文件类型"""
+    def decorator(cls):
+        for file_type in file_types:
+            LOADER_REGISTRY[file_type] = cls
+        return cls
+    return decorator
+
+def _sniff_zip(file_path: Path) -> Optional[str]:
+    """根据OOXML压缩包中的目录结构区分docx/xlsx/pptx，只读取中央目录"""
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            names = archive.namelist()
+    except zipfile.BadZipFile:
+        return None
+    for prefix, file_type in (('word/', 'docx'), ('xl/', 'xlsx'), ('ppt/', 'pptx')):
+        if any(name.startswith(prefix) for name in names):
+            return file_type
+    return None
+
+def sniff_file_type(file_path: str) -> Optional[str]:
+    """
+    根据文件头部的魔数识别文件类型
+    :param file_path: 文件路径
+    :return: 文件类型，无法识别时返回None
+    """
+    path = Path(file_path)
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(SNIFF_BYTES)
+    except OSError:
+        return None
+
+    if head.startswith(b'%PDF-'):
+        return 'pdf'
+    if head.startswith(b'PK\x03\x04'):
+        return _sniff_zip(path)
+    if head.startswith(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'):
+        # 旧版Office复合文档，无法仅凭头部区分，交给扩展名判断
+        return 'ole'
+    if b'\x00' in head and not head.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return None
+
+    text_head = head.lstrip(b'\xef\xbb\xbf \t\r\n').lower()
+    if text_head.startswith((b'<!doctype html', b'<html')):
+        return 'html'
+    return 'text'
+
+def detect_file_type(file_path: str) -> str:
+    """
+    结合扩展名和魔数确定文件类型，扩展名错误的文件会按实际内容路由
+    :param file_path: 文件路径
+    :return: 注册表中的文件类型
+    """
+    suffix = Path(file_path).suffix.lower().lstrip('.')
+    ext_type = EXTENSION_ALIASES.get(suffix, suffix) or 'unknown'
+    sniffed = sniff_file_type(file_path)
+
+    if sniffed in BINARY_FILE_TYPES or sniffed == 'html' and ext_type not in ('md', 'txt'):
+        return sniffed
+    if sniffed == 'ole':
+        # 扩展名不是doc/xls/ppt的复合文档无法确定具体格式
+        return ext_type if ext_type in LEGACY_OFFICE_TYPES else 'ole'
+    if sniffed == 'text' and (ext_type in BINARY_FILE_TYPES or ext_type not in LOADER_REGISTRY):
+        # 内容为纯文本，扩展名却是二进制格式或未知格式
+        return 'txt'
+    return ext_type
 
 class LangChainFileLoader(BaseLoader):
-    def __init__(self, file_path: str, **kwargs):
+    def __init__(self, file_path: str, file_type: Optional[str] = None, **kwargs):
         self.file_path = Path(file_path)
         self.kwargs = kwargs
-        self.file_type = self._detect_file_type()
+        self.file_type = file_type or self._detect_file_type()
         self.metadata = self._base_metadata()
-        self.loader = self._create_loader()
+        self._loader = None
+        self._encoding = None
+
+    @property
+    def loader(self) -> BaseLoader:
+        """首次使用时才创建LangChain加载器，之后复用同一个实例"""
+        if self._loader is None:
+            self._loader = self._create_loader()
+        return self._loader
 
     def _generate_document_id(self) -> str:
         """生成文档唯一ID"""
@@ -38,69 +140,78 @@ class LangChainFileLoader(BaseLoader):
             'loader_params': self.kwargs
         }
 
+    @property
+    def encoding(self) -> str:
+        """
+        文本文件的编码：未指定或指定为auto时，只采样文件开头和结尾检测编码和主要语言，并写入元数据
+        """
+        if self._encoding is None:
+            encoding = self.kwargs.get('encoding', 'auto')
+            if encoding == 'auto' and self.file_path.exists():
+                profile = detect_text_profile(str(self.file_path))
+                self.metadata.update(profile)
+                encoding = profile['encoding']
+            elif encoding == 'auto':
+                encoding = 'utf-8'
+            else:
+                self.metadata['encoding'] = encoding
+            self._encoding = encoding
+        return self._encoding
+
     def _create_loader(self) -> BaseLoader:
         """根据文件类型创建对应的LangChain加载器"""
-        file_ext = self.file_path.suffix.lower()
+        file_type = self.file_type
 
-        if file_ext == '.pdf':
+        if file_type == 'pdf':
             return PyPDFLoader(
                 file_path=str(self.file_path),
-                password=self.kwargs.get('password', ''),
+                password=self.kwargs.get('password') or None,
                 extract_images=self.kwargs.get('extract_images', False)
             )
-        elif file_ext == '.md':
+        elif file_type == 'md':
             return UnstructuredMarkdownLoader(
                 file_path=str(self.file_path),
                 mode=self.kwargs.get('mode', 'single'),
-                encoding=self.kwargs.get('encoding', 'utf-8')
+                encoding=self.encoding
             )
-        elif file_ext in ['.docx', '.doc']:
+        elif file_type == 'docx':
             return Docx2txtLoader(str(self.file_path))
-        elif file_ext in ['.txt', '.csv', '.json']:
+        elif file_type in ['txt', 'csv', 'json']:
             return LangChainTextLoader(
                 file_path=str(self.file_path),
-                encoding=self.kwargs.get('encoding', 'utf-8'),
+                encoding=self.encoding,
                 autodetect_encoding=self.kwargs.get('autodetect_encoding', False)
             )
-        elif file_ext in ['.xlsx', '.xls']:
+        elif file_type == 'xlsx':
             return UnstructuredExcelLoader(str(self.file_path))
-        elif file_ext in ['.pptx', '.ppt']:
+        elif file_type == 'pptx':
             return UnstructuredPowerPointLoader(str(self.file_path))
         else:
-            raise ValueError(f"Unsupported file type: {file_ext}")
+            raise ValueError(f"Unsupported file type: {file_type}")
 
     def load(self) -> List[LangChainDocument]:
         """使用LangChain加载器加载文档并返回标准Document对象列表"""
         return self.loader.load()
 
-class PDFLoader(LangChainFileLoader):
-    def load(self) -> RAGDocument:
-        """加载PDF文件，支持页码范围、密码保护和提取模式等参数"""
-        loader = PyPDFLoader(
-            file_path=str(self.file_path),
-            password=self.kwargs.get('password', ''),
-            extract_images=self.kwargs.get('extract_images', False)
-        )
-        documents = loader.load()
-
-        content = "\n\n".join([doc.page_content for doc in documents])
-        metadata = {**self.metadata, **{'loader_used': 'PDFLoader'}}
-
-        # 添加PDF特定元数据
-        if documents and hasattr(documents[0], 'metadata'):
-            metadata['total_pages'] = len(documents)
-            metadata['pdf_version'] = documents[0].metadata.get('pdf_version', 'unknown')
+    def _build_document(self, content: str, loader_name: str,
+                        extra_metadata: Optional[Dict[str, Any]] = None) -> RAGDocument:
+        """将加载得到的文本封装为只有一个整体块的RAGDocument"""
+        metadata = {**self.metadata, **{'loader_used': loader_name}, **(extra_metadata or {})}
+        if 'language' not in metadata:
+            # 非文本格式（PDF、Word等）按提取出的文本采样判断主要语言
+            metadata.update(detect_language(content))
+        document_id = self._generate_document_id()
 
         return RAGDocument(
             page_content=content,
-            document_id=self._generate_document_id(),
+            document_id=document_id,
             file_name=self.file_path.name,
             file_type=self.file_type,
             file_path=str(self.file_path),
             chunks=[Chunk(
-                chunk_id=f"chunk_{self._generate_document_id()}_0",
+                chunk_id=f"chunk_{document_id}_0",
                 page_content=content,
-                metadata=metadata,
+                metadata=inherited_metadata(metadata),
                 chunk_size=len(content),
                 chunk_overlap=0,
                 chunk_method='whole_document'
@@ -108,129 +219,261 @@ class PDFLoader(LangChainFileLoader):
             metadata=metadata,
             total_chunks=1,
             total_size=len(content),
-            loader_used='PDFLoader',
+            loader_used=loader_name,
             loader_params=self.kwargs
         )
 
+@register_loader('pdf')
+class PDFLoader(LangChainFileLoader):
+    def load(self) -> RAGDocument:
+        """
+        加载PDF文件，支持密码保护和提取模式等参数
+        逐页提取文本，出错或没有文本的页依次回退到pdfplumber和OCR，某页失败只记录该页的错误，不影响其他页
+        extract_images=True 时沿用PyPDFLoader识别页面中的图像
+        """
+        if self.kwargs.get('extract_images', False):
+            documents = self.loader.load()
+            texts = [doc.page_content for doc in documents]
+            page_numbers = [doc.metadata.get('page', index) + 1 for index, doc in enumerate(documents)]
+            extra_metadata = {'total_pages': len(documents)}
+        else:
+            extraction = PDFPageExtractor(
+                str(self.file_path),
+                password=self.kwargs.get('password') or None,
+                ocr=str(self.kwargs.get('ocr', True)).lower() not in ('0', 'false', 'no'),
+                tesseract_config=self.kwargs.get('tesseract_config', DEFAULT_TESSERACT_CONFIG),
+                ocr_timeout=float(self.kwargs.get('ocr_timeout', DEFAULT_PAGE_OCR_TIMEOUT)),
+                workers=int(self.kwargs.get('page_workers', PDF_PAGE_WORKERS))
+            ).extract()
+            texts = extraction['texts']
+            page_numbers = None
+            extra_metadata = {
+                'total_pages': extraction['page_count'],
+                'pdf_version': extraction['pdf_version'],
+                'page_methods': extraction['page_methods'],
+                'page_errors': extraction['page_errors'],
+                'failed_pages': extraction['failed_pages']
+            }
+
+        # 拼接各页的同时记录每页的起始偏移，分块后据此得到块所在的页码
+        content, page_map = join_pages(texts, page_numbers)
+        if texts:
+            extra_metadata[PAGE_MAP_KEY] = page_map.to_metadata()
+
+        return self._build_document(content, 'PDFLoader', extra_metadata)
+
+@register_loader('md')
 class MarkdownLoader(LangChainFileLoader):
     def load(self) -> RAGDocument:
         """加载Markdown文件，支持表格解析和元数据提取"""
-        loader = UnstructuredMarkdownLoader(
-            file_path=str(self.file_path),
-            mode=self.kwargs.get('mode', 'single'),
-            encoding=self.kwargs.get('encoding', 'utf-8')
-        )
-        documents = loader.load()
-
+        documents = self.loader.load()
         content = "\n\n".join([doc.page_content for doc in documents])
-        metadata = {**self.metadata, **{'loader_used': 'MarkdownLoader'}}
-
-        return RAGDocument(
-            page_content=content,
-            document_id=self._generate_document_id(),
-            file_name=self.file_path.name,
-            file_type=self.file_type,
-            file_path=str(self.file_path),
-            chunks=[Chunk(
-                chunk_id=f"chunk_{self._generate_document_id()}_0",
-                page_content=content,
-                metadata=metadata,
-                chunk_size=len(content),
-                chunk_overlap=0,
-                chunk_method='whole_document'
-            )],
-            metadata=metadata,
-            total_chunks=1,
-            total_size=len(content),
-            loader_used='MarkdownLoader',
-            loader_params=self.kwargs
-        )
+        return self._build_document(content, 'MarkdownLoader')
 
+@register_loader('docx')
 class DocxLoader(LangChainFileLoader):
     def load(self) -> RAGDocument:
         """加载Word文档，支持段落提取和表格处理"""
-        loader = Docx2txtLoader(
-            file_path=str(self.file_path),
-            encoding=self.kwargs.get('encoding', 'utf-8')
-        )
-        documents = loader.load()
-
+        documents = self.loader.load()
         content = "\n\n".join([doc.page_content for doc in documents])
-        metadata = {**self.metadata, **{'loader_used': 'DocxLoader'}}
-
-        return RAGDocument(
-            page_content=content,
-            document_id=self._generate_document_id(),
-            file_name=self.file_path.name,
-            file_type=self.file_type,
-            file_path=str(self.file_path),
-            chunks=[Chunk(
-                chunk_id=f"chunk_{self._generate_document_id()}_0",
-                page_content=content,
-                metadata=metadata,
-                chunk_size=len(content),
-                chunk_overlap=0,
-                chunk_method='whole_document'
-            )],
-            metadata=metadata,
-            total_chunks=1,
-            total_size=len(content),
-            loader_used='DocxLoader',
-            loader_params=self.kwargs
-        )
+        return self._build_document(content, 'DocxLoader')
 
+@register_loader('txt', 'csv', 'json')
 class CustomTextLoader(LangChainFileLoader):
     def load(self) -> RAGDocument:
         """加载文本文件，支持多种编码和行处理模式"""
-        loader = LangChainTextLoader(
-            file_path=str(self.file_path),
-            encoding=self.kwargs.get('encoding', 'utf-8'),
-            autodetect_encoding=self.kwargs.get('autodetect_encoding', False)
-        )
-        documents = loader.load()
-
+        documents = self.loader.load()
         content = "\n\n".join([doc.page_content for doc in documents])
-        metadata = {**self.metadata, **{'loader_used': 'TextLoader'}}
+        return self._build_document(content, 'TextLoader')
 
-        return RAGDocument(
-            page_content=content,
-            document_id=self._generate_document_id(),
-            file_name=self.file_path.name,
-            file_type=self.file_type,
-            file_path=str(self.file_path),
-            chunks=[Chunk(
-                chunk_id=f"chunk_{self._generate_document_id()}_0",
-                page_content=content,
-                metadata=metadata,
-                chunk_size=len(content),
-                chunk_overlap=0,
-                chunk_method='whole_document'
-            )],
-            metadata=metadata,
-            total_chunks=1,
-            total_size=len(content),
-            loader_used='TextLoader',
-            loader_params=self.kwargs
-        )
+def _local_name(tag: str) -> str:
+    """去掉XML标签的命名空间前缀"""
+    return tag.rsplit('}', 1)[-1]
+
+def _column_index(reference: Optional[str]) -> Optional[int]:
+    """单元格引用（如D5）中的列号，从0开始；没有引用时返回None"""
+    match = re.match(r'([A-Za-z]+)', reference or '')
+    if not match:
+        return None
+    index = 0
+    for letter in match.group(1).upper():
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+def _natural_key(name: str):
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+@register_loader('xlsx')
+class XlsxLoader(LangChainFileLoader):
+    """直接流式解析xlsx中的XML，逐行输出单元格，内存与单行大小相关"""
+    def _shared_strings(self, archive: zipfile.ZipFile) -> List[str]:
+        if 'xl/sharedStrings.xml' not in archive.namelist():
+            return []
+        strings = []
+        with archive.open('xl/sharedStrings.xml') as f:
+            for _, elem in ET.iterparse(f):
+                if _local_name(elem.tag) == 'si':
+                    strings.append(''.join(t.text or '' for t in elem.iter() if _local_name(t.tag) == 't'))
+                    elem.clear()
+        return strings
+
+    def _sheet_names(self, archive: zipfile.ZipFile) -> Dict[str, str]:
+        """返回工作表文件路径 -> 工作表名称"""
+        rel_targets = {}
+        if 'xl/_rels/workbook.xml.rels' in archive.namelist():
+            rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+            for rel in rels:
+                target = rel.get('Target', '').lstrip('/')
+                rel_targets[rel.get('Id')] = target if target.startswith('xl/') else f"xl/{target}"
+        names = {}
+        workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+        for elem in workbook.iter():
+            if _local_name(elem.tag) == 'sheet':
+                rel_id = next((value for key, value in elem.attrib.items() if _local_name(key) == 'id'), None)
+                if rel_id in rel_targets:
+                    names[rel_targets[rel_id]] = elem.get('name')
+        return names
+
+    def _iter_rows(self, archive: zipfile.ZipFile, sheet_path: str, shared: List[str]):
+        with archive.open(sheet_path) as f:
+            for _, elem in ET.iterparse(f):
+                if _local_name(elem.tag) != 'row':
+                    continue
+                values = []
+                for cell in elem:
+                    if _local_name(cell.tag) != 'c':
+                        continue
+                    cell_type = cell.get('t')
+                    value = ''
+                    for child in cell.iter():
+                        name = _local_name(child.tag)
+                        if name == 'v' and child.text is not None:
+                            value = child.text
+                        elif name == 't' and cell_type == 'inlineStr':
+                            value += child.text or ''
+                    if cell_type == 's' and value.isdigit() and int(value) < len(shared):
+                        value = shared[int(value)]
+                    # 空单元格在XML中省略，按单元格引用的列号补齐，保证各行的列与表头对齐
+                    column = _column_index(cell.get('r'))
+                    if column is not None and column > len(values):
+                        values.extend([''] * (column - len(values)))
+                    values.append(value)
+                elem.clear()
+                if any(values):
+                    yield values
+
+    def load(self) -> RAGDocument:
+        """逐个工作表读取，每行以制表符连接"""
+        sections = []
+        total_rows = 0
+        with zipfile.ZipFile(self.file_path) as archive:
+            shared = self._shared_strings(archive)
+            sheet_names = self._sheet_names(archive)
+            sheet_paths = sorted((name for name in archive.namelist()
+                                  if name.startswith('xl/worksheets/') and name.endswith('.xml')), key=_natural_key)
+            for sheet_path in sheet_paths:
+                lines = ['\t'.join(row) for row in self._iter_rows(archive, sheet_path, shared)]
+                total_rows += len(lines)
+                title = sheet_names.get(sheet_path, Path(sheet_path).stem)
+                sections.append(f"## {title}\n" + "\n".join(lines))
+
+        content = "\n\n".join(sections)
+        return self._build_document(content, 'XlsxLoader', {'total_sheets': len(sections), 'total_rows': total_rows})
+
+@register_loader('pptx')
+class PptxLoader(LangChainFileLoader):
+    """直接流式解析pptx中每张幻灯片的XML，按段落提取文本"""
+    def _iter_paragraphs(self, archive: zipfile.ZipFile, slide_path: str):
+        with archive.open(slide_path) as f:
+            for _, elem in ET.iterparse(f):
+                if _local_name(elem.tag) != 'p':
+                    continue
+                text = ''.join(t.text or '' for t in elem.iter() if _local_name(t.tag) == 't')
+                elem.clear()
+                if text.strip():
+                    yield text
+
+    def load(self) -> RAGDocument:
+        sections = []
+        with zipfile.ZipFile(self.file_path) as archive:
+            slide_paths = sorted((name for name in archive.namelist()
+                                  if re.fullmatch(r'ppt/slides/slide\d+\.xml', name)), key=_natural_key)
+            for index, slide_path in enumerate(slide_paths):
+                paragraphs = list(self._iter_paragraphs(archive, slide_path))
+                sections.append(f"## Slide {index + 1}\n" + "\n".join(paragraphs))
+
+        content = "\n\n".join(sections)
+        return self._build_document(content, 'PptxLoader', {'total_slides': len(sections)})
+
+class _HTMLTextExtractor(HTMLParser):
+    """增量解析HTML，跳过脚本和样式，块级元素转换为换行"""
+    BLOCK_TAGS = {'p', 'div', 'br', 'li', 'tr', 'section', 'article', 'header', 'footer',
+                  'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'table', 'ul', 'ol', 'pre', 'blockquote'}
+    SKIP_TAGS = {'script', 'style', 'noscript', 'template'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.title = ''
+        self._skip_depth = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == 'title':
+            self._in_title = True
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == 'title':
+            self._in_title = False
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._in_title:
+            self.title += data
+            return
+        self.parts.append(data)
+
+    def text(self) -> str:
+        raw = ''.join(self.parts)
+        lines = [re.sub(r'[ \t\r\f\v]+', ' ', line).strip() for line in raw.split('\n')]
+        return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+@register_loader('html')
+class HtmlLoader(LangChainFileLoader):
+    """分段读取HTML并增量解析为纯文本"""
+    def load(self) -> RAGDocument:
+        extractor = _HTMLTextExtractor()
+        with open(self.file_path, 'r', encoding=self.encoding, errors='replace') as f:
+            while True:
+                block = f.read(STREAM_READ_SIZE)
+                if not block:
+                    break
+                extractor.feed(block)
+        extractor.close()
+        return self._build_document(extractor.text(), 'HtmlLoader', {'title': extractor.title.strip()})
 
 class FileLoaderFactory:
     @staticmethod
     def get_loader(file_path: str,** kwargs) -> LangChainFileLoader:
-        """根据文件扩展名返回相应的加载器实例"""
-        file_ext = Path(file_path).suffix.lower()
-
-        if file_ext == '.pdf':
-            return PDFLoader(file_path, **kwargs)
-        elif file_ext == '.md':
-            return MarkdownLoader(file_path,** kwargs)
-        elif file_ext in ['.docx', '.doc']:
-            return DocxLoader(file_path, **kwargs)
-        elif file_ext in ['.txt', '.md', '.csv', '.json']:
-            return CustomTextLoader(file_path,**kwargs)
-        else:
-            raise ValueError(f"Unsupported file type: {file_ext}")
+        """根据文件内容（魔数）和扩展名从注册表中选择加载器实例"""
+        file_type = detect_file_type(file_path)
+        if file_type in LEGACY_OFFICE_TYPES or file_type == 'ole':
+            raise ValueError(f"不支持旧版Office二进制格式（{file_type}），请另存为docx/xlsx/pptx后重试: {file_path}")
+        loader_cls = LOADER_REGISTRY.get(file_type)
+        if loader_cls is None:
+            raise ValueError(f"Unsupported file type: {file_type}")
+        return loader_cls(file_path, file_type=file_type, **kwargs)
 
 # 主函数用于直接调用
 def load_file(file_path: str, **kwargs) -> RAGDocument:
     loader = FileLoaderFactory.get_loader(file_path,** kwargs)
-    return loader.load()
\ No newline at end of file
+    return loader.load()
@@ -0,0 +1,208 @@
+import os
+import logging
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+logger = logging.getLogger(__name__)
+
+# 每页依次尝试的提取方法，前一种出错或没有取到文本时才尝试下一种
+PDF_PAGE_EXTRACTORS = ('pypdf', 'pdfplumber', 'ocr')
+# 需要OCR时并行处理的线程数；每个线程持有自己的PDF句柄
+# pypdf和pdfplumber的文本提取是纯Python，持有GIL，多线程没有加速；线程只用于让OCR页的渲染等待和
+# tesseract子进程与其他页的提取重叠，不做OCR时在当前线程中顺序提取
+PDF_PAGE_WORKERS = min(8, os.cpu_count() or 1)
+# 每个任务处理的连续页数
+PDF_PAGE_BATCH = 16
+# 渲染页面做OCR时的分辨率（DPI）
+OCR_RESOLUTION = 200
+DEFAULT_TESSERACT_CONFIG = r'--oem 3 --psm 6'
+# 单页OCR超时（秒），0表示不限
+DEFAULT_PAGE_OCR_TIMEOUT = 30
+
+class PDFPasswordError(ValueError):
+    """加密PDF未提供密码或密码错误"""
+
+@lru_cache(maxsize=1)
+def tesseract_available() -> bool:
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+def open_reader(file_path: str, password: Optional[str] = None):
+    """
+    打开PDF并解密：先用给定密码，再试空密码（只设置了权限密码的文件用空密码即可打开）
+    :raises PDFPasswordError: 文件加密且密码都不正确
+    """
+    from pypdf import PdfReader
+    reader = PdfReader(file_path, strict=False)
+    if reader.is_encrypted:
+        for candidate in ([password] if password else []) + ['']:
+            try:
+                if reader.decrypt(candidate):
+                    return reader
+            except Exception:
+                continue
+        raise PDFPasswordError(f"PDF已加密，{'密码错误' if password else '需要提供password参数'}: {file_path}")
+    return reader
+
+class _PageSources(threading.local):
+    """每个线程各自打开的PDF句柄（pypdf和pdfplumber的对象都不是线程安全的）"""
+    reader = None
+    plumber = None
+
+class PDFPageExtractor:
+    """
+    逐页提取PDF文本，每页按 pypdf -> pdfplumber -> OCR 的顺序回退
+    可能做OCR时多个线程处理不同页，使tesseract子进程的等待与其他页的提取重叠；否则顺序提取
+    某页所有方法都失败时只记录该页的错误，其余页照常提取；提取结束后关闭各线程打开的PDF句柄
+    """
+    def __init__(self, file_path: str, password: Optional[str] = None, ocr: bool = True,
+                 tesseract_config: str = DEFAULT_TESSERACT_CONFIG, ocr_timeout: float = DEFAULT_PAGE_OCR_TIMEOUT,
+                 workers: int = PDF_PAGE_WORKERS):
+        self.file_path = file_path
+        self.password = password
+        self.ocr = ocr
+        self.tesseract_config = tesseract_config
+        self.ocr_timeout = ocr_timeout
+        self.workers = max(1, workers)
+        self._local = _PageSources()
+        # 各线程打开的pypdf和pdfplumber对象，提取结束后统一关闭
+        self._opened: List[Any] = []
+        self._lock = threading.Lock()
+        methods = {'pypdf': self._extract_pypdf, 'pdfplumber': self._extract_pdfplumber, 'ocr': self._extract_ocr}
+        self.extractors: List[Tuple[str, Callable[[int], str]]] = [
+            (name, methods[name]) for name in PDF_PAGE_EXTRACTORS if ocr or name != 'ocr'
+        ]
+
+    def _reader(self):
+        if self._local.reader is None:
+            self._local.reader = open_reader(self.file_path, self.password)
+            with self._lock:
+                self._opened.append(self._local.reader)
+        return self._local.reader
+
+    def _plumber(self):
+        if self._local.plumber is None:
+            import pdfplumber
+            self._local.plumber = pdfplumber.open(self.file_path, password=self.password or '')
+            with self._lock:
+                self._opened.append(self._local.plumber)
+        return self._local.plumber
+
+    def _extract_pypdf(self, index: int) -> str:
+        return self._reader().pages[index].extract_text() or ''
+
+    def _extract_pdfplumber(self, index: int) -> str:
+        page = self._plumber().pages[index]
+        try:
+            return page.extract_text() or ''
+        finally:
+            page.close()
+
+    def _extract_ocr(self, index: int) -> str:
+        if not tesseract_available():
+            raise RuntimeError("tesseract不可用")
+        import pytesseract
+        page = self._plumber().pages[index]
+        try:
+            image = page.to_image(resolution=OCR_RESOLUTION).original
+        finally:
+            page.close()
+        return pytesseract.image_to_string(image, config=self.tesseract_config, timeout=self.ocr_timeout)
+
+    def extract_page(self, index: int) -> Dict[str, Any]:
+        """
+        提取一页：返回 {'text', 'method', 'errors'}
+        method为取到文本的方法；所有方法都没有取到文本时为None（空白页或全部失败）
+        """
+        errors: Dict[str, str] = {}
+        for name, extractor in self.extractors:
+            try:
+                text = extractor(index)
+            except Exception as e:
+                errors[name] = f"{type(e).__name__}: {e}"
+                continue
+            if text.strip():
+                return {'text': text, 'method': name, 'errors': errors}
+        return {'text': '', 'method': None, 'errors': errors}
+
+    def _extract_batch(self, start: int, end: int) -> List[Dict[str, Any]]:
+        return [self.extract_page(index) for index in range(start, end)]
+
+    def page_count(self) -> int:
+        """页数：pypdf无法解析时用pdfplumber（pdfminer）再试一次"""
+        try:
+            return len(self._reader().pages)
+        except PDFPasswordError:
+            raise
+        except Exception as e:
+            logger.warning(f"pypdf无法读取页目录，改用pdfplumber: {self.file_path}: {e}")
+            self.extractors = [item for item in self.extractors if item[0] != 'pypdf']
+            return len(self._plumber().pages)
+
+    def close(self):
+        """关闭所有线程打开的PDF句柄；之后再次提取时重新打开"""
+        with self._lock:
+            opened, self._opened = self._opened, []
+            self._local = _PageSources()
+        for source in opened:
+            try:
+                source.close()
+            except Exception as e:
+                logger.debug(f"关闭PDF句柄失败: {self.file_path}: {e}")
+
+    def _parallel(self, batch_count: int) -> bool:
+        """只有可能做OCR时才值得用多个线程"""
+        return (self.workers > 1 and batch_count > 1 and self.ocr
+                and any(name == 'ocr' for name, _ in self.extractors) and tesseract_available())
+
+    def extract(self) -> Dict[str, Any]:
+        """
+        提取全部页面
+        :return: {'texts': 每页文本, 'page_count', 'pdf_version', 'page_methods': 方法 -> 页数,
+                  'page_errors': [{'page', 'method', 'errors'}]（只包含出过错的页）, 'failed_pages': 没有取到文本且出错的页}
+        """
+        try:
+            count = self.page_count()
+            batches = [(start, min(start + PDF_PAGE_BATCH, count)) for start in range(0, count, PDF_PAGE_BATCH)]
+            if not self._parallel(len(batches)):
+                pages = [page for start, end in batches for page in self._extract_batch(start, end)]
+            else:
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    pages = [page for result in executor.map(lambda batch: self._extract_batch(*batch), batches)
+                             for page in result]
+            version = self._pdf_version()
+        finally:
+            self.close()
+
+        page_methods: Dict[str, int] = {}
+        page_errors, failed_pages = [], []
+        for number, page in enumerate(pages, 1):
+            # 所有方法都没有文本且没有出错的是空白页；有出错的（如扫描页但没有tesseract）记为失败
+            method = page['method'] or ('failed' if page['errors'] else 'empty')
+            page_methods[method] = page_methods.get(method, 0) + 1
+            if page['errors']:
+                page_errors.append({'page': number, 'method': page['method'], 'errors': page['errors']})
+                if page['method'] is None:
+                    failed_pages.append(number)
+        if failed_pages:
+            logger.warning(f"{self.file_path}: {len(failed_pages)} 页提取失败: {failed_pages[:20]}")
+        return {
+            'texts': [page['text'] for page in pages],
+            'page_count': count,
+            'pdf_version': version,
+            'page_methods': page_methods,
+            'page_errors': page_errors,
+            'failed_pages': failed_pages
+        }
+
+    def _pdf_version(self) -> str:
+        try:
+            return self._reader().pdf_header.replace('%PDF-', '') or 'unknown'
+        except Exception:
+            return 'unknown'
@@ -1,24 +1,48 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import os
 import hashlib
 from langchain_core.documents import Document as LangChainDocument
 from langchain_community.document_loaders import UnstructuredPDFLoader, UnstructuredMarkdownLoader
-# 尝试从不同的模块导入TableTransformer
+from langchain_community.document_transformers import Html2TextTransformer
+# pdfplumber用于表格提取，未安装时跳过该阶段
 try:
-    from langchain_community.document_transformers import TableTransformer
+    import pdfplumber
 except ImportError:
-    try:
-        from langchain_experimental.document_transformers import TableTransformer
-    except ImportError:
-        # 如果都无法导入，设置为None并在代码中处理
-        TableTransformer = None
-from langchain_community.document_transformers import Html2TextTransformer
+    pdfplumber = None
 from src.utils.models import Document as RAGDocument, Chunk
+from src.utils.page_map import join_pages, inherited_metadata, PAGE_MAP_KEY
 import pytesseract
 from PIL import Image
 from io import BytesIO
 
+# 页数不超过该值时在当前进程内提取表格，避免进程池的启动开销
+PARALLEL_TABLE_MIN_PAGES = 8
+
+def _extract_page_tables(file_path: str, page_numbers: List[int], password: str = '',
+                         table_settings: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """在单个进程中提取指定页的表格（模块级函数，便于进程池调用）"""
+    tables = []
+    with pdfplumber.open(file_path, password=password or None) as pdf:
+        for page_number in page_numbers:
+            page = pdf.pages[page_number - 1]
+            for table_index, table in enumerate(page.find_tables(table_settings or {})):
+                rows = table.extract()
+                if not rows:
+                    continue
+                tables.append({
+                    'page_number': page_number,
+                    'table_index': table_index,
+                    'bbox': [round(float(v), 2) for v in table.bbox],
+                    'page_size': [float(page.width), float(page.height)],
+                    'rows': rows
+                })
+            # 释放页面缓存，避免大文件内存持续增长
+            page.flush_cache()
+    return tables
+
 class LangChainDocumentParser:
     def __init__(self, file_path: str, **kwargs):
         self.file_path = Path(file_path)
@@ -27,6 +51,8 @@ class LangChainDocumentParser:
         self.metadata = self._base_metadata()
         self.loader = self._create_loader()
         self.transformers = self._create_transformers()
+        # defer_ocr=True时只收集图像数据，由调用方（如异步批处理）自行调度OCR
+        self.pending_images: List[bytes] = []
 
     def _detect_file_type(self) -> str:
         suffix = self.file_path.suffix.lower()
@@ -50,6 +76,8 @@ class LangChainDocumentParser:
             return UnstructuredPDFLoader(
                 file_path=str(self.file_path),
                 strategy=self.kwargs.get('strategy', 'hi_res'),
+                # elements模式逐元素返回并带页码，按"\n\n"拼接后与single模式的文本相同
+                mode=self.kwargs.get('mode', 'elements'),
                 extract_images_in_pdf=self.kwargs.get('extract_images', True)
             )
         elif file_ext == '.md':
@@ -61,15 +89,6 @@ class LangChainDocumentParser:
         """创建文档转换器列表"""
         transformers = []
 
-        # 添加表格转换器
-        if self.kwargs.get('extract_tables', True) and TableTransformer is not None:
-            transformers.append(TableTransformer(
-                table_finder=self.kwargs.get('table_finder', None),
-                table_parser=self.kwargs.get('table_parser', None)
-            ))
-        elif self.kwargs.get('extract_tables', True) and TableTransformer is None:
-            print("警告: 无法导入TableTransformer，表格提取功能将被跳过。")
-
         # 添加HTML到文本转换器（如果需要）
         if self.file_type in ['html', 'htm']:
             transformers.append(Html2TextTransformer())
@@ -90,49 +109,179 @@ class LangChainDocumentParser:
 
         # 处理图像（如果有）
         processed_docs = self._process_images(transformed_docs)
+        page_numbers = [doc.metadata.get('page_number') for doc in processed_docs]
+        paged = all(page_number is not None for page_number in page_numbers)
+        total_pages = max(page_numbers) if paged and page_numbers else len(processed_docs)
+
+        # 提取表格；表格已作为原子块输出，正文中去掉表格区域，避免分块器在行中间再次拆分
+        tables = self._extract_tables() if self.kwargs.get('extract_tables', True) else []
+        text_docs = self._without_table_regions(processed_docs, tables)
 
-        # 合并所有文档内容
-        full_content = "\n\n".join([doc.page_content for doc in processed_docs])
+        # 合并所有文档内容；元素带页码时（如elements模式）同时记录页边界
+        if paged:
+            full_content, page_map = join_pages([doc.page_content for doc in text_docs],
+                                                [doc.metadata['page_number'] for doc in text_docs])
+        else:
+            full_content, page_map = "\n\n".join([doc.page_content for doc in text_docs]), None
         parser_name = f"LangChain{self.loader.__class__.__name__}"
 
         # 收集元数据
         combined_metadata = {**self.metadata, **{
-            'total_pages': len(processed_docs),
+            'total_pages': total_pages,
             'parser_used': parser_name,
-            'extracted_tables': self._count_tables(processed_docs),
-            'extracted_images': self._count_images(processed_docs)
+            'extracted_tables': len(tables),
+            'extracted_images': self._count_images(processed_docs),
+            'pending_ocr_images': len(self.pending_images)
         }}
+        if page_map is not None:
+            combined_metadata[PAGE_MAP_KEY] = page_map.to_metadata()
 
         # 创建初始块
         initial_chunk = Chunk(
             chunk_id=self._generate_chunk_id(),
             page_content=full_content,
-            metadata=combined_metadata,
+            metadata=inherited_metadata(combined_metadata),
             chunk_size=len(full_content),
             chunk_overlap=0,
             chunk_method='initial_parser'
         )
 
+        # 表格作为独立的原子块，分块器不会再拆分
+        table_chunks = self._build_table_chunks(tables, inherited_metadata(combined_metadata))
+        chunks = [initial_chunk] + table_chunks
+
         # 创建RAGDocument对象
         return RAGDocument(
             document_id=self._generate_document_id(),
             file_name=self.file_path.name,
             file_type=self.file_type,
             file_path=str(self.file_path),
-            chunks=[initial_chunk],
+            chunks=chunks,
             metadata=combined_metadata,
-            total_chunks=1,
-            total_size=len(full_content),
+            total_chunks=len(chunks),
+            total_size=sum(len(chunk.page_content) for chunk in chunks),
             loader_used=parser_name,
             loader_params=self.kwargs,
             page_content=full_content
         )
 
+    def _extract_tables(self) -> List[Dict[str, Any]]:
+        """使用pdfplumber按页检测表格，页数较多时按页分组并行提取"""
+        if self.file_type != 'pdf':
+            return []
+        if pdfplumber is None:
+            print("警告: 未安装pdfplumber，表格提取功能将被跳过。")
+            return []
+
+        password = self.kwargs.get('password', '')
+        table_settings = self.kwargs.get('table_settings')
+        try:
+            with pdfplumber.open(str(self.file_path), password=password or None) as pdf:
+                total_pages = len(pdf.pages)
+        except Exception as e:
+            print(f"打开PDF提取表格时出错: {e}")
+            return []
+
+        page_numbers = list(range(1, total_pages + 1))
+        max_workers = min(self.kwargs.get('table_workers', os.cpu_count() or 1), total_pages)
+        if total_pages < PARALLEL_TABLE_MIN_PAGES or max_workers <= 1:
+            return _extract_page_tables(str(self.file_path), page_numbers, password, table_settings)
+
+        # 页码交错分组，使各进程负载均衡；每个进程各自打开PDF，结果按页码顺序合并
+        batches = [page_numbers[i::max_workers] for i in range(max_workers)]
+        tables = []
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_extract_page_tables, str(self.file_path), batch, password, table_settings)
+                       for batch in batches]
+            for future in futures:
+                tables.extend(future.result())
+        tables.sort(key=lambda table: (table['page_number'], table['table_index']))
+        return tables
+
+    @staticmethod
+    def _element_box(metadata: Dict[str, Any], page_size: List[float]) -> Optional[List[float]]:
+        """把元素坐标换算到pdfplumber的页面坐标系 [x0, top, x1, bottom]，没有坐标时返回None"""
+        coordinates = metadata.get('coordinates') or {}
+        points = coordinates.get('points')
+        layout_width, layout_height = coordinates.get('layout_width'), coordinates.get('layout_height')
+        if not points or not layout_width or not layout_height:
+            return None
+        scale_x, scale_y = page_size[0] / layout_width, page_size[1] / layout_height
+        xs = [point[0] * scale_x for point in points]
+        ys = [point[1] * scale_y for point in points]
+        return [min(xs), min(ys), max(xs), max(ys)]
+
+    def _without_table_regions(self, docs: List[LangChainDocument],
+                               tables: List[Dict[str, Any]]) -> List[LangChainDocument]:
+        """
+        去掉已提取为表格块的内容：有表格的页上的Table元素，以及中心点落在表格区域内的元素
+        没有检测到表格的页保持不变
+        """
+        if not tables:
+            return docs
+        tables_by_page: Dict[int, List[Dict[str, Any]]] = {}
+        for table in tables:
+            tables_by_page.setdefault(table['page_number'], []).append(table)
+
+        kept = []
+        for doc in docs:
+            page_tables = tables_by_page.get(doc.metadata.get('page_number'))
+            if page_tables:
+                if doc.metadata.get('category') == 'Table':
+                    continue
+                box = self._element_box(doc.metadata, page_tables[0]['page_size'])
+                if box is not None:
+                    center_x, center_y = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+                    if any(x0 <= center_x <= x1 and top <= center_y <= bottom
+                           for x0, top, x1, bottom in (table['bbox'] for table in page_tables)):
+                        continue
+            kept.append(doc)
+        return kept
+
+    def _build_table_chunks(self, tables: List[Dict[str, Any]], base_metadata: Dict[str, Any]) -> List[Chunk]:
+        """将表格转换为Markdown并封装为原子块"""
+        table_chunks = []
+        for index, table in enumerate(tables):
+            markdown = self._convert_table_to_markdown(self._normalize_table(table['rows']))
+            if not markdown:
+                continue
+            table_chunks.append(Chunk(
+                chunk_id=f"{self._generate_chunk_id()}_table_{index}",
+                page_content=markdown,
+                metadata={
+                    **base_metadata,
+                    'chunk_type': 'table',
+                    'atomic': True,
+                    'page_number': table['page_number'],
+                    'bbox': table['bbox'],
+                    'table_index': table['table_index'],
+                    'rows': len(table['rows'])
+                },
+                chunk_size=len(markdown),
+                chunk_overlap=0,
+                chunk_method='table'
+            ))
+        return table_chunks
+
+    @staticmethod
+    def _normalize_table(rows: List[List[Optional[str]]]) -> List[List[str]]:
+        """补齐列数，空单元格转为空字符串，单元格内换行替换为空格"""
+        width = max(len(row) for row in rows)
+        return [
+            [(cell or '').replace('\n', ' ').replace('|', '\\|') for cell in row] + [''] * (width - len(row))
+            for row in rows
+        ]
+
     def _process_images(self, docs: List[LangChainDocument]) -> List[LangChainDocument]:
         """处理文档中的图像并提取文本"""
         if not self.kwargs.get('process_images', True):
             return docs
 
+        if self.kwargs.get('defer_ocr', False):
+            for doc in docs:
+                self.pending_images.extend(doc.metadata.get('images') or [])
+            return docs
+
         processed_docs = []
         for doc in docs:
             # 检查文档中是否有图像数据
@@ -143,7 +292,9 @@ class LangChainDocumentParser:
                         # 尝试从图像数据中提取文本
                         img = Image.open(BytesIO(img_data))
                         custom_config = self.kwargs.get('tesseract_config', r'--oem 3 --psm 6')
-                        img_text = pytesseract.image_to_string(img, config=custom_config)
+                        # ocr_timeout限制单张图像的识别时间，超时按错误记录，不影响其他图像
+                        img_text = pytesseract.image_to_string(img, config=custom_config,
+                                                               timeout=self.kwargs.get('ocr_timeout', 0))
                         image_texts.append(f"[IMAGE {img_idx+1} TEXT]:\n{img_text}\n")
                     except Exception as e:
                         image_texts.append(f"[IMAGE {img_idx+1} ERROR]: {str(e)}\n")
@@ -156,14 +307,6 @@ class LangChainDocumentParser:
 
         return processed_docs
 
-    def _count_tables(self, docs: List[LangChainDocument]) -> int:
-        """计算提取的表格数量"""
-        count = 0
-        for doc in docs:
-            if 'tables' in doc.metadata:
-                count += len(doc.metadata['tables'])
-        return count
-
     def _count_images(self, docs: List[LangChainDocument]) -> int:
         """计算提取的图像数量"""
         count = 0
@@ -203,6 +346,16 @@ class LangChainDocumentParser:
             print(f"转换表格为Markdown时出错: {e}")
             return f"[表格转换错误: {str(e)}]"
 
+def format_image_texts(results: List[Union[str, Exception]]) -> str:
+    """按_process_images的格式拼接图像OCR结果（文本或异常），供延迟OCR的调用方追加到正文"""
+    lines = []
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            lines.append(f"[IMAGE {index + 1} ERROR]: {str(result)}\n")
+        else:
+            lines.append(f"[IMAGE {index + 1} TEXT]:\n{result}\n")
+    return "\n".join(lines)
+
 class ParserFactory:
     @staticmethod
     def get_parser(file_path: str, **kwargs) -> LangChainDocumentParser:
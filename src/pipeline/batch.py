@@ -0,0 +1,548 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple
+import pytesseract
+from src.loaders.loaders import LOADER_REGISTRY, EXTENSION_ALIASES
+from src.parsers.parsers import format_image_texts
+from src.chunkers.chunkers import chunk_document
+from src.utils.file_utils import JSONFileHandler
+from src.utils.chunk_stats import annotate_chunk_stats
+from src.utils.models import Document
+from src.utils.resource_limits import ResourceBudget
+from src.utils.shared_text import SharedDocument, SharedDocumentView, ensure_resource_tracker, unlink_shared_document
+from src.pipeline.governance import load_document_governed, DEFAULT_OCR_TIMEOUT
+from src.pipeline.ledger import JobLedger, config_fingerprint, file_content_hash
+
+logger = logging.getLogger(__name__)
+
+# 预读时每次读取的块大小
+READ_BLOCK_SIZE = 1024 * 1024
+DEFAULT_TESSERACT_CONFIG = r'--oem 3 --psm 6'
+# 首次重试前的等待秒数，之后每次加倍
+DEFAULT_RETRY_BACKOFF = 2.0
+
+def iter_input_files(inputs: Iterable[str]) -> Iterator[Path]:
+    """展开输入路径：文件原样返回，目录按文件名顺序返回其中可加载的文件"""
+    extensions = set(LOADER_REGISTRY) | set(EXTENSION_ALIASES)
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            for child in sorted(path.rglob('*')):
+                if child.is_file() and child.suffix.lower().lstrip('.') in extensions:
+                    yield child
+        elif path.exists():
+            yield path
+
+def _restore_source_path(document: Document, source_path: str) -> Document:
+    """文件先落到本地暂存目录再解析时，把路径改回原始位置"""
+    update = {'file_path': source_path, 'file_name': Path(source_path).name}
+    metadata = {**document.metadata, **update}
+    chunks = [chunk.copy(update={'metadata': {**chunk.metadata, **update}}) for chunk in document.chunks]
+    return document.copy(update={**update, 'metadata': metadata, 'chunks': chunks})
+
+def parse_stage(file_path: str, source_path: Optional[str] = None, defer_ocr: bool = False,
+                budget: Optional[ResourceBudget] = None,
+                ocr_timeout: float = DEFAULT_OCR_TIMEOUT) -> Tuple[Document, List[bytes]]:
+    """
+    解析或加载一个文件（CPU密集，适合在进程池中执行）
+    :param file_path: 实际读取的路径（可能是本地暂存副本）
+    :param source_path: 原始路径，与file_path不同时写回文档
+    :param defer_ocr: 为True时不在这里执行OCR，返回待识别的图像数据
+    :param budget: 每条解析路径的时间/内存预算，超出时降级到更便宜的路径
+    :param ocr_timeout: 单张图像OCR超时（秒）
+    :return: (文档, 待OCR的图像列表)
+    """
+    document, images = load_document_governed(file_path, budget=budget, defer_ocr=defer_ocr,
+                                              ocr_timeout=ocr_timeout)
+    if source_path and source_path != file_path:
+        document = _restore_source_path(document, source_path)
+    return document, images
+
+def apply_ocr_results(document: Document, results: List[Any]) -> Document:
+    """将延迟执行的OCR结果追加到正文和初始块"""
+    if not results:
+        return document
+    segment = "\n\n" + format_image_texts(results)
+    page_content = document.page_content + segment
+    chunks = list(document.chunks)
+    if chunks and not chunks[0].metadata.get('atomic'):
+        first = chunks[0]
+        # 初始块就是正文时共用拼接结果，不再单独复制一份
+        content = page_content if first.page_content is document.page_content else first.page_content + segment
+        chunks[0] = first.copy(update={'page_content': content, 'chunk_size': len(content)})
+    metadata = {**document.metadata, 'pending_ocr_images': 0, 'ocr_images': len(results)}
+    return document.copy(update={
+        'page_content': page_content,
+        'chunks': chunks,
+        'metadata': metadata,
+        'total_size': sum(len(chunk.page_content) for chunk in chunks)
+    })
+
+def chunk_stage(document: Document, chunking_strategy: str, **kwargs) -> Document:
+    """分块并写入分块统计（CPU密集）"""
+    chunked = chunk_document(document, chunking_strategy, **kwargs)
+    annotate_chunk_stats(chunked)
+    return chunked
+
+def output_file_name(document: Document, index: int, output_key: Optional[str] = None) -> str:
+    # 使用台账时文件名由源路径决定，中断后重新处理会覆盖同一个文件而不是另存一份
+    if output_key:
+        return f"final_{document.document_id[:8]}_{output_key}.json"
+    # 序号写入文件名前缀，避免同一秒内写出的文档重名
+    return JSONFileHandler.document_file_name(document, prefix=f"final_{index:06d}")
+
+def chunk_serialize_stage(document: Document, index: int, chunking_strategy: str,
+                          chunking_kwargs: Dict[str, Any], output_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    在工作进程中分块并序列化，只把JSON字节串传回主进程
+    避免把分块后的文档对象再跨进程传输，也避免在事件循环所在进程中做JSON编码
+    """
+    timings = {}
+    stage_start = time.perf_counter()
+    chunked = chunk_stage(document, chunking_strategy, **chunking_kwargs)
+    timings['chunk'] = time.perf_counter() - stage_start
+    stage_start = time.perf_counter()
+    payload = JSONFileHandler.serialize_document(chunked)
+    timings['serialize'] = time.perf_counter() - stage_start
+    return {
+        'file_name': output_file_name(chunked, index, output_key),
+        'payload': payload,
+        'header': JSONFileHandler.document_header(chunked),
+        'chunks': len(chunked.chunks),
+        'timings': timings
+    }
+
+def chunk_shared_stage(handle: Dict[str, Any], ocr_results: List[Any], index: int, chunking_strategy: str,
+                       chunking_kwargs: Dict[str, Any], output_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    从共享内存取出解析后的文档，追加OCR结果后分块并序列化
+    共享内存由提交任务的一方释放，这里只读取
+    """
+    stage_start = time.perf_counter()
+    with SharedDocumentView(handle) as view:
+        document = view.document()
+    attach_seconds = time.perf_counter() - stage_start
+    document = apply_ocr_results(document, ocr_results)
+    result = chunk_serialize_stage(document, index, chunking_strategy, chunking_kwargs, output_key)
+    result['timings']['attach'] = attach_seconds
+    return result
+
+def process_stage(file_path: str, source_path: str, index: int, chunking_strategy: str,
+                  chunking_kwargs: Dict[str, Any], budget: Optional[ResourceBudget] = None,
+                  output_key: Optional[str] = None, share_document: bool = False) -> Dict[str, Any]:
+    """
+    工作进程中的一次调用：解析后若没有待OCR的图像，直接分块并序列化
+    有图像时返回未分块的文档和图像，由主进程异步OCR后再提交分块任务
+    :param share_document: 为True时文档正文放入共享内存，只返回句柄（'shared'），
+                           主进程不需要反序列化正文，再次提交分块任务时也不需要序列化；
+                           共享内存的所有权交给调用方，由调用方在分块完成后释放
+    """
+    stage_start = time.perf_counter()
+    document, images = parse_stage(file_path, source_path, defer_ocr=True, budget=budget)
+    parse_seconds = time.perf_counter() - stage_start
+    if images:
+        if share_document:
+            shared = SharedDocument(document)
+            shared.close()
+            return {'shared': shared.handle, 'images': images, 'timings': {'parse': parse_seconds}}
+        return {'document': document, 'images': images, 'timings': {'parse': parse_seconds}}
+    result = chunk_serialize_stage(document, index, chunking_strategy, chunking_kwargs, output_key)
+    result['timings']['parse'] = parse_seconds
+    return result
+
+def write_payload(output_dir: str, file_name: str, payload: bytes, header: Optional[Dict[str, Any]] = None) -> str:
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    file_path = output_path / file_name
+    # 先写临时文件再替换，中途被终止时不会留下不完整的结果
+    tmp_path = file_path.with_suffix('.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, file_path)
+    if header is not None:
+        JSONFileHandler.write_sidecar(str(file_path), header)
+    return str(file_path)
+
+def ocr_image_sync(image: bytes, config: str = DEFAULT_TESSERACT_CONFIG,
+                   timeout: float = DEFAULT_OCR_TIMEOUT) -> str:
+    from PIL import Image
+    from io import BytesIO
+    # 超时后pytesseract终止tesseract进程并抛出RuntimeError，记为该图像的识别错误
+    return pytesseract.image_to_string(Image.open(BytesIO(image)), config=config, timeout=timeout)
+
+def _summarize(results: List[Dict[str, Any]], elapsed: float, mode: str) -> Dict[str, Any]:
+    stage_totals: Dict[str, float] = {}
+    for result in results:
+        for stage, seconds in result.get('timings', {}).items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+    succeeded = sum(1 for result in results if result['status'] == 'done')
+    skipped = sum(1 for result in results if result['status'] == 'skipped')
+    # 速率只计算本次实际处理（完成或失败）的文件
+    processed = len(results) - skipped
+    return {
+        'mode': mode,
+        'files': len(results),
+        'succeeded': succeeded,
+        'skipped': skipped,
+        'failed': processed - succeeded,
+        'elapsed': elapsed,
+        'files_per_second': processed / elapsed if elapsed else 0.0,
+        'stage_seconds': stage_totals,
+        'results': results
+    }
+
+class RunTracker:
+    """
+    把每个文件的阶段、结果和重试安排记入台账
+    未启用台账时只在内存中统计尝试次数，失败重试仍然生效
+    """
+    def __init__(self, ledger: Optional[JobLedger], config: Dict[str, Any], file_paths: List[str],
+                 max_retries: int = 0, retry_backoff: float = DEFAULT_RETRY_BACKOFF, retry_failed: bool = False):
+        self.ledger = ledger
+        self.config_hash = config_fingerprint(config)
+        self.max_attempts = max_retries + 1
+        self.retry_backoff = retry_backoff
+        self.attempts: Dict[str, int] = {}
+        self.run_id = ledger.start_run(config, file_paths, retry_failed=retry_failed) if ledger else None
+
+    @property
+    def needs_hash(self) -> bool:
+        return self.ledger is not None
+
+    def output_key(self, file_path: str) -> Optional[str]:
+        """使用台账时输出文件名中的固定部分，未使用台账时为None（文件名带时间戳）"""
+        if self.ledger is None:
+            return None
+        return hashlib.sha256(file_path.encode()).hexdigest()[:16]
+
+    def retry_delay(self, file_path: str) -> float:
+        """上次运行中失败的文件需等到退避时间之后再处理"""
+        return self.ledger.retry_delay(file_path, self.config_hash) if self.ledger else 0.0
+
+    def check(self, file_path: str, content_hash: Optional[str]) -> Optional[Dict[str, Any]]:
+        """已完成或已用完重试次数的文件直接返回结果，需要处理时返回None"""
+        if self.ledger is None:
+            return None
+        action, row = self.ledger.check(file_path, self.config_hash, content_hash, self.max_attempts)
+        if action == 'skip':
+            return {'file': file_path, 'status': 'skipped', 'output_path': row['output_path'], 'timings': {}}
+        if action == 'exhausted':
+            return {'file': file_path, 'status': 'failed', 'error': row['error'], 'attempts': row['attempts'],
+                    'retries_exhausted': True, 'timings': {}}
+        return None
+
+    def stage(self, file_path: str, stage: str, content_hash: Optional[str] = None):
+        if self.ledger is not None:
+            self.ledger.mark_stage(file_path, self.config_hash, stage, content_hash=content_hash, run_id=self.run_id)
+
+    def done(self, file_path: str, output_path: str, timings: Dict[str, float]):
+        if self.ledger is None:
+            return
+        previous = self.ledger.mark_done(file_path, self.config_hash, output_path, timings)
+        # 文件内容改变后重新处理，删除旧的结果，避免输出目录中出现同一文件的多份结果
+        if previous and Path(previous).exists():
+            os.remove(previous)
+
+    def failed(self, file_path: str, error: str) -> Optional[float]:
+        """
+        记录一次失败
+        :return: 距下次重试的等待秒数；已用完重试次数时返回None
+        """
+        if self.ledger is not None:
+            attempts = self.ledger.mark_failed(file_path, self.config_hash, error, self.retry_backoff)
+        else:
+            attempts = self.attempts.get(file_path, 0) + 1
+            self.attempts[file_path] = attempts
+        if attempts >= self.max_attempts:
+            return None
+        return self.retry_backoff * 2 ** (attempts - 1)
+
+    def finish(self):
+        if self.ledger is not None:
+            self.ledger.finish_run(self.run_id)
+
+def _process_file_sync(file_path: str, index: int, output_dir: str, chunking_strategy: str,
+                       tesseract_config: str, budget: Optional[ResourceBudget], ocr_timeout: float,
+                       tracker: RunTracker, chunking_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    result: Dict[str, Any] = {'file': file_path, 'timings': {}}
+    try:
+        content_hash = file_content_hash(file_path) if tracker.needs_hash else None
+        finished = tracker.check(file_path, content_hash)
+        if finished is not None:
+            return finished
+        tracker.stage(file_path, 'parse', content_hash)
+        output_key = tracker.output_key(file_path)
+        staged = process_stage(file_path, file_path, index, chunking_strategy, chunking_kwargs, budget, output_key)
+        if 'images' in staged:
+            tracker.stage(file_path, 'ocr')
+            stage_start = time.perf_counter()
+            ocr_results = []
+            for image in staged['images']:
+                try:
+                    ocr_results.append(ocr_image_sync(image, tesseract_config, ocr_timeout))
+                except Exception as e:
+                    ocr_results.append(e)
+            document = apply_ocr_results(staged['document'], ocr_results)
+            ocr_seconds = time.perf_counter() - stage_start
+            parse_timings = staged['timings']
+            tracker.stage(file_path, 'chunk')
+            staged = chunk_serialize_stage(document, index, chunking_strategy, chunking_kwargs, output_key)
+            staged['timings'].update(parse_timings, ocr=ocr_seconds)
+        result['timings'].update(staged['timings'])
+
+        tracker.stage(file_path, 'write')
+        stage_start = time.perf_counter()
+        result['output_path'] = write_payload(output_dir, staged['file_name'], staged['payload'], staged['header'])
+        result['timings']['write'] = time.perf_counter() - stage_start
+        tracker.done(file_path, result['output_path'], result['timings'])
+        result.update({'status': 'done', 'chunks': staged['chunks']})
+    except Exception as e:
+        logger.error(f"处理文件失败: {file_path}: {str(e)}")
+        result.update({'status': 'failed', 'error': str(e)})
+    return result
+
+def run_batch_sync(file_paths: List[str], output_dir: str, chunking_strategy: str = 'fixed_size',
+                   tesseract_config: str = DEFAULT_TESSERACT_CONFIG, budget: Optional[ResourceBudget] = None,
+                   ocr_timeout: float = DEFAULT_OCR_TIMEOUT, tracker: Optional[RunTracker] = None,
+                   **chunking_kwargs) -> Dict[str, Any]:
+    """逐个文件顺序执行 读取 -> 解析 -> OCR -> 分块 -> 写出，作为异步模式的对照"""
+    tracker = tracker or RunTracker(None, {}, file_paths)
+    start = time.perf_counter()
+    results = []
+    for index, file_path in enumerate(file_paths):
+        delay = tracker.retry_delay(file_path)
+        while True:
+            if delay:
+                time.sleep(delay)
+            result = _process_file_sync(file_path, index, output_dir, chunking_strategy, tesseract_config,
+                                        budget, ocr_timeout, tracker, chunking_kwargs)
+            if result['status'] != 'failed' or result.get('retries_exhausted'):
+                break
+            delay = tracker.failed(file_path, result['error'])
+            if delay is None:
+                break
+            logger.warning(f"{file_path} 将在 {delay:.1f}s 后重试")
+        results.append(result)
+    return _summarize(results, time.perf_counter() - start, 'sync')
+
+class AsyncBatchPipeline:
+    """
+    基于asyncio的批处理流水线
+    - 读取：后续文件的读取与当前文件的处理重叠（预读到系统缓存，或复制到本地暂存目录）
+    - OCR：以异步子进程调用tesseract，信号量限制并发数，单张图像超时后终止子进程
+    - 解析/分块：CPU密集部分在进程池中执行；需要OCR的文件在解析和分块之间经共享内存交接正文
+    - 写出：在线程中写JSON，不阻塞事件循环
+    同时在途的文件数为 workers + prefetch，保证进程池空闲时总有已读好的文件可用
+    设置budget后每个文件的解析在预算内进行，超时或超内存的文件降级处理，不会占住工作进程
+    失败的文件在退避等待后重试，等待期间不占用在途名额
+    """
+    def __init__(self, output_dir: str, chunking_strategy: str = 'fixed_size', workers: Optional[int] = None,
+                 prefetch: int = 4, ocr_concurrency: int = 2, write_concurrency: int = 4,
+                 spool_dir: Optional[str] = None, tesseract_config: str = DEFAULT_TESSERACT_CONFIG,
+                 budget: Optional[ResourceBudget] = None, ocr_timeout: float = DEFAULT_OCR_TIMEOUT,
+                 tracker: Optional[RunTracker] = None, **chunking_kwargs):
+        self.output_dir = output_dir
+        self.chunking_strategy = chunking_strategy
+        self.chunking_kwargs = chunking_kwargs
+        self.workers = workers or os.cpu_count() or 1
+        self.prefetch = prefetch
+        self.ocr_concurrency = ocr_concurrency
+        self.write_concurrency = write_concurrency
+        self.spool_dir = Path(spool_dir) if spool_dir else None
+        self.tesseract_config = tesseract_config
+        self.budget = budget
+        self.ocr_timeout = ocr_timeout
+        self.tracker = tracker
+
+    @staticmethod
+    def _warm_read(file_path: str) -> str:
+        """顺序读完整个文件，让后续解析命中系统页缓存；读取的同时计算内容哈希"""
+        hasher = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            while True:
+                block = f.read(READ_BLOCK_SIZE)
+                if not block:
+                    return hasher.hexdigest()
+                hasher.update(block)
+
+    def _spool(self, file_path: str, index: int) -> Tuple[str, str]:
+        """复制到本地暂存目录并计算内容哈希；保留扩展名以便加载器识别类型"""
+        target = self.spool_dir / f"{index:06d}_{Path(file_path).name}"
+        hasher = hashlib.sha256()
+        with open(file_path, 'rb') as source, open(target, 'wb') as destination:
+            while True:
+                block = source.read(READ_BLOCK_SIZE)
+                if not block:
+                    break
+                hasher.update(block)
+                destination.write(block)
+        return str(target), hasher.hexdigest()
+
+    async def _read(self, file_path: str, index: int) -> Tuple[str, str]:
+        if self.spool_dir is not None:
+            return await asyncio.to_thread(self._spool, file_path, index)
+        return file_path, await asyncio.to_thread(self._warm_read, file_path)
+
+    async def _ocr_image(self, image: bytes) -> Any:
+        """通过标准输入把图像交给tesseract子进程，结果从标准输出读取"""
+        async with self._ocr_semaphore:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    pytesseract.pytesseract.tesseract_cmd, 'stdin', 'stdout', *self.tesseract_config.split(),
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                try:
+                    stdout, stderr = await asyncio.wait_for(process.communicate(image), self.ocr_timeout)
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await process.wait()
+                    return RuntimeError(f'OCR超时 ({self.ocr_timeout}s)')
+                if process.returncode != 0:
+                    return RuntimeError(stderr.decode('utf-8', errors='replace').strip())
+                return stdout.decode('utf-8', errors='replace')
+            except Exception as e:
+                return e
+
+    async def _attempt(self, loop, executor, file_path: str, index: int) -> Dict[str, Any]:
+        result: Dict[str, Any] = {'file': file_path, 'timings': {}}
+        spooled = None
+        async with self._in_flight:
+            try:
+                stage_start = time.perf_counter()
+                local_path, content_hash = await self._read(file_path, index)
+                spooled = local_path if local_path != file_path else None
+                result['timings']['read'] = time.perf_counter() - stage_start
+                finished = self.tracker.check(file_path, content_hash)
+                if finished is not None:
+                    return finished
+
+                self.tracker.stage(file_path, 'parse', content_hash)
+                output_key = self.tracker.output_key(file_path)
+                staged = await loop.run_in_executor(
+                    executor, process_stage, local_path, file_path, index,
+                    self.chunking_strategy, self.chunking_kwargs, self.budget, output_key, True
+                )
+                if 'images' in staged:
+                    # 正文留在共享内存中，主进程只持有句柄，OCR结果交给分块任务追加
+                    handle = staged['shared']
+                    try:
+                        self.tracker.stage(file_path, 'ocr')
+                        stage_start = time.perf_counter()
+                        ocr_results = await asyncio.gather(*(self._ocr_image(image) for image in staged['images']))
+                        result['timings']['ocr'] = time.perf_counter() - stage_start
+                        result['timings'].update(staged['timings'])
+                        self.tracker.stage(file_path, 'chunk')
+                        staged = await loop.run_in_executor(
+                            executor, chunk_shared_stage, handle, list(ocr_results), index,
+                            self.chunking_strategy, self.chunking_kwargs, output_key
+                        )
+                    finally:
+                        unlink_shared_document(handle)
+                result['timings'].update(staged['timings'])
+
+                self.tracker.stage(file_path, 'write')
+                stage_start = time.perf_counter()
+                async with self._write_semaphore:
+                    result['output_path'] = await asyncio.to_thread(
+                        write_payload, self.output_dir, staged['file_name'], staged['payload'], staged['header']
+                    )
+                result['timings']['write'] = time.perf_counter() - stage_start
+                self.tracker.done(file_path, result['output_path'], result['timings'])
+                result.update({'status': 'done', 'chunks': staged['chunks']})
+            except Exception as e:
+                logger.error(f"处理文件失败: {file_path}: {str(e)}")
+                result.update({'status': 'failed', 'error': str(e)})
+            finally:
+                if spooled:
+                    await asyncio.to_thread(os.remove, spooled)
+        return result
+
+    async def _process_file(self, loop, executor, file_path: str, index: int) -> Dict[str, Any]:
+        delay = self.tracker.retry_delay(file_path)
+        while True:
+            if delay:
+                await asyncio.sleep(delay)
+            result = await self._attempt(loop, executor, file_path, index)
+            if result['status'] != 'failed' or result.get('retries_exhausted'):
+                return result
+            delay = self.tracker.failed(file_path, result['error'])
+            if delay is None:
+                return result
+            logger.warning(f"{file_path} 将在 {delay:.1f}s 后重试")
+
+    async def run_async(self, file_paths: List[str]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        if self.tracker is None:
+            self.tracker = RunTracker(None, {}, file_paths)
+        if self.spool_dir is not None:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._in_flight = asyncio.Semaphore(self.workers + self.prefetch)
+        self._ocr_semaphore = asyncio.Semaphore(self.ocr_concurrency)
+        self._write_semaphore = asyncio.Semaphore(self.write_concurrency)
+        loop = asyncio.get_running_loop()
+        # 工作进程创建、主进程释放的共享内存需登记在同一个resource_tracker中
+        ensure_resource_tracker()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            results = await asyncio.gather(*(
+                self._process_file(loop, executor, file_path, index)
+                for index, file_path in enumerate(file_paths)
+            ))
+        return _summarize(list(results), time.perf_counter() - start, 'async')
+
+    def run(self, file_paths: List[str]) -> Dict[str, Any]:
+        return asyncio.run(self.run_async(file_paths))
+
+def run_batch(inputs: Iterable[str], output_dir: str, mode: str = 'async', chunking_strategy: str = 'fixed_size',
+              workers: Optional[int] = None, prefetch: int = 4, ocr_concurrency: int = 2,
+              spool_dir: Optional[str] = None, tesseract_config: str = DEFAULT_TESSERACT_CONFIG,
+              budget: Optional[ResourceBudget] = None, ocr_timeout: float = DEFAULT_OCR_TIMEOUT,
+              ledger_path: Optional[str] = None, max_retries: int = 0,
+              retry_backoff: float = DEFAULT_RETRY_BACKOFF, retry_failed: bool = False,
+              **chunking_kwargs) -> Dict[str, Any]:
+    """
+    批量处理文件
+    :param inputs: 文件或目录
+    :param output_dir: 输出目录
+    :param mode: async（默认，读取/OCR/写出与计算重叠）或 sync（逐个顺序处理）
+    :param budget: 单个文件解析的时间/内存预算
+    :param ocr_timeout: 单张图像OCR超时（秒）
+    :param ledger_path: 任务台账路径；设置后跳过之前已完成且内容未变的文件，中断后可从断点继续
+    :param max_retries: 失败文件的最大重试次数（跨运行累计）
+    :param retry_backoff: 首次重试前的等待秒数，之后每次加倍
+    :param retry_failed: 清零之前已用完重试次数的失败文件
+    :return: 汇总结果，包含每个文件的状态和各阶段耗时
+    """
+    file_paths = [str(path) for path in iter_input_files(inputs)]
+    if mode not in ('async', 'sync'):
+        raise ValueError(f"Unsupported batch mode: {mode}")
+    # 影响输出内容的配置，任一项改变时所有文件重新处理
+    config = {'output_dir': str(Path(output_dir).resolve()), 'chunking_strategy': chunking_strategy,
+              'tesseract_config': tesseract_config, **chunking_kwargs}
+    ledger = JobLedger(ledger_path) if ledger_path else None
+    try:
+        tracker = RunTracker(ledger, config, file_paths, max_retries=max_retries,
+                             retry_backoff=retry_backoff, retry_failed=retry_failed)
+        if mode == 'sync':
+            summary = run_batch_sync(file_paths, output_dir, chunking_strategy, tesseract_config, budget=budget,
+                                     ocr_timeout=ocr_timeout, tracker=tracker, **chunking_kwargs)
+        else:
+            pipeline = AsyncBatchPipeline(
+                output_dir, chunking_strategy, workers=workers, prefetch=prefetch, ocr_concurrency=ocr_concurrency,
+                spool_dir=spool_dir, tesseract_config=tesseract_config, budget=budget, ocr_timeout=ocr_timeout,
+                tracker=tracker, **chunking_kwargs
+            )
+            summary = pipeline.run(file_paths)
+        tracker.finish()
+    finally:
+        if ledger is not None:
+            ledger.close()
+    if ledger_path:
+        summary['ledger'] = str(ledger_path)
+    return summary
@@ -0,0 +1,113 @@
+import time
+import logging
+from typing import Dict, Any, List, Optional, Tuple, Callable
+from src.loaders.loaders import load_file, detect_file_type
+from src.parsers.parsers import ParserFactory
+from src.utils.models import Document
+from src.utils.resource_limits import ResourceBudget, BudgetExceeded, StageError, run_with_budget
+from src.utils.shared_text import SharedDocument, SharedDocumentView, ensure_resource_tracker
+
+logger = logging.getLogger(__name__)
+
+# 与main.py process一致：PDF和Markdown走解析器，其他格式直接加载
+PARSED_EXTENSIONS = ['.pdf', '.md', '.markdown']
+
+# 默认的单阶段预算和单张图像OCR超时
+DEFAULT_TIME_BUDGET = 300
+DEFAULT_MEMORY_BUDGET_MB = 4096
+DEFAULT_OCR_TIMEOUT = 30
+
+def _parse(file_path: str, options: Dict[str, Any], **parser_kwargs) -> Tuple[Document, List[bytes]]:
+    parser = ParserFactory.get_parser(
+        file_path,
+        defer_ocr=options.get('defer_ocr', False),
+        ocr_timeout=options.get('ocr_timeout', DEFAULT_OCR_TIMEOUT),
+        **parser_kwargs
+    )
+    document = parser.parse()
+    return document, parser.pending_images
+
+def parse_hi_res(file_path: str, options: Dict[str, Any]) -> Tuple[Document, List[bytes]]:
+    """完整解析：版面分析、表格和图像OCR"""
+    return _parse(file_path, options, strategy='hi_res', extract_tables=True, extract_images=True)
+
+def parse_fast(file_path: str, options: Dict[str, Any]) -> Tuple[Document, List[bytes]]:
+    """降级解析：只取文本，跳过图像和表格"""
+    return _parse(file_path, options, strategy='fast', extract_tables=False,
+                  extract_images=False, process_images=False)
+
+def load_text(file_path: str, options: Dict[str, Any]) -> Tuple[Document, List[bytes]]:
+    """最低成本路径：用加载器直接读取文本层（PDF中没有文本层的页逐页回退到OCR）"""
+    if detect_file_type(file_path) == 'pdf':
+        return load_file(file_path, ocr_timeout=options.get('ocr_timeout', DEFAULT_OCR_TIMEOUT)), []
+    return load_file(file_path), []
+
+# 各文件类型（detect_file_type的结果）的处理路径，按成本从高到低排列，前一条超出预算或出错时尝试下一条
+FALLBACK_CHAINS: Dict[str, List[Tuple[str, Callable]]] = {
+    'pdf': [('hi_res', parse_hi_res), ('fast', parse_fast), ('text_layer', load_text)],
+    'md': [('parse', parse_hi_res), ('text', load_text)],
+}
+DEFAULT_CHAIN: List[Tuple[str, Callable]] = [('load', load_text)]
+
+def _shared_step(func: Callable, file_path: str, options: Dict[str, Any]) -> Tuple[Dict[str, Any], List[bytes]]:
+    """
+    在预算子进程中执行一条处理路径，正文放入共享内存，只把句柄传回父进程
+    共享内存的所有权交给父进程，由父进程读取后释放
+    """
+    document, images = func(file_path, options)
+    shared = SharedDocument(document)
+    shared.close()
+    return shared.handle, images
+
+def _run_step(func: Callable, file_path: str, options: Dict[str, Any],
+              budget: Optional[ResourceBudget]) -> Tuple[Document, List[bytes]]:
+    if budget is None or budget.unlimited:
+        return func(file_path, options)
+    ensure_resource_tracker()
+    handle, images = run_with_budget(_shared_step, (func, file_path, options), budget=budget)
+    view = SharedDocumentView(handle)
+    try:
+        document = view.document()
+    finally:
+        view.unlink()
+    return document, images
+
+def load_document_governed(file_path: str, budget: Optional[ResourceBudget] = None, defer_ocr: bool = False,
+                           ocr_timeout: float = DEFAULT_OCR_TIMEOUT) -> Tuple[Document, List[bytes]]:
+    """
+    在资源预算内加载/解析文件，失败时沿降级链改用更便宜的处理路径
+    每条路径在独立子进程中执行（budget为None时在当前进程执行），超时或内存超限时终止子进程
+    子进程通过共享内存交回正文，不经过管道序列化
+    :param file_path: 文件路径
+    :param budget: 每条路径的时间/内存预算
+    :param defer_ocr: 为True时不执行OCR，返回待识别的图像
+    :param ocr_timeout: 单张图像OCR超时（秒）
+    :return: (文档, 待OCR的图像)；文档metadata记录processing_path和degradations
+    """
+    # 按内容识别的文件类型选择降级链，扩展名错误的文件（如改名为.pdf的docx）不会走PDF解析
+    chain = FALLBACK_CHAINS.get(detect_file_type(file_path), DEFAULT_CHAIN)
+    options = {'defer_ocr': defer_ocr, 'ocr_timeout': ocr_timeout}
+    degradations: List[Dict[str, Any]] = []
+    for path_name, func in chain:
+        start = time.monotonic()
+        try:
+            document, images = _run_step(func, file_path, options, budget)
+        except BudgetExceeded as e:
+            degradations.append({'path': path_name, 'reason': e.kind, 'message': str(e),
+                                 'elapsed': round(e.elapsed, 3), 'peak_rss_mb': round(e.peak_rss_mb, 1)})
+        except (StageError, Exception) as e:
+            degradations.append({'path': path_name, 'reason': 'error', 'message': str(e),
+                                 'elapsed': round(time.monotonic() - start, 3)})
+        else:
+            if degradations:
+                logger.warning(f"{file_path} 已降级为 {path_name}: " +
+                               "; ".join(f"{item['path']} {item['reason']}" for item in degradations))
+            document.metadata.update({
+                'processing_path': path_name,
+                'degraded': bool(degradations),
+                'degradations': degradations,
+                'resource_budget': budget.to_dict() if budget else None
+            })
+            return document, images
+    raise RuntimeError(f"所有处理路径均失败: " +
+                       "; ".join(f"{item['path']}: {item['message']}" for item in degradations))
@@ -0,0 +1,252 @@
+import json
+import time
+import sqlite3
+import hashlib
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+# 计算内容哈希时每次读取的字节数
+HASH_BLOCK_SIZE = 1024 * 1024
+LEDGER_FILE_NAME = 'ledger.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    config_hash TEXT NOT NULL,
+    config TEXT NOT NULL,
+    total_files INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS files (
+    source_path TEXT NOT NULL,
+    config_hash TEXT NOT NULL,
+    content_hash TEXT,
+    status TEXT NOT NULL,
+    stage TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    output_path TEXT,
+    error TEXT,
+    timings TEXT,
+    elapsed REAL,
+    run_id INTEGER,
+    started_at REAL,
+    finished_at REAL,
+    next_attempt_at REAL,
+    PRIMARY KEY (source_path, config_hash)
+);
+CREATE INDEX IF NOT EXISTS files_status ON files (config_hash, status);
+"""
+
+def config_fingerprint(config: Dict[str, Any]) -> str:
+    """处理配置的指纹；配置改变后同一文件需要重新处理"""
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def file_content_hash(file_path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                return hasher.hexdigest()
+            hasher.update(block)
+
+class JobLedger:
+    """
+    批处理任务台账（SQLite）
+    记录每个输入文件的内容哈希、到达的阶段、尝试次数、输出位置和耗时
+    每次状态变化立即提交，进程中途被终止后，重新运行时跳过已完成的文件，从未完成的文件继续
+    """
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.row_factory = sqlite3.Row
+        # WAL模式下status命令可以在批处理运行时并发读取
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _get(self, source_path: str, config_hash: str) -> Optional[sqlite3.Row]:
+        return self.conn.execute('SELECT * FROM files WHERE source_path = ? AND config_hash = ?',
+                                 (source_path, config_hash)).fetchone()
+
+    def start_run(self, config: Dict[str, Any], file_paths: List[str], retry_failed: bool = False) -> int:
+        """
+        登记一次运行：新文件记为pending；上次中断时处于running的文件退回pending
+        :param retry_failed: 为True时清零已失败文件的尝试次数
+        """
+        config_hash = config_fingerprint(config)
+        now = time.time()
+        with self.conn:
+            cursor = self.conn.execute(
+                'INSERT INTO runs (config_hash, config, total_files, started_at) VALUES (?, ?, ?, ?)',
+                (config_hash, json.dumps(config, sort_keys=True, default=str), len(file_paths), now)
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO files (source_path, config_hash, status) VALUES (?, ?, 'pending')",
+                [(file_path, config_hash) for file_path in file_paths]
+            )
+            self.conn.execute("UPDATE files SET status = 'pending' WHERE config_hash = ? AND status = 'running'",
+                              (config_hash,))
+            if retry_failed:
+                self.conn.execute("UPDATE files SET status = 'pending', attempts = 0, next_attempt_at = NULL "
+                                  "WHERE config_hash = ? AND status = 'failed'", (config_hash,))
+        return cursor.lastrowid
+
+    def finish_run(self, run_id: int):
+        with self.conn:
+            self.conn.execute('UPDATE runs SET finished_at = ? WHERE run_id = ?', (time.time(), run_id))
+
+    def check(self, source_path: str, config_hash: str, content_hash: str,
+              max_attempts: int) -> Tuple[str, Optional[sqlite3.Row]]:
+        """
+        判断文件在本次运行中的处理方式
+        :return: ('skip', 记录) 已完成且内容未变；('exhausted', 记录) 已用完重试次数；('process', 记录或None)
+        """
+        row = self._get(source_path, config_hash)
+        if row is None or row['content_hash'] != content_hash:
+            return 'process', row
+        if row['status'] == 'done' and row['output_path'] and Path(row['output_path']).exists():
+            return 'skip', row
+        if row['status'] == 'failed' and row['attempts'] >= max_attempts:
+            return 'exhausted', row
+        return 'process', row
+
+    def retry_delay(self, source_path: str, config_hash: str) -> float:
+        """距离下次允许重试还需等待的秒数"""
+        row = self._get(source_path, config_hash)
+        if row is None or row['next_attempt_at'] is None:
+            return 0.0
+        return max(row['next_attempt_at'] - time.time(), 0.0)
+
+    def mark_stage(self, source_path: str, config_hash: str, stage: str,
+                   content_hash: Optional[str] = None, run_id: Optional[int] = None):
+        """记录文件进入的阶段；内容哈希变化时重置尝试次数"""
+        now = time.time()
+        with self.conn:
+            row = self._get(source_path, config_hash)
+            if row is None:
+                self.conn.execute(
+                    "INSERT INTO files (source_path, config_hash, content_hash, status, stage, run_id, started_at) "
+                    "VALUES (?, ?, ?, 'running', ?, ?, ?)",
+                    (source_path, config_hash, content_hash, stage, run_id, now)
+                )
+                return
+            updates = {'status': 'running', 'stage': stage}
+            if content_hash is not None:
+                if content_hash != row['content_hash']:
+                    updates['attempts'] = 0
+                updates.update(content_hash=content_hash, run_id=run_id, started_at=now, error=None)
+            assignments = ', '.join(f'{column} = ?' for column in updates)
+            self.conn.execute(f'UPDATE files SET {assignments} WHERE source_path = ? AND config_hash = ?',
+                              (*updates.values(), source_path, config_hash))
+
+    def mark_done(self, source_path: str, config_hash: str, output_path: str,
+                  timings: Dict[str, float]) -> Optional[str]:
+        """
+        记录文件处理完成
+        :return: 该文件之前的输出路径（与本次不同时），由调用方删除旧结果
+        """
+        now = time.time()
+        row = self._get(source_path, config_hash)
+        with self.conn:
+            self.conn.execute(
+                "UPDATE files SET status = 'done', stage = 'done', output_path = ?, error = NULL, timings = ?, "
+                "elapsed = ? - started_at, finished_at = ?, attempts = attempts + 1, next_attempt_at = NULL "
+                "WHERE source_path = ? AND config_hash = ?",
+                (output_path, json.dumps(timings), now, now, source_path, config_hash)
+            )
+        previous = row['output_path'] if row is not None else None
+        return previous if previous and previous != output_path else None
+
+    def mark_failed(self, source_path: str, config_hash: str, error: str, retry_backoff: float) -> int:
+        """
+        记录一次失败，下次重试时间按指数退避：retry_backoff * 2^(attempts-1)
+        :return: 累计尝试次数
+        """
+        now = time.time()
+        row = self._get(source_path, config_hash)
+        attempts = (row['attempts'] if row is not None else 0) + 1
+        with self.conn:
+            self.conn.execute(
+                "UPDATE files SET status = 'failed', error = ?, attempts = ?, finished_at = ?, "
+                "elapsed = ? - started_at, next_attempt_at = ? WHERE source_path = ? AND config_hash = ?",
+                (error, attempts, now, now, now + retry_backoff * 2 ** (attempts - 1), source_path, config_hash)
+            )
+        return attempts
+
+    def latest_run(self) -> Optional[sqlite3.Row]:
+        return self.conn.execute('SELECT * FROM runs ORDER BY run_id DESC LIMIT 1').fetchone()
+
+    def status(self, max_failures: int = 20) -> Dict[str, Any]:
+        """
+        最近一次运行对应配置下的进度：各状态文件数、运行中文件所在阶段、处理速率和预计剩余时间
+        """
+        run = self.latest_run()
+        if run is None:
+            return {'runs': 0}
+        config_hash = run['config_hash']
+        counts = {row['status']: row['count'] for row in self.conn.execute(
+            'SELECT status, COUNT(*) AS count FROM files WHERE config_hash = ? GROUP BY status', (config_hash,))}
+        stages = {row['stage']: row['count'] for row in self.conn.execute(
+            "SELECT stage, COUNT(*) AS count FROM files WHERE config_hash = ? AND status = 'running' GROUP BY stage",
+            (config_hash,))}
+        # 本次运行中完成的文件数，用于估算速率（之前运行已完成、本次跳过的文件不计入）
+        finished_in_run, mean_elapsed = self.conn.execute(
+            "SELECT COUNT(*), AVG(elapsed) FROM files WHERE config_hash = ? AND status = 'done' AND run_id = ? "
+            "AND finished_at >= ?", (config_hash, run['run_id'], run['started_at'])
+        ).fetchone()
+        failures = [dict(row) for row in self.conn.execute(
+            "SELECT source_path, attempts, stage, error FROM files WHERE config_hash = ? AND status = 'failed' "
+            "ORDER BY finished_at DESC LIMIT ?", (config_hash, max_failures))]
+
+        end = run['finished_at'] or time.time()
+        run_elapsed = max(end - run['started_at'], 1e-9)
+        rate = finished_in_run / run_elapsed
+        remaining = counts.get('pending', 0) + counts.get('running', 0)
+        return {
+            'runs': run['run_id'],
+            'config': json.loads(run['config']),
+            'run_started_at': run['started_at'],
+            'run_finished': run['finished_at'] is not None,
+            'total_files': sum(counts.values()),
+            'counts': counts,
+            'running_stages': stages,
+            'finished_in_run': finished_in_run,
+            'mean_file_seconds': mean_elapsed or 0.0,
+            'files_per_second': rate,
+            'remaining': remaining,
+            'eta_seconds': remaining / rate if rate and remaining else (0.0 if not remaining else None),
+            'failures': failures
+        }
+
+def format_status(status: Dict[str, Any]) -> str:
+    if not status.get('runs'):
+        return "台账中没有运行记录"
+    counts = status['counts']
+    done = counts.get('done', 0)
+    total = status['total_files']
+    eta = status['eta_seconds']
+    lines = [
+        f"运行 #{status['runs']} ({'已结束' if status['run_finished'] else '进行中或已中断'}): "
+        f"完成 {done}/{total} ({done / total if total else 0:.1%}), 等待 {counts.get('pending', 0)}, "
+        f"处理中 {counts.get('running', 0)}, 失败 {counts.get('failed', 0)}",
+        f"速率: {status['files_per_second']:.2f} 文件/秒, 单文件平均 {status['mean_file_seconds']:.2f}s, "
+        f"预计剩余: {'未知' if eta is None else f'{eta:.0f}s'}"
+    ]
+    if status['running_stages']:
+        lines.append("处理中的阶段: " + ", ".join(f"{stage} {count}" for stage, count in status['running_stages'].items()))
+    for failure in status['failures']:
+        lines.append(f"失败: {failure['source_path']} (尝试 {failure['attempts']} 次, 阶段 {failure['stage']}): {failure['error']}")
+    return "\n".join(lines)
@@ -0,0 +1,100 @@
+import time
+import logging
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Iterator
+from src.chunkers.chunkers import chunk_document, chunk_text
+from src.utils.file_utils import JSONFileHandler
+from src.utils.models import Document
+from src.utils.resource_limits import ResourceBudget
+from src.utils.chunk_stats import annotate_chunk_stats, format_chunk_stats
+from src.pipeline.governance import load_document_governed, PARSED_EXTENSIONS, DEFAULT_OCR_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# 完整流程的阶段：(阶段名, 进度百分比, 说明)，阶段开始时通过on_progress通知调用方
+PROCESS_STAGES = [
+    ('load', 10, '解析/加载文件'),
+    ('chunk', 50, '分块处理'),
+    ('save', 80, '保存结果')
+]
+
+def chunk_events(document: Document, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """分块结果的流式记录（写盘前输出给Web端或服务客户端），limit限制条数"""
+    for index, chunk in enumerate(document.chunks):
+        if limit is not None and index >= limit:
+            break
+        yield {
+            'chunk_index': index,
+            'chunk_id': chunk.chunk_id,
+            'chunk_size': chunk.chunk_size,
+            'chunk_method': chunk.chunk_method,
+            'page_content': chunk_text(document, chunk)
+        }
+
+def process_file(file_path: str, output_dir: str, chunk_strategy: str = 'fixed_size', chunk_size: int = 1000,
+                 chunk_overlap: int = 200, budget: Optional[ResourceBudget] = None,
+                 ocr_timeout: float = DEFAULT_OCR_TIMEOUT,
+                 on_chunked: Optional[Callable[[Document], Optional[Document]]] = None,
+                 on_progress: Optional[Callable[[str, int, str], None]] = None) -> Dict[str, Any]:
+    """
+    完整流程：解析/加载 -> 分块 -> 保存（main.py process 和常驻服务共用）
+    :param on_chunked: 分块完成、写盘之前调用，可用于流式输出块或嵌入；返回新文档时以返回值为准
+    :param on_progress: 阶段开始时调用 (阶段名, 进度百分比, 说明)
+    :return: 输出路径、文档概要和各阶段耗时（秒）
+    """
+    stages = {name: (progress, label) for name, progress, label in PROCESS_STAGES}
+    timings: Dict[str, float] = {}
+
+    def enter(stage: str):
+        if on_progress:
+            on_progress(stage, *stages[stage])
+        return time.perf_counter()
+
+    logger.info(f"开始完整流程处理: {file_path}")
+    # 1. 解析文件（如果是PDF或Markdown），对于纯文本文件直接加载
+    # 超出预算或解析失败时依次降级（如PDF: hi_res -> fast -> 文本层）
+    parsed = Path(file_path).suffix.lower() in PARSED_EXTENSIONS
+    start = enter('load')
+    logger.info("步骤1/3: 解析文件..." if parsed else "步骤1/3: 加载文件...")
+    current_doc, _ = load_document_governed(file_path, budget=budget, ocr_timeout=ocr_timeout)
+    for degradation in current_doc.metadata.get('degradations', []):
+        logger.warning(f"处理路径 {degradation['path']} 未完成({degradation['reason']}): {degradation['message']}")
+    step_dir = "step1_parsed" if parsed else "step1_loaded"
+    step_path = JSONFileHandler.save_document(current_doc, f"{output_dir}/{step_dir}")
+    logger.info(f"{'解析' if parsed else '加载'}结果保存至: {step_path}（处理路径: {current_doc.metadata['processing_path']}）")
+    timings['load'] = time.perf_counter() - start
+
+    # 2. 分块处理
+    start = enter('chunk')
+    logger.info("步骤2/3: 分块处理...")
+    chunked_doc = chunk_document(current_doc, chunking_strategy=chunk_strategy,
+                                 chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    annotate_chunk_stats(chunked_doc)
+    timings['chunk'] = time.perf_counter() - start
+    if on_chunked:
+        chunked_doc = on_chunked(chunked_doc) or chunked_doc
+
+    start = enter('save')
+    chunked_path = JSONFileHandler.save_document(chunked_doc, f"{output_dir}/step2_chunked")
+    logger.info(f"分块结果保存至: {chunked_path}")
+
+    # 3. 最终输出
+    final_path = JSONFileHandler.save_document(chunked_doc, output_dir, prefix='final')
+    timings['save'] = time.perf_counter() - start
+    logger.info(f"完整流程完成！最终结果保存至: {final_path}")
+    logger.info(f"文档ID: {chunked_doc.document_id}")
+    logger.info(f"总块数: {len(chunked_doc.chunks)}")
+    logger.info(f"总字符数: {chunked_doc.total_size}")
+    logger.info(f"分块统计: {format_chunk_stats(chunked_doc.metadata['chunk_stats'])}")
+    return {
+        'output_dir': output_dir,
+        'step_path': step_path,
+        'chunked_path': chunked_path,
+        'final_path': final_path,
+        'document_id': chunked_doc.document_id,
+        'file_name': chunked_doc.file_name,
+        'total_chunks': len(chunked_doc.chunks),
+        'total_size': chunked_doc.total_size,
+        'processing_path': chunked_doc.metadata.get('processing_path'),
+        'timings': timings
+    }
@@ -0,0 +1,130 @@
+import time
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+import numpy as np
+
+# 优先级类别：interactive 为Web上传等有人等待结果的请求，bulk 为批量导入、回填
+PRIORITY_CLASSES = ('interactive', 'bulk')
+DEFAULT_PRIORITY = 'interactive'
+# 交互请求等待超过该秒数后按到达顺序优先，避免大文件一直被小文件插队
+INTERACTIVE_MAX_WAIT = 30.0
+# 每个类别保留最近多少次等待时间用于计算分位数
+WAIT_SAMPLES = 1024
+
+def default_class_limits(workers: int) -> Dict[str, int]:
+    """交互请求可以使用全部槽位；批量请求至少留出一个槽位给交互请求（只有一个槽位时共享）"""
+    return {'interactive': workers, 'bulk': max(1, workers - 1)}
+
+class _Ticket:
+    __slots__ = ('priority', 'size', 'seq', 'arrival', 'granted')
+
+    def __init__(self, priority: str, size: int, seq: int):
+        self.priority = priority
+        self.size = size
+        self.seq = seq
+        self.arrival = time.perf_counter()
+        self.granted = False
+
+class PriorityScheduler:
+    """
+    按优先级类别分配处理槽位
+    - 总槽位数为workers，每个类别另有并发上限，批量任务占满时交互任务仍有空闲槽位
+    - 有空闲槽位时先调度交互任务：小文件优先，等待超过interactive_max_wait的按到达顺序优先
+    - 批量任务按到达顺序调度
+    调用方在 with scheduler.slot(priority, size): 中执行处理，阻塞直到分到槽位
+    """
+    def __init__(self, workers: int, class_limits: Optional[Dict[str, int]] = None,
+                 interactive_max_wait: float = INTERACTIVE_MAX_WAIT):
+        self.workers = max(1, workers)
+        self.class_limits = {**default_class_limits(self.workers), **(class_limits or {})}
+        self.interactive_max_wait = interactive_max_wait
+        self._condition = threading.Condition()
+        self._seq = itertools.count()
+        self._interactive: List[_Ticket] = []
+        self._bulk: deque = deque()
+        self._running = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._completed = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._waits = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITY_CLASSES}
+
+    def _next_interactive(self, now: float) -> _Ticket:
+        oldest = min(self._interactive, key=lambda ticket: ticket.seq)
+        if now - oldest.arrival >= self.interactive_max_wait:
+            return oldest
+        return min(self._interactive, key=lambda ticket: (ticket.size, ticket.seq))
+
+    def _dispatch(self):
+        """在持有锁时调用：把空闲槽位分给排队中的任务"""
+        granted = False
+        now = time.perf_counter()
+        while sum(self._running.values()) < self.workers:
+            if self._interactive and self._running['interactive'] < self.class_limits['interactive']:
+                ticket = self._next_interactive(now)
+                self._interactive.remove(ticket)
+            elif self._bulk and self._running['bulk'] < self.class_limits['bulk']:
+                ticket = self._bulk.popleft()
+            else:
+                break
+            ticket.granted = True
+            self._running[ticket.priority] += 1
+            self._waits[ticket.priority].append(now - ticket.arrival)
+            granted = True
+        if granted:
+            self._condition.notify_all()
+
+    def acquire(self, priority: str = DEFAULT_PRIORITY, size: int = 0) -> _Ticket:
+        """排队等待槽位，返回的票据交给release归还"""
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unsupported priority: {priority}")
+        with self._condition:
+            ticket = _Ticket(priority, size, next(self._seq))
+            (self._interactive.append if priority == 'interactive' else self._bulk.append)(ticket)
+            try:
+                self._dispatch()
+                while not ticket.granted:
+                    self._condition.wait()
+            except BaseException:
+                # 等待中被中断：撤回排队
+                if not ticket.granted:
+                    (self._interactive if priority == 'interactive' else self._bulk).remove(ticket)
+                raise
+        return ticket
+
+    def release(self, ticket: _Ticket):
+        with self._condition:
+            self._running[ticket.priority] -= 1
+            self._completed[ticket.priority] += 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: str = DEFAULT_PRIORITY, size: int = 0):
+        """占用一个槽位执行处理，返回排队等待的秒数"""
+        ticket = self.acquire(priority, size)
+        try:
+            yield time.perf_counter() - ticket.arrival
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> Dict[str, Any]:
+        """各类别的并发上限、运行数、队列深度和最近的等待时间分位数（秒）"""
+        with self._condition:
+            now = time.perf_counter()
+            queued = {'interactive': list(self._interactive), 'bulk': list(self._bulk)}
+            classes = {}
+            for priority in PRIORITY_CLASSES:
+                waits = np.fromiter(self._waits[priority], dtype=np.float64)
+                p50, p95 = np.percentile(waits, [50, 95]).tolist() if len(waits) else (0.0, 0.0)
+                classes[priority] = {
+                    'limit': self.class_limits[priority],
+                    'running': self._running[priority],
+                    'queued': len(queued[priority]),
+                    'queued_bytes': sum(ticket.size for ticket in queued[priority]),
+                    'oldest_wait': max((now - ticket.arrival for ticket in queued[priority]), default=0.0),
+                    'completed': self._completed[priority],
+                    'wait_p50': p50,
+                    'wait_p95': p95,
+                    'wait_max': float(waits.max()) if len(waits) else 0.0
+                }
+            return {'workers': self.workers, 'running': sum(self._running.values()), 'classes': classes}
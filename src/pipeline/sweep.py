@@ -0,0 +1,122 @@
+import os
+import time
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional
+import numpy as np
+from src.chunkers.chunkers import chunk_document
+from src.utils.models import Document as RAGDocument
+from src.utils.shared_text import SharedDocument, SharedDocumentView, document_skeleton, rebuild_document
+from src.pipeline.governance import load_document_governed
+
+# 不使用chunk_size/chunk_overlap的策略，网格中只保留一个配置
+SIZE_INDEPENDENT_STRATEGIES = {'paragraph'}
+
+def load_source_document(file_path: str) -> RAGDocument:
+    """加载或解析一个输入文件（每个文件在一次参数扫描中只执行一次）"""
+    document, _ = load_document_governed(file_path)
+    return document
+
+def build_grid(strategies: List[str], chunk_sizes: List[int], chunk_overlaps: List[int]) -> List[Dict[str, Any]]:
+    """生成参数网格，跳过重叠不小于块大小的组合"""
+    grid = []
+    for strategy in strategies:
+        if strategy in SIZE_INDEPENDENT_STRATEGIES:
+            grid.append({'strategy': strategy, 'chunk_size': None, 'chunk_overlap': None})
+            continue
+        for chunk_size, chunk_overlap in itertools.product(chunk_sizes, chunk_overlaps):
+            if chunk_overlap < chunk_size:
+                grid.append({'strategy': strategy, 'chunk_size': chunk_size, 'chunk_overlap': chunk_overlap})
+    return grid
+
+def _run_config(text: str, skeleton: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+    kwargs = {key: config[key] for key in ('chunk_size', 'chunk_overlap') if config[key] is not None}
+    document = rebuild_document(text, skeleton)
+    start = time.perf_counter()
+    chunked = chunk_document(document, config['strategy'], **kwargs)
+    elapsed = time.perf_counter() - start
+    # 与分块统计一致：层级分块的父块不存文本，原子块（表格）不受分块参数影响，都不计入
+    return {
+        'lengths': [len(chunk.page_content) for chunk in chunked.chunks
+                    if not chunk.metadata.get('atomic') and chunk.metadata.get('is_leaf', True)],
+        'runtime': elapsed
+    }
+
+def _sweep_task(handle: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+    """进程池任务：从共享内存读取正文，按一个配置分块，只返回统计需要的块长度"""
+    with SharedDocumentView(handle) as view:
+        text = view.text()
+    return _run_config(text, handle['skeleton'], config)
+
+def summarize_config(config: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """汇总一个配置在所有文档上的结果"""
+    lengths = np.concatenate([np.asarray(result['lengths'], dtype=np.int64) for result in results]) \
+        if results else np.zeros(0, dtype=np.int64)
+    if lengths.size:
+        p50, p95 = np.percentile(lengths, [50, 95])
+        max_length = int(lengths.max())
+    else:
+        p50 = p95 = 0.0
+        max_length = 0
+    return {
+        **config,
+        'documents': len(results),
+        'total_chunks': int(lengths.size),
+        'p50': float(p50),
+        'p95': float(p95),
+        'max': max_length,
+        'runtime': sum(result['runtime'] for result in results)
+    }
+
+def run_sweep(file_paths: List[str], strategies: List[str], chunk_sizes: List[int], chunk_overlaps: List[int],
+              workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    参数扫描：每个文件只解析一次，正文放入共享内存，在进程池中按参数网格并行分块
+    :param file_paths: 输入文件
+    :param strategies: 分块策略列表
+    :param chunk_sizes: 块大小列表
+    :param chunk_overlaps: 块重叠列表
+    :param workers: 进程数，默认为CPU核数
+    :return: 每个配置的汇总结果
+    """
+    grid = build_grid(strategies, chunk_sizes, chunk_overlaps)
+    workers = workers or os.cpu_count() or 1
+    documents = [load_source_document(path) for path in file_paths]
+    results: Dict[int, List[Dict[str, Any]]] = {index: [] for index in range(len(grid))}
+
+    if workers <= 1:
+        for document in documents:
+            skeleton = document_skeleton(document)
+            for index, config in enumerate(grid):
+                results[index].append(_run_config(document.page_content, skeleton, config))
+        return [summarize_config(config, results[index]) for index, config in enumerate(grid)]
+
+    shared_documents = [SharedDocument(document) for document in documents]
+    try:
+        # 正文已在共享内存中，释放解析结果
+        del documents
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for shared in shared_documents:
+                for index, config in enumerate(grid):
+                    futures.append((index, executor.submit(_sweep_task, shared.handle, config)))
+            for index, future in futures:
+                results[index].append(future.result())
+    finally:
+        for shared in shared_documents:
+            shared.unlink()
+
+    return [summarize_config(config, results[index]) for index, config in enumerate(grid)]
+
+def format_sweep_table(summaries: List[Dict[str, Any]]) -> str:
+    """将扫描结果格式化为文本表格"""
+    header = f"{'strategy':<14}{'size':>8}{'overlap':>9}{'chunks':>10}{'p50':>10}{'p95':>10}{'max':>10}{'runtime(s)':>12}"
+    lines = [header, '-' * len(header)]
+    for summary in summaries:
+        size = summary['chunk_size'] if summary['chunk_size'] is not None else '-'
+        overlap = summary['chunk_overlap'] if summary['chunk_overlap'] is not None else '-'
+        lines.append(
+            f"{summary['strategy']:<14}{size:>8}{overlap:>9}{summary['total_chunks']:>10}"
+            f"{summary['p50']:>10.0f}{summary['p95']:>10.0f}{summary['max']:>10}{summary['runtime']:>12.3f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,183 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+import numpy as np
+from src.embeddings.embeddings import BaseEmbedder, embed_texts
+from src.retrieval.index import ExactIndex
+from src.retrieval.keyword import BM25Index
+from src.utils.cache_utils import TTLCache
+
+# 倒数排名融合的平滑常数：得分为 Σ 1/(RRF_K + 排名)
+RRF_K = 60
+# 每种检索取回的候选数，融合后再截取top_k
+DEFAULT_CANDIDATES = 50
+# 查询结果缓存的条目数和有效期（秒）
+QUERY_CACHE_SIZE = 1024
+QUERY_CACHE_TTL = 300
+SEARCH_MODES = ('hybrid', 'vector', 'keyword')
+
+def reciprocal_rank_fusion(rankings: Dict[str, Sequence[str]], k: int = RRF_K,
+                           weights: Optional[Dict[str, float]] = None) -> List[Tuple[str, float]]:
+    """
+    倒数排名融合：只用排名不用原始得分，BM25得分和余弦相似度不需要归一化到同一尺度
+    :param rankings: 检索方式 -> 按相关度排序的块ID列表
+    :return: [(块ID, 融合得分)]，按得分降序
+    """
+    scores: Dict[str, float] = {}
+    for name, ranking in rankings.items():
+        weight = (weights or {}).get(name, 1.0)
+        for rank, chunk_id in enumerate(ranking, 1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+class HybridSearcher:
+    """
+    关键词（BM25）与向量检索的混合检索
+    - 两种检索在线程中并发执行（矩阵运算和bincount执行时释放GIL），结果按倒数排名融合
+    - 查询结果缓存在带过期时间的LRU中，以索引的revision作为版本，索引增删后缓存整体失效，
+      关键词索引也在revision变化后的下一次查询时重建
+    """
+    def __init__(self, index: ExactIndex, embedder: BaseEmbedder, candidates: int = DEFAULT_CANDIDATES,
+                 cache_size: int = QUERY_CACHE_SIZE, cache_ttl: float = QUERY_CACHE_TTL, rrf_k: int = RRF_K):
+        self.index = index
+        self.embedder = embedder
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.cache = TTLCache(max_entries=cache_size, ttl=cache_ttl)
+        self._keyword: Optional[BM25Index] = None
+        self._keyword_revision: Optional[str] = None
+        self._keyword_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='hybrid')
+
+    def keyword_index(self) -> BM25Index:
+        with self._keyword_lock:
+            if self._keyword is None or self._keyword_revision != self.index.revision:
+                revision = self.index.revision
+                self._keyword = BM25Index.from_index(self.index)
+                self._keyword_revision = revision
+            return self._keyword
+
+    def _vector_search(self, query: str, limit: int, search_kwargs: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], float]:
+        start = time.perf_counter()
+        vectors, _ = embed_texts([query], self.embedder)
+        return self.index.search(vectors[0], limit, **search_kwargs), time.perf_counter() - start
+
+    def _keyword_search(self, query: str, limit: int) -> Tuple[List[Tuple[str, float]], float]:
+        start = time.perf_counter()
+        return self.keyword_index().search(query, limit), time.perf_counter() - start
+
+    def search(self, query: str, top_k: int = 5, mode: str = 'hybrid', **search_kwargs) -> List[Dict[str, Any]]:
+        """
+        检索
+        :param mode: hybrid（融合）、vector（仅向量）或 keyword（仅关键词）
+        :param search_kwargs: 传给向量索引的参数，如IVF的nprobe
+        :return: 结果列表，元素为 {'chunk_id', 'score'(融合得分), 'vector_rank', 'vector_score',
+                 'keyword_rank', 'keyword_score', **块记录}，未被某种检索召回时对应字段为None
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unsupported search mode: {mode}")
+        revision = self.index.revision
+        key = (query, top_k, mode, tuple(sorted(search_kwargs.items())))
+        hit, results = self.cache.get(key, fingerprint=revision)
+        if hit:
+            return results
+
+        limit = max(self.candidates, top_k)
+        vector_future, vector_hits = None, []
+        if mode != 'keyword':
+            try:
+                vector_future = self._executor.submit(self._vector_search, query, limit, search_kwargs)
+            except RuntimeError:
+                # 检索器已被关闭（如索引更新后被替换）时，进行中的请求在当前线程里完成向量检索
+                vector_hits = self._vector_search(query, limit, search_kwargs)[0]
+        keyword_hits = self._keyword_search(query, limit)[0] if mode != 'vector' else []
+        if vector_future:
+            vector_hits = vector_future.result()[0]
+
+        rankings = {'vector': [hit['chunk_id'] for hit in vector_hits],
+                    'keyword': [chunk_id for chunk_id, _ in keyword_hits]}
+        vector_info = {hit['chunk_id']: (rank, hit['score']) for rank, hit in enumerate(vector_hits, 1)}
+        keyword_info = {chunk_id: (rank, score) for rank, (chunk_id, score) in enumerate(keyword_hits, 1)}
+        results = []
+        for chunk_id, score in reciprocal_rank_fusion(rankings, k=self.rrf_k)[:top_k]:
+            record = self.index.get_record(chunk_id)
+            if record is None:
+                continue
+            vector_rank, vector_score = vector_info.get(chunk_id, (None, None))
+            keyword_rank, keyword_score = keyword_info.get(chunk_id, (None, None))
+            results.append({**record, 'chunk_id': chunk_id, 'score': score,
+                            'vector_rank': vector_rank, 'vector_score': vector_score,
+                            'keyword_rank': keyword_rank, 'keyword_score': keyword_score})
+        self.cache.put(key, results, fingerprint=revision)
+        return results
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+def run_query_load(searcher: HybridSearcher, queries: Sequence[str], requests: int = 1000,
+                   concurrency: int = 8, top_k: int = 5, mode: str = 'hybrid', seed: int = 0,
+                   **search_kwargs) -> Dict[str, Any]:
+    """
+    查询压测：concurrency个线程共发出requests个查询，查询文本从queries中随机抽取（重复查询会命中缓存）
+    :return: 吞吐量、延迟分位数（毫秒）、错误数和缓存命中率
+    """
+    rng = random.Random(seed)
+    plan = [rng.choice(list(queries)) for _ in range(requests)]
+    latencies = np.zeros(requests, dtype=np.float64)
+    errors: List[str] = []
+    cache_before = searcher.cache.stats()
+    cursor = iter(range(requests))
+    cursor_lock = threading.Lock()
+
+    def worker():
+        while True:
+            with cursor_lock:
+                position = next(cursor, None)
+            if position is None:
+                return
+            start = time.perf_counter()
+            try:
+                searcher.search(plan[position], top_k=top_k, mode=mode, **search_kwargs)
+            except Exception as e:
+                errors.append(str(e))
+            latencies[position] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    cache_after = searcher.cache.stats()
+    hits = cache_after['hits'] - cache_before['hits']
+    misses = cache_after['misses'] - cache_before['misses']
+    p50, p95, p99 = (np.percentile(latencies, [50, 95, 99]) * 1000).tolist() if requests else (0.0, 0.0, 0.0)
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'distinct_queries': len(set(plan)),
+        'elapsed': elapsed,
+        'throughput': requests / elapsed if elapsed else 0.0,
+        'p50_ms': p50,
+        'p95_ms': p95,
+        'p99_ms': p99,
+        'max_ms': float(latencies.max() * 1000) if requests else 0.0,
+        'errors': len(errors),
+        'cache_hit_rate': hits / (hits + misses) if hits + misses else 0.0
+    }
+
+def sample_queries(index: ExactIndex, count: int, seed: int = 0, length: int = 12) -> List[str]:
+    """从索引中的块文本随机截取片段作为压测查询"""
+    rng = random.Random(seed)
+    texts = [record.get('text', '') for row, record in enumerate(index.records)
+             if not index._deleted[row] and record.get('text')]
+    queries = []
+    for _ in range(count if texts else 0):
+        text = rng.choice(texts)
+        start = rng.randrange(max(1, len(text) - length))
+        queries.append(text[start:start + length].strip() or text[:length])
+    return queries
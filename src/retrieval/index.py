@@ -0,0 +1,430 @@
+import os
+import json
+import uuid
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Iterator
+import numpy as np
+from src.embeddings.vector_cache import VECTOR_DTYPE
+
+# 索引目录中的文件；均不使用.json扩展名，避免被输出目录下的文档遍历当作文档
+INDEX_META_FILE = 'index.meta'
+VECTOR_FILE = 'vectors.f16'
+RECORDS_FILE = 'records.jsonl'
+DELETED_FILE = 'deleted.npy'
+CENTROIDS_FILE = 'centroids.npy'
+ASSIGNMENTS_FILE = 'assignments.npy'
+
+# 精确检索每次转为float32参与矩阵乘法的行数，决定扫描时的额外内存
+DEFAULT_BLOCK_ROWS = 16384
+# 已删除行超过该比例时保存前压缩
+COMPACT_RATIO = 0.25
+DEFAULT_NPROBE = 8
+# 向量数少于该值时更新索引不训练IVF，查询为精确扫描
+MIN_TRAIN_ROWS = 1024
+KMEANS_ITERATIONS = 20
+KMEANS_SAMPLE = 65536
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """按行L2归一化，索引内统一用内积表示余弦相似度"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """每行保留得分最高的k个（未排序）"""
+    if scores.shape[1] <= k:
+        return scores, rows
+    keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(scores, keep, axis=1), np.take_along_axis(rows, keep, axis=1)
+
+def _write_atomic(path: Path, data: bytes):
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _save_npy(path: Path, array: np.ndarray):
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+class ExactIndex:
+    """
+    精确向量检索（余弦相似度）
+    向量归一化后以float16存储，保存后以内存映射方式打开；查询时按块转为float32与查询向量做矩阵乘法，
+    逐块保留前k个，扫描的额外内存只与块大小有关
+    按块ID增删：重复添加同一ID视为更新，删除只做标记，保存时已删除比例过高则压缩
+    """
+    index_type = 'exact'
+
+    def __init__(self, dimension: int, model: str = '', block_rows: int = DEFAULT_BLOCK_ROWS, **kwargs):
+        self.dimension = int(dimension)
+        self.model = model
+        self.block_rows = block_rows
+        self.ids: List[str] = []
+        self.records: List[Dict[str, Any]] = []
+        self.directory: Optional[Path] = None
+        self._positions: Dict[str, int] = {}
+        self._deleted = np.zeros(0, dtype=bool)
+        # 已保存部分（内存映射）和保存后新增的部分
+        self._stored: np.ndarray = np.zeros((0, self.dimension), dtype=VECTOR_DTYPE)
+        self._pending: List[np.ndarray] = []
+        self._pending_matrix: Optional[np.ndarray] = None
+        self._persisted_rows = 0
+        self._records_bytes = 0
+        # 内容版本号，每次增删或重新训练时更换并随索引保存，查询结果缓存据此失效
+        self.revision = uuid.uuid4().hex
+
+    def __len__(self) -> int:
+        """有效（未删除）的向量数"""
+        return len(self._positions)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._positions
+
+    @property
+    def rows(self) -> int:
+        """包括已删除行在内的总行数"""
+        return len(self.ids)
+
+    def get_record(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        position = self._positions.get(chunk_id)
+        return None if position is None else self.records[position]
+
+    def _pending_vectors(self) -> np.ndarray:
+        if self._pending_matrix is None:
+            self._pending_matrix = np.concatenate(self._pending) if self._pending else \
+                np.zeros((0, self.dimension), dtype=VECTOR_DTYPE)
+        return self._pending_matrix
+
+    def _take(self, rows: np.ndarray) -> np.ndarray:
+        """按行号取向量（float16），内存映射部分只读取被访问的行"""
+        stored_rows = self._stored.shape[0]
+        rows = np.asarray(rows, dtype=np.int64)
+        if rows.size and rows.max() < stored_rows:
+            return self._stored[rows]
+        result = np.empty((rows.size, self.dimension), dtype=VECTOR_DTYPE)
+        in_stored = rows < stored_rows
+        result[in_stored] = self._stored[rows[in_stored]]
+        result[~in_stored] = self._pending_vectors()[rows[~in_stored] - stored_rows]
+        return result
+
+    def _iter_blocks(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """按块遍历全部向量：(起始行号, float16块)"""
+        for matrix, offset in ((self._stored, 0), (self._pending_vectors(), self._stored.shape[0])):
+            for start in range(0, matrix.shape[0], self.block_rows):
+                yield offset + start, matrix[start:start + self.block_rows]
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray, records: Optional[Sequence[Dict[str, Any]]] = None):
+        """添加向量；ID已存在时旧向量标记删除后追加新向量"""
+        vectors = normalize(vectors)
+        if vectors.shape != (len(ids), self.dimension):
+            raise ValueError(f"向量形状 {vectors.shape} 与 ({len(ids)}, {self.dimension}) 不一致")
+        if len(set(ids)) != len(ids):
+            raise ValueError("同一批次中有重复的ID")
+        self.delete(ids)
+        start = self.rows
+        for offset, chunk_id in enumerate(ids):
+            self._positions[chunk_id] = start + offset
+        self.ids.extend(ids)
+        self.records.extend(dict(record) for record in (records or [{} for _ in ids]))
+        self._deleted = np.concatenate([self._deleted, np.zeros(len(ids), dtype=bool)])
+        self._pending.append(vectors.astype(VECTOR_DTYPE))
+        self._pending_matrix = None
+        self._on_add(start, vectors)
+        self.revision = uuid.uuid4().hex
+
+    def _on_add(self, start: int, vectors: np.ndarray):
+        pass
+
+    def delete(self, ids: Sequence[str]) -> int:
+        """按ID删除，返回实际删除的数量"""
+        deleted = 0
+        for chunk_id in ids:
+            position = self._positions.pop(chunk_id, None)
+            if position is not None:
+                self._deleted[position] = True
+                deleted += 1
+        if deleted:
+            self.revision = uuid.uuid4().hex
+        return deleted
+
+    def delete_document(self, document_id: str) -> int:
+        """删除某个文档的全部块（文档重新处理后块ID会变化，更新前先删除旧块）"""
+        return self.delete([chunk_id for chunk_id, position in self._positions.items()
+                            if self.records[position].get('document_id') == document_id])
+
+    def _scan(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        best_scores = np.empty((queries.shape[0], 0), dtype=np.float32)
+        best_rows = np.empty((queries.shape[0], 0), dtype=np.int64)
+        for start, block in self._iter_blocks():
+            scores = queries @ block.astype(np.float32).T
+            scores[:, self._deleted[start:start + block.shape[0]]] = -np.inf
+            rows = np.broadcast_to(np.arange(start, start + block.shape[0]), scores.shape)
+            best_scores, best_rows = _top_k(np.concatenate([best_scores, scores], axis=1),
+                                            np.concatenate([best_rows, rows], axis=1), top_k)
+        return best_scores, best_rows
+
+    def _search_rows(self, queries: np.ndarray, top_k: int, **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+        return self._scan(queries, top_k)
+
+    def search_batch(self, queries: np.ndarray, top_k: int = 10, **kwargs) -> List[List[Dict[str, Any]]]:
+        """
+        批量查询
+        :param queries: 形状为 (查询数, 维度) 的向量
+        :return: 每个查询的结果列表，按相似度降序，元素为 {'chunk_id', 'score', **记录}
+        """
+        queries = normalize(queries)
+        if queries.shape[1] != self.dimension:
+            raise ValueError(f"查询向量维度 {queries.shape[1]} 与索引维度 {self.dimension} 不一致")
+        if not len(self) or top_k <= 0:
+            return [[] for _ in range(queries.shape[0])]
+        scores, rows = self._search_rows(queries, top_k, **kwargs)
+        results = []
+        for query_scores, query_rows in zip(scores, rows):
+            order = np.argsort(-query_scores)
+            results.append([{**self.records[row], 'chunk_id': self.ids[row], 'score': float(score)}
+                            for score, row in zip(query_scores[order], query_rows[order]) if np.isfinite(score)])
+        return results
+
+    def search(self, query: np.ndarray, top_k: int = 10, **kwargs) -> List[Dict[str, Any]]:
+        return self.search_batch(np.asarray(query)[None, :] if np.ndim(query) == 1 else query, top_k, **kwargs)[0]
+
+    def compact(self):
+        """去掉已删除的行（全部有效向量读入内存，下次保存时整体重写）"""
+        live = np.flatnonzero(~self._deleted)
+        self._stored = np.ascontiguousarray(self._take(live))
+        self._pending, self._pending_matrix = [], None
+        self.ids = [self.ids[row] for row in live]
+        self.records = [self.records[row] for row in live]
+        self._positions = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self._deleted = np.zeros(len(self.ids), dtype=bool)
+        self._persisted_rows = 0
+        self._on_compact(live)
+
+    def _on_compact(self, live: np.ndarray):
+        pass
+
+    def _meta(self) -> Dict[str, Any]:
+        return {
+            'type': self.index_type,
+            'dimension': self.dimension,
+            'model': self.model,
+            'rows': self.rows,
+            'live': len(self),
+            'block_rows': self.block_rows,
+            'records_bytes': self._records_bytes,
+            'revision': self.revision
+        }
+
+    def save(self, directory: Optional[str] = None) -> str:
+        """
+        保存到目录；保存到原目录且文件完整时只追加新增的向量和记录
+        index.meta最后写入，保存中途中断时按旧的行数读取，多出的部分被忽略
+        """
+        directory = Path(directory or self.directory).resolve()
+        directory.mkdir(parents=True, exist_ok=True)
+        if self.rows and self._deleted.sum() > COMPACT_RATIO * self.rows:
+            self.compact()
+
+        vector_path = directory / VECTOR_FILE
+        records_path = directory / RECORDS_FILE
+        row_bytes = self.dimension * np.dtype(VECTOR_DTYPE).itemsize
+        append = directory == self.directory and self._persisted_rows > 0 and \
+            vector_path.exists() and vector_path.stat().st_size >= self._persisted_rows * row_bytes and \
+            records_path.exists() and records_path.stat().st_size >= self._records_bytes
+        first_new = self._persisted_rows if append else 0
+        new_records = ''.join(json.dumps(record, ensure_ascii=False) + '\n'
+                              for record in self._record_lines(first_new)).encode('utf-8')
+        if append:
+            # 截掉上次中断时多写的部分再追加
+            with open(vector_path, 'r+b') as f:
+                f.truncate(self._persisted_rows * row_bytes)
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(self._pending_vectors()).tobytes())
+            with open(records_path, 'r+b') as f:
+                f.truncate(self._records_bytes)
+                f.seek(0, os.SEEK_END)
+                f.write(new_records)
+            self._records_bytes += len(new_records)
+        else:
+            tmp_path = vector_path.with_name(VECTOR_FILE + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                for _, block in self._iter_blocks():
+                    f.write(np.ascontiguousarray(block).tobytes())
+            os.replace(tmp_path, vector_path)
+            _write_atomic(records_path, new_records)
+            self._records_bytes = len(new_records)
+
+        _save_npy(directory / DELETED_FILE, self._deleted)
+        self._save_extra(directory)
+        _write_atomic(directory / INDEX_META_FILE, json.dumps(self._meta(), ensure_ascii=False, indent=2).encode('utf-8'))
+
+        self.directory = directory
+        self._persisted_rows = self.rows
+        self._stored = np.memmap(vector_path, dtype=VECTOR_DTYPE, mode='r', shape=(self.rows, self.dimension)) \
+            if self.rows else np.zeros((0, self.dimension), dtype=VECTOR_DTYPE)
+        self._pending, self._pending_matrix = [], None
+        return str(directory)
+
+    def _record_lines(self, start: int) -> Iterator[Dict[str, Any]]:
+        for row in range(start, self.rows):
+            yield {'chunk_id': self.ids[row], **self.records[row]}
+
+    def _save_extra(self, directory: Path):
+        pass
+
+    def _load_extra(self, directory: Path, meta: Dict[str, Any]):
+        pass
+
+    @classmethod
+    def _from_meta(cls, meta: Dict[str, Any]) -> 'ExactIndex':
+        return cls(meta['dimension'], model=meta['model'], block_rows=meta.get('block_rows', DEFAULT_BLOCK_ROWS))
+
+    @classmethod
+    def load(cls, directory: str) -> 'ExactIndex':
+        directory = Path(directory).resolve()
+        with open(directory / INDEX_META_FILE, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        index = INDEX_TYPES[meta['type']]._from_meta(meta)
+        rows = meta['rows']
+        with open(directory / RECORDS_FILE, 'rb') as f:
+            lines = f.read(meta['records_bytes']).decode('utf-8').splitlines()[:rows]
+        for line in lines:
+            record = json.loads(line)
+            index.ids.append(record.pop('chunk_id'))
+            index.records.append(record)
+        index._deleted = np.load(directory / DELETED_FILE)[:rows].copy()
+        index._positions = {chunk_id: row for row, chunk_id in enumerate(index.ids) if not index._deleted[row]}
+        if rows:
+            index._stored = np.memmap(directory / VECTOR_FILE, dtype=VECTOR_DTYPE, mode='r',
+                                      shape=(rows, index.dimension))
+        index.directory = directory
+        index._persisted_rows = rows
+        index._records_bytes = meta['records_bytes']
+        index.revision = meta.get('revision', index.revision)
+        index._load_extra(directory, meta)
+        return index
+
+class IVFIndex(ExactIndex):
+    """
+    倒排文件（IVF）近似检索
+    用球面k-means把向量分到nlist个簇，查询时只扫描与查询最相近的nprobe个簇中的向量
+    训练后新增的向量直接归入最近的簇；向量数明显增长后应重新训练（train）
+    查询不会触发训练，未训练时退化为精确扫描
+    """
+    index_type = 'ivf'
+
+    def __init__(self, dimension: int, model: str = '', nlist: Optional[int] = None,
+                 nprobe: int = DEFAULT_NPROBE, **kwargs):
+        super().__init__(dimension, model=model, **kwargs)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_rows = 0
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._lists: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def train(self, sample_size: int = KMEANS_SAMPLE, iterations: int = KMEANS_ITERATIONS, seed: int = 0):
+        """在有效向量的样本上训练簇中心，并重新划分全部向量"""
+        live = np.flatnonzero(~self._deleted)
+        if not live.size:
+            return
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(live, min(sample_size, live.size), replace=False))
+        data = self._take(sample).astype(np.float32)
+        nlist = min(self.nlist or max(1, int(np.sqrt(live.size))), data.shape[0])
+        centroids = data[rng.choice(data.shape[0], nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, data)
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            # 空簇重新取一个随机样本作为中心
+            sums[empty] = data[rng.choice(data.shape[0], int(empty.sum()))]
+            centroids = normalize(sums)
+        self.centroids = centroids
+        self._assignments = np.concatenate([self._assign(block.astype(np.float32)) for _, block in self._iter_blocks()])
+        self._lists = None
+        self.trained_rows = live.size
+        self.revision = uuid.uuid4().hex
+
+    def _on_add(self, start: int, vectors: np.ndarray):
+        labels = self._assign(vectors) if self.trained else np.full(vectors.shape[0], -1, dtype=np.int32)
+        self._assignments = np.concatenate([self._assignments, labels])
+        self._lists = None
+
+    def _on_compact(self, live: np.ndarray):
+        self._assignments = self._assignments[live]
+        self._lists = None
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(按簇排序的行号, 每个簇在其中的起止位置)"""
+        if self._lists is None:
+            order = np.argsort(self._assignments, kind='stable')
+            offsets = np.searchsorted(self._assignments[order], np.arange(self.centroids.shape[0] + 1))
+            self._lists = (order, offsets)
+        return self._lists
+
+    def _search_rows(self, queries: np.ndarray, top_k: int, nprobe: Optional[int] = None,
+                     **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+        if not self.trained:
+            return self._scan(queries, top_k)
+        nprobe = min(nprobe or self.nprobe, self.centroids.shape[0])
+        order, offsets = self._inverted_lists()
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        all_scores = np.full((queries.shape[0], top_k), -np.inf, dtype=np.float32)
+        all_rows = np.zeros((queries.shape[0], top_k), dtype=np.int64)
+        for index, (query, probe) in enumerate(zip(queries, probes)):
+            candidates = np.concatenate([order[offsets[cluster]:offsets[cluster + 1]] for cluster in probe])
+            candidates = np.sort(candidates[~self._deleted[candidates]])
+            if not candidates.size:
+                continue
+            scores = self._take(candidates).astype(np.float32) @ query
+            scores, rows = _top_k(scores[None, :], candidates[None, :], top_k)
+            all_scores[index, :scores.shape[1]] = scores[0]
+            all_rows[index, :rows.shape[1]] = rows[0]
+        return all_scores, all_rows
+
+    def _meta(self) -> Dict[str, Any]:
+        return {**super()._meta(), 'nlist': self.nlist, 'nprobe': self.nprobe, 'trained_rows': self.trained_rows}
+
+    def _save_extra(self, directory: Path):
+        _save_npy(directory / ASSIGNMENTS_FILE, self._assignments)
+        if self.trained:
+            _save_npy(directory / CENTROIDS_FILE, self.centroids)
+
+    @classmethod
+    def _from_meta(cls, meta: Dict[str, Any]) -> 'IVFIndex':
+        return cls(meta['dimension'], model=meta['model'], nlist=meta.get('nlist'),
+                   nprobe=meta.get('nprobe', DEFAULT_NPROBE), block_rows=meta.get('block_rows', DEFAULT_BLOCK_ROWS))
+
+    def _load_extra(self, directory: Path, meta: Dict[str, Any]):
+        self._assignments = np.load(directory / ASSIGNMENTS_FILE)[:meta['rows']].copy()
+        self.trained_rows = meta.get('trained_rows', 0)
+        if self.trained_rows and (directory / CENTROIDS_FILE).exists():
+            self.centroids = np.load(directory / CENTROIDS_FILE)
+
+INDEX_TYPES = {'exact': ExactIndex, 'ivf': IVFIndex}
+
+def create_index(index_type: str, dimension: int, model: str = '', **kwargs) -> ExactIndex:
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unsupported index type: {index_type}")
+    return INDEX_TYPES[index_type](dimension, model=model, **kwargs)
+
+def load_index(directory: str) -> ExactIndex:
+    return ExactIndex.load(directory)
+
+def index_exists(directory: str) -> bool:
+    return (Path(directory) / INDEX_META_FILE).exists()
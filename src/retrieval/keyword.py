@@ -0,0 +1,99 @@
+from typing import Dict, Any, List, Sequence, Tuple
+import numpy as np
+from src.utils.text_detection import TOKEN_PATTERN, CJK_PATTERN
+
+# BM25参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def tokenize(text: str) -> List[str]:
+    """
+    关键词检索的词项：英文和数字按单词（小写），CJK连续片段按相邻二字切分，单个CJK字保留为单字
+    """
+    terms: List[str] = []
+    run: List[str] = []
+    end = -1
+    for match in list(TOKEN_PATTERN.finditer(text.lower())) + [None]:
+        token = match.group() if match else ''
+        # 标点或空白隔开的CJK字不组成二字词
+        if token and CJK_PATTERN.fullmatch(token) and (not run or match.start() == end):
+            run.append(token)
+            end = match.end()
+            continue
+        if len(run) == 1:
+            terms.append(run[0])
+        else:
+            terms.extend(first + second for first, second in zip(run, run[1:]))
+        run = []
+        if token and CJK_PATTERN.fullmatch(token):
+            run.append(token)
+            end = match.end()
+        elif token:
+            terms.append(token)
+    return terms
+
+class BM25Index:
+    """
+    内存中的BM25关键词索引
+    倒排表按词项连续存放（CSR格式：词项 -> 行号数组、词频数组），查询时只访问查询词项的倒排表，
+    用bincount累加各行得分
+    """
+    def __init__(self, ids: Sequence[str], texts: Sequence[str], k1: float = BM25_K1, b: float = BM25_B):
+        self.ids = list(ids)
+        self.k1 = k1
+        self.b = b
+        vocabulary: Dict[str, int] = {}
+        term_ids, rows, counts = [], [], []
+        lengths = np.zeros(len(self.ids), dtype=np.float32)
+        for row, text in enumerate(texts):
+            terms = tokenize(text or '')
+            lengths[row] = len(terms)
+            frequencies: Dict[int, int] = {}
+            for term in terms:
+                term_id = vocabulary.setdefault(term, len(vocabulary))
+                frequencies[term_id] = frequencies.get(term_id, 0) + 1
+            term_ids.extend(frequencies)
+            rows.extend([row] * len(frequencies))
+            counts.extend(frequencies.values())
+        self.vocabulary = vocabulary
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind='stable')
+        self._rows = np.asarray(rows, dtype=np.int64)[order]
+        self._counts = np.asarray(counts, dtype=np.float32)[order]
+        self._offsets = np.searchsorted(term_ids[order], np.arange(len(vocabulary) + 1))
+        document_frequency = np.diff(self._offsets).astype(np.float32)
+        count = max(len(self.ids), 1)
+        self._idf = np.log(1 + (count - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = float(lengths.mean()) if len(self.ids) else 0.0
+        self._norms = k1 * (1 - b + b * lengths / max(average_length, 1e-9))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_index(cls, index) -> 'BM25Index':
+        """由向量索引中未删除的块记录建立，两种检索覆盖相同的块"""
+        rows = [row for row in range(index.rows) if not index._deleted[row]]
+        return cls([index.ids[row] for row in rows], [index.records[row].get('text', '') for row in rows])
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        :return: [(块ID, BM25得分)]，按得分降序，只包含至少匹配一个词项的块
+        """
+        term_ids = sorted({self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary})
+        if not term_ids or top_k <= 0:
+            return []
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            rows, counts = self._rows[start:end], self._counts[start:end]
+            scores += np.bincount(rows, weights=self._idf[term_id] * counts * (self.k1 + 1) /
+                                  (counts + self._norms[rows]), minlength=len(self.ids)).astype(np.float32)
+        matched = np.flatnonzero(scores > 0)
+        if matched.size > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        matched = matched[np.argsort(-scores[matched], kind='stable')]
+        return [(self.ids[row], float(scores[row])) for row in matched]
+
+    def stats(self) -> Dict[str, Any]:
+        return {'chunks': len(self.ids), 'terms': len(self.vocabulary), 'postings': int(self._rows.size)}
@@ -0,0 +1,107 @@
+import logging
+from pathlib import Path
+from typing import Dict, Any, List, Iterable, Optional
+from src.utils.models import Document as RAGDocument
+from src.embeddings.embeddings import BaseEmbedder, EmbedderFactory, embed_texts
+from src.embeddings.vector_cache import EmbeddingCache
+from src.retrieval.index import ExactIndex, IVFIndex, create_index, load_index, index_exists, MIN_TRAIN_ROWS
+
+logger = logging.getLogger(__name__)
+
+# 向量数增长到上次训练时的该倍数后，更新索引时重新训练IVF
+RETRAIN_GROWTH = 2.0
+
+def chunk_record(document: RAGDocument, chunk_index: int) -> Dict[str, Any]:
+    """索引中随向量保存的块信息，查询结果直接返回，不需要再读取文档"""
+    chunk = document.chunks[chunk_index]
+    record = {
+        'document_id': document.document_id,
+        'file_name': document.file_name,
+        'file_path': document.file_path,
+        'chunk_index': chunk_index,
+        'text': chunk.page_content
+    }
+    # 带页边界表的文档（如PDF）记录块所在的起止页码
+    if chunk.metadata.get('page_start') is not None:
+        record['page_start'] = chunk.metadata['page_start']
+        record['page_end'] = chunk.metadata['page_end']
+    return record
+
+def _document_cache(document: RAGDocument, cache_dir: Optional[str],
+                    caches: Dict[str, EmbeddingCache]) -> Optional[EmbeddingCache]:
+    """文档对应的向量缓存：优先使用指定目录，否则使用嵌入时记录在元数据中的目录"""
+    info = document.metadata.get('embedding') or {}
+    if not info.get('model'):
+        return None
+    directory = cache_dir or (str(Path(info['cache_dir']).parent) if info.get('cache_dir') else None)
+    if directory is None:
+        return None
+    key = f"{directory}|{info['model']}"
+    if key not in caches:
+        caches[key] = EmbeddingCache(directory, info['model'])
+    return caches[key]
+
+def update_index(index_dir: str, documents: Iterable[RAGDocument], index_type: str = 'exact',
+                 cache_dir: Optional[str] = None, **index_kwargs) -> Dict[str, Any]:
+    """
+    把已嵌入文档的块加入索引（索引不存在时创建）
+    同一文档再次加入时先删除其旧块；向量从嵌入缓存读取，不重新嵌入
+    :param index_type: 新建索引的类型，exact或ivf；索引已存在时沿用原类型
+    :param cache_dir: 向量缓存目录，默认使用文档元数据中记录的目录
+    :return: 更新统计
+    """
+    index: Optional[ExactIndex] = load_index(index_dir) if index_exists(index_dir) else None
+    caches: Dict[str, EmbeddingCache] = {}
+    stats = {'documents': 0, 'added': 0, 'removed': 0, 'skipped_documents': 0, 'missing_vectors': 0}
+    for document in documents:
+        cache = _document_cache(document, cache_dir, caches)
+        if cache is None or cache.dimension is None:
+            logger.warning(f"文档未嵌入或找不到向量缓存，跳过: {document.file_name}")
+            stats['skipped_documents'] += 1
+            continue
+        if index is None:
+            index = create_index(index_type, cache.dimension, model=cache.model, **index_kwargs)
+        if cache.model != index.model:
+            logger.warning(f"文档嵌入模型 {cache.model} 与索引模型 {index.model} 不一致，跳过: {document.file_name}")
+            stats['skipped_documents'] += 1
+            continue
+
+        positions = [position for position, chunk in enumerate(document.chunks)
+                     if chunk.metadata.get('embedding_key')]
+        keys = [document.chunks[position].metadata['embedding_key'] for position in positions]
+        vectors, missing = cache.get_many(keys)
+        if missing:
+            stats['missing_vectors'] += len(missing)
+            missing_set = set(missing)
+            found = [i for i in range(len(keys)) if i not in missing_set]
+            positions = [positions[i] for i in found]
+            vectors = vectors[found]
+        stats['removed'] += index.delete_document(document.document_id)
+        if positions:
+            index.add([document.chunks[position].chunk_id for position in positions], vectors,
+                      [chunk_record(document, position) for position in positions])
+        stats['added'] += len(positions)
+        stats['documents'] += 1
+
+    if index is None:
+        raise ValueError("没有可加入索引的已嵌入文档")
+    if isinstance(index, IVFIndex) and len(index) >= MIN_TRAIN_ROWS and \
+            (not index.trained or len(index) >= RETRAIN_GROWTH * index.trained_rows):
+        index.train()
+    index.save(index_dir)
+    stats.update({'index_type': index.index_type, 'model': index.model, 'size': len(index),
+                  'index_dir': str(index.directory)})
+    return stats
+
+def embedder_for_index(index: ExactIndex, base_url: Optional[str] = None,
+                       api_key: Optional[str] = None) -> BaseEmbedder:
+    """与索引使用相同模型的嵌入器：hash-<维度>为本地嵌入，其他模型名走OpenAI兼容接口"""
+    if index.model.startswith('hash-'):
+        return EmbedderFactory.get_embedder('hash', dimension=int(index.model.split('-', 1)[1]))
+    return EmbedderFactory.get_embedder('openai', model=index.model, base_url=base_url, api_key=api_key)
+
+def query_index(index: ExactIndex, embedder: BaseEmbedder, queries: List[str], top_k: int = 5,
+                **search_kwargs) -> List[List[Dict[str, Any]]]:
+    """嵌入查询文本并检索；查询向量不写入缓存"""
+    vectors, _ = embed_texts(queries, embedder)
+    return index.search_batch(vectors, top_k=top_k, **search_kwargs)
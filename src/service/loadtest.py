@@ -0,0 +1,383 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import socket
+import tempfile
+import subprocess
+from collections import Counter
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from urllib import request as urllib_request, error as urllib_error
+from urllib.parse import quote
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+
+# 压测文档类型：名称 -> (扩展名, 大小)；文本按字符数，PDF按页数
+DOCUMENT_KINDS = {
+    'txt_small': ('txt', 2_000),
+    'txt_medium': ('txt', 20_000),
+    'txt_large': ('txt', 200_000),
+    'pdf_small': ('pdf', 5),
+    'pdf_large': ('pdf', 50),
+}
+# 默认文档组合（权重）
+DEFAULT_MIX = {'txt_small': 6, 'txt_medium': 3, 'pdf_small': 1}
+# 轮询任务状态的间隔（秒）
+DEFAULT_POLL_INTERVAL = 0.1
+# 单个文档从上传到处理完成的最长等待时间（秒）
+DEFAULT_JOB_TIMEOUT = 600
+# 每个HTTP请求的超时（秒）
+HTTP_TIMEOUT = 60
+# 压测涉及的接口，process 为上传后到任务完成的时间
+ENDPOINTS = ('upload', 'process', 'results', 'json')
+# 比较报告时列出的指标：(路径, 越大越好)
+COMPARE_METRICS = [
+    ('throughput', True),
+    ('error_rate', False),
+    ('endpoints.upload.p95_ms', False),
+    ('endpoints.process.p50_ms', False),
+    ('endpoints.process.p95_ms', False),
+    ('endpoints.process.p99_ms', False),
+    ('endpoints.results.p95_ms', False),
+    ('endpoints.json.p95_ms', False),
+]
+
+SENTENCES = [
+    "检索增强生成先把文档切分为合适大小的块，再为每个块计算向量。",
+    "分块过大时检索结果包含太多无关内容，过小时又会丢失上下文。",
+    "The service parses uploaded files, chunks them and stores the results as JSON.",
+    "Load testing measures how many concurrent uploads the server can sustain.",
+    "表格和图像需要额外的解析步骤，扫描件还需要OCR。",
+]
+
+def parse_mix(spec: Optional[str]) -> Dict[str, float]:
+    """解析 'txt_small=5,pdf_small=1' 形式的文档组合"""
+    if not spec:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in spec.split(','):
+        kind, _, weight = item.partition('=')
+        kind = kind.strip()
+        if kind not in DOCUMENT_KINDS:
+            raise ValueError(f"未知的文档类型: {kind}（可选: {', '.join(DOCUMENT_KINDS)}）")
+        mix[kind] = float(weight) if weight else 1.0
+    return mix
+
+def generate_text(chars: int, rng: random.Random) -> str:
+    paragraphs, size = [], 0
+    while size < chars:
+        paragraph = "".join(rng.choice(SENTENCES) for _ in range(rng.randint(2, 6)))
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)[:chars]
+
+def write_text_pdf(file_path: str, pages: List[List[str]]):
+    """生成每页若干行英文文本的简单PDF（只用标准字体，不依赖第三方库）"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        stream = "BT /F1 11 Tf 50 800 Td 14 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    content, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(content))
+        content += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+    xref = len(content)
+    content += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    content += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode('latin-1')
+    content += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1')
+    with open(file_path, 'wb') as f:
+        f.write(content)
+
+def generate_documents(directory: str, kinds: List[str], seed: int = 0) -> Dict[str, bytes]:
+    """每种文档类型生成一个样本，返回 类型 -> 文件内容"""
+    rng = random.Random(seed)
+    samples = {}
+    for kind in kinds:
+        extension, size = DOCUMENT_KINDS[kind]
+        path = os.path.join(directory, f"{kind}.{extension}")
+        if extension == 'pdf':
+            write_text_pdf(path, [[f"Page {page} line {line}. Load test document for chunking throughput."
+                                   for line in range(40)] for page in range(1, size + 1)])
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(generate_text(size, rng))
+        with open(path, 'rb') as f:
+            samples[kind] = f.read()
+    return samples
+
+def latency_summary(seconds: List[float], errors: int = 0) -> Dict[str, Any]:
+    """延迟分位数（毫秒）"""
+    if not seconds:
+        return {'count': 0, 'errors': errors, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    values = np.asarray(seconds) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]).tolist()
+    return {'count': len(seconds), 'errors': errors, 'mean_ms': float(values.mean()),
+            'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99, 'max_ms': float(values.max())}
+
+class LoadTestClient:
+    """只依赖标准库的HTTP客户端"""
+    def __init__(self, base_url: str, timeout: float = HTTP_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _send(self, req: urllib_request.Request) -> Tuple[int, Dict[str, Any]]:
+        try:
+            with urllib_request.urlopen(req, timeout=self.timeout) as response:
+                return response.status, json.loads(response.read() or b'{}')
+        except urllib_error.HTTPError as e:
+            try:
+                body = json.loads(e.read() or b'{}')
+            except ValueError:
+                body = {}
+            return e.code, body
+
+    def get(self, path: str) -> Tuple[int, Dict[str, Any]]:
+        return self._send(urllib_request.Request(self.base_url + path))
+
+    def upload(self, file_name: str, data: bytes, fields: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        boundary = uuid.uuid4().hex
+        parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8')
+                 for name, value in fields.items()]
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{file_name}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8') + data + b'\r\n')
+        parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+        req = urllib_request.Request(self.base_url + '/upload', data=b''.join(parts), method='POST',
+                                     headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        return self._send(req)
+
+def run_document(client: LoadTestClient, index: int, kind: str, data: bytes, fields: Dict[str, Any],
+                 poll_interval: float, job_timeout: float, fetch_results: bool = True) -> Dict[str, Any]:
+    """
+    一个文档的完整流程：上传 -> 轮询任务直到完成 -> 查询结果列表 -> 读取最终结果第一页
+    :return: {'kind', 'ok', 'error', 'latencies': 接口 -> 秒, 'timings': 服务端各阶段耗时, 'chunks'}
+    """
+    record: Dict[str, Any] = {'kind': kind, 'ok': False, 'error': None, 'failed_endpoint': None,
+                              'latencies': {}, 'timings': {}, 'chunks': 0}
+
+    def fail(endpoint: str, message: str) -> Dict[str, Any]:
+        record.update(error=message, failed_endpoint=endpoint)
+        return record
+
+    endpoint = 'upload'
+    try:
+        extension = DOCUMENT_KINDS[kind][0]
+        start = time.perf_counter()
+        status, body = client.upload(f"loadtest_{index:06d}_{uuid.uuid4().hex[:6]}.{extension}", data, fields)
+        record['latencies']['upload'] = time.perf_counter() - start
+        if status != 200 or not body.get('success'):
+            return fail(endpoint, f"HTTP {status}: {body.get('message', '')}")
+
+        endpoint = 'process'
+        job_id = body['job_id']
+        deadline = start + job_timeout
+        while True:
+            status, body = client.get(f'/jobs/{job_id}')
+            job = body.get('job') or {}
+            if status != 200 or job.get('status') in ('done', 'failed'):
+                break
+            if time.perf_counter() > deadline:
+                return fail(endpoint, f"任务超过 {job_timeout} 秒未完成")
+            time.sleep(poll_interval)
+        record['latencies']['process'] = time.perf_counter() - start
+        result = job.get('result') or {}
+        if status != 200 or job.get('status') != 'done':
+            return fail(endpoint, result.get('message') or f"HTTP {status}")
+        record['timings'] = result.get('timings') or {}
+        record['chunks'] = result.get('total_chunks') or 0
+
+        if fetch_results:
+            endpoint = 'results'
+            json_files = result.get('json_files') or []
+            if not json_files:
+                return fail(endpoint, "任务结果中没有JSON文件")
+            run_dir = json_files[0].replace('\\', '/').split('/', 1)[0]
+            start = time.perf_counter()
+            status, body = client.get(f'/results/{quote(run_dir)}')
+            record['latencies']['results'] = time.perf_counter() - start
+            if status != 200 or not body.get('json_files'):
+                return fail(endpoint, f"HTTP {status}: {body.get('message', '结果目录为空')}")
+
+            endpoint = 'json'
+            final = next((name for name in body['json_files'] if os.path.basename(name).startswith('final')),
+                         body['json_files'][-1])
+            start = time.perf_counter()
+            status, body = client.get(f"/json/{quote(final.replace(os.sep, '/'))}?offset=0&limit=50")
+            record['latencies']['json'] = time.perf_counter() - start
+            if status != 200 or not body.get('success'):
+                return fail(endpoint, f"HTTP {status}: {body.get('message', '')}")
+        record['ok'] = True
+    except (OSError, ValueError, KeyError) as e:
+        return fail(endpoint, f"{type(e).__name__}: {e}")
+    return record
+
+def summarize_records(records: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    succeeded = [record for record in records if record['ok']]
+    endpoints = {}
+    for endpoint in ENDPOINTS:
+        latencies = [record['latencies'][endpoint] for record in records if endpoint in record['latencies']
+                     and record['failed_endpoint'] != endpoint]
+        errors = sum(record['failed_endpoint'] == endpoint for record in records)
+        endpoints[endpoint] = latency_summary(latencies, errors)
+
+    stage_values: Dict[str, List[float]] = {}
+    for record in succeeded:
+        for stage, seconds in record['timings'].items():
+            stage_values.setdefault(stage, []).append(seconds)
+    server_stages = {stage: latency_summary(values) for stage, values in stage_values.items()}
+
+    by_kind = {}
+    for kind in sorted({record['kind'] for record in records}):
+        kind_records = [record for record in records if record['kind'] == kind]
+        summary = latency_summary([record['latencies']['process'] for record in kind_records
+                                   if record['ok']])
+        by_kind[kind] = {'requests': len(kind_records), 'failed': sum(not record['ok'] for record in kind_records),
+                         'process_p50_ms': summary['p50_ms'], 'process_p95_ms': summary['p95_ms']}
+
+    return {
+        'elapsed': elapsed,
+        'requests': len(records),
+        'succeeded': len(succeeded),
+        'failed': len(records) - len(succeeded),
+        'error_rate': (len(records) - len(succeeded)) / len(records) if records else 0.0,
+        'throughput': len(succeeded) / elapsed if elapsed else 0.0,
+        'chunks_per_second': sum(record['chunks'] for record in succeeded) / elapsed if elapsed else 0.0,
+        'errors': dict(Counter(f"{record['failed_endpoint']}: {record['error']}"
+                               for record in records if not record['ok']).most_common(10)),
+        'endpoints': endpoints,
+        'server_stages': server_stages,
+        'by_kind': by_kind
+    }
+
+def run_load_test(base_url: str, requests: int = 50, concurrency: int = 4, mix: Optional[Dict[str, float]] = None,
+                  chunk_type: str = 'fixed_size', chunk_size: int = 1000, overlap: int = 100,
+                  priority: str = 'interactive', seed: int = 0, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                  job_timeout: float = DEFAULT_JOB_TIMEOUT, fetch_results: bool = True,
+                  label: Optional[str] = None) -> Dict[str, Any]:
+    """
+    并发上传生成的文档并等待处理完成，统计各接口延迟、吞吐量、错误率和服务端各阶段耗时
+    :param concurrency: 同时在处理中的文档数（闭环：每个虚拟用户完成一个文档后才上传下一个）
+    :param mix: 文档类型 -> 权重，见 DOCUMENT_KINDS
+    :return: 可保存为JSON并与其他报告比较的压测报告
+    """
+    mix = mix or dict(DEFAULT_MIX)
+    rng = random.Random(seed)
+    kinds = list(mix)
+    schedule = rng.choices(kinds, weights=[mix[kind] for kind in kinds], k=requests)
+    fields = {'chunk_type': chunk_type, 'chunk_size': chunk_size, 'overlap': overlap, 'priority': priority}
+    client = LoadTestClient(base_url)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        samples = generate_documents(temp_dir, kinds, seed)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        records = list(executor.map(
+            lambda item: run_document(client, item[0], item[1], samples[item[1]], fields, poll_interval,
+                                      job_timeout, fetch_results),
+            enumerate(schedule)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'label': label or datetime.now().strftime('%Y%m%d_%H%M%S'),
+        'created_at': datetime.now().isoformat(),
+        'base_url': base_url,
+        'config': {'requests': requests, 'concurrency': concurrency, 'mix': mix, 'chunk_type': chunk_type,
+                   'chunk_size': chunk_size, 'overlap': overlap, 'priority': priority, 'seed': seed,
+                   'sample_bytes': {kind: len(data) for kind, data in samples.items()}},
+        **summarize_records(records, elapsed)
+    }
+
+def _metric(report: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = report
+    for key in path.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    比较两份压测报告的主要指标
+    :return: [{'metric', 'baseline', 'current', 'change'（相对变化）, 'better'}]
+    """
+    metrics = list(COMPARE_METRICS) + [(f'server_stages.{stage}.mean_ms', False)
+                                       for stage in sorted(set(baseline.get('server_stages', {}))
+                                                           | set(current.get('server_stages', {})))]
+    rows = []
+    for path, higher_is_better in metrics:
+        before, after = _metric(baseline, path), _metric(current, path)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else None
+        better = None if after == before else (after > before) == higher_is_better
+        rows.append({'metric': path, 'baseline': before, 'current': after, 'change': change, 'better': better})
+    return rows
+
+def format_report(report: Dict[str, Any]) -> str:
+    config = report['config']
+    lines = [
+        f"压测 {report['label']}: {report['requests']} 个文档, 并发 {config['concurrency']}, "
+        f"组合 {config['mix']}, 耗时 {report['elapsed']:.2f}s",
+        f"吞吐量 {report['throughput']:.2f} 文档/秒 ({report['chunks_per_second']:.1f} 块/秒), "
+        f"成功 {report['succeeded']}, 失败 {report['failed']}, 错误率 {report['error_rate']:.1%}",
+        f"{'接口':<10}{'次数':>8}{'错误':>6}{'p50(ms)':>11}{'p95(ms)':>11}{'p99(ms)':>11}{'max(ms)':>11}"
+    ]
+    for endpoint, summary in report['endpoints'].items():
+        lines.append(f"{endpoint:<12}{summary['count']:>8}{summary['errors']:>6}{summary['p50_ms']:>11.1f}"
+                     f"{summary['p95_ms']:>11.1f}{summary['p99_ms']:>11.1f}{summary['max_ms']:>11.1f}")
+    if report['server_stages']:
+        lines.append("服务端各阶段(ms) " + ", ".join(
+            f"{stage} 平均 {summary['mean_ms']:.1f}/p95 {summary['p95_ms']:.1f}"
+            for stage, summary in report['server_stages'].items()))
+    for kind, summary in report['by_kind'].items():
+        lines.append(f"  {kind:<12} {summary['requests']} 个, 失败 {summary['failed']}, "
+                     f"处理p50/p95 {summary['process_p50_ms']:.0f}/{summary['process_p95_ms']:.0f} ms")
+    for message, count in report['errors'].items():
+        lines.append(f"  错误 x{count}: {message}")
+    return "\n".join(lines)
+
+def format_comparison(rows: List[Dict[str, Any]], baseline_label: str, current_label: str) -> str:
+    lines = [f"{'指标':<34}{baseline_label:>18}{current_label:>18}{'变化':>10}"]
+    for row in rows:
+        change = f"{row['change']:+.1%}" if row['change'] is not None else '-'
+        mark = {True: ' ↑', False: ' ↓', None: ''}[row['better']]
+        lines.append(f"{row['metric']:<36}{row['baseline']:>18.2f}{row['current']:>18.2f}{change:>10}{mark}")
+    return "\n".join(lines)
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_local_server(port: int, workdir: str = '.', startup_timeout: float = 60.0) -> subprocess.Popen:
+    """在本机启动一个Web服务实例（非调试模式），等待其可以响应后返回进程"""
+    process = subprocess.Popen([sys.executable, 'app.py', '--port', str(port)], cwd=workdir,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    client = LoadTestClient(f'http://127.0.0.1:{port}', timeout=2)
+    deadline = time.time() + startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Web服务启动失败，返回码 {process.returncode}")
+        try:
+            client.get('/scheduler')
+            return process
+        except OSError:
+            time.sleep(0.2)
+    stop_local_server(process)
+    raise RuntimeError(f"Web服务在 {startup_timeout} 秒内没有响应")
+
+def stop_local_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
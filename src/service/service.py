@@ -0,0 +1,326 @@
+import os
+import json
+import time
+import socket
+import logging
+import tempfile
+import threading
+import socketserver
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable
+from src.utils.resource_limits import ResourceBudget
+from src.utils.shared_text import ensure_resource_tracker
+from src.pipeline.governance import DEFAULT_OCR_TIMEOUT
+from src.pipeline.process import process_file, chunk_events
+from src.pipeline.scheduler import PriorityScheduler, PRIORITY_CLASSES, DEFAULT_PRIORITY
+
+logger = logging.getLogger(__name__)
+
+# 常驻服务的Unix套接字路径，可通过环境变量RAG_CHUNK_SOCKET覆盖
+DEFAULT_SOCKET_PATH = os.environ.get('RAG_CHUNK_SOCKET', 'output/rag_chunk.sock')
+# 同时处理的文件数
+DEFAULT_WORKERS = os.cpu_count() or 1
+# 探测服务是否在线时的连接超时（秒）
+CONNECT_TIMEOUT = 2.0
+# 单条消息（一行JSON）的长度上限
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+# 预热使用的示例文本，中英文混合，覆盖各分块策略的分隔符
+WARMUP_TEXT = ("# 第一章 示例\n\n检索增强生成需要先把文档切分为合适大小的块。中文没有空格，依靠标点判断句子边界！\n\n"
+               "Dr. Smith reviewed the chunking results. Does it keep sentences intact?\n\n" * 8)
+
+class DaemonError(Exception):
+    """服务端返回的错误，或无法连接服务"""
+
+def send_message(stream, message: Dict[str, Any]):
+    """协议：每条消息为一行UTF-8 JSON"""
+    stream.write(json.dumps(message, ensure_ascii=False, default=str).encode('utf-8') + b'\n')
+    stream.flush()
+
+def read_message(stream) -> Optional[Dict[str, Any]]:
+    """读取一条消息，连接关闭时返回None"""
+    line = stream.readline(MAX_MESSAGE_BYTES + 1)
+    if not line:
+        return None
+    if len(line) > MAX_MESSAGE_BYTES:
+        raise DaemonError("消息超过长度上限")
+    return json.loads(line)
+
+def _timed(results: Dict[str, Any], name: str, func: Callable[[], Any]):
+    start = time.perf_counter()
+    try:
+        detail = func()
+        results[name] = {'ok': True, 'seconds': round(time.perf_counter() - start, 3)}
+        if detail:
+            results[name]['detail'] = detail
+    except Exception as e:
+        results[name] = {'ok': False, 'seconds': round(time.perf_counter() - start, 3), 'error': str(e)}
+
+def warmup() -> Dict[str, Any]:
+    """
+    预先导入并初始化各处理组件，之后的请求不再承担这部分开销
+    某个组件不可用（如未安装unstructured或tesseract）只记录错误，不影响其他组件和服务启动
+    :return: 组件 -> {'ok', 'seconds', 'error'/'detail'}
+    """
+    results: Dict[str, Any] = {}
+
+    def chunkers():
+        from src.loaders.loaders import load_file
+        from src.chunkers.chunkers import chunk_document
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sample = Path(temp_dir) / 'warmup.txt'
+            sample.write_text(WARMUP_TEXT, encoding='utf-8')
+            document = load_file(str(sample))
+            for strategy in ('fixed_size', 'sentence', 'paragraph', 'hierarchical'):
+                chunk_document(document, strategy, chunk_size=200, chunk_overlap=20)
+
+    def parsers():
+        import src.parsers.parsers  # noqa: F401
+        import unstructured.partition.auto  # noqa: F401
+
+    def layout_model():
+        # hi_res解析使用的版面分析模型，首次加载需要数秒
+        from unstructured_inference.models.base import get_model
+        get_model()
+
+    def tesseract():
+        import pytesseract
+        return str(pytesseract.get_tesseract_version())
+
+    _timed(results, 'chunkers', chunkers)
+    _timed(results, 'parsers', parsers)
+    _timed(results, 'layout_model', layout_model)
+    _timed(results, 'tesseract', tesseract)
+    return results
+
+class _RequestLogHandler(logging.Handler):
+    """把处理线程产生的日志转发给对应的客户端"""
+    def __init__(self, thread_id: int, send: Callable[[Dict[str, Any]], None]):
+        super().__init__(logging.INFO)
+        self.thread_id = thread_id
+        self.send = send
+
+    def emit(self, record: logging.LogRecord):
+        if record.thread == self.thread_id:
+            self.send({'event': 'log', 'level': record.levelname, 'message': record.getMessage()})
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class ProcessingDaemon:
+    """
+    常驻处理服务：启动时预热解析器和分块器，在Unix套接字上接收请求
+    协议为逐行JSON：客户端发送 {'id', 'method', 'params'}，服务端返回若干事件
+    （queued/progress/log/chunk），最后以 result 或 error 事件结束并关闭连接
+    方法：ping、process、shutdown
+    process请求按优先级类别（interactive/bulk）排队，见 PriorityScheduler
+    资源预算不为空时每个解析步骤在fork出的子进程中执行，子进程直接继承已加载的模块和模型
+    """
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, workers: int = DEFAULT_WORKERS,
+                 budget: Optional[ResourceBudget] = None, ocr_timeout: float = DEFAULT_OCR_TIMEOUT,
+                 warm: bool = True, class_limits: Optional[Dict[str, int]] = None):
+        self.socket_path = os.path.abspath(socket_path)
+        self.workers = max(1, workers)
+        self.budget = budget
+        self.ocr_timeout = ocr_timeout
+        self.warm = warm
+        self.warmup_results: Dict[str, Any] = {}
+        self.started_at = time.time()
+        self.stats = {'completed': 0, 'failed': 0}
+        self.scheduler = PriorityScheduler(self.workers, class_limits)
+        self._stats_lock = threading.Lock()
+        self._server: Optional[_ThreadingUnixServer] = None
+        self.ready = threading.Event()
+
+    def _update(self, **deltas):
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                self.stats[key] += delta
+
+    def _prepare_socket(self):
+        """套接字文件已存在时：能连上说明已有服务在运行，否则是上次异常退出留下的，删除"""
+        if not os.path.exists(self.socket_path):
+            Path(self.socket_path).parent.mkdir(parents=True, exist_ok=True)
+            return
+        if daemon_available(self.socket_path):
+            raise DaemonError(f"服务已在运行: {self.socket_path}")
+        os.unlink(self.socket_path)
+
+    def start(self):
+        """预热并开始监听（不阻塞），之后调用serve_forever或在其他线程中运行"""
+        self._prepare_socket()
+        if self.warm:
+            self.warmup_results = warmup()
+        # 解析子进程在处理线程中fork，resource_tracker需先在主进程启动
+        ensure_resource_tracker()
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                daemon._handle_connection(self.rfile, self.wfile)
+
+        self._server = _ThreadingUnixServer(self.socket_path, Handler)
+        self.started_at = time.time()
+
+    def serve_forever(self):
+        if self._server is None:
+            self.start()
+        self.ready.set()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self):
+        if self._server is not None:
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def status(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {'pid': os.getpid(), 'socket': self.socket_path, 'workers': self.workers,
+                'uptime': time.time() - self.started_at, 'warmup': self.warmup_results,
+                'scheduler': self.scheduler.stats(), **stats}
+
+    def _handle_connection(self, rfile, wfile):
+        write_lock = threading.Lock()
+        connected = [True]
+
+        def send(message: Dict[str, Any]):
+            # 客户端断开后继续处理，结果照常写盘，只是不再发送事件
+            if not connected[0]:
+                return
+            with write_lock:
+                try:
+                    send_message(wfile, {'id': request_id, **message})
+                except OSError:
+                    connected[0] = False
+
+        request_id = None
+        try:
+            request = read_message(rfile)
+        except (ValueError, DaemonError) as e:
+            send({'event': 'error', 'message': f'无效的请求: {e}'})
+            return
+        if request is None:
+            return
+        request_id = request.get('id')
+        method = request.get('method')
+        try:
+            if method == 'ping':
+                send({'event': 'result', 'result': self.status()})
+            elif method == 'process':
+                send({'event': 'result', 'result': self._process(request.get('params') or {}, send)})
+            elif method == 'shutdown':
+                send({'event': 'result', 'result': {'stopping': True}})
+                self.shutdown()
+            else:
+                send({'event': 'error', 'message': f'未知的方法: {method}'})
+        except Exception as e:
+            logger.error(f"请求处理失败({method}): {e}", exc_info=True)
+            send({'event': 'error', 'message': str(e)})
+
+    def _process(self, params: Dict[str, Any], send: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        file_path = params.get('file_path')
+        if not file_path or not os.path.isfile(file_path):
+            raise DaemonError(f"文件不存在: {file_path}")
+        output_dir = params.get('output_dir') or 'output/full_process'
+        stream_chunks = params.get('stream_chunks', False)
+        chunk_limit = params.get('chunk_limit')
+        priority = params.get('priority') or DEFAULT_PRIORITY
+        if priority not in PRIORITY_CLASSES:
+            raise DaemonError(f"未知的优先级: {priority}")
+
+        queue = self.scheduler.stats()['classes'][priority]
+        send({'event': 'queued', 'priority': priority, 'queued': queue['queued'], 'running': queue['running']})
+        with self.scheduler.slot(priority, os.path.getsize(file_path)) as wait:
+            handler = _RequestLogHandler(threading.get_ident(), send)
+            logging.getLogger().addHandler(handler)
+            try:
+                def on_chunked(document):
+                    if stream_chunks:
+                        for record in chunk_events(document, chunk_limit):
+                            send({'event': 'chunk', 'chunk': record})
+                    return None
+
+                result = process_file(
+                    file_path, output_dir,
+                    chunk_strategy=params.get('chunk_strategy', 'fixed_size'),
+                    chunk_size=int(params.get('chunk_size', 1000)),
+                    chunk_overlap=int(params.get('chunk_overlap', 200)),
+                    budget=self.budget, ocr_timeout=self.ocr_timeout,
+                    on_chunked=on_chunked,
+                    on_progress=lambda stage, progress, label: send(
+                        {'event': 'progress', 'stage': stage, 'progress': progress, 'label': label})
+                )
+            except Exception:
+                self._update(failed=1)
+                raise
+            finally:
+                logging.getLogger().removeHandler(handler)
+        self._update(completed=1)
+        result['timings']['wait'] = wait
+        return result
+
+class DaemonClient:
+    """常驻服务的客户端：每个请求一个连接，逐条接收事件"""
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, timeout: Optional[float] = None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def call(self, method: str, params: Optional[Dict[str, Any]] = None,
+             on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+             connect_timeout: float = CONNECT_TIMEOUT) -> Dict[str, Any]:
+        """
+        发送请求并等待结束事件
+        :param on_event: 收到中间事件（queued/progress/log/chunk）时调用
+        :raises DaemonError: 无法连接、连接中断或服务端返回错误
+        :return: result事件中的结果
+        """
+        request_id = os.urandom(6).hex()
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(connect_timeout)
+            sock.connect(self.socket_path)
+            sock.settimeout(self.timeout)
+        except OSError as e:
+            sock.close()
+            raise DaemonError(f"无法连接服务 {self.socket_path}: {e}")
+        with sock, sock.makefile('rb') as rfile, sock.makefile('wb') as wfile:
+            send_message(wfile, {'id': request_id, 'method': method, 'params': params or {}})
+            while True:
+                try:
+                    message = read_message(rfile)
+                except (OSError, ValueError) as e:
+                    raise DaemonError(f"与服务的连接中断: {e}")
+                if message is None:
+                    raise DaemonError("服务在返回结果前关闭了连接")
+                if message.get('event') == 'result':
+                    return message['result']
+                if message.get('event') == 'error':
+                    raise DaemonError(message.get('message', '未知错误'))
+                if on_event:
+                    on_event(message)
+
+    def ping(self) -> Dict[str, Any]:
+        return self.call('ping')
+
+    def process(self, file_path: str, output_dir: str, on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+                **options) -> Dict[str, Any]:
+        """提交一个文件执行完整流程；路径转为绝对路径，服务的工作目录可以与客户端不同"""
+        params = {'file_path': os.path.abspath(file_path), 'output_dir': os.path.abspath(output_dir), **options}
+        return self.call('process', params, on_event=on_event)
+
+    def shutdown(self) -> Dict[str, Any]:
+        return self.call('shutdown')
+
+def daemon_available(socket_path: str = DEFAULT_SOCKET_PATH) -> bool:
+    """服务是否在线：套接字文件存在且能在短时间内响应ping"""
+    if not os.path.exists(socket_path):
+        return False
+    try:
+        DaemonClient(socket_path, timeout=CONNECT_TIMEOUT).ping()
+        return True
+    except DaemonError:
+        return False
@@ -0,0 +1,251 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+class LRUFileCache:
+    """
+    按文件缓存解析结果的LRU缓存
+    - 以文件大小作为权重，总量超过max_bytes时淘汰最久未使用的条目
+    - 每次读取都会校验文件的mtime和大小，文件被改写后自动失效
+    - on_evict 在缓存值被替换、淘汰或失效时调用（在锁外），用于释放值持有的资源
+    """
+    def __init__(self, loader: Callable[[str], Any], max_bytes: int = 256 * 1024 * 1024,
+                 on_evict: Optional[Callable[[Any], None]] = None):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, Tuple[Tuple[int, int], Any, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def file_signature(file_path: str) -> Tuple[int, int]:
+        stat = os.stat(file_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, file_path: str) -> Tuple[Any, Tuple[int, int]]:
+        """
+        读取文件对应的缓存值，未命中或已过期时调用loader重新加载
+        :param file_path: 文件路径
+        :return: (缓存值, 文件签名)
+        """
+        key = os.path.abspath(file_path)
+        signature = self.file_signature(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], signature
+
+        # 加载放在锁外，避免大文件阻塞其它请求
+        value = self.loader(key)
+        weight = signature[1]
+        evicted = []
+        with self._lock:
+            self.misses += 1
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[2]
+                evicted.append(old[1])
+            # 超过容量上限的单个文件不缓存
+            if weight <= self.max_bytes:
+                self._entries[key] = (signature, value, weight)
+                self.current_bytes += weight
+                while self.current_bytes > self.max_bytes:
+                    _, (_, evicted_value, evicted_weight) = self._entries.popitem(last=False)
+                    self.current_bytes -= evicted_weight
+                    evicted.append(evicted_value)
+        self._release(evicted)
+        return value, signature
+
+    def _release(self, values: List[Any]):
+        if self.on_evict is None:
+            return
+        for value in values:
+            self.on_evict(value)
+
+    def invalidate(self, file_path: Optional[str] = None):
+        with self._lock:
+            if file_path is None:
+                evicted = [entry[1] for entry in self._entries.values()]
+                self._entries.clear()
+                self.current_bytes = 0
+            else:
+                entry = self._entries.pop(os.path.abspath(file_path), None)
+                evicted = [entry[1]] if entry is not None else []
+                if entry is not None:
+                    self.current_bytes -= entry[2]
+        self._release(evicted)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'current_bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+class TTLCache:
+    """
+    带过期时间的LRU缓存（按条目数计容量）
+    - 条目超过ttl秒后视为未命中；总数超过max_entries时淘汰最久未使用的条目
+    - 可选的fingerprint标识缓存内容所依赖的数据版本，版本变化时整体清空
+    """
+    def __init__(self, max_entries: int = 1024, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._fingerprint: Any = None
+        self._entries: 'OrderedDict[Any, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_fingerprint(self, fingerprint: Any):
+        if fingerprint is not None and fingerprint != self._fingerprint:
+            self._entries.clear()
+            self._fingerprint = fingerprint
+
+    def get(self, key: Any, fingerprint: Any = None) -> Tuple[bool, Any]:
+        """
+        :return: (是否命中, 缓存值)
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key: Any, value: Any, fingerprint: Any = None):
+        """写入缓存；fingerprint与当前版本不一致时（计算期间数据已变化）不写入"""
+        with self._lock:
+            if fingerprint is not None and fingerprint != self._fingerprint:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+# 目录mtime距今超过该时间（纳秒）才认为扫描结果已确定
+DIRECTORY_SETTLE_NS = 1_000_000_000
+
+class ResultsIndex:
+    """
+    输出目录的内存索引：每次处理运行的根目录 -> JSON文件相对路径列表
+    处理完成时通过register登记新目录，查询时不再遍历整个输出目录
+    扫描时记录运行目录树中每个目录的mtime，查询时逐个stat校验；命令行、常驻服务或批处理
+    在register之外写入新文件（或删除文件）时目录mtime改变，下次查询自动重新扫描该运行
+    """
+    def __init__(self, output_folder: str):
+        self.output_folder = output_folder
+        self._runs: Dict[str, List[str]] = {}
+        self._signatures: Dict[str, Dict[str, int]] = {}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _scan(self, run_dir: str) -> Tuple[List[str], Dict[str, int]]:
+        """返回 (JSON文件列表, 目录 -> mtime_ns)"""
+        json_files, signature = [], {}
+        for root, dirs, files in os.walk(os.path.join(self.output_folder, run_dir)):
+            try:
+                mtime_ns = os.stat(root).st_mtime_ns
+            except OSError:
+                continue
+            # 刚改动过的目录可能在同一mtime精度内还会写入文件，记为未确认，下次查询时重新扫描
+            signature[root] = mtime_ns if time.time_ns() - mtime_ns > DIRECTORY_SETTLE_NS else -1
+            for file in files:
+                if file.endswith('.json'):
+                    json_files.append(os.path.relpath(os.path.join(root, file), self.output_folder))
+        return sorted(json_files), signature
+
+    @staticmethod
+    def _is_stale(signature: Dict[str, int]) -> bool:
+        for directory, mtime_ns in signature.items():
+            try:
+                if os.stat(directory).st_mtime_ns != mtime_ns:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    @staticmethod
+    def _run_root(relative_dir: str) -> str:
+        return relative_dir.replace('\\', '/').strip('/').split('/', 1)[0]
+
+    def register(self, output_dir: str) -> List[str]:
+        """
+        登记（或刷新）一个处理运行的输出目录
+        :param output_dir: 输出目录，可以是相对于输出根目录或包含输出根目录的路径
+        :return: 该运行下的JSON文件列表
+        """
+        if os.path.isabs(output_dir) or output_dir.startswith(self.output_folder + os.sep):
+            relative_dir = os.path.relpath(output_dir, self.output_folder)
+        else:
+            relative_dir = output_dir
+        run_root = self._run_root(relative_dir)
+        json_files, signature = self._scan(run_root)
+        with self._lock:
+            # 文件列表不变时版本号不变，ETag保持有效
+            if self._runs.get(run_root) != json_files:
+                self._versions[run_root] = self._versions.get(run_root, 0) + 1
+            self._runs[run_root] = json_files
+            self._signatures[run_root] = signature
+        return json_files
+
+    def list_files(self, output_dir: str) -> Tuple[Optional[List[str]], int]:
+        """
+        查询目录下的JSON文件
+        :param output_dir: 相对于输出根目录的路径
+        :return: (文件列表或None, 索引版本号)
+        """
+        relative_dir = output_dir.replace('\\', '/').strip('/')
+        run_root = self._run_root(relative_dir)
+        with self._lock:
+            json_files = self._runs.get(run_root)
+            signature = self._signatures.get(run_root, {})
+            version = self._versions.get(run_root, 0)
+        if json_files is None or self._is_stale(signature):
+            # 不是通过Web生成的目录（例如命令行输出）首次访问时登记；目录在登记后被改动时重新扫描
+            if not os.path.isdir(os.path.join(self.output_folder, run_root)):
+                with self._lock:
+                    self._runs.pop(run_root, None)
+                    self._signatures.pop(run_root, None)
+                return None, version
+            self.register(run_root)
+            with self._lock:
+                json_files = self._runs[run_root]
+                version = self._versions[run_root]
+
+        if relative_dir == run_root:
+            return json_files, version
+        if not os.path.isdir(os.path.join(self.output_folder, relative_dir)):
+            return None, version
+        prefix = relative_dir + '/'
+        return [path for path in json_files if path.replace('\\', '/').startswith(prefix)], version
@@ -0,0 +1,61 @@
+from collections import Counter
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Iterable, Iterator
+from src.utils.corpus import iter_document_paths
+from src.utils.file_utils import JSONFileHandler
+
+# 读取元数据的线程数（主要是小文件IO，没有sidecar的旧文档需要完整解析）
+CATALOG_WORKERS = 8
+
+def parse_date(value: Optional[str]) -> Optional[datetime]:
+    """解析 YYYY-MM-DD 或完整的ISO时间"""
+    return datetime.fromisoformat(value) if value else None
+
+def _read_entry(path: str, backfill: bool) -> Dict[str, Any]:
+    try:
+        return {'path': path, **JSONFileHandler.get_document_metadata(path, backfill=backfill)}
+    except (OSError, ValueError) as e:
+        return {'path': path, 'error': str(e)}
+
+def iter_catalog(inputs: Iterable[str], backfill: bool = False, prefix: Optional[str] = None,
+                 workers: int = CATALOG_WORKERS) -> Iterator[Dict[str, Any]]:
+    """
+    逐个返回输出文档的元数据（附带文件路径），顺序与文件路径顺序一致
+    有sidecar的文档只读取几百字节；无法读取的文件返回带error的条目
+    :param prefix: 只包含文件名以此开头的文档，如 final
+    :param backfill: 为没有sidecar的旧文档补写sidecar
+    """
+    paths = [str(path) for path in iter_document_paths(inputs) if not prefix or path.name.startswith(prefix)]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        yield from executor.map(lambda path: _read_entry(path, backfill), paths)
+
+def matches(entry: Dict[str, Any], file_type: Optional[str] = None, loader_used: Optional[str] = None,
+            since: Optional[datetime] = None, until: Optional[datetime] = None) -> bool:
+    """按文件类型、加载器和创建时间 [since, until) 过滤"""
+    if 'error' in entry:
+        return False
+    if file_type and (entry.get('file_type') or '').lower().lstrip('.') != file_type.lower().lstrip('.'):
+        return False
+    if loader_used and entry.get('loader_used') != loader_used:
+        return False
+    if since or until:
+        created_at = entry.get('created_at')
+        if not created_at:
+            return False
+        created_at = datetime.fromisoformat(created_at)
+        if (since and created_at < since) or (until and created_at >= until):
+            return False
+    return True
+
+def summarize_catalog(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """条目数、块数和字符数合计，以及按文件类型、加载器的计数"""
+    valid = [entry for entry in entries if 'error' not in entry]
+    return {
+        'documents': len(valid),
+        'errors': len(entries) - len(valid),
+        'total_chunks': sum(entry.get('total_chunks') or 0 for entry in valid),
+        'total_size': sum(entry.get('total_size') or 0 for entry in valid),
+        'file_types': dict(Counter(entry.get('file_type') for entry in valid).most_common()),
+        'loaders': dict(Counter(entry.get('loader_used') for entry in valid).most_common())
+    }
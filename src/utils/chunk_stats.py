@@ -0,0 +1,208 @@
+from typing import Dict, Any, List, Optional
+import numpy as np
+from src.utils.models import Document
+
+# 固定的块长度直方图分桶（字符数），各文档的直方图可以直接相加
+HISTOGRAM_EDGES = [0, 1, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192]
+# 去除空白后短于该长度的块视为过小
+DEFAULT_TINY_THRESHOLD = 32
+# 超过这些比例时给出告警
+TINY_RATIO_WARNING = 0.1
+DUPLICATE_RATIO_WARNING = 0.05
+DROPPED_RATIO_WARNING = 0.2
+
+def _histogram_labels() -> List[str]:
+    labels = [f"{low}-{high - 1}" for low, high in zip(HISTOGRAM_EDGES[:-1], HISTOGRAM_EDGES[1:])]
+    labels.append(f"{HISTOGRAM_EDGES[-1]}+")
+    return labels
+
+HISTOGRAM_LABELS = _histogram_labels()
+
+def locate_chunk_offsets(page_content: str, contents: List[str], chunk_overlap: int = 0) -> np.ndarray:
+    """
+    按顺序定位每个块在原文中的起始位置，找不到的块记为-1
+    下一块从上一块结尾减去重叠长度处开始查找（与LangChain的add_start_index一致），避免重复文本被定位到前面
+    """
+    offsets = np.full(len(contents), -1, dtype=np.int64)
+    cursor = 0
+    for i, content in enumerate(contents):
+        start = page_content.find(content, cursor) if content else -1
+        if start == -1:
+            # 重叠块可能从上一块内部开始，退回到文首重新查找一次
+            start = page_content.find(content) if content else -1
+        if start != -1:
+            offsets[i] = start
+            cursor = max(start + 1, start + len(content) - chunk_overlap)
+    return offsets
+
+def compute_chunk_stats(document: Document, tiny_threshold: int = DEFAULT_TINY_THRESHOLD) -> Dict[str, Any]:
+    """
+    计算文档分块质量统计：长度分布、直方图、实际重叠率、覆盖率、重复率、空块和过小块数量
+    每个块只在Python中取一次长度、哈希和位置，其余统计都在NumPy数组上完成
+    :param document: 已分块的文档
+    :param tiny_threshold: 过小块的长度阈值
+    :return: 统计结果字典
+    """
+    # 层级分块中的父块不存文本，只统计叶子块
+    text_chunks = [chunk for chunk in document.chunks
+                   if not chunk.metadata.get('atomic') and chunk.metadata.get('is_leaf', True)]
+    contents = [chunk.page_content for chunk in text_chunks]
+    count = len(contents)
+
+    lengths = np.fromiter((len(content) for content in contents), dtype=np.int64, count=count)
+    stripped = np.fromiter((len(content.strip()) for content in contents), dtype=np.int64, count=count)
+    hashes = np.fromiter((hash(content) for content in contents), dtype=np.int64, count=count)
+    chunk_overlap = max((chunk.chunk_overlap for chunk in text_chunks), default=0)
+    offsets = locate_chunk_offsets(document.page_content, contents, chunk_overlap)
+
+    histogram = np.bincount(np.searchsorted(HISTOGRAM_EDGES, lengths, side='right') - 1,
+                            minlength=len(HISTOGRAM_EDGES))
+    empty_chunks = int(np.count_nonzero(stripped == 0))
+    tiny_chunks = int(np.count_nonzero((stripped > 0) & (stripped < tiny_threshold)))
+    duplicate_chunks = count - int(np.unique(hashes).size) if count else 0
+
+    # 只用能在原文中定位到的块计算重叠和覆盖
+    located = offsets >= 0
+    starts = offsets[located]
+    ends = starts + lengths[located]
+    overlap_chars = 0
+    covered_chars = 0
+    if starts.size:
+        order = np.argsort(starts, kind='stable')
+        starts, ends = starts[order], ends[order]
+        # 截至前一块为止覆盖到的最远位置
+        reach = np.concatenate(([0], np.maximum.accumulate(ends)[:-1]))
+        new_start = np.maximum(starts, reach)
+        covered_chars = int(np.maximum(ends - new_start, 0).sum())
+        overlap_chars = int(np.maximum(np.minimum(reach, ends) - starts, 0).sum())
+
+    total_chars = int(lengths.sum())
+    source_chars = len(document.page_content)
+    stats: Dict[str, Any] = {
+        'chunk_count': count,
+        'atomic_chunks': sum(1 for chunk in document.chunks if chunk.metadata.get('atomic')),
+        'total_chars': total_chars,
+        'mean': float(lengths.mean()) if count else 0.0,
+        'std': float(lengths.std()) if count else 0.0,
+        'min': int(lengths.min()) if count else 0,
+        'p50': float(np.percentile(lengths, 50)) if count else 0.0,
+        'p95': float(np.percentile(lengths, 95)) if count else 0.0,
+        'max': int(lengths.max()) if count else 0,
+        'histogram': dict(zip(HISTOGRAM_LABELS, histogram.tolist())),
+        'empty_chunks': empty_chunks,
+        'tiny_chunks': tiny_chunks,
+        'tiny_threshold': tiny_threshold,
+        'duplicate_chunks': duplicate_chunks,
+        'duplicate_ratio': duplicate_chunks / count if count else 0.0,
+        'unlocated_chunks': int(count - np.count_nonzero(located)),
+        'overlap_chars': overlap_chars,
+        'overlap_ratio': overlap_chars / total_chars if total_chars else 0.0,
+        'coverage_ratio': covered_chars / source_chars if source_chars else 0.0,
+        'dropped_paragraphs': int(document.metadata.get('dropped_paragraphs', 0)),
+        'dropped_chars': int(document.metadata.get('dropped_chars', 0))
+    }
+    stats['warnings'] = _check_stats(stats, _configured_chunk_size(document))
+    return stats
+
+def _configured_chunk_size(document: Document) -> Optional[int]:
+    """从块元数据中取出分块时配置的chunk_size（按token计的块大小无法与字符长度比较，忽略）"""
+    for chunk in document.chunks:
+        params = chunk.metadata.get('chunking_params')
+        if isinstance(params, dict) and params.get('chunk_size') and params.get('unit', 'characters') == 'characters':
+            return int(params['chunk_size'])
+    return None
+
+def _check_stats(stats: Dict[str, Any], chunk_size: Optional[int] = None) -> List[str]:
+    """根据统计结果给出可能的分块配置问题"""
+    warnings = []
+    count = stats['chunk_count']
+    if count == 0:
+        return ['no_text_chunks']
+    if stats['empty_chunks']:
+        warnings.append('empty_chunks')
+    if (stats['tiny_chunks'] + stats['empty_chunks']) / count > TINY_RATIO_WARNING:
+        warnings.append('many_tiny_chunks')
+    if stats['duplicate_ratio'] > DUPLICATE_RATIO_WARNING:
+        warnings.append('many_duplicate_chunks')
+    if chunk_size and stats['max'] > chunk_size:
+        warnings.append('chunk_exceeds_chunk_size')
+    if stats['dropped_paragraphs'] / (count + stats['dropped_paragraphs']) > DROPPED_RATIO_WARNING:
+        warnings.append('many_dropped_paragraphs')
+    return warnings
+
+def annotate_chunk_stats(document: Document, tiny_threshold: int = DEFAULT_TINY_THRESHOLD) -> Dict[str, Any]:
+    """计算统计结果并写入document.metadata['chunk_stats']"""
+    stats = compute_chunk_stats(document, tiny_threshold=tiny_threshold)
+    document.metadata['chunk_stats'] = stats
+    return stats
+
+def format_chunk_stats(stats: Dict[str, Any]) -> str:
+    """单行摘要，用于日志输出"""
+    summary = (
+        f"块数: {stats['chunk_count']}, 长度p50/p95/max: {stats['p50']:.0f}/{stats['p95']:.0f}/{stats['max']}, "
+        f"重叠率: {stats['overlap_ratio']:.1%}, 覆盖率: {stats['coverage_ratio']:.1%}, "
+        f"重复率: {stats['duplicate_ratio']:.1%}, 空块: {stats['empty_chunks']}, 过小块: {stats['tiny_chunks']}, "
+        f"丢弃段落: {stats['dropped_paragraphs']}"
+    )
+    if stats.get('warnings'):
+        summary += f", 告警: {','.join(stats['warnings'])}"
+    return summary
+
+class ChunkStatsAggregator:
+    """
+    汇总一批文档的分块统计
+    只累加计数和直方图，不保留逐块数据，内存占用与文档数无关
+    """
+    def __init__(self):
+        self.documents = 0
+        self.histogram = np.zeros(len(HISTOGRAM_EDGES), dtype=np.int64)
+        self.totals = {key: 0 for key in (
+            'chunk_count', 'atomic_chunks', 'total_chars', 'empty_chunks', 'tiny_chunks',
+            'duplicate_chunks', 'overlap_chars', 'dropped_paragraphs', 'dropped_chars'
+        )}
+        self.max = 0
+        self.warning_counts: Dict[str, int] = {}
+        self.flagged_documents: List[str] = []
+        self.max_flagged = 100
+
+    def add(self, stats: Dict[str, Any], document_id: Optional[str] = None):
+        self.documents += 1
+        self.histogram += np.asarray([stats['histogram'].get(label, 0) for label in HISTOGRAM_LABELS],
+                                     dtype=np.int64)
+        for key in self.totals:
+            self.totals[key] += stats.get(key, 0)
+        self.max = max(self.max, stats['max'])
+        for warning in stats.get('warnings', []):
+            self.warning_counts[warning] = self.warning_counts.get(warning, 0) + 1
+        if stats.get('warnings') and document_id and len(self.flagged_documents) < self.max_flagged:
+            self.flagged_documents.append(document_id)
+
+    def _histogram_percentile(self, q: float) -> float:
+        """由合并后的直方图估算分位数（桶内线性插值）"""
+        total = int(self.histogram.sum())
+        if total == 0:
+            return 0.0
+        cumulative = np.cumsum(self.histogram)
+        index = int(np.searchsorted(cumulative, q * total, side='left'))
+        low = HISTOGRAM_EDGES[index]
+        high = HISTOGRAM_EDGES[index + 1] if index + 1 < len(HISTOGRAM_EDGES) else max(self.max, low)
+        before = cumulative[index - 1] if index > 0 else 0
+        fraction = (q * total - before) / self.histogram[index] if self.histogram[index] else 0.0
+        return float(low + (high - low) * fraction)
+
+    def summary(self) -> Dict[str, Any]:
+        count = self.totals['chunk_count']
+        total_chars = self.totals['total_chars']
+        return {
+            'documents': self.documents,
+            **self.totals,
+            'mean': total_chars / count if count else 0.0,
+            'p50_estimate': self._histogram_percentile(0.5),
+            'p95_estimate': self._histogram_percentile(0.95),
+            'max': self.max,
+            'histogram': dict(zip(HISTOGRAM_LABELS, self.histogram.tolist())),
+            'duplicate_ratio': self.totals['duplicate_chunks'] / count if count else 0.0,
+            'overlap_ratio': self.totals['overlap_chars'] / total_chars if total_chars else 0.0,
+            'warning_counts': self.warning_counts,
+            'flagged_documents': self.flagged_documents
+        }
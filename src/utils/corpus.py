@@ -0,0 +1,248 @@
+import json
+import hashlib
+from pathlib import Path
+from typing import Dict, Any, List, Iterable, Iterator, Tuple
+from datetime import datetime
+from src.utils.models import Document
+from src.utils.file_utils import JSONFileHandler, datetime_encoder
+
+# 单个分片文件的默认大小上限
+DEFAULT_SHARD_MAX_BYTES = 64 * 1024 * 1024
+MANIFEST_NAME = 'manifest.json'
+
+def iter_document_paths(inputs: Iterable[str]) -> Iterator[Path]:
+    """展开输入路径：文件原样返回，目录按文件名顺序返回其中的JSON文件"""
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            for child in sorted(path.rglob('*.json')):
+                if child.name != MANIFEST_NAME:
+                    yield child
+        elif path.exists():
+            yield path
+
+def iter_documents(inputs: Iterable[str]) -> Iterator[Document]:
+    """逐个加载文档，任意时刻内存中只有一个文档"""
+    for path in iter_document_paths(inputs):
+        yield JSONFileHandler.load_document(str(path))
+
+class CorpusShardWriter:
+    """
+    将记录以JSON Lines格式写入大小受限的分片文件，并生成分片清单
+    下游可以根据清单并行读取各个分片
+    """
+    def __init__(self, output_dir: str, shard_max_bytes: int = DEFAULT_SHARD_MAX_BYTES, prefix: str = 'shard'):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.shard_max_bytes = shard_max_bytes
+        self.prefix = prefix
+        self.shards: List[Dict[str, Any]] = []
+        self.total_records = 0
+        self._file = None
+        self._hasher = None
+        self._shard_bytes = 0
+        self._shard_records = 0
+
+    def _open_shard(self):
+        file_name = f"{self.prefix}_{len(self.shards):05d}.jsonl"
+        self._file = open(self.output_dir / file_name, 'wb')
+        self._hasher = hashlib.sha256()
+        self._shard_bytes = 0
+        self._shard_records = 0
+        self.shards.append({'file': file_name, 'first_record': self.total_records})
+
+    def _close_shard(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self.shards[-1].update({
+            'records': self._shard_records,
+            'bytes': self._shard_bytes,
+            'sha256': self._hasher.hexdigest()
+        })
+        self._file = None
+
+    def write(self, record: Dict[str, Any]):
+        """写入一条记录，当前分片写满时切换到新分片"""
+        line = (json.dumps(record, ensure_ascii=False, default=datetime_encoder) + '\n').encode('utf-8')
+        # 单条记录超过上限时独占一个分片
+        if self._file is not None and self._shard_records > 0 and \
+                self._shard_bytes + len(line) > self.shard_max_bytes:
+            self._close_shard()
+        if self._file is None:
+            self._open_shard()
+        self._file.write(line)
+        self._hasher.update(line)
+        self._shard_bytes += len(line)
+        self._shard_records += 1
+        self.total_records += 1
+
+    def close(self, **extra) -> str:
+        """
+        关闭当前分片并写出清单
+        :param extra: 额外写入清单的字段
+        :return: 清单文件路径
+        """
+        self._close_shard()
+        manifest = {
+            'format': 'jsonl',
+            'created_at': datetime.now().isoformat(),
+            'shard_max_bytes': self.shard_max_bytes,
+            'total_records': self.total_records,
+            'total_shards': len(self.shards),
+            'shards': self.shards,
+            **extra
+        }
+        manifest_path = self.output_dir / MANIFEST_NAME
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return str(manifest_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._close_shard()
+
+def read_manifest(manifest_path: str) -> Dict[str, Any]:
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def iter_shard_records(shard_path: str) -> Iterator[Dict[str, Any]]:
+    """逐行读取一个分片文件中的记录"""
+    with open(shard_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def shard_paths(manifest_path: str) -> List[str]:
+    """返回清单中所有分片的路径，供调用方分配给并行的读取进程"""
+    manifest = read_manifest(manifest_path)
+    base_dir = Path(manifest_path).parent
+    return [str(base_dir / shard['file']) for shard in manifest['shards']]
+
+class StreamingRechunker:
+    """
+    跨文档边界的流式再分块
+    文档文本依次追加到缓冲区，缓冲区足够长时分块并输出除最后一块外的所有块，
+    最后一块作为下一轮的开头，内存占用与chunk_size成正比，而不是与语料大小成正比
+    """
+    def __init__(self, chunking_strategy: str = 'fixed_size', separator: str = '\n\n',
+                 flush_factor: int = 8, **kwargs):
+        from src.chunkers.chunkers import ChunkerFactory
+        self.chunker = ChunkerFactory.get_chunker(chunking_strategy, **kwargs)
+        self.separator = separator
+        self.flush_threshold = self.chunker.chunk_size * flush_factor
+        self.chunk_method = f"corpus_{chunking_strategy}_size_{self.chunker.chunk_size}_overlap_{self.chunker.chunk_overlap}"
+        self._buffer = ''
+        # (缓冲区内的起始位置, 文档ID)
+        self._segments: List[Tuple[int, str]] = []
+        self._chunk_index = 0
+
+    def _split(self, text: str) -> List[str]:
+        return self.chunker.split_text(text)
+
+    def _documents_in_range(self, start: int, end: int) -> List[str]:
+        document_ids = []
+        for i, (seg_start, document_id) in enumerate(self._segments):
+            seg_end = self._segments[i + 1][0] if i + 1 < len(self._segments) else len(self._buffer)
+            if seg_start < end and seg_end > start:
+                document_ids.append(document_id)
+        return document_ids
+
+    def _drain(self, final: bool) -> Iterator[Dict[str, Any]]:
+        pieces = self._split(self._buffer)
+        if not pieces:
+            return
+        emit = pieces if final else pieces[:-1]
+        cursor = 0
+        tail_start = len(self._buffer)
+        for i, piece in enumerate(pieces):
+            start = self._buffer.find(piece, cursor)
+            if start == -1:
+                start = cursor
+            if i >= len(emit):
+                tail_start = start
+                break
+            cursor = start + 1
+            yield {
+                'chunk_id': f"corpus_chunk_{self._chunk_index:08d}",
+                'chunk_index': self._chunk_index,
+                'page_content': piece,
+                'chunk_size': len(piece),
+                'chunk_method': self.chunk_method,
+                'source_document_ids': self._documents_in_range(start, start + len(piece))
+            }
+            self._chunk_index += 1
+
+        if final:
+            self._buffer = ''
+            self._segments = []
+            return
+        # 只保留未输出的尾部文本，并调整各文档在缓冲区中的起始位置
+        kept = []
+        for i, (seg_start, document_id) in enumerate(self._segments):
+            seg_end = self._segments[i + 1][0] if i + 1 < len(self._segments) else len(self._buffer)
+            if seg_end > tail_start:
+                kept.append((max(seg_start - tail_start, 0), document_id))
+        self._buffer = self._buffer[tail_start:]
+        self._segments = kept
+
+    def feed(self, document: Document) -> Iterator[Dict[str, Any]]:
+        """追加一个文档的文本，返回已经可以确定的块"""
+        # 使用分块前的正文；已分块文档的块之间有重叠，拼接块会重复重叠部分，只在正文为空时退回拼接块
+        text = document.page_content or "\n\n".join(chunk.page_content for chunk in document.chunks
+                                                     if not chunk.metadata.get('atomic'))
+        if self._buffer:
+            self._buffer += self.separator
+        self._segments.append((len(self._buffer), document.document_id))
+        self._buffer += text
+        if len(self._buffer) >= self.flush_threshold:
+            yield from self._drain(final=False)
+
+    def flush(self) -> Iterator[Dict[str, Any]]:
+        """输出缓冲区中剩余的所有块"""
+        if self._buffer:
+            yield from self._drain(final=True)
+
+def merge_corpus(inputs: Iterable[str], output_dir: str, shard_max_bytes: int = DEFAULT_SHARD_MAX_BYTES,
+                 rechunk: bool = False, **chunking_kwargs) -> str:
+    """
+    流式合并大量文档并写出分片
+    :param inputs: 文档JSON文件或目录
+    :param output_dir: 分片输出目录
+    :param shard_max_bytes: 单个分片的大小上限
+    :param rechunk: 为True时跨文档边界重新分块，否则保留各文档原有的块
+    :param chunking_kwargs: 再分块参数（chunking_strategy、chunk_size、chunk_overlap等）
+    :return: 清单文件路径
+    """
+    writer = CorpusShardWriter(output_dir, shard_max_bytes=shard_max_bytes)
+    rechunker = StreamingRechunker(**chunking_kwargs) if rechunk else None
+    documents = []
+
+    with writer:
+        for document in iter_documents(inputs):
+            documents.append({'document_id': document.document_id, 'file_name': document.file_name})
+            if rechunker is not None:
+                for record in rechunker.feed(document):
+                    writer.write(record)
+                # 原子块（如表格）不参与跨文档再分块，原样写出
+                for chunk in document.chunks:
+                    if chunk.metadata.get('atomic'):
+                        writer.write({**chunk.dict(), 'source_document_ids': [document.document_id]})
+                continue
+            for chunk in document.chunks:
+                writer.write({**chunk.dict(), 'document_id': document.document_id,
+                              'file_name': document.file_name})
+
+        if rechunker is not None:
+            for record in rechunker.flush():
+                writer.write(record)
+
+        return writer.close(
+            total_documents=len(documents),
+            documents=documents,
+            rechunked=rechunk,
+            chunking_params={key: value for key, value in chunking_kwargs.items()
+                             if isinstance(value, (str, int, float, bool))}
+        )
@@ -1,11 +1,39 @@
 import json
 import os
+import uuid
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 from src.utils.models import Document
 
+# 文档概要字段，保存在与文档同名的sidecar文件中，读取时不必解析整个文档
+METADATA_FIELDS = ['document_id', 'file_name', 'file_type', 'file_path', 'total_chunks', 'total_size',
+                   'created_at', 'loader_used']
+# sidecar文件后缀（<文档文件名>.meta）；不以.json结尾，扫描文档的 *.json 时不会被当作文档
+SIDECAR_SUFFIX = '.meta'
+
+def datetime_encoder(obj):
+    """JSON编码器的default函数，处理datetime对象"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f'Object of type {obj.__class__.__name__} is not JSON serializable')
+
 class JSONFileHandler:
+    @staticmethod
+    def document_file_name(document: Document, prefix: str = 'document') -> str:
+        """生成保存文档时使用的文件名"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return f"{prefix}_{document.document_id[:8]}_{timestamp}.json"
+
+    @staticmethod
+    def serialize_document(document: Document, indent: int = 2) -> bytes:
+        """
+        将Document对象序列化为与save_document相同格式的字节串
+        序列化是CPU密集的，可以在工作进程中完成，再由调用方异步写盘
+        """
+        text = json.dumps(document.to_json(), ensure_ascii=False, indent=indent, default=datetime_encoder)
+        return text.encode('utf-8-sig')
+
     @staticmethod
     def save_document(document: Document, output_dir: str = 'output', prefix: str = 'document', indent: int = 2) -> str:
         """
@@ -21,22 +49,15 @@ class JSONFileHandler:
         output_path.mkdir(parents=True, exist_ok=True)
 
         # 生成文件名
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        file_name = f"{prefix}_{document.document_id[:8]}_{timestamp}.json"
-        file_path = output_path / file_name
+        file_path = output_path / JSONFileHandler.document_file_name(document, prefix)
 
         # 转换Document对象为字典
         doc_dict = document.to_json()
 
-        # 自定义JSON编码器，处理datetime对象
-        def datetime_encoder(obj):
-            if isinstance(obj, datetime):
-                return obj.isoformat()
-            raise TypeError(f'Object of type {obj.__class__.__name__} is not JSON serializable')
-
         # 保存为JSON文件
         with open(file_path, 'w', encoding='utf-8-sig') as f:
             json.dump(doc_dict, f, ensure_ascii=False, indent=indent, default=datetime_encoder)
+        JSONFileHandler.write_sidecar(str(file_path), JSONFileHandler.document_header(document))
 
         return str(file_path)
 
@@ -72,28 +93,80 @@ class JSONFileHandler:
         file_name = f"{prefix}_{len(documents)}_docs_{timestamp}.json"
         file_path = output_path / file_name
 
-        # 转换Document对象列表为字典列表
-        docs_dict = [doc.to_json() for doc in documents]
-
-        # 保存为JSON文件
+        # 逐个文档写入JSON数组，避免同时在内存中保留所有文档的字典
         with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(docs_dict, f, ensure_ascii=False, indent=indent)
+            f.write('[\n')
+            for index, doc in enumerate(documents):
+                if index > 0:
+                    f.write(',\n')
+                json.dump(doc.to_json(), f, ensure_ascii=False, indent=indent, default=datetime_encoder)
+            f.write('\n]')
 
         return str(file_path)
 
     @staticmethod
-    def get_document_metadata(file_path: str) -> Dict[str, Any]:
+    def document_header(document: Document) -> Dict[str, Any]:
+        """文档概要：METADATA_FIELDS 加上处理路径"""
+        header = {field: getattr(document, field) for field in METADATA_FIELDS}
+        header['created_at'] = document.created_at.isoformat()
+        header['processing_path'] = document.metadata.get('processing_path')
+        return header
+
+    @staticmethod
+    def sidecar_path(file_path: str) -> str:
+        return f"{file_path}{SIDECAR_SUFFIX}"
+
+    @staticmethod
+    def write_sidecar(file_path: str, header: Dict[str, Any]) -> str:
+        """
+        在文档写盘之后写入sidecar，记录文档文件的大小和修改时间
+        文档之后被其他程序改写时两者对不上，读取方据此判断sidecar已过期
+        """
+        stat = os.stat(file_path)
+        sidecar = JSONFileHandler.sidecar_path(file_path)
+        # 同名文档可能被并发写入（同一秒内保存同一文档），临时文件名需各不相同
+        tmp_path = f"{sidecar}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({**header, 'source_bytes': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns},
+                      f, ensure_ascii=False, default=datetime_encoder)
+        os.replace(tmp_path, sidecar)
+        return sidecar
+
+    @staticmethod
+    def read_sidecar(file_path: str) -> Optional[Dict[str, Any]]:
+        """读取sidecar；不存在、损坏或与文档文件不一致时返回None"""
+        try:
+            with open(JSONFileHandler.sidecar_path(file_path), 'r', encoding='utf-8') as f:
+                header = json.load(f)
+            stat = os.stat(file_path)
+        except (OSError, ValueError):
+            return None
+        if header.get('source_bytes') != stat.st_size or header.get('source_mtime_ns') != stat.st_mtime_ns:
+            return None
+        return header
+
+    @staticmethod
+    def get_document_metadata(file_path: str, backfill: bool = False) -> Dict[str, Any]:
         """
         获取JSON文档的元数据，而不加载整个文档
+        优先读取sidecar（只有几百字节）；没有sidecar的旧文档退回到加载整个文件
         :param file_path: JSON文件路径
+        :param backfill: 退回加载整个文件时顺便写入sidecar，下次直接读取
         :return: 文档元数据
         """
-        with open(file_path, 'r', encoding='utf-8') as f:
+        header = JSONFileHandler.read_sidecar(file_path)
+        if header is not None:
+            return {field: header.get(field) for field in METADATA_FIELDS + ['processing_path']}
+
+        with open(file_path, 'r', encoding='utf-8-sig') as f:
             doc_dict = json.load(f)
 
         # 提取元数据字段
-        metadata_fields = ['document_id', 'file_name', 'file_type', 'total_chunks', 'total_size', 'created_at', 'loader_used']
-        return {field: doc_dict.get(field) for field in metadata_fields}
+        header = {field: doc_dict.get(field) for field in METADATA_FIELDS}
+        header['processing_path'] = (doc_dict.get('metadata') or {}).get('processing_path')
+        if backfill:
+            JSONFileHandler.write_sidecar(file_path, header)
+        return header
 
     @staticmethod
     def merge_documents(documents: List[Document], new_document_id: Optional[str] = None) -> Document:
@@ -122,6 +195,7 @@ class JSONFileHandler:
 
         # 创建合并后的文档
         return Document(
+            page_content="\n\n".join(doc.page_content for doc in documents),
             document_id=new_document_id or f"merged_{'_'.join([doc.document_id[:4] for doc in documents])}",
             file_name=f"merged_{base_doc.file_name}",
             file_type=base_doc.file_type,
@@ -129,7 +203,7 @@ class JSONFileHandler:
             chunks=all_chunks,
             metadata=merged_metadata,
             total_chunks=len(all_chunks),
-            total_size=sum(len(chunk.content) for chunk in all_chunks),
+            total_size=sum(len(chunk.page_content) for chunk in all_chunks),
             loader_used=base_doc.loader_used,
             loader_params=base_doc.loader_params
         )
\ No newline at end of file
@@ -0,0 +1,119 @@
+import json
+import mmap
+import re
+from typing import Dict, Any, List, Tuple
+import numpy as np
+
+# 字符串（整体匹配，含转义）或括号；字符串内部的括号不会被误认
+_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]')
+# 数字、true/false/null 等标量值的结尾
+_SCALAR_END = re.compile(rb'\s*[,}\]]')
+_WHITESPACE = b' \t\r\n'
+_OPEN = (ord('{'), ord('['))
+_CLOSE = (ord('}'), ord(']'))
+_QUOTE = ord('"')
+_BOM = b'\xef\xbb\xbf'
+
+def _skip_whitespace(data, position: int) -> int:
+    while position < len(data) and data[position] in _WHITESPACE:
+        position += 1
+    return position
+
+class JSONPageIndex:
+    """
+    文档JSON的字节偏移索引，用于分页读取块而不解析整个文件
+    建立时在内存映射上用正则扫描一遍：字符串整体跳过、不构造块对象，只记录顶层各字段和
+    chunks数组中每个元素的字节区间；之后读取一页只读取并解析该页的块
+    顶层字段（除chunks和page_content外）在建立时解析并保留，page_content只保留长度
+    """
+    def __init__(self, file_path: str, array_key: str = 'chunks', text_key: str = 'page_content'):
+        self.file_path = file_path
+        self.array_key = array_key
+        self.text_key = text_key
+        self.header: Dict[str, Any] = {}
+        self.text_length = 0
+        self.items = np.zeros((0, 2), dtype=np.int64)
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            self._build(data)
+
+    def _build(self, data):
+        start = _skip_whitespace(data, len(_BOM) if data[:len(_BOM)] == _BOM else 0)
+        if start >= len(data) or data[start] != ord('{'):
+            raise ValueError(f"顶层不是JSON对象: {self.file_path}")
+
+        fields: Dict[str, Tuple[int, int]] = {}
+        items: List[Tuple[int, int]] = []
+        depth, key, value_start, item_start = 0, None, 0, 0
+        for match in _TOKEN.finditer(data, start):
+            position, end = match.span()
+            char = data[position]
+            if char == _QUOTE:
+                if depth != 1:
+                    continue
+                if key is not None:
+                    # 顶层字段的字符串值
+                    fields[key] = (position, end)
+                    key = None
+                    continue
+                key = json.loads(data[position:end])
+                colon = _skip_whitespace(data, end)
+                if colon >= len(data) or data[colon] != ord(':'):
+                    raise ValueError(f"JSON格式错误: {self.file_path} 第 {colon} 字节")
+                value_start = _skip_whitespace(data, colon + 1)
+                if value_start < len(data) and data[value_start] not in _OPEN and data[value_start] != _QUOTE:
+                    # 标量值中没有字符串和括号，直接找到结尾
+                    scalar_end = _SCALAR_END.search(data, value_start)
+                    if scalar_end is None:
+                        raise ValueError(f"JSON格式错误: {self.file_path}")
+                    fields[key] = (value_start, scalar_end.start())
+                    key = None
+            elif char in _OPEN:
+                depth += 1
+                if depth == 3 and key == self.array_key:
+                    item_start = position
+            else:
+                if depth == 3 and key == self.array_key:
+                    items.append((item_start, end))
+                elif depth == 2 and key is not None:
+                    fields[key] = (value_start, end)
+                    key = None
+                depth -= 1
+                if depth == 0:
+                    break
+        if depth != 0:
+            raise ValueError(f"JSON不完整: {self.file_path}")
+        if self.array_key not in fields or data[fields[self.array_key][0]] != ord('['):
+            raise ValueError(f"缺少 {self.array_key} 数组: {self.file_path}")
+
+        for name, (value_start, value_end) in fields.items():
+            if name == self.array_key:
+                continue
+            value = json.loads(data[value_start:value_end])
+            if name == self.text_key:
+                self.text_length = len(value or '')
+            else:
+                self.header[name] = value
+        if items:
+            self.items = np.asarray(items, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def read_items(self, offset: int, limit: int) -> List[Any]:
+        """读取并解析第 [offset, offset+limit) 个块，只读取这些块所在的字节区间"""
+        selected = self.items[offset:offset + limit]
+        if not len(selected):
+            return []
+        base = int(selected[0][0])
+        with open(self.file_path, 'rb') as f:
+            f.seek(base)
+            block = f.read(int(selected[-1][1]) - base)
+        return [json.loads(block[start - base:end - base]) for start, end in selected.tolist()]
+
+    def read_page(self, offset: int, limit: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """返回与完整解析后分页相同结构的 (页面, 分页信息)"""
+        page = dict(self.header)
+        page[f'{self.text_key}_length'] = self.text_length
+        page[self.array_key] = self.read_items(offset, limit)
+        total = len(self)
+        return page, {'offset': offset, 'limit': limit, 'total': total, 'has_more': offset + limit < total}
@@ -0,0 +1,112 @@
+from array import array
+from bisect import bisect_right
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from src.utils.models import Document
+from src.utils.chunk_stats import locate_chunk_offsets
+
+# 文档元数据中页边界表的键；只保存在文档级元数据中，不复制到各个块
+PAGE_MAP_KEY = 'page_map'
+# 加载器和解析器拼接各页文本使用的分隔符
+PAGE_SEPARATOR = "\n\n"
+
+class PageMap:
+    """
+    页边界偏移表：offsets[i] 为第i个页面在page_content中的起始字符偏移（升序）
+    页码默认从first_page开始连续编号；页码不连续时（如只提取了部分页、空页没有元素）另存pages数组
+    以array保存，按偏移查页码为二分查找，O(log 页数)
+    """
+    def __init__(self, offsets: Sequence[int], pages: Optional[Sequence[int]] = None, first_page: int = 1):
+        self.offsets = array('q', offsets)
+        self.pages = array('q', pages) if pages is not None else None
+        self.first_page = first_page
+        if self.pages is not None and len(self.pages) != len(self.offsets):
+            raise ValueError("页码数量与偏移数量不一致")
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def page_at(self, offset: int) -> Optional[int]:
+        """字符偏移所在的页码；偏移在第一页之前或表为空时返回None"""
+        index = bisect_right(self.offsets, offset) - 1
+        if index < 0:
+            return None
+        return self.pages[index] if self.pages is not None else self.first_page + index
+
+    def page_span(self, start: int, end: int) -> Tuple[Optional[int], Optional[int]]:
+        """[start, end) 区间覆盖的起止页码"""
+        return self.page_at(start), self.page_at(max(start, end - 1))
+
+    def to_metadata(self) -> Dict[str, Any]:
+        value: Dict[str, Any] = {'offsets': self.offsets.tolist(), 'first_page': self.first_page}
+        if self.pages is not None:
+            value['pages'] = self.pages.tolist()
+        return value
+
+    @classmethod
+    def from_metadata(cls, value: Optional[Dict[str, Any]]) -> Optional['PageMap']:
+        if not value or not value.get('offsets'):
+            return None
+        return cls(value['offsets'], value.get('pages'), value.get('first_page', 1))
+
+    @classmethod
+    def from_document(cls, document: Document) -> Optional['PageMap']:
+        return cls.from_metadata(document.metadata.get(PAGE_MAP_KEY))
+
+def join_pages(texts: Sequence[str], page_numbers: Optional[Sequence[int]] = None,
+               separator: str = PAGE_SEPARATOR) -> Tuple[str, PageMap]:
+    """
+    拼接各页（或各元素）文本，同时记录页边界
+    :param texts: 按顺序排列的文本片段
+    :param page_numbers: 每个片段的页码，默认每个片段为一页、从1开始；相邻片段页码相同时属于同一页
+    :return: (拼接后的文本, 页边界表)
+    """
+    offsets: List[int] = []
+    pages: List[int] = []
+    position = 0
+    for index, text in enumerate(texts):
+        if index:
+            position += len(separator)
+        page = page_numbers[index] if page_numbers is not None else index + 1
+        if not pages or page != pages[-1]:
+            offsets.append(position)
+            pages.append(page)
+        position += len(text)
+    content = separator.join(texts)
+    first_page = pages[0] if pages else 1
+    consecutive = pages == list(range(first_page, first_page + len(pages)))
+    return content, PageMap(offsets, None if consecutive else pages, first_page)
+
+def inherited_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """块继承的文档元数据：去掉页边界表等只属于文档的条目"""
+    return {key: value for key, value in metadata.items() if key != PAGE_MAP_KEY}
+
+def annotate_chunk_pages(document: Document) -> Document:
+    """
+    为每个块写入起止页码 page_start/page_end
+    分块器已记录 start_offset/end_offset 的直接使用；否则按顺序在原文中定位一次并补写偏移
+    表格等原子块使用提取时记录的 page_number
+    文档没有页边界表时原样返回
+    """
+    page_map = PageMap.from_document(document)
+    if page_map is None:
+        return document
+    text_chunks = [chunk for chunk in document.chunks if not chunk.metadata.get('atomic')]
+    unlocated = [chunk for chunk in text_chunks if chunk.metadata.get('start_offset') is None]
+    if unlocated:
+        chunk_overlap = max((chunk.chunk_overlap for chunk in unlocated), default=0)
+        offsets = locate_chunk_offsets(document.page_content, [chunk.page_content for chunk in unlocated],
+                                       chunk_overlap)
+        for chunk, start in zip(unlocated, offsets.tolist()):
+            if start >= 0:
+                chunk.metadata['start_offset'] = start
+                chunk.metadata['end_offset'] = start + len(chunk.page_content)
+
+    for chunk in document.chunks:
+        metadata = chunk.metadata
+        if metadata.get('atomic'):
+            if metadata.get('page_number') is not None:
+                metadata['page_start'] = metadata['page_end'] = metadata['page_number']
+        elif metadata.get('start_offset') is not None:
+            metadata['page_start'], metadata['page_end'] = page_map.page_span(metadata['start_offset'],
+                                                                              metadata['end_offset'])
+    return document
@@ -0,0 +1,183 @@
+import os
+import time
+import signal
+import traceback
+import multiprocessing
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# 检查子进程状态的间隔（秒）
+POLL_INTERVAL = 0.2
+
+class BudgetExceeded(Exception):
+    """子进程超出时间或内存预算、或异常退出"""
+    def __init__(self, kind: str, message: str, elapsed: float = 0.0, peak_rss_mb: float = 0.0):
+        super().__init__(message)
+        # time、memory 或 crash
+        self.kind = kind
+        self.elapsed = elapsed
+        self.peak_rss_mb = peak_rss_mb
+
+class StageError(Exception):
+    """子进程中的函数抛出了普通异常"""
+    def __init__(self, message: str, error_type: str, details: str = ''):
+        super().__init__(message)
+        self.error_type = error_type
+        self.details = details
+
+class ResourceBudget:
+    """
+    单个处理阶段的资源预算
+    :param time_limit: 最长运行时间（秒），None表示不限
+    :param memory_limit_mb: 常驻内存上限（MB），None表示不限
+    """
+    def __init__(self, time_limit: Optional[float] = None, memory_limit_mb: Optional[int] = None):
+        self.time_limit = time_limit
+        self.memory_limit_mb = memory_limit_mb
+
+    @property
+    def unlimited(self) -> bool:
+        return self.time_limit is None and self.memory_limit_mb is None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'time_limit': self.time_limit, 'memory_limit_mb': self.memory_limit_mb}
+
+def _rss_mb(pid: int) -> float:
+    """读取进程常驻内存（Linux下读/proc，其他平台返回0，即不做内存检查）"""
+    try:
+        with open(f'/proc/{pid}/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
+
+def _process_table() -> Dict[int, Tuple[int, int]]:
+    """读取/proc中所有进程的 pid -> (父进程pid, 会话id)，非Linux平台返回空表"""
+    table = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return table
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                stat = f.read()
+            # 进程名可能包含空格和括号，从最后一个右括号之后开始解析
+            fields = stat[stat.rindex(')') + 2:].split()
+            table[int(entry)] = (int(fields[1]), int(fields[3]))
+        except (OSError, ValueError, IndexError):
+            continue
+    return table
+
+def _tree_rss_mb(pid: int) -> float:
+    """
+    子进程及其全部后代的常驻内存之和
+    后代包括沿父进程关系找到的进程，以及父进程已退出、被init收养但仍在该会话中的进程
+    """
+    table = _process_table()
+    children: Dict[int, list] = {}
+    for child, (parent, _) in table.items():
+        children.setdefault(parent, []).append(child)
+    members = set()
+    stack = [pid] + [child for child, (_, session) in table.items() if session == pid]
+    while stack:
+        current = stack.pop()
+        if current in members:
+            continue
+        members.add(current)
+        stack.extend(children.get(current, []))
+    return sum(_rss_mb(member) for member in members)
+
+def _child_main(conn, func: Callable, args: Tuple, kwargs: Dict[str, Any]):
+    if hasattr(os, 'setsid'):
+        # 成为新会话和进程组的首进程，超出预算时连同其启动的子进程一起终止
+        os.setsid()
+    try:
+        conn.send(('ok', func(*args, **kwargs)))
+    except MemoryError:
+        conn.send(('memory', 'MemoryError'))
+    except BaseException as e:
+        conn.send(('error', (str(e), type(e).__name__, traceback.format_exc())))
+    finally:
+        conn.close()
+
+def _signal_group(process, sig) -> bool:
+    """
+    向以子进程pid为组号的进程组发送信号
+    子进程尚未建立自己的进程组、或组内已没有进程时返回False
+    """
+    try:
+        os.killpg(process.pid, sig)
+        return True
+    except (OSError, AttributeError):
+        return False
+
+def _stop(process):
+    """终止子进程及其进程组中的所有进程（如解析阶段启动的进程池）"""
+    if not _signal_group(process, signal.SIGTERM):
+        process.terminate()
+    process.join(2)
+    if process.is_alive():
+        process.kill()
+        process.join()
+    # 子进程退出后，组内可能还有未响应SIGTERM的后代进程
+    _signal_group(process, getattr(signal, 'SIGKILL', signal.SIGTERM))
+
+def run_with_budget(func: Callable, args: Tuple = (), kwargs: Optional[Dict[str, Any]] = None,
+                    budget: Optional[ResourceBudget] = None) -> Any:
+    """
+    在子进程中执行func，超出预算时终止子进程
+    父进程定期检查运行时间和子进程及其后代的常驻内存之和，卡死或内存膨胀的解析不会拖住调用方
+    子进程在独立的进程组中运行，超出预算时整组终止
+    :raises BudgetExceeded: 超时、超内存或子进程异常退出
+    :raises StageError: func本身抛出异常
+    :return: func的返回值（需可pickle）
+    """
+    kwargs = kwargs or {}
+    if budget is None or budget.unlimited:
+        return func(*args, **kwargs)
+
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    # 不设为daemon：解析阶段自身可能再启动进程池（如并行提取表格）
+    process = multiprocessing.Process(target=_child_main, args=(sender, func, args, kwargs))
+    start = time.monotonic()
+    process.start()
+    sender.close()
+    peak_rss = 0.0
+    try:
+        while not receiver.poll(POLL_INTERVAL):
+            elapsed = time.monotonic() - start
+            if not process.is_alive():
+                # 子进程已退出但没有返回结果，通常是被系统OOM终止或崩溃
+                if receiver.poll(0):
+                    break
+                raise BudgetExceeded('crash', f'子进程异常退出，退出码 {process.exitcode}', elapsed, peak_rss)
+            if budget.time_limit is not None and elapsed > budget.time_limit:
+                _stop(process)
+                raise BudgetExceeded('time', f'超出时间预算 {budget.time_limit}s', elapsed, peak_rss)
+            if budget.memory_limit_mb is not None:
+                peak_rss = max(peak_rss, _tree_rss_mb(process.pid))
+                if peak_rss > budget.memory_limit_mb:
+                    _stop(process)
+                    raise BudgetExceeded('memory', f'超出内存预算 {budget.memory_limit_mb}MB', elapsed, peak_rss)
+        try:
+            status, payload = receiver.recv()
+        except EOFError:
+            raise BudgetExceeded('crash', '子进程未返回结果', time.monotonic() - start, peak_rss)
+    finally:
+        receiver.close()
+        if process.is_alive():
+            process.join(POLL_INTERVAL * 5)
+            if process.is_alive():
+                _stop(process)
+        # 子进程已退出（包括崩溃），清理组内残留的后代进程
+        _signal_group(process, getattr(signal, 'SIGKILL', signal.SIGTERM))
+
+    elapsed = time.monotonic() - start
+    if status == 'memory':
+        raise BudgetExceeded('memory', '子进程内存不足 (MemoryError)', elapsed, peak_rss)
+    if status == 'error':
+        message, error_type, details = payload
+        raise StageError(message, error_type, details)
+    return payload
@@ -0,0 +1,180 @@
+from multiprocessing import shared_memory, resource_tracker
+from typing import Dict, Any, Tuple
+from src.utils.models import Document, Chunk
+from src.utils.page_map import inherited_metadata
+
+class SharedText:
+    """
+    将文本以UTF-8编码放入共享内存，供进程池中的多个任务读取，避免每个任务都序列化整段文本
+    创建方负责调用unlink释放；读取方通过handle附加，只读不释放
+    """
+    def __init__(self, text: str):
+        data = text.encode('utf-8')
+        self.size = len(data)
+        # 共享内存大小不能为0
+        self._shm = shared_memory.SharedMemory(create=True, size=max(self.size, 1))
+        self._shm.buf[:self.size] = data
+
+    @property
+    def handle(self) -> Tuple[str, int]:
+        """可以廉价传递给子进程的句柄：(共享内存名称, 字节数)"""
+        return self._shm.name, self.size
+
+    def close(self):
+        self._shm.close()
+
+    def unlink(self):
+        """关闭并释放共享内存"""
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.unlink()
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    以读取方身份附加共享内存
+    进程池子进程与创建方共用同一个resource_tracker，附加时的重复登记不会导致共享内存被提前删除；
+    不能在这里取消登记，否则会把创建方的登记一并移除
+    """
+    return shared_memory.SharedMemory(name=name)
+
+def read_shared_text(handle: Tuple[str, int]) -> str:
+    """在子进程中读取共享文本"""
+    name, size = handle
+    shm = attach_shared_memory(name)
+    try:
+        return bytes(shm.buf[:size]).decode('utf-8')
+    finally:
+        shm.close()
+
+def ensure_resource_tracker():
+    """
+    在创建子进程之前启动resource_tracker
+    子进程创建、父进程读取并释放的共享内存需要登记在父子共用的tracker中；
+    否则子进程会启动自己的tracker，子进程退出时该tracker会删除父进程尚未读取的共享内存
+    """
+    resource_tracker.ensure_running()
+
+def document_skeleton(document: Document) -> Dict[str, Any]:
+    """文档中除正文外的部分（元数据和原子块），体积小，可以直接随任务传递"""
+    return {
+        'document_id': document.document_id,
+        'file_name': document.file_name,
+        'file_type': document.file_type,
+        'file_path': document.file_path,
+        'metadata': document.metadata,
+        'loader_used': document.loader_used,
+        'loader_params': document.loader_params,
+        'atomic_chunks': [chunk.dict() for chunk in document.chunks if chunk.metadata.get('atomic')]
+    }
+
+def rebuild_document(text: str, skeleton: Dict[str, Any]) -> Document:
+    """由正文和骨架还原分块前的文档：正文作为一个整体块，原子块原样保留"""
+    chunks = [Chunk(
+        chunk_id=f"chunk_{skeleton['document_id']}_0",
+        page_content=text,
+        metadata=inherited_metadata(skeleton['metadata']),
+        chunk_size=len(text),
+        chunk_overlap=0,
+        chunk_method='whole_document'
+    )] + [Chunk(**chunk) for chunk in skeleton['atomic_chunks']]
+    return Document(
+        page_content=text,
+        document_id=skeleton['document_id'],
+        file_name=skeleton['file_name'],
+        file_type=skeleton['file_type'],
+        file_path=skeleton['file_path'],
+        chunks=chunks,
+        total_chunks=len(chunks),
+        total_size=sum(len(chunk.page_content) for chunk in chunks),
+        metadata=skeleton['metadata'],
+        loader_used=skeleton['loader_used'],
+        loader_params=skeleton['loader_params']
+    )
+
+class SharedDocument:
+    """
+    在进程间传递分块前的文档：正文以UTF-8放入共享内存，元数据等骨架随句柄传递
+    句柄只有共享内存名称、字节数和骨架，跨进程传递时不需要序列化正文
+    与SharedText相同，由持有所有权的一方调用unlink释放
+    """
+    def __init__(self, document: Document):
+        self.text = SharedText(document.page_content)
+        self.skeleton = document_skeleton(document)
+
+    @property
+    def handle(self) -> Dict[str, Any]:
+        return {'text': self.text.handle, 'skeleton': self.skeleton}
+
+    def close(self):
+        """只关闭本进程的映射，共享内存保留给句柄的接收方"""
+        self.text.close()
+
+    def unlink(self):
+        self.text.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.unlink()
+
+class SharedDocumentView:
+    """
+    读取方对共享文档的只读视图
+    buffer是共享内存上的memoryview，按字节偏移切片不复制；
+    text()直接从共享内存解码，不经过中间的bytes副本
+    """
+    def __init__(self, handle: Dict[str, Any]):
+        name, size = handle['text']
+        self.skeleton = handle['skeleton']
+        self._shm = attach_shared_memory(name)
+        self.buffer = self._shm.buf[:size]
+
+    @property
+    def size(self) -> int:
+        return len(self.buffer)
+
+    def text(self) -> str:
+        return str(self.buffer, 'utf-8')
+
+    def document(self) -> Document:
+        return rebuild_document(self.text(), self.skeleton)
+
+    def close(self):
+        # 共享内存上仍有导出的memoryview时无法关闭，先释放视图
+        self.buffer.release()
+        self._shm.close()
+
+    def unlink(self):
+        """关闭并释放共享内存（接收方取得所有权时使用）"""
+        self.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def unlink_shared_document(handle: Dict[str, Any]):
+    """按句柄释放共享文档；已被释放时忽略"""
+    try:
+        shm = attach_shared_memory(handle['text'][0])
+    except FileNotFoundError:
+        return
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
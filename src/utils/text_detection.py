@@ -0,0 +1,186 @@
+import os
+import re
+import codecs
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
+
+# 编码检测只读取文件开头和结尾的样本，代价与文件大小无关
+PREFIX_SAMPLE_BYTES = 64 * 1024
+SUFFIX_SAMPLE_BYTES = 16 * 1024
+# 语言检测从文本开头和结尾各取的字符数
+LANGUAGE_SAMPLE_CHARS = 8 * 1024
+
+# 依次尝试的编码；后面的编码只有得分更高时才会被选中
+# EUC-KR文本按GB18030解码同样全是常用汉字，无法靠打分区分，默认不参与检测，需要时通过candidates传入
+DEFAULT_CANDIDATE_ENCODINGS = ('utf-8', 'gb18030', 'big5', 'shift_jis')
+# 所有候选编码都无法解码时的兜底编码（任何字节序列都能解码）
+FALLBACK_ENCODING = 'latin-1'
+
+# 字节序标记，UTF-32需在UTF-16之前判断；第三项为解码样本时使用的定序编码
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig', 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32', 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32', 'utf-32-be'),
+    (codecs.BOM_UTF16_LE, 'utf-16', 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16', 'utf-16-be'),
+]
+
+# CJK统一表意文字（含扩展A）、兼容表意文字、假名和韩文音节
+CJK_CHARS = '㐀-䶿一-鿿豈-﫿぀-ヿ가-힯'
+LATIN_CHARS = 'A-Za-zÀ-ɏ'
+CJK_PATTERN = re.compile(f'[{CJK_CHARS}]')
+LATIN_PATTERN = re.compile(f'[{LATIN_CHARS}]')
+# 近似的token：一个CJK字符或一个连续的字母数字串
+TOKEN_PATTERN = re.compile(f'[{CJK_CHARS}]|[{LATIN_CHARS}0-9_]+')
+# CJK字符占字母类字符的比例不低于该值时视为CJK文本
+CJK_RATIO_THRESHOLD = 0.3
+
+@lru_cache(maxsize=65536)
+def _is_plausible_char(char: str) -> bool:
+    """
+    按某种编码解码后的字符是否像正常文本
+    错误的编码通常解码出私用区字符、控制字符、半角片假名或生僻字，据此区分候选编码
+    """
+    code = ord(char)
+    if code < 0x80:
+        return char.isprintable() or char in '\t\r\n\f'
+    if code < 0xa0 or 0xe000 <= code <= 0xf8ff or 0xff61 <= code <= 0xff9f:
+        return False
+    if 0x4e00 <= code <= 0x9fff:
+        # 常用汉字都能用GB2312或Big5编码
+        for encoding in ('gb2312', 'big5'):
+            try:
+                char.encode(encoding)
+                return True
+            except UnicodeEncodeError:
+                pass
+        return False
+    return char.isprintable() or char.isspace()
+
+def _plausibility(text: str) -> float:
+    """非ASCII字符中看起来正常的比例"""
+    non_ascii = [char for char in text if ord(char) >= 0x80]
+    if not non_ascii:
+        return 1.0
+    return sum(1 for char in non_ascii if _is_plausible_char(char)) / len(non_ascii)
+
+def _decode_sample(sample: bytes, encoding: str, truncated_head: bool = False,
+                   truncated_tail: bool = False) -> Optional[str]:
+    """
+    严格解码一个样本
+    :param truncated_head: 样本从文件中间开始，允许跳过开头最多3个字节（半个字符）
+    :param truncated_tail: 样本在文件中间结束，末尾不完整的字符不算错误
+    :return: 解码后的文本，无法解码时返回None
+    """
+    for skip in range(4 if truncated_head else 1):
+        decoder = codecs.getincrementaldecoder(encoding)(errors='strict')
+        try:
+            return decoder.decode(sample[skip:], final=not truncated_tail)
+        except UnicodeDecodeError:
+            continue
+    return None
+
+def _decode_samples(prefix: bytes, suffix: bytes, encoding: str) -> Optional[str]:
+    """解码开头和结尾样本并拼接；suffix为空表示prefix就是整个文件"""
+    head = _decode_sample(prefix, encoding, truncated_tail=bool(suffix))
+    if head is None or not suffix:
+        return head
+    tail = _decode_sample(suffix, encoding, truncated_head=True)
+    return None if tail is None else head + '\n' + tail
+
+def read_samples(file_path: str, prefix_bytes: int = PREFIX_SAMPLE_BYTES,
+                 suffix_bytes: int = SUFFIX_SAMPLE_BYTES) -> Tuple[bytes, bytes]:
+    """读取文件开头和结尾的样本；文件不大于两者之和时整个文件作为开头样本，结尾样本为空"""
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        if size <= prefix_bytes + suffix_bytes:
+            return f.read(), b''
+        prefix = f.read(prefix_bytes)
+        f.seek(size - suffix_bytes)
+        return prefix, f.read()
+
+def _detect_bom(prefix: bytes) -> Optional[Tuple[str, str]]:
+    for bom, encoding, sample_encoding in BOMS:
+        if prefix.startswith(bom):
+            return encoding, sample_encoding
+    return None
+
+def detect_encoding_from_samples(prefix: bytes, suffix: bytes = b'',
+                                 candidates: Tuple[str, ...] = DEFAULT_CANDIDATE_ENCODINGS) -> Dict[str, Any]:
+    """
+    根据开头和结尾样本选择编码：先看字节序标记，再逐个严格解码候选编码并按解码结果是否正常打分
+    :param suffix: 结尾样本，为空表示prefix就是整个文件
+    :return: {'encoding', 'confidence', 'method'}
+    """
+    bom = _detect_bom(prefix)
+    if bom:
+        return {'encoding': bom[0], 'confidence': 1.0, 'method': 'bom'}
+    if prefix.isascii() and suffix.isascii():
+        return {'encoding': 'utf-8', 'confidence': 1.0, 'method': 'ascii'}
+
+    best: Optional[Dict[str, Any]] = None
+    for encoding in candidates:
+        text = _decode_samples(prefix, suffix, encoding)
+        if text is None:
+            continue
+        score = _plausibility(text)
+        if best is None or score > best['confidence']:
+            best = {'encoding': encoding, 'confidence': round(score, 4), 'method': 'sample'}
+        # UTF-8的严格解码几乎不会误判，解码成功且文本正常时不再尝试其他编码
+        if encoding == 'utf-8' and score >= 0.99:
+            break
+    if best is not None:
+        return best
+    text = _decode_samples(prefix, suffix, FALLBACK_ENCODING)
+    return {'encoding': FALLBACK_ENCODING, 'confidence': round(_plausibility(text), 4), 'method': 'fallback'}
+
+def detect_encoding(file_path: str, candidates: Tuple[str, ...] = DEFAULT_CANDIDATE_ENCODINGS) -> Dict[str, Any]:
+    """
+    只读取开头和结尾的样本检测文件编码
+    :return: {'encoding', 'confidence', 'method'}
+    """
+    prefix, suffix = read_samples(file_path)
+    return detect_encoding_from_samples(prefix, suffix, candidates=candidates)
+
+def sample_text(text: str, sample_chars: int = LANGUAGE_SAMPLE_CHARS) -> str:
+    """取文本开头和结尾的样本"""
+    if len(text) <= 2 * sample_chars:
+        return text
+    return text[:sample_chars] + '\n' + text[-sample_chars:]
+
+def detect_language(text: str, sample_chars: int = LANGUAGE_SAMPLE_CHARS) -> Dict[str, Any]:
+    """
+    判断文本以CJK还是拉丁字母为主（只统计开头和结尾的样本）
+    :return: {'language': 'cjk'|'latin'|'unknown', 'cjk_ratio'}
+    """
+    sample = sample_text(text, sample_chars)
+    cjk = len(CJK_PATTERN.findall(sample))
+    latin = len(LATIN_PATTERN.findall(sample))
+    if cjk + latin == 0:
+        return {'language': 'unknown', 'cjk_ratio': 0.0}
+    ratio = cjk / (cjk + latin)
+    return {'language': 'cjk' if ratio >= CJK_RATIO_THRESHOLD else 'latin', 'cjk_ratio': round(ratio, 4)}
+
+def count_tokens(text: str) -> int:
+    """近似token数：每个CJK字符计1，每个连续的字母数字串计1"""
+    return len(TOKEN_PATTERN.findall(text))
+
+def detect_text_profile(file_path: str) -> Dict[str, Any]:
+    """
+    检测文本文件的编码和主要语言（两者共用同一份样本）
+    :return: {'encoding', 'encoding_confidence', 'encoding_method', 'language', 'cjk_ratio'}
+    """
+    prefix, suffix = read_samples(file_path)
+    detection = detect_encoding_from_samples(prefix, suffix)
+    bom = _detect_bom(prefix)
+    if bom:
+        # 带字节序标记的UTF-16/32只有开头样本能直接解码
+        text = _decode_sample(prefix, bom[1], truncated_tail=bool(suffix)) or ''
+    else:
+        text = _decode_samples(prefix, suffix, detection['encoding']) or ''
+    return {
+        'encoding': detection['encoding'],
+        'encoding_confidence': detection['confidence'],
+        'encoding_method': detection['method'],
+        **detect_language(text)
+    }
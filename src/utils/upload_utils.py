@@ -0,0 +1,292 @@
+import json
+import os
+import re
+import shutil
+import hashlib
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Optional, BinaryIO, List
+from datetime import datetime
+
+# 流式读写时每次处理的字节数
+COPY_BUFFER_SIZE = 1024 * 1024
+# 客户端可指定的最小分片大小（文件本身更小时除外），避免产生海量分片
+MIN_PART_SIZE = 64 * 1024
+# 未完成的上传会话超过该时间（秒）没有新分片即视为放弃，清理其分片
+DEFAULT_SESSION_TTL = 24 * 3600
+# 两次过期清理之间的最短间隔（秒）
+CLEANUP_INTERVAL = 600
+
+def safe_filename(filename: str) -> str:
+    """
+    去掉客户端文件名中的路径和控制字符，保留中文等Unicode字符
+    :param filename: 客户端提供的文件名
+    :return: 可安全用于本地保存的文件名
+    """
+    name = os.path.basename(filename.replace('\\', '/'))
+    name = re.sub(r'[\x00-\x1f<>:"|?*]', '_', name).strip().lstrip('.')
+    return name or 'upload'
+
+class UploadError(Exception):
+    """分片上传协议错误，status_code对应HTTP状态码"""
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+def parse_int(value: Any, name: str, minimum: Optional[int] = None, maximum: Optional[int] = None) -> int:
+    """
+    把请求中的整数参数转换为int并检查范围
+    :raises UploadError: 不是整数或超出范围（400）
+    """
+    try:
+        if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+            raise ValueError
+        number = int(value)
+    except (TypeError, ValueError):
+        raise UploadError(f'{name} 必须为整数')
+    if minimum is not None and number < minimum:
+        raise UploadError(f'{name} 不能小于 {minimum}')
+    if maximum is not None and number > maximum:
+        raise UploadError(f'{name} 不能大于 {maximum}')
+    return number
+
+class ChunkedUploadManager:
+    """
+    分片、可续传的上传管理：init -> PUT parts -> finalize
+    会话状态保存在磁盘上，服务重启后仍可继续上传未完成的分片
+    超过session_ttl秒没有活动的会话在创建新会话时被清理
+    """
+    def __init__(self, upload_folder: str, part_size: int = 8 * 1024 * 1024,
+                 max_upload_size: int = 2 * 1024 * 1024 * 1024, session_ttl: float = DEFAULT_SESSION_TTL):
+        self.upload_folder = Path(upload_folder)
+        self.parts_folder = self.upload_folder / '.parts'
+        self.index_path = self.upload_folder / '.hash_index.json'
+        self.part_size = part_size
+        self.max_upload_size = max_upload_size
+        self.session_ttl = session_ttl
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        self.parts_folder.mkdir(parents=True, exist_ok=True)
+
+    def _session_dir(self, upload_id: str) -> Path:
+        if not re.fullmatch(r'[0-9a-f]{32}', upload_id):
+            raise UploadError('无效的上传ID', 404)
+        return self.parts_folder / upload_id
+
+    def _write_json(self, path: Path, data: Dict[str, Any]):
+        # 先写临时文件再替换，避免中途崩溃留下损坏的状态文件
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _load_session(self, upload_id: str) -> Dict[str, Any]:
+        session_path = self._session_dir(upload_id) / 'session.json'
+        if not session_path.exists():
+            raise UploadError('上传会话不存在', 404)
+        with open(session_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _load_index(self) -> Dict[str, str]:
+        if not self.index_path.exists():
+            return {}
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _last_activity(self, session_dir: Path) -> float:
+        # 每收到一个分片都会在会话目录中新建分片和标记文件，目录的修改时间随之更新
+        try:
+            return session_dir.stat().st_mtime
+        except OSError:
+            return time.time()
+
+    @staticmethod
+    def _marker_path(session_dir: Path, part_number: int) -> Path:
+        return session_dir / f'part_{part_number:06d}.json'
+
+    @staticmethod
+    def _received_parts(session_dir: Path) -> Dict[int, str]:
+        """
+        列出会话目录中的分片标记：分片序号 -> 标记文件路径
+        每个分片完成后单独写一个标记文件，不必每次改写整个会话状态；查询状态时只看文件名
+        """
+        parts = {}
+        with os.scandir(session_dir) as entries:
+            for entry in entries:
+                match = re.fullmatch(r'part_(\d+)\.json', entry.name)
+                if match:
+                    parts[int(match.group(1))] = entry.path
+        return parts
+
+    def cleanup_expired(self, max_age: Optional[float] = None) -> List[str]:
+        """
+        删除超过max_age秒没有活动的未完成会话（分片和状态文件）
+        :return: 被删除的上传ID
+        """
+        max_age = self.session_ttl if max_age is None else max_age
+        now = time.time()
+        removed = []
+        for session_dir in self.parts_folder.iterdir():
+            if session_dir.is_dir() and now - self._last_activity(session_dir) > max_age:
+                shutil.rmtree(session_dir, ignore_errors=True)
+                removed.append(session_dir.name)
+        self._last_cleanup = now
+        return removed
+
+    def init_upload(self, filename: str, size: Any, options: Optional[Dict[str, Any]] = None,
+                    part_size: Any = None) -> Dict[str, Any]:
+        """
+        创建上传会话
+        :param filename: 原始文件名
+        :param size: 文件总字节数
+        :param options: 上传完成后处理时使用的选项
+        :param part_size: 客户端期望的分片大小，不超过服务端上限
+        :return: 会话状态
+        """
+        size = parse_int(size, 'size', minimum=1)
+        if size > self.max_upload_size:
+            raise UploadError(f'文件超过大小限制: {self.max_upload_size} 字节', 413)
+        if part_size is None:
+            part_size = self.part_size
+        else:
+            part_size = min(parse_int(part_size, 'part_size', minimum=min(MIN_PART_SIZE, size)), self.part_size)
+
+        if time.time() - self._last_cleanup > CLEANUP_INTERVAL:
+            self.cleanup_expired()
+        session = {
+            'upload_id': uuid.uuid4().hex,
+            'filename': safe_filename(filename),
+            'size': size,
+            'part_size': part_size,
+            'total_parts': (size + part_size - 1) // part_size,
+            'options': options or {},
+            'parts': {},
+            'created_at': datetime.now().isoformat()
+        }
+        session_dir = self.parts_folder / session['upload_id']
+        session_dir.mkdir(parents=True)
+        self._write_json(session_dir / 'session.json', session)
+        return self.get_status(session['upload_id'])
+
+    def get_status(self, upload_id: str) -> Dict[str, Any]:
+        """返回会话状态，客户端据此跳过已完成的分片"""
+        session = self._load_session(upload_id)
+        received = sorted(self._received_parts(self._session_dir(upload_id)))
+        received_set = set(received)
+        return {
+            'upload_id': upload_id,
+            'filename': session['filename'],
+            'size': session['size'],
+            'part_size': session['part_size'],
+            'total_parts': session['total_parts'],
+            'received_parts': received,
+            'missing_parts': [i for i in range(session['total_parts']) if i not in received_set]
+        }
+
+    def write_part(self, upload_id: str, part_number: int, stream: BinaryIO,
+                   expected_sha256: Optional[str] = None) -> Dict[str, Any]:
+        """
+        将一个分片流式写入磁盘，同时计算SHA-256
+        :param upload_id: 上传ID
+        :param part_number: 分片序号（从0开始）
+        :param stream: 请求体流
+        :param expected_sha256: 客户端给出的分片哈希，不一致时拒绝该分片
+        :return: 分片信息
+        """
+        session = self._load_session(upload_id)
+        if not 0 <= part_number < session['total_parts']:
+            raise UploadError('分片序号超出范围')
+
+        # 最后一个分片可能小于part_size
+        if part_number == session['total_parts'] - 1:
+            expected_size = session['size'] - part_number * session['part_size']
+        else:
+            expected_size = session['part_size']
+
+        session_dir = self._session_dir(upload_id)
+        part_path = session_dir / f'part_{part_number:06d}'
+        tmp_path = session_dir / f'part_{part_number:06d}.{uuid.uuid4().hex[:8]}.tmp'
+        hasher = hashlib.sha256()
+        written = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                while True:
+                    block = stream.read(COPY_BUFFER_SIZE)
+                    if not block:
+                        break
+                    written += len(block)
+                    if written > expected_size:
+                        raise UploadError('分片大小超出预期')
+                    hasher.update(block)
+                    f.write(block)
+            if written != expected_size:
+                raise UploadError(f'分片大小不完整: {written}/{expected_size}')
+            digest = hasher.hexdigest()
+            if expected_sha256 and expected_sha256.lower() != digest:
+                raise UploadError('分片校验失败')
+            os.replace(tmp_path, part_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+        # 分片落盘后再写标记；只有分片没有标记时该分片视为缺失，由客户端重传
+        self._write_json(self._marker_path(session_dir, part_number), {'size': written, 'sha256': digest})
+
+        return {'part_number': part_number, 'size': written, 'sha256': digest}
+
+    def finalize(self, upload_id: str) -> Dict[str, Any]:
+        """
+        按顺序合并分片并计算整体哈希，内容相同的文件只保留一份
+        :param upload_id: 上传ID
+        :return: 包含最终文件路径、哈希和是否去重的信息
+        """
+        status = self.get_status(upload_id)
+        if status['missing_parts']:
+            raise UploadError(f"还有 {len(status['missing_parts'])} 个分片未上传", 409)
+
+        session = self._load_session(upload_id)
+        session_dir = self._session_dir(upload_id)
+        # 合并前把各分片的标记汇总写入会话状态
+        for number, marker_path in sorted(self._received_parts(session_dir).items()):
+            with open(marker_path, 'r', encoding='utf-8') as f:
+                session['parts'][str(number)] = json.load(f)
+        self._write_json(session_dir / 'session.json', session)
+        assembled_path = session_dir / 'assembled'
+        hasher = hashlib.sha256()
+        with open(assembled_path, 'wb') as out:
+            for part_number in range(session['total_parts']):
+                with open(session_dir / f'part_{part_number:06d}', 'rb') as part:
+                    while True:
+                        block = part.read(COPY_BUFFER_SIZE)
+                        if not block:
+                            break
+                        hasher.update(block)
+                        out.write(block)
+        sha256 = hasher.hexdigest()
+
+        with self._lock:
+            index = self._load_index()
+            existing = index.get(sha256)
+            if existing and Path(existing).exists():
+                file_path = existing
+                deduplicated = True
+            else:
+                file_path = str(self.upload_folder / f"{sha256[:12]}_{session['filename']}")
+                shutil.move(str(assembled_path), file_path)
+                index[sha256] = file_path
+                self._write_json(self.index_path, index)
+                deduplicated = False
+
+        shutil.rmtree(session_dir, ignore_errors=True)
+        return {
+            'upload_id': upload_id,
+            'file_path': file_path,
+            'filename': session['filename'],
+            'size': session['size'],
+            'sha256': sha256,
+            'deduplicated': deduplicated,
+            'options': session['options']
+        }
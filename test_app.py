@@ -0,0 +1,99 @@
+from src.utils.json_index import JSONPageIndex
+from src.utils.cache_utils import ResultsIndex
+import tempfile
+import json
+import time
+import os
+
+def parse_sse(body):
+    """把SSE响应体解析为 [(id, event, data)]，忽略心跳注释"""
+    events = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n') if not line.startswith(':'))
+        if fields:
+            events.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+    return events
+
+if __name__ == '__main__':
+    import app as web
+
+    # 事件只保留最近 event_limit 条，结束事件总在最后
+    job = web.ProcessJob('ring', '/tmp/a.txt', {}, event_limit=5)
+    for number in range(10):
+        job.emit('log', {'message': f'line {number}'})
+    job.finish({'success': True, 'total_chunks': 3})
+    assert len(job.events) == 5 and job.first_event == 6 and job.next_event == 11
+    first, events, status = job.wait_events(0, timeout=0)
+    assert first == 6 and status == 'done' and events[-1] == ('done', {'success': True, 'total_chunks': 3})
+    assert [data['message'] for _, data in events[:-1]] == [f'line {n}' for n in range(6, 10)]
+    assert job.wait_events(9, timeout=0)[1][0] == ('log', {'message': 'line 9'})
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        web.app.config['OUTPUT_FOLDER'] = temp_dir
+        web.results_index = ResultsIndex(temp_dir)
+        with web.app.test_client() as http:
+            # SSE：按序号推送，带Last-Event-ID重连时从下一条继续；被丢弃的事件直接跳过
+            web.jobs[job.job_id] = job
+            events = parse_sse(http.get('/events/ring').get_data(as_text=True))
+            assert [event_id for event_id, _, _ in events] == list(range(6, 11)) and events[-1][1] == 'done'
+            resumed = parse_sse(http.get('/events/ring', headers={'Last-Event-ID': '8'}).get_data(as_text=True))
+            assert [event_id for event_id, _, _ in resumed] == [9, 10]
+            assert http.get('/events/missing').status_code == 404
+
+            # 运行中的任务：先推送已有事件，结束后推送结束事件并断开
+            running = web.ProcessJob('running', '/tmp/b.txt', {}, event_limit=100)
+            running.status = 'running'
+            running.emit('progress', {'progress': 10, 'stage': '解析/加载文件'})
+            web.jobs[running.job_id] = running
+            response = http.get('/events/running', buffered=False)
+            stream = response.response
+            assert 'event: progress' in next(stream).decode('utf-8')
+            running.emit('chunk', {'chunk_index': 0})
+            running.finish({'success': False, 'message': '处理失败'})
+            rest = b''.join(stream).decode('utf-8')
+            assert [event for _, event, _ in parse_sse(rest)] == ['chunk', 'error']
+            response.close()
+
+            # 已结束的任务超过保留时间或个数后被移除，运行中的任务保留
+            web.app.config['MAX_FINISHED_JOBS'] = 2
+            now = time.time()
+            for number in range(4):
+                finished = web.ProcessJob(f'finished{number}', '/tmp/c.txt', {})
+                finished.finish({'success': True})
+                finished.finished_at = now - 10 * (4 - number)
+                web.jobs[finished.job_id] = finished
+            web.jobs['old'] = web.ProcessJob('old', '/tmp/d.txt', {})
+            web.jobs['old'].finish({'success': True})
+            web.jobs['old'].finished_at = now - web.app.config['JOB_TTL'] - 1
+            web.jobs['active'] = web.ProcessJob('active', '/tmp/e.txt', {})
+            del web.jobs['ring']
+            web.prune_jobs(now)
+            # running刚刚结束，与finished3是最近结束的两个
+            assert set(web.jobs) == {'active', 'running', 'finished3'}
+
+            # 分页读取结果：只解析所需的块，结果与完整解析后分页相同
+            document = {'document_id': 'doc', 'file_name': '含"引号"{括号}.txt', 'total_chunks': 120, 'ok': True,
+                        'page_content': '正文[' * 1000, 'metadata': {'pages': [{'page': 1, 'end': '}'}]},
+                        'chunks': [{'chunk_id': f'c{i}', 'page_content': f'块{i} "]}}', 'metadata': {'n': [i, None]}}
+                                   for i in range(120)]}
+            os.makedirs(os.path.join(temp_dir, 'run'))
+            path = os.path.join(temp_dir, 'run', 'final_doc.json')
+            with open(path, 'w', encoding='utf-8-sig') as f:
+                json.dump(document, f, ensure_ascii=False, indent=2)
+            index = JSONPageIndex(path)
+            assert len(index) == 120 and index.read_items(118, 10) == document['chunks'][118:]
+            page = http.get('/json/run/final_doc.json?offset=100&limit=15').get_json()
+            full = http.get('/json/run/final_doc.json').get_json()['data']
+            expected, pagination = web.load_json_page(full, 100, 15)
+            assert page['data'] == expected and page['pagination'] == pagination
+            assert page['pagination'] == {'offset': 100, 'limit': 15, 'total': 120, 'has_more': True}
+            assert page['data']['page_content_length'] == 3000
+            assert http.get('/json/run/final_doc.json?offset=500').get_json()['data']['chunks'] == []
+
+            # 不是文档的JSON退回完整解析；路径不能跳出输出目录
+            with open(os.path.join(temp_dir, 'run', 'list.json'), 'w', encoding='utf-8') as f:
+                json.dump([1, 2, 3], f)
+            assert http.get('/json/run/list.json?offset=0').get_json()['data'] == [1, 2, 3]
+            assert not http.get('/json/../' + os.path.basename(temp_dir) + '/../etc/passwd?offset=0').get_json()['success']
+
+    print("Web任务事件与分页测试通过")
@@ -0,0 +1,45 @@
+from src.pipeline.batch import run_batch, apply_ocr_results
+from src.utils.file_utils import JSONFileHandler
+from src.loaders.loaders import load_file
+import tempfile
+import os
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_dir = os.path.join(temp_dir, 'inputs')
+        os.makedirs(input_dir)
+        for i in range(6):
+            with open(os.path.join(input_dir, f'doc_{i}.txt'), 'w', encoding='utf-8') as f:
+                f.write("\n\n".join(f"文件{i}第{j}段，用于测试批量处理流水线。" * 4 for j in range(50)))
+        # 不支持的扩展名不会被目录展开收集
+        with open(os.path.join(input_dir, 'ignored.bin'), 'wb') as f:
+            f.write(b'\x00\x01')
+
+        summaries = {}
+        for mode in ['sync', 'async']:
+            kwargs = {'workers': 2, 'spool_dir': os.path.join(temp_dir, 'spool')} if mode == 'async' else {}
+            summaries[mode] = run_batch([input_dir], os.path.join(temp_dir, mode), mode=mode,
+                                        chunk_size=200, chunk_overlap=20, **kwargs)
+            summary = summaries[mode]
+            print(f"{mode}: 文件数 {summary['files']}, 成功 {summary['succeeded']}, 耗时 {summary['elapsed']:.2f}s")
+            assert summary['files'] == 6 and summary['failed'] == 0
+
+        # 两种模式的输出一致，暂存副本已清理，文档路径指向原始文件
+        for sync_result, async_result in zip(summaries['sync']['results'], summaries['async']['results']):
+            assert sync_result['chunks'] == async_result['chunks']
+            document = JSONFileHandler.load_document(async_result['output_path'])
+            assert document.file_path == async_result['file']
+            assert document.file_name == os.path.basename(async_result['file'])
+            assert 'chunk_stats' in document.metadata
+        assert os.listdir(os.path.join(temp_dir, 'spool')) == []
+
+        # OCR结果追加到正文
+        document = load_file(os.path.join(input_dir, 'doc_0.txt'))
+        with_ocr = apply_ocr_results(document, ["图像中的文字", RuntimeError("无法识别")])
+        assert "[IMAGE 1 TEXT]:\n图像中的文字" in with_ocr.page_content
+        assert "[IMAGE 2 ERROR]: 无法识别" in with_ocr.chunks[0].page_content
+        assert with_ocr.metadata['ocr_images'] == 2
+        # 初始块与正文共用同一个拼接结果
+        assert with_ocr.chunks[0].page_content is with_ocr.page_content
+
+    print("批量处理测试通过")
@@ -0,0 +1,85 @@
+from src.utils.cache_utils import LRUFileCache, ResultsIndex
+import tempfile
+import shutil
+import json
+import time
+import os
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+def settle(directory):
+    """把目录树的mtime调到一分钟前，模拟已经写完的目录"""
+    past = time.time_ns() - 60 * 1_000_000_000
+    for root, dirs, files in os.walk(directory):
+        os.utime(root, ns=(past, past))
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # LRU：按文件大小计容量，淘汰最久未使用的条目，文件改写后重新加载
+        loads, evicted = [], []
+        def loader(path):
+            loads.append(os.path.basename(path))
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        paths = []
+        for name in ('a', 'b', 'c'):
+            path = os.path.join(temp_dir, f'{name}.txt')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(name * 100)
+            paths.append(path)
+        cache = LRUFileCache(loader, max_bytes=250, on_evict=evicted.append)
+        assert cache.get(paths[0])[0] == 'a' * 100 and cache.get(paths[1])[0] == 'b' * 100
+        cache.get(paths[0])
+        cache.get(paths[2])
+        assert evicted == ['b' * 100] and cache.stats()['entries'] == 2 and cache.stats()['current_bytes'] == 200
+        assert loads == ['a.txt', 'b.txt', 'c.txt'] and cache.hits == 1
+        with open(paths[0], 'w', encoding='utf-8') as f:
+            f.write('x' * 120)
+        assert cache.get(paths[0])[0] == 'x' * 120 and evicted[1] == 'a' * 100
+        cache.invalidate()
+        assert cache.stats()['entries'] == 0 and len(evicted) == 4
+
+        # 结果索引：在register之外写入的文件在下次查询时出现
+        output = os.path.join(temp_dir, 'output')
+        write_json(os.path.join(output, 'full_process', 'a.json'), {'n': 1})
+        write_json(os.path.join(output, 'full_process', 'step1', 'x.json'), {'n': 2})
+        settle(output)
+        index = ResultsIndex(output)
+        files, version = index.list_files('full_process')
+        assert files == ['full_process/a.json', 'full_process/step1/x.json']
+        assert index.list_files('full_process') == (files, version)
+        assert index.list_files('full_process/step1')[0] == ['full_process/step1/x.json']
+        write_json(os.path.join(output, 'full_process', 'b.json'), {'n': 3})
+        write_json(os.path.join(output, 'full_process', 'step1', 'y.json'), {'n': 4})
+        files, new_version = index.list_files('full_process')
+        assert 'full_process/b.json' in files and 'full_process/step1/y.json' in files and new_version > version
+        # 刚写入的目录在稳定后只再扫描一次，文件不变时版本号不变
+        settle(output)
+        assert index.list_files('full_process')[1] == new_version
+        shutil.rmtree(os.path.join(output, 'full_process'))
+        assert index.list_files('full_process')[0] is None
+        assert index.list_files('missing')[0] is None
+
+        # Web接口：结果列表和JSON内容未变时返回304
+        import app as web
+        web.app.config['OUTPUT_FOLDER'] = output
+        web.results_index = ResultsIndex(output)
+        write_json(os.path.join(output, 'web_run', 'final_doc.json'),
+                   {'document_id': 'd', 'page_content': 'text', 'chunks': [{'chunk_id': f'c{i}'} for i in range(30)]})
+        with web.app.test_client() as http:
+            response = http.get('/results/web_run')
+            assert response.get_json()['json_files'] == ['web_run/final_doc.json'] and response.headers['ETag']
+            assert http.get('/results/web_run', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+            page = http.get('/json/web_run/final_doc.json?offset=10&limit=5')
+            assert [chunk['chunk_id'] for chunk in page.get_json()['data']['chunks']] == [f'c{i}' for i in range(10, 15)]
+            assert http.get('/json/web_run/final_doc.json?offset=10&limit=5',
+                            headers={'If-None-Match': page.headers['ETag']}).status_code == 304
+            # 新文件写入后ETag改变
+            write_json(os.path.join(output, 'web_run', 'step1_loaded', 'document.json'), {'n': 1})
+            changed = http.get('/results/web_run', headers={'If-None-Match': response.headers['ETag']})
+            assert changed.status_code == 200 and len(changed.get_json()['json_files']) == 2
+
+    print("缓存与结果索引测试通过")
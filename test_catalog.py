@@ -0,0 +1,74 @@
+from src.utils.file_utils import JSONFileHandler, SIDECAR_SUFFIX
+from src.utils.catalog import iter_catalog, matches, summarize_catalog, parse_date
+from src.utils.corpus import iter_document_paths
+from src.utils.models import Document, Chunk
+from src.pipeline.batch import write_payload
+from datetime import datetime
+import tempfile
+import json
+import os
+
+def make_document(index, file_type, loader_used, created_at, chunks=50):
+    text = f"文档{index}的内容。" * 100
+    return Document(
+        page_content=text, document_id=f"doc_{index:04d}", file_name=f"file{index}.{file_type}",
+        file_type=file_type, file_path=f"/data/file{index}.{file_type}",
+        chunks=[Chunk(page_content=text[:200], chunk_id=f"c{index}_{i}", chunk_size=200, chunk_overlap=0,
+                      chunk_method='fixed_size', metadata={}) for i in range(chunks)],
+        metadata={'processing_path': 'load'}, total_chunks=chunks, total_size=len(text),
+        created_at=created_at, loader_used=loader_used, loader_params={}
+    )
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # 保存文档时同时写入sidecar，读取元数据只读sidecar
+        document = make_document(0, 'pdf', 'PDFLoader', datetime(2025, 7, 1, 12))
+        path = JSONFileHandler.save_document(document, temp_dir, prefix='final')
+        assert os.path.exists(path + SIDECAR_SUFFIX)
+        assert os.path.getsize(path + SIDECAR_SUFFIX) < os.path.getsize(path) / 10
+        metadata = JSONFileHandler.get_document_metadata(path)
+        assert metadata['document_id'] == 'doc_0000' and metadata['total_chunks'] == 50
+        assert metadata['created_at'] == '2025-07-01T12:00:00' and metadata['processing_path'] == 'load'
+        # sidecar不会被当作文档扫描
+        assert [str(p) for p in iter_document_paths([temp_dir])] == [path]
+
+        # 文档被改写后sidecar过期，退回到读取整个文件
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            doc_dict = json.load(f)
+        doc_dict['total_chunks'] = 7
+        with open(path, 'w', encoding='utf-8-sig') as f:
+            json.dump(doc_dict, f, ensure_ascii=False)
+        assert JSONFileHandler.read_sidecar(path) is None
+        assert JSONFileHandler.get_document_metadata(path)['total_chunks'] == 7
+
+        # 没有sidecar的旧文档：backfill时补写sidecar
+        os.remove(path + SIDECAR_SUFFIX)
+        assert JSONFileHandler.get_document_metadata(path, backfill=True)['total_chunks'] == 7
+        assert JSONFileHandler.read_sidecar(path)['total_chunks'] == 7
+
+        # 批处理异步写出的结果同样带sidecar
+        batch_doc = make_document(1, 'txt', 'TextLoader', datetime(2025, 7, 20))
+        batch_path = write_payload(os.path.join(temp_dir, 'batch'), 'final_000001_doc.json',
+                                   JSONFileHandler.serialize_document(batch_doc),
+                                   JSONFileHandler.document_header(batch_doc))
+        assert JSONFileHandler.read_sidecar(batch_path)['file_type'] == 'txt'
+
+        # 编目：扫描大量输出并按类型、加载器、日期过滤
+        for index in range(2, 202):
+            file_type, loader = (('pdf', 'PDFLoader'), ('md', 'UnstructuredMarkdownLoader'),
+                                 ('txt', 'TextLoader'))[index % 3]
+            JSONFileHandler.save_document(make_document(index, file_type, loader, datetime(2025, 7, 1 + index % 28)),
+                                          os.path.join(temp_dir, 'runs', f'run{index % 5}'), prefix='final')
+        with open(os.path.join(temp_dir, 'runs', 'broken.json'), 'w') as f:
+            f.write('{not json')
+        entries = list(iter_catalog([temp_dir]))
+        assert len(entries) == 203 and sum('error' in entry for entry in entries) == 1
+        pdfs = [entry for entry in entries if matches(entry, file_type='.PDF', loader_used='PDFLoader')]
+        assert len(pdfs) == 68 and all(entry['file_type'] == 'pdf' for entry in pdfs)
+        week = [entry for entry in entries if matches(entry, since=parse_date('2025-07-10'), until=parse_date('2025-07-17'))]
+        assert week and all('2025-07-10' <= entry['created_at'] < '2025-07-17' for entry in week)
+        assert len(list(iter_catalog([temp_dir], prefix='final'))) == 202
+        summary = summarize_catalog(entries)
+        assert summary['documents'] == 202 and summary['errors'] == 1 and summary['file_types']['pdf'] == 68
+
+    print("元数据sidecar与编目测试通过")
@@ -0,0 +1,67 @@
+from src.utils.models import Document, Chunk
+from src.chunkers.chunkers import chunk_document
+from src.utils.chunk_stats import compute_chunk_stats, annotate_chunk_stats, ChunkStatsAggregator
+
+# 创建测试文档：段落内容各不相同，另含若干过短段落
+paragraphs = [f"第{i}段：这是用于测试分块统计的段落，编号{i * 7919 % 1000}。" * 3 for i in range(40)]
+paragraphs += ["短", "也短"]
+content = "\n\n".join(paragraphs)
+document = Document(
+    page_content=content,
+    document_id="doc_stats",
+    file_name="stats.txt",
+    file_type="txt",
+    file_path="/path/to/stats.txt",
+    chunks=[Chunk(
+        page_content=content,
+        chunk_id="chunk_0",
+        chunk_size=len(content),
+        chunk_overlap=0,
+        chunk_method="whole_document",
+        metadata={}
+    )],
+    total_chunks=1,
+    total_size=len(content),
+    metadata={},
+    loader_used="TextLoader",
+    loader_params={}
+)
+
+# 固定大小分块：有重叠、覆盖全文、没有重复块
+chunked = chunk_document(document, 'fixed_size', chunk_size=300, chunk_overlap=120)
+stats = annotate_chunk_stats(chunked)
+print(f"块数: {stats['chunk_count']}, 重叠率: {stats['overlap_ratio']:.3f}, 覆盖率: {stats['coverage_ratio']:.3f}")
+assert chunked.metadata['chunk_stats'] is stats
+assert stats['chunk_count'] == len(chunked.chunks)
+assert sum(stats['histogram'].values()) == stats['chunk_count']
+assert stats['overlap_ratio'] > 0
+assert stats['coverage_ratio'] > 0.95
+assert stats['duplicate_chunks'] == 0
+assert stats['max'] <= 300 and 'chunk_exceeds_chunk_size' not in stats['warnings']
+
+# 段落分块：过短段落被丢弃并记录
+para = chunk_document(document, 'paragraph')
+para_stats = compute_chunk_stats(para)
+print(f"段落块数: {para_stats['chunk_count']}, 丢弃段落: {para_stats['dropped_paragraphs']}")
+assert para_stats['dropped_paragraphs'] == 2
+assert para_stats['overlap_chars'] == 0
+
+# 重复块和空块
+duplicated = chunked.copy(update={'chunks': chunked.chunks + chunked.chunks[:5] + [chunked.chunks[0].copy(update={'page_content': '  '})]})
+dup_stats = compute_chunk_stats(duplicated)
+assert dup_stats['duplicate_chunks'] == 5
+assert dup_stats['empty_chunks'] == 1
+assert 'empty_chunks' in dup_stats['warnings']
+
+# 批量汇总
+aggregator = ChunkStatsAggregator()
+for item_stats, document_id in [(stats, 'a'), (para_stats, 'b'), (dup_stats, 'c')]:
+    aggregator.add(item_stats, document_id)
+summary = aggregator.summary()
+print(f"汇总块数: {summary['chunk_count']}, p50估算: {summary['p50_estimate']:.0f}, 告警: {summary['warning_counts']}")
+assert summary['documents'] == 3
+assert summary['chunk_count'] == stats['chunk_count'] + para_stats['chunk_count'] + dup_stats['chunk_count']
+assert sum(summary['histogram'].values()) == summary['chunk_count']
+assert 'c' in summary['flagged_documents']
+
+print("分块统计测试通过")
@@ -0,0 +1,75 @@
+from src.utils.models import Document, Chunk
+from src.utils.file_utils import JSONFileHandler
+from src.utils.corpus import merge_corpus, read_manifest, shard_paths, iter_shard_records, StreamingRechunker
+from src.chunkers.chunkers import chunk_document
+import tempfile
+import os
+
+# 创建若干测试文档
+def make_document(index):
+    content = "\n\n".join(f"文档{index}的第{i}段，内容用于测试语料合并。" for i in range(20))
+    return Document(
+        page_content=content,
+        document_id=f"doc_{index:04d}",
+        file_name=f"test_{index}.txt",
+        file_type="txt",
+        file_path=f"/path/to/test_{index}.txt",
+        chunks=[Chunk(
+            page_content=content,
+            chunk_id=f"chunk_{index}",
+            chunk_size=len(content),
+            chunk_overlap=0,
+            chunk_method="whole_document",
+            metadata={}
+        )],
+        total_chunks=1,
+        total_size=len(content),
+        metadata={},
+        loader_used="TextLoader",
+        loader_params={}
+    )
+
+with tempfile.TemporaryDirectory() as temp_dir:
+    input_dir = os.path.join(temp_dir, 'docs')
+    documents = [make_document(i) for i in range(30)]
+    for document in documents:
+        JSONFileHandler.save_document(document, input_dir, prefix=document.document_id)
+
+    # 测试merge_documents
+    merged = JSONFileHandler.merge_documents(documents[:3])
+    print(f"合并文档块数: {merged.total_chunks}, 总字符数: {merged.total_size}")
+    assert merged.total_chunks == 3
+
+    # 保留原有块，分片大小限制为4KB
+    manifest_path = merge_corpus([input_dir], os.path.join(temp_dir, 'plain'), shard_max_bytes=4096)
+    manifest = read_manifest(manifest_path)
+    print(f"分片数: {manifest['total_shards']}, 记录数: {manifest['total_records']}")
+    assert manifest['total_records'] == 30
+    assert manifest['total_shards'] > 1
+    assert all(shard['bytes'] <= 4096 for shard in manifest['shards'])
+
+    # 跨文档边界重新分块
+    manifest_path = merge_corpus([input_dir], os.path.join(temp_dir, 'rechunked'), rechunk=True,
+                                 chunking_strategy='fixed_size', chunk_size=200, chunk_overlap=0)
+    records = [record for path in shard_paths(manifest_path) for record in iter_shard_records(path)]
+    total_text = sum(len(document.page_content) for document in documents)
+    print(f"再分块记录数: {len(records)}")
+    assert all(record['chunk_size'] <= 200 for record in records)
+    assert sum(record['chunk_size'] for record in records) >= total_text * 0.95
+    assert any(len(record['source_document_ids']) > 1 for record in records)
+
+    # 已带重叠分块的输出再分块：按分块前的正文重建，重叠部分不会重复
+    chunked_dir = os.path.join(temp_dir, 'chunked')
+    for document in documents[:5]:
+        chunked = chunk_document(document, chunking_strategy='fixed_size', chunk_size=120, chunk_overlap=40)
+        assert sum(chunk.chunk_size for chunk in chunked.chunks) > len(document.page_content)
+        JSONFileHandler.save_document(chunked, chunked_dir, prefix=document.document_id)
+    rechunker = StreamingRechunker(chunking_strategy='fixed_size', chunk_size=200, chunk_overlap=0, flush_factor=10 ** 6)
+    for path in sorted(name for name in os.listdir(chunked_dir) if name.endswith('.json')):
+        assert not list(rechunker.feed(JSONFileHandler.load_document(os.path.join(chunked_dir, path))))
+    assert rechunker._buffer == "\n\n".join(document.page_content for document in documents[:5])
+    manifest_path = merge_corpus([chunked_dir], os.path.join(temp_dir, 'rechunked_overlap'), rechunk=True,
+                                 chunking_strategy='fixed_size', chunk_size=200, chunk_overlap=0)
+    records = [record for path in shard_paths(manifest_path) for record in iter_shard_records(path)]
+    assert sum(record['chunk_size'] for record in records) <= sum(len(d.page_content) for d in documents[:5])
+    print("语料合并测试通过")
@@ -0,0 +1,112 @@
+from src.embeddings.embeddings import (EmbedderFactory, HashEmbedder, embed_texts, embed_document, plan_batches,
+                                       embeddable_chunks)
+from src.embeddings.vector_cache import EmbeddingCache, content_hash
+from src.loaders.loaders import load_file
+from src.chunkers.chunkers import chunk_document
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import threading
+import tempfile
+import json
+import os
+
+class StubEmbeddingHandler(BaseHTTPRequestHandler):
+    """OpenAI兼容接口的测试桩：第一次请求返回429，超过8条的请求返回413"""
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        StubEmbeddingHandler.requests.append(len(body['input']))
+        if len(StubEmbeddingHandler.requests) == 1:
+            self._reply(429, {'error': 'rate limited'})
+        elif len(body['input']) > 8:
+            self._reply(413, {'error': 'too many inputs'})
+        else:
+            vectors = HashEmbedder(dimension=32).embed_texts(body['input'])
+            # 打乱顺序，客户端应按index还原
+            data = [{'index': i, 'embedding': vectors[i].tolist()} for i in range(len(vectors))][::-1]
+            self._reply(200, {'data': data, 'model': body['model']})
+
+    def _reply(self, status, payload):
+        content = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+if __name__ == '__main__':
+    # 本地确定性嵌入：相同文本向量相同，词汇重叠越多越相似
+    embedder = HashEmbedder(dimension=128)
+    vectors = embedder.embed_texts(["机器学习模型的训练", "机器学习模型的训练", "训练机器学习模型", "今天天气很好"])
+    assert np.allclose(vectors[0], vectors[1]) and np.isclose(np.linalg.norm(vectors[0]), 1.0)
+    assert vectors[0] @ vectors[2] > vectors[0] @ vectors[3]
+
+    # 按token数分批
+    batches = plan_batches(["word " * 30, "word " * 30, "word " * 50, "short"], max_batch_tokens=60)
+    assert batches == [[0, 1], [2, 3]], batches
+    assert plan_batches(["a"] * 10, max_batch_size=4) == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache_dir = os.path.join(temp_dir, 'embeddings')
+        texts = [f"第{i}段：检索增强生成中的向量缓存。" for i in range(20)] + ["重复的段落"] * 5
+        cache = EmbeddingCache(cache_dir, embedder.model_name)
+        first, stats = embed_texts(texts, embedder, cache, max_batch_tokens=50, concurrency=3)
+        assert stats['cache_hits'] == 0 and stats['embedded'] == 21 and stats['batches'] > 1
+        # float16存储，每个向量占 维度*2 字节
+        assert os.path.getsize(cache.vector_path) == 21 * 128 * 2
+
+        # 重新打开缓存：全部命中，不再计算
+        cache = EmbeddingCache(cache_dir, embedder.model_name)
+        second, stats = embed_texts(texts, embedder, cache)
+        assert stats['cache_hits'] == len(texts) and stats['embedded'] == 0 and stats['batches'] == 0
+        assert np.array_equal(first, second)
+        assert np.allclose(second[0], embedder.embed_texts(texts[:1])[0], atol=1e-3)
+
+        # 写到一半中断：多余的向量字节和不完整的键行在打开时被丢弃
+        with open(cache.vector_path, 'ab') as f:
+            f.write(b'\x00' * 100)
+        with open(cache.keys_path, 'a', encoding='utf-8') as f:
+            f.write('deadbeef')
+        cache = EmbeddingCache(cache_dir, embedder.model_name)
+        assert len(cache) == 21 and os.path.getsize(cache.vector_path) == 21 * 128 * 2
+        assert embed_texts(texts + ["新段落"], embedder, cache)[1]['embedded'] == 1
+
+        # 文档嵌入：层级分块只嵌入叶子块
+        file_path = os.path.join(temp_dir, 'doc.txt')
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write("\n\n".join(f"第{i}段。向量检索需要先嵌入每个块。" * 4 for i in range(10)))
+        chunked = chunk_document(load_file(file_path), 'hierarchical', chunk_size=60, chunk_overlap=10)
+        leaves = embeddable_chunks(chunked)
+        assert leaves and all(chunked.chunks[i].metadata['is_leaf'] for i in leaves)
+        embedded = embed_document(chunked, embedder, cache)
+        info = embedded.metadata['embedding']
+        assert info['embedded_chunks'] == len(leaves) and info['dimension'] == 128
+        leaf = embedded.chunks[leaves[0]]
+        assert leaf.metadata['embedding_key'] == content_hash(leaf.page_content)
+        assert all('embedding_key' not in chunk.metadata for chunk in embedded.chunks
+                   if not chunk.metadata['is_leaf'])
+        assert embed_document(chunked, embedder, cache).metadata['embedding']['embedded'] == 0
+
+        # OpenAI兼容接口：限流后重试，请求过大时拆分批次，结果按index还原
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubEmbeddingHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            remote = EmbedderFactory.get_embedder('openai', model='stub-model',
+                                                  base_url=f'http://127.0.0.1:{server.server_port}/v1')
+            remote_cache = EmbeddingCache(cache_dir, remote.model_name)
+            sample = texts[:12]
+            vectors, stats = embed_texts(sample, remote, remote_cache, concurrency=1)
+            assert stats['embedded'] == 12 and vectors.shape == (12, 32)
+            assert np.allclose(vectors, HashEmbedder(dimension=32).embed_texts(sample), atol=1e-3)
+            assert StubEmbeddingHandler.requests[:3] == [12, 12, 6]
+            count = len(StubEmbeddingHandler.requests)
+            embed_texts(sample, remote, EmbeddingCache(cache_dir, remote.model_name))
+            assert len(StubEmbeddingHandler.requests) == count
+        finally:
+            server.shutdown()
+
+    print("嵌入测试通过")
@@ -0,0 +1,108 @@
+from src.loaders.loaders import (sniff_file_type, detect_file_type, load_file, FileLoaderFactory,
+                                 DocxLoader, XlsxLoader, PptxLoader, HtmlLoader, CustomTextLoader)
+import tempfile
+import zipfile
+import os
+
+OLE_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+def write_zip(path, members):
+    with zipfile.ZipFile(path, 'w') as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return path
+
+def write_bytes(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+def make_xlsx(path):
+    return write_zip(path, {
+        '[Content_Types].xml': '<Types/>',
+        'xl/workbook.xml': '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                           'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                           '<sheets><sheet name="销售" sheetId="1" r:id="rId1"/></sheets></workbook>',
+        'xl/_rels/workbook.xml.rels': '<Relationships><Relationship Id="rId1" Target="worksheets/sheet1.xml"/>'
+                                      '</Relationships>',
+        'xl/sharedStrings.xml': '<sst><si><t>地区</t></si><si><t>华东</t></si></sst>',
+        'xl/worksheets/sheet1.xml': '<worksheet><sheetData>'
+                                    '<row><c t="s"><v>0</v></c><c t="inlineStr"><is><t>金额</t></is></c></row>'
+                                    '<row><c t="s"><v>1</v></c><c><v>42</v></c></row>'
+                                    # 稀疏行：空单元格被省略，值按单元格引用放回对应的列
+                                    '<row r="3"><c r="B3"><v>7</v></c></row>'
+                                    '<row r="4"><c r="A4" t="inlineStr"><is><t>华南</t></is></c>'
+                                    '<c r="AB4"><v>9</v></c></row>'
+                                    '</sheetData></worksheet>',
+    })
+
+def make_pptx(path):
+    slide = '<p:sld xmlns:p="p" xmlns:a="a"><a:p><a:r><a:t>{}</a:t></a:r><a:r><a:t>{}</a:t></a:r></a:p></p:sld>'
+    return write_zip(path, {
+        '[Content_Types].xml': '<Types/>',
+        'ppt/presentation.xml': '<presentation/>',
+        'ppt/slides/slide2.xml': slide.format('第二', '页'),
+        'ppt/slides/slide10.xml': slide.format('第十', '页'),
+        'ppt/slides/slide1.xml': slide.format('标题', '页'),
+    })
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = lambda name: os.path.join(temp_dir, name)
+        docx = write_zip(path('a.docx'), {'[Content_Types].xml': '<Types/>', 'word/document.xml': '<document/>'})
+        xlsx = make_xlsx(path('a.xlsx'))
+        pptx = make_pptx(path('a.pptx'))
+        html = write_bytes(path('a.html'), '<!DOCTYPE html><html><head><title>标题</title><style>p{}</style>'
+                                           '</head><body><p>第一段</p><script>var x;</script><p>第二段</p>'
+                                           '</body></html>'.encode('utf-8'))
+        text = write_bytes(path('a.txt'), '普通文本'.encode('utf-8'))
+        ole = write_bytes(path('a.doc'), OLE_MAGIC + b'\x00' * 512)
+
+        # 按魔数识别格式
+        assert [sniff_file_type(p) for p in (docx, xlsx, pptx, html, text, ole)] == \
+               ['docx', 'xlsx', 'pptx', 'html', 'text', 'ole']
+        assert sniff_file_type(write_zip(path('other.zip'), {'readme.txt': 'x'})) is None
+        assert sniff_file_type(path('missing.pdf')) is None
+
+        # 扩展名错误的文件按内容路由到对应的加载器
+        misnamed = {
+            write_zip(path('report.pdf'), {'word/document.xml': '<document/>'}): ('docx', DocxLoader),
+            make_xlsx(path('table.docx')): ('xlsx', XlsxLoader),
+            make_pptx(path('slides.bin')): ('pptx', PptxLoader),
+            write_bytes(path('page.txt'), b'<html><body>x</body></html>'): ('txt', CustomTextLoader),
+            write_bytes(path('page.dat'), b'<html><body>x</body></html>'): ('html', HtmlLoader),
+            write_bytes(path('notes.pdf'), b'plain text'): ('txt', CustomTextLoader),
+            write_bytes(path('notes.xyz'), b'plain text'): ('txt', CustomTextLoader),
+        }
+        for file_path, (file_type, loader_cls) in misnamed.items():
+            loader = FileLoaderFactory.get_loader(file_path)
+            assert detect_file_type(file_path) == file_type and type(loader) is loader_cls, file_path
+
+        # 旧版Office二进制格式明确拒绝，不交给只能读取docx的加载器
+        for name, file_type in (('a.doc', 'doc'), ('a.xls', 'xls'), ('a.ppt', 'ppt'), ('a.docx', 'ole')):
+            file_path = write_bytes(path(f'ole_{name}'), OLE_MAGIC + b'\x00' * 512)
+            assert detect_file_type(file_path) == file_type
+            try:
+                load_file(file_path)
+                assert False, "应当拒绝旧版Office格式"
+            except ValueError as e:
+                assert '旧版Office' in str(e) and file_type in str(e)
+
+        # xlsx：按工作表输出，每行以制表符连接，共享字符串和内联字符串都能读取
+        document = load_file(xlsx)
+        lines = document.page_content.split('\n')
+        assert lines[:4] == ["## 销售", "地区\t金额", "华东\t42", "\t7"]
+        assert lines[4].split('\t') == ['华南'] + [''] * 26 + ['9']
+        assert document.metadata['total_sheets'] == 1 and document.metadata['total_rows'] == 4
+
+        # pptx：幻灯片按编号的数值顺序排列
+        document = load_file(pptx)
+        assert document.page_content == "## Slide 1\n标题页\n\n## Slide 2\n第二页\n\n## Slide 3\n第十页"
+        assert document.metadata['total_slides'] == 3
+
+        # html：跳过脚本和样式，标题写入元数据
+        document = load_file(html)
+        assert document.page_content == "第一段\n\n第二段" and document.metadata['title'] == '标题'
+        assert document.file_type == 'html'
+
+    print("文件类型识别与加载器测试通过")
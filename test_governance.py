@@ -0,0 +1,142 @@
+from src.utils.resource_limits import ResourceBudget, BudgetExceeded, StageError, run_with_budget
+from src.pipeline import governance
+from src.pipeline.governance import load_document_governed, load_text
+from src.pipeline.batch import run_batch
+import subprocess
+import tempfile
+import time
+import sys
+import os
+
+def slow_step(file_path, options):
+    time.sleep(30)
+
+def greedy_step(file_path, options):
+    blocks = []
+    while True:
+        blocks.append(bytearray(64 * 1024 * 1024))
+        time.sleep(0.05)
+
+def spawning_step(pid_file, program):
+    """启动一个孙进程执行program并等待，孙进程的pid写入pid_file"""
+    grandchild = subprocess.Popen([sys.executable, '-c', program])
+    with open(pid_file, 'w') as f:
+        f.write(str(grandchild.pid))
+    grandchild.wait()
+
+def alive(pid):
+    """进程存在且不是僵尸进程"""
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except OSError:
+        return False
+
+def wait_gone(pid, timeout=5):
+    deadline = time.monotonic() + timeout
+    while alive(pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return not alive(pid)
+
+def failing_step(file_path, options):
+    raise ValueError("无法解析")
+
+def picky_step(file_path, options):
+    if 'bad' in os.path.basename(file_path):
+        raise ValueError("无法解析")
+    return load_text(file_path, options)
+
+if __name__ == '__main__':
+    # 超时：子进程被终止，调用方不会被卡住
+    start = time.monotonic()
+    try:
+        run_with_budget(slow_step, ('x', {}), budget=ResourceBudget(time_limit=1))
+        assert False, "应当超时"
+    except BudgetExceeded as e:
+        assert e.kind == 'time'
+    assert time.monotonic() - start < 10
+
+    # 超内存
+    try:
+        run_with_budget(greedy_step, ('x', {}), budget=ResourceBudget(time_limit=30, memory_limit_mb=256))
+        assert False, "应当超出内存预算"
+    except BudgetExceeded as e:
+        assert e.kind == 'memory' and e.peak_rss_mb > 256
+        print(f"内存超限: 峰值 {e.peak_rss_mb:.0f}MB")
+
+    # 孙进程：内存计入整个进程树，超出预算或超时时与子进程一起被终止
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pid_file = os.path.join(temp_dir, 'grandchild.pid')
+        greedy = "import time\nblocks = []\nwhile True:\n    blocks.append(bytearray(64 * 1024 * 1024))\n    time.sleep(0.05)"
+        try:
+            run_with_budget(spawning_step, (pid_file, greedy), budget=ResourceBudget(time_limit=30, memory_limit_mb=256))
+            assert False, "孙进程的内存应当计入预算"
+        except BudgetExceeded as e:
+            assert e.kind == 'memory' and e.peak_rss_mb > 256
+        with open(pid_file) as f:
+            assert wait_gone(int(f.read()))
+        try:
+            run_with_budget(spawning_step, (pid_file, "import time\ntime.sleep(60)"), budget=ResourceBudget(time_limit=1))
+            assert False, "应当超时"
+        except BudgetExceeded as e:
+            assert e.kind == 'time'
+        with open(pid_file) as f:
+            assert wait_gone(int(f.read()))
+
+    # 普通异常带回原始类型
+    try:
+        run_with_budget(failing_step, ('x', {}), budget=ResourceBudget(time_limit=10))
+        assert False, "应当抛出StageError"
+    except StageError as e:
+        assert e.error_type == 'ValueError' and "无法解析" in str(e)
+
+    # 未设置预算时在当前进程执行
+    assert run_with_budget(sum, ([1, 2, 3],)) == 6
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, 'doc.txt')
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write("\n\n".join(f"第{i}段，用于测试资源预算和降级处理。" * 3 for i in range(20)))
+
+        # 正常路径不记录降级
+        document, images = load_document_governed(file_path, budget=ResourceBudget(time_limit=30))
+        assert document.metadata['processing_path'] == 'load' and not document.metadata['degraded']
+        assert images == []
+
+        # 降级链按内容识别的类型选择：改名为.pdf的文本文件直接加载，不尝试PDF解析
+        misnamed = os.path.join(temp_dir, 'misnamed.pdf')
+        with open(misnamed, 'w', encoding='utf-8') as f:
+            f.write("扩展名错误的纯文本文件。")
+        document, _ = load_document_governed(misnamed, budget=ResourceBudget(time_limit=30))
+        assert document.metadata['processing_path'] == 'load' and not document.metadata['degraded']
+        assert document.file_type == 'txt'
+        os.remove(misnamed)
+
+        # 降级链：超时 -> 异常 -> 文本加载
+        governance.FALLBACK_CHAINS['txt'] = [('slow', slow_step), ('failing', failing_step), ('text', load_text)]
+        document, _ = load_document_governed(file_path, budget=ResourceBudget(time_limit=1))
+        degradations = document.metadata['degradations']
+        assert document.metadata['processing_path'] == 'text' and document.metadata['degraded']
+        assert [item['reason'] for item in degradations] == ['time', 'error']
+        assert document.metadata['resource_budget'] == {'time_limit': 1, 'memory_limit_mb': None}
+        assert "第0段" in document.page_content
+        print(f"降级记录: {degradations}")
+
+        # 所有路径都失败时抛出异常，批处理中只有该文件失败
+        governance.FALLBACK_CHAINS['txt'] = [('failing', failing_step)]
+        try:
+            load_document_governed(file_path, budget=ResourceBudget(time_limit=5))
+            assert False, "应当失败"
+        except RuntimeError as e:
+            assert "failing" in str(e)
+        governance.FALLBACK_CHAINS['txt'] = [('picky', picky_step)]
+        os.rename(file_path, os.path.join(temp_dir, 'bad.txt'))
+        with open(os.path.join(temp_dir, 'good.txt'), 'w', encoding='utf-8') as f:
+            f.write("正文内容。" * 20)
+        summary = run_batch([temp_dir], os.path.join(temp_dir, 'out'), mode='sync',
+                            budget=ResourceBudget(time_limit=30), chunk_size=100, chunk_overlap=10)
+        statuses = {os.path.basename(result['file']): result['status'] for result in summary['results']}
+        assert statuses == {'good.txt': 'done', 'bad.txt': 'failed'}
+        del governance.FALLBACK_CHAINS['txt']
+
+    print("资源预算测试通过")
@@ -0,0 +1,87 @@
+from src.utils.models import Document, Chunk
+from src.chunkers.chunkers import chunk_document, chunk_text, ChunkerFactory
+from src.utils.chunk_stats import compute_chunk_stats
+from src.utils.text_detection import count_tokens
+
+# 创建带标题的测试文档
+sections = []
+for i in range(3):
+    body = "\n\n".join(f"第{i}节第{j}段。" + "这是层级分块测试用的句子。" * (j * 10 + 1) for j in range(4))
+    sections.append(f"# 标题{i}\n\n{body}")
+content = "\n\n".join(sections)
+document = Document(
+    page_content=content,
+    document_id="doc_hierarchical",
+    file_name="hierarchical.md",
+    file_type="md",
+    file_path="/path/to/hierarchical.md",
+    chunks=[Chunk(
+        page_content=content,
+        chunk_id="chunk_0",
+        chunk_size=len(content),
+        chunk_overlap=0,
+        chunk_method="whole_document",
+        metadata={}
+    )],
+    total_chunks=1,
+    total_size=len(content),
+    metadata={},
+    loader_used="TextLoader",
+    loader_params={}
+)
+
+chunked = chunk_document(document, 'hierarchical', chunk_size=200, chunk_overlap=20)
+levels = chunked.metadata['hierarchy_levels']
+print(f"章节: {levels['section']}, 段落: {levels['paragraph']}, 窗口: {levels['window']}")
+assert levels['section'] == 3
+assert levels['paragraph'] == 12
+
+by_id = {chunk.chunk_id: chunk for chunk in chunked.chunks}
+for chunk in chunked.chunks:
+    metadata = chunk.metadata
+    start, end = metadata['start_offset'], metadata['end_offset']
+    # 父块不存文本，叶子块文本与偏移一致
+    if metadata['is_leaf']:
+        assert chunk.page_content == content[start:end]
+        assert len(chunk.page_content) <= 200
+    else:
+        assert chunk.page_content == ''
+        assert chunk_text(chunked, chunk) == content[start:end]
+    # 子块落在父块范围内，且父块记录了子块
+    if metadata['parent_id']:
+        parent = by_id[metadata['parent_id']]
+        assert parent.metadata['start_offset'] <= start and end <= parent.metadata['end_offset']
+        assert chunk.chunk_id in parent.metadata['children_ids']
+
+# 先序排列：每个子块都出现在父块之后
+positions = {chunk.chunk_id: index for index, chunk in enumerate(chunked.chunks)}
+assert all(positions[chunk.metadata['parent_id']] < index
+           for index, chunk in enumerate(chunked.chunks) if chunk.metadata['parent_id'])
+
+# 统计只计算叶子块
+stats = compute_chunk_stats(chunked)
+assert stats['chunk_count'] == levels['window'] and stats['empty_chunks'] == 0
+
+# split_text只返回叶子窗口文本
+windows = ChunkerFactory.get_chunker('hierarchical', chunk_size=200, chunk_overlap=20).split_text(content)
+assert windows == [chunk.page_content for chunk in chunked.chunks if chunk.metadata['is_leaf']]
+
+# 窗口大小按unit计量：token单位下每个叶子窗口不超过chunk_size个token，而不是chunk_size个字符
+english = "\n\n".join(
+    f"# Chapter {i}\n\n" + "\n\n".join(
+        f"Paragraph {j} of chapter {i}. " + "Hierarchical windows are measured in tokens here. " * (j * 6 + 1)
+        for j in range(4))
+    for i in range(2))
+english_document = document.copy(update={'page_content': english, 'document_id': 'doc_tokens', 'metadata': {}})
+for unit in ('tokens', 'auto'):
+    chunked = chunk_document(english_document, 'hierarchical', chunk_size=40, chunk_overlap=5, unit=unit)
+    leaves = [chunk.page_content for chunk in chunked.chunks if chunk.metadata['is_leaf']]
+    assert chunked.metadata['chunking_unit'] == 'tokens' and chunked.metadata['chunking_language'] == 'latin'
+    assert all(count_tokens(leaf) <= 40 for leaf in leaves), max(map(count_tokens, leaves))
+    # 不超过40个token的段落保持为一个窗口，即使超过40个字符
+    assert any(len(leaf) > 200 for leaf in leaves)
+    assert any(count_tokens(leaf) > 30 for leaf in leaves)
+    windows = ChunkerFactory.get_chunker('hierarchical', chunk_size=40, chunk_overlap=5, unit=unit).split_text(english)
+    assert windows == leaves
+
+print("层级分块测试通过")
@@ -0,0 +1,102 @@
+from src.retrieval.index import ExactIndex, load_index
+from src.retrieval.keyword import BM25Index, tokenize
+from src.retrieval.hybrid import HybridSearcher, reciprocal_rank_fusion, run_query_load, sample_queries
+from src.embeddings.embeddings import HashEmbedder
+from src.utils.cache_utils import TTLCache, LRUFileCache
+import tempfile
+import time
+import os
+
+TEXTS = [
+    "检索增强生成先把文档切分成块，再为每个块计算向量。",
+    "BM25是经典的关键词检索算法，按词频和逆文档频率打分。",
+    "向量检索按余弦相似度返回语义相近的块。",
+    "Tesseract OCR can extract text from scanned PDF pages.",
+    "今天的天气晴朗，适合外出散步。",
+    "错误码E1024表示索引文件损坏，需要重新建立索引。",
+]
+
+if __name__ == '__main__':
+    # 分词：英文按单词，中文按相邻二字，标点处断开
+    assert tokenize("BM25检索，OCR") == ['bm25', '检索', 'ocr']
+
+    # BM25：精确的关键词（如错误码）排在最前
+    keyword = BM25Index([f'c{i}' for i in range(len(TEXTS))], TEXTS)
+    hits = keyword.search("E1024 是什么错误")
+    assert hits[0][0] == 'c5', hits
+    assert keyword.search("完全无关的词汇xyz") == []
+
+    # 倒数排名融合：两种检索都靠前的块排第一
+    fused = reciprocal_rank_fusion({'vector': ['a', 'b', 'c'], 'keyword': ['b', 'd']})
+    assert fused[0][0] == 'b' and {chunk_id for chunk_id, _ in fused} == {'a', 'b', 'c', 'd'}
+
+    # TTL缓存：过期后未命中，版本变化时清空，旧版本的计算结果不写入
+    cache = TTLCache(max_entries=2, ttl=0.05)
+    cache.put('q', 1)
+    assert cache.get('q') == (True, 1)
+    time.sleep(0.06)
+    assert cache.get('q') == (False, None)
+    cache.get('x', fingerprint='v1')
+    cache.put('x', 1, fingerprint='v1')
+    assert cache.get('x', fingerprint='v1')[0] and not cache.get('x', fingerprint='v2')[0]
+    cache.put('y', 2, fingerprint='v1')
+    assert not cache.get('y', fingerprint='v2')[0]
+
+    embedder = HashEmbedder(dimension=128)
+    index = ExactIndex(128, model=embedder.model_name)
+    index.add([f'c{i}' for i in range(len(TEXTS))], embedder.embed_texts(TEXTS),
+              [{'text': text, 'file_name': f'{i}.txt'} for i, text in enumerate(TEXTS)])
+    searcher = HybridSearcher(index, embedder)
+
+    # 混合检索：结果带两种检索的排名，关键词命中的错误码块排在最前
+    results = searcher.search("错误码E1024", top_k=3)
+    assert results[0]['chunk_id'] == 'c5' and results[0]['keyword_rank'] == 1
+    assert results[0]['vector_rank'] is not None and results[0]['text'] == TEXTS[5]
+    assert all(result['vector_rank'] is None for result in searcher.search("E1024", mode='keyword'))
+    assert all(result['keyword_rank'] is None for result in searcher.search("检索", mode='vector'))
+
+    # 重复查询命中缓存；索引变化后缓存失效，关键词索引随之重建
+    hits_before = searcher.cache.hits
+    assert searcher.search("错误码E1024", top_k=3) == results
+    assert searcher.cache.hits == hits_before + 1
+    index.add(['c6'], embedder.embed_texts(["新增：错误码E1024的修复步骤"]), [{'text': "新增：错误码E1024的修复步骤"}])
+    updated = searcher.search("错误码E1024", top_k=3)
+    assert 'c6' in [result['chunk_id'] for result in updated]
+    index.delete(['c5'])
+    assert 'c5' not in [result['chunk_id'] for result in searcher.search("错误码E1024", top_k=3)]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # 版本号随索引保存，重新加载后不变
+        index.save(temp_dir)
+        assert load_index(temp_dir).revision == index.revision
+
+        # 索引更新后缓存中的旧检索器被关闭，仍在使用它的请求照常完成
+        closed = []
+        def close_searcher(old):
+            old.close()
+            closed.append(old)
+        searchers = LRUFileCache(lambda meta_path: HybridSearcher(load_index(os.path.dirname(meta_path)), embedder),
+                                 on_evict=close_searcher)
+        meta_path = os.path.join(temp_dir, 'index.meta')
+        first, _ = searchers.get(meta_path)
+        index.add(['c7'], embedder.embed_texts(["再次更新的索引"]), [{'text': "再次更新的索引"}])
+        index.save(temp_dir)
+        os.utime(meta_path, ns=(time.time_ns(), time.time_ns() + 10_000_000))
+        second, _ = searchers.get(meta_path)
+        assert second is not first and closed == [first]
+        assert first.search("错误码E1024", top_k=3)
+        searchers.invalidate()
+        assert closed == [first, second]
+
+    # 压测：报告分位数和缓存命中率
+    queries = sample_queries(index, 5, length=6)
+    assert len(queries) == 5 and all(queries)
+    report = run_query_load(searcher, queries, requests=200, concurrency=4)
+    assert report['errors'] == 0 and report['requests'] == 200
+    assert report['p50_ms'] <= report['p95_ms'] <= report['p99_ms'] <= report['max_ms']
+    assert report['cache_hit_rate'] >= 0.9
+    print(f"压测: 吞吐量 {report['throughput']:.0f} 次/秒, p95 {report['p95_ms']:.2f} ms, "
+          f"缓存命中率 {report['cache_hit_rate']:.1%}")
+    searcher.close()
+
+    print("混合检索测试通过")
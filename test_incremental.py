@@ -0,0 +1,75 @@
+from src.utils.models import Document, Chunk
+from src.chunkers.incremental import rechunk_document, diff_equal_blocks
+import tempfile
+
+# 创建测试文档
+def make_document(text):
+    return Document(
+        page_content=text,
+        document_id="doc_incremental",
+        file_name="incremental.txt",
+        file_type="txt",
+        file_path="/path/to/incremental.txt",
+        chunks=[Chunk(
+            page_content=text,
+            chunk_id="chunk_0",
+            chunk_size=len(text),
+            chunk_overlap=0,
+            chunk_method="whole_document",
+            metadata={}
+        )],
+        total_chunks=1,
+        total_size=len(text),
+        metadata={},
+        loader_used="TextLoader",
+        loader_params={}
+    )
+
+# 测试行级差异
+blocks = diff_equal_blocks("a\nb\nc\nd\n", "a\nX\nc\nd\ne\n")
+print(f"未改动区间: {blocks}")
+assert blocks == [(0, 2, 0), (4, 8, 4)]
+
+paragraphs = [f"第{i}段：这是用于测试增量分块的段落，编号{i * 7919 % 1000}。\n第二行内容{i}。" for i in range(300)]
+
+with tempfile.TemporaryDirectory() as lineage_dir:
+    for strategy in ['fixed_size', 'sentence', 'paragraph']:
+        first = rechunk_document(make_document("\n\n".join(paragraphs)), strategy,
+                                 lineage_dir=lineage_dir, lineage_id=strategy, chunk_size=300, chunk_overlap=50)
+        assert first.metadata['incremental']['full_rechunk']
+
+        # 修改一段并在后面插入一段
+        edited = list(paragraphs)
+        edited[100] = "这一段被修改过了，内容完全不同。"
+        edited.insert(200, "这是新插入的一段内容，长度超过十个字。")
+        second = rechunk_document(make_document("\n\n".join(edited)), strategy,
+                                  lineage_dir=lineage_dir, lineage_id=strategy, chunk_size=300, chunk_overlap=50)
+        incremental = second.metadata['incremental']
+        print(f"{strategy}: 复用 {incremental['reused_chunks']}, 新增 {incremental['new_chunks']}, "
+              f"移除 {len(incremental['removed_chunk_ids'])}, 重新分块字符数 {incremental['rechunked_chars']}")
+
+        assert incremental['version'] == 2 and not incremental['full_rechunk']
+        assert second.document_id == first.document_id
+        assert incremental['reused_chunks'] >= len(first.chunks) - 4
+        assert incremental['rechunked_chars'] < len(second.page_content) // 10
+        # 未改动的块保留原ID，所有块的偏移与原文一致
+        first_ids = {chunk.chunk_id for chunk in first.chunks}
+        assert sum(chunk.chunk_id in first_ids for chunk in second.chunks) == incremental['reused_chunks']
+        for chunk in second.chunks:
+            start, end = chunk.metadata['start_offset'], chunk.metadata['end_offset']
+            assert second.page_content[start:end] == chunk.page_content
+        assert any("新插入的一段" in chunk.page_content for chunk in second.chunks)
+
+        # 参数改变时全量分块
+        third = rechunk_document(make_document("\n\n".join(edited)), strategy,
+                                 lineage_dir=lineage_dir, lineage_id=strategy, chunk_size=500, chunk_overlap=50)
+        assert third.metadata['incremental']['full_rechunk']
+
+    # 层级分块的父子结构无法按区间局部重建，不支持增量分块
+    try:
+        rechunk_document(make_document("\n\n".join(edited)), 'hierarchical', lineage_dir=lineage_dir)
+        assert False, "应当拒绝层级分块"
+    except ValueError:
+        pass
+
+print("增量分块测试通过")
@@ -0,0 +1,81 @@
+from src.pipeline.batch import run_batch
+from src.pipeline.ledger import JobLedger, format_status
+import tempfile
+import sqlite3
+import time
+import os
+
+def results_by_name(summary):
+    return {os.path.basename(result['file']): result for result in summary['results']}
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_dir = os.path.join(temp_dir, 'inputs')
+        os.makedirs(input_dir)
+        for i in range(4):
+            with open(os.path.join(input_dir, f'doc_{i}.txt'), 'w', encoding='utf-8') as f:
+                f.write("\n\n".join(f"文件{i}第{j}段，用于测试任务台账。" * 3 for j in range(20)))
+        # 无法解码的文本文件，每次都会失败
+        with open(os.path.join(input_dir, 'broken.txt'), 'wb') as f:
+            f.write(b'\xff\xfe\x00\xd8\xff')
+
+        for mode in ['sync', 'async']:
+            output_dir = os.path.join(temp_dir, f'out_{mode}')
+            ledger_path = os.path.join(output_dir, 'ledger.sqlite')
+            options = {'mode': mode, 'ledger_path': ledger_path, 'max_retries': 2, 'retry_backoff': 0.05,
+                       'chunk_size': 200, 'chunk_overlap': 20}
+            if mode == 'async':
+                options['workers'] = 2
+
+            # 首次运行：失败文件重试2次后放弃
+            start = time.perf_counter()
+            summary = run_batch([input_dir], output_dir, **options)
+            results = results_by_name(summary)
+            assert summary['succeeded'] == 4 and summary['failed'] == 1
+            with JobLedger(ledger_path) as ledger:
+                status = ledger.status()
+            assert status['counts'] == {'done': 4, 'failed': 1}
+            assert status['failures'][0]['attempts'] == 3
+            # 退避等待 0.05 + 0.1
+            assert time.perf_counter() - start >= 0.15
+            print(format_status(status))
+
+            # 再次运行：已完成文件跳过，已用完重试次数的文件不再处理
+            summary = run_batch([input_dir], output_dir, **options)
+            assert summary['skipped'] == 4 and summary['succeeded'] == 0 and summary['failed'] == 1
+            assert results_by_name(summary)['broken.txt'].get('retries_exhausted')
+
+            # 修改一个文件：只重新处理该文件，覆盖原来的结果
+            old_output = results['doc_1.txt']['output_path']
+            with open(os.path.join(input_dir, 'doc_1.txt'), 'a', encoding='utf-8') as f:
+                f.write("\n\n新增的段落。")
+            summary = run_batch([input_dir], output_dir, **options)
+            changed = results_by_name(summary)['doc_1.txt']
+            assert changed['status'] == 'done' and summary['skipped'] == 3
+            assert changed['output_path'] == old_output and os.path.exists(old_output)
+
+            # 模拟中途崩溃：一个文件停在parse阶段，台账中没有输出记录
+            connection = sqlite3.connect(ledger_path)
+            with connection:
+                connection.execute("UPDATE files SET status = 'running', stage = 'parse', output_path = NULL "
+                                   "WHERE source_path LIKE '%doc_2.txt'")
+            connection.close()
+            with JobLedger(ledger_path) as ledger:
+                assert ledger.status()['running_stages'] == {'parse': 1}
+            summary = run_batch([input_dir], output_dir, **options)
+            assert results_by_name(summary)['doc_2.txt']['status'] == 'done' and summary['skipped'] == 3
+
+            # 清零失败文件的尝试次数后会再次处理
+            summary = run_batch([input_dir], output_dir, retry_failed=True, **options)
+            assert not results_by_name(summary)['broken.txt'].get('retries_exhausted')
+
+            outputs = [name for name in os.listdir(output_dir) if name.endswith('.json')]
+            assert len(outputs) == 4, outputs
+            print(f"{mode}: 台账测试通过")
+
+        # 不使用台账时每次全部重新处理，重试仍然生效
+        summary = run_batch([input_dir], os.path.join(temp_dir, 'plain'), mode='sync', max_retries=1,
+                            retry_backoff=0.01, chunk_size=200, chunk_overlap=20)
+        assert summary['succeeded'] == 4 and summary['skipped'] == 0
+
+    print("任务台账测试通过")
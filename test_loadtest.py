@@ -0,0 +1,71 @@
+from src.service.loadtest import (run_load_test, parse_mix, compare_reports, format_report, format_comparison,
+                                  generate_documents, free_port)
+from src.utils.cache_utils import ResultsIndex
+from werkzeug.serving import make_server
+from pypdf import PdfReader
+import threading
+import logging
+import tempfile
+import os
+
+if __name__ == '__main__':
+    assert parse_mix('txt_small=3, pdf_small') == {'txt_small': 3.0, 'pdf_small': 1.0}
+    try:
+        parse_mix('docx_huge=1')
+        assert False, "应当拒绝未知的文档类型"
+    except ValueError:
+        pass
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        samples = generate_documents(temp_dir, ['txt_small', 'pdf_small'])
+        assert len(samples['txt_small'].decode('utf-8')) == 2_000
+        reader = PdfReader(os.path.join(temp_dir, 'pdf_small.pdf'))
+        assert len(reader.pages) == 5 and 'Page 3 line 0' in reader.pages[2].extract_text()
+
+        # 在本机随机端口启动Web服务，上传与输出目录都放在临时目录，不使用常驻处理服务
+        import app as web
+        web.app.config['UPLOAD_FOLDER'] = os.path.join(temp_dir, 'uploads')
+        web.app.config['OUTPUT_FOLDER'] = os.path.join(temp_dir, 'output')
+        web.app.config['DAEMON_SOCKET'] = os.path.join(temp_dir, 'missing.sock')
+        os.makedirs(web.app.config['UPLOAD_FOLDER'])
+        web.results_index = ResultsIndex(web.app.config['OUTPUT_FOLDER'])
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        port = free_port()
+        server = make_server('127.0.0.1', port, web.app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base_url = f'http://127.0.0.1:{port}'
+
+        try:
+            report = run_load_test(base_url, requests=6, concurrency=2, mix={'txt_small': 2, 'txt_medium': 1},
+                                   chunk_type='fixed_size', chunk_size=500, overlap=50, seed=1, label='baseline')
+            assert report['requests'] == 6 and report['succeeded'] == 6, report['errors']
+            assert report['error_rate'] == 0 and report['throughput'] > 0 and report['chunks_per_second'] > 0
+            for endpoint in ('upload', 'process', 'results', 'json'):
+                summary = report['endpoints'][endpoint]
+                assert summary['count'] == 6 and summary['errors'] == 0
+                assert 0 < summary['p50_ms'] <= summary['p95_ms'] <= summary['p99_ms'] <= summary['max_ms']
+            # 服务端各阶段耗时来自处理结果
+            assert {'load', 'chunk', 'save'} <= set(report['server_stages'])
+            assert sum(kind['requests'] for kind in report['by_kind'].values()) == 6
+
+            # 处理失败的文档计入错误率
+            failing = run_load_test(base_url, requests=2, concurrency=2, mix={'txt_small': 1},
+                                    chunk_type='no_such_method', label='broken')
+            assert failing['failed'] == 2 and failing['error_rate'] == 1.0
+            assert failing['endpoints']['upload']['errors'] + failing['endpoints']['process']['errors'] == 2
+        finally:
+            server.shutdown()
+            thread.join(5)
+
+        # 同样的配置可以相互比较
+        current = dict(report, label='current', throughput=report['throughput'] * 2,
+                       endpoints=dict(report['endpoints'], process=dict(report['endpoints']['process'],
+                                                                       p95_ms=report['endpoints']['process']['p95_ms'] * 2)))
+        rows = {row['metric']: row for row in compare_reports(report, current)}
+        assert rows['throughput']['change'] == 1.0 and rows['throughput']['better'] is True
+        assert rows['endpoints.process.p95_ms']['better'] is False
+        assert rows['error_rate']['better'] is None and 'server_stages.chunk.mean_ms' in rows
+        assert '吞吐量' in format_report(report) and 'throughput' in format_comparison(list(rows.values()), 'baseline', 'current')
+
+    print("Web服务压测测试通过")
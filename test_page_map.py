@@ -0,0 +1,91 @@
+from src.utils.page_map import PageMap, join_pages, annotate_chunk_pages, PAGE_MAP_KEY
+from src.loaders.loaders import load_file
+from src.chunkers.chunkers import chunk_document
+from src.chunkers.incremental import rechunk_document
+from src.retrieval.retrieval import chunk_record
+import tempfile
+import os
+
+def write_pdf(file_path, pages):
+    """生成每页若干行文本的简单PDF（只用标准字体，不依赖第三方库）"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        stream = "BT /F1 11 Tf 50 800 Td 14 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    content, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(content))
+        content += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+    xref = len(content)
+    content += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    content += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode('latin-1')
+    content += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1')
+    with open(file_path, 'wb') as f:
+        f.write(content)
+
+if __name__ == '__main__':
+    # 拼接时记录页边界，二分查找页码
+    content, page_map = join_pages(["第一页内容", "", "第三页内容"])
+    assert content == "第一页内容\n\n\n\n第三页内容"
+    assert list(page_map.offsets) == [0, 7, 9] and page_map.pages is None
+    assert page_map.page_at(0) == 1 and page_map.page_at(6) == 1 and page_map.page_at(9) == 3
+    assert page_map.page_span(3, 12) == (1, 3) and page_map.page_span(9, 9) == (3, 3)
+
+    # 同一页的多个元素合并为一个边界；页码不连续时保存页码数组
+    content, page_map = join_pages(["a", "b", "c", "d"], [2, 2, 5, 5])
+    assert list(page_map.offsets) == [0, 6] and list(page_map.pages) == [2, 5]
+    assert page_map.page_at(3) == 2 and page_map.page_at(6) == 5
+    restored = PageMap.from_metadata(page_map.to_metadata())
+    assert restored.page_at(7) == 5 and restored.first_page == 2 and PageMap.from_metadata(None) is None
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # PDF加载时写入页边界表，分块后每个块带页码，页边界表不复制到块中
+        pdf_path = os.path.join(temp_dir, 'sample.pdf')
+        write_pdf(pdf_path, [[f"Page {page} line {line}. This sentence belongs to page {page}." for line in range(6)]
+                             for page in range(1, 5)])
+        document = load_file(pdf_path)
+        assert document.metadata['total_pages'] == 4 and len(document.metadata[PAGE_MAP_KEY]['offsets']) == 4
+        assert PAGE_MAP_KEY not in document.chunks[0].metadata
+        for strategy, kwargs in (('fixed_size', {'chunk_size': 150, 'chunk_overlap': 30}),
+                                 ('paragraph', {'max_paragraph_length': 150}),
+                                 ('hierarchical', {'chunk_size': 150, 'chunk_overlap': 30})):
+            chunked = chunk_document(document, strategy, **kwargs)
+            leaves = [chunk for chunk in chunked.chunks if chunk.metadata.get('is_leaf', True)]
+            assert leaves and all(PAGE_MAP_KEY not in chunk.metadata for chunk in chunked.chunks)
+            for chunk in leaves:
+                page = int(chunk.page_content.split('Page ', 1)[1].split(' ', 1)[0])
+                assert chunk.metadata['page_start'] == page, (strategy, chunk.metadata, chunk.page_content)
+                assert chunk.metadata['page_end'] >= page
+                start = chunk.metadata['start_offset']
+                assert chunked.page_content[start:start + len(chunk.page_content)] == chunk.page_content
+        assert chunk_record(chunked, len(chunked.chunks) - 1)['page_end'] == 4
+        assert any(chunk.metadata['page_start'] != chunk.metadata['page_end']
+                   for chunk in chunk_document(document, 'fixed_size', chunk_size=800, chunk_overlap=0).chunks)
+
+        # 增量分块：复用的块按新偏移重新计算页码
+        lineage_dir = os.path.join(temp_dir, 'lineage')
+        rechunk_document(document, 'fixed_size', lineage_dir=lineage_dir, lineage_id='pdf', chunk_size=150, chunk_overlap=0)
+        shifted_pdf = os.path.join(temp_dir, 'shifted.pdf')
+        write_pdf(shifted_pdf, [["Cover page"]] + [[f"Page {page} line {line}. This sentence belongs to page {page}."
+                                                      for line in range(6)] for page in range(1, 5)])
+        shifted = rechunk_document(load_file(shifted_pdf), 'fixed_size', lineage_dir=lineage_dir, lineage_id='pdf',
+                                   chunk_size=150, chunk_overlap=0)
+        assert shifted.metadata['incremental']['reused_chunks'] > 0
+        last = shifted.chunks[-1]
+        assert last.metadata['page_start'] == 5, last.metadata
+
+        # 没有页边界表的文档不受影响
+        text_path = os.path.join(temp_dir, 'plain.txt')
+        with open(text_path, 'w', encoding='utf-8') as f:
+            f.write("没有分页的纯文本。\n\n第二段内容足够长。")
+        plain = chunk_document(load_file(text_path), 'paragraph')
+        assert all('page_start' not in chunk.metadata for chunk in plain.chunks)
+        assert annotate_chunk_pages(plain) is plain
+
+    print("页码溯源测试通过")
@@ -0,0 +1,81 @@
+from src.loaders.pdf_pages import PDFPageExtractor, PDFPasswordError
+from src.loaders.loaders import load_file
+from src.utils.page_map import PageMap
+from test_page_map import write_pdf
+from pypdf import PdfReader, PdfWriter
+import tempfile
+import os
+
+class FlakyExtractor(PDFPageExtractor):
+    """第3页pypdf出错（回退到pdfplumber），第5页pypdf和pdfplumber都出错"""
+    def _extract_pypdf(self, index):
+        if index in (2, 4):
+            raise ValueError(f"corrupt page {index + 1}")
+        return super()._extract_pypdf(index)
+
+    def _extract_pdfplumber(self, index):
+        if index == 4:
+            raise ValueError("pdfminer failed")
+        return super()._extract_pdfplumber(index)
+
+class ThreadedExtractor(FlakyExtractor):
+    """不论是否做OCR都用多个线程提取，检查各线程的句柄都被关闭"""
+    def _parallel(self, batch_count):
+        return batch_count > 1
+
+def encrypt(source, target, user_password, owner_password):
+    writer = PdfWriter(clone_from=PdfReader(source))
+    writer.encrypt(user_password=user_password, owner_password=owner_password)
+    with open(target, 'wb') as f:
+        writer.write(f)
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = os.path.join(temp_dir, 'sample.pdf')
+        write_pdf(pdf_path, [[f"Page {page} text"] for page in range(1, 41)])
+
+        # 逐页提取，结果按页序排列
+        result = PDFPageExtractor(pdf_path, workers=4).extract()
+        assert result['page_count'] == 40 and result['pdf_version'] == '1.4'
+        assert [text.strip() for text in result['texts']] == [f"Page {page} text" for page in range(1, 41)]
+        assert result['page_methods'] == {'pypdf': 40} and result['failed_pages'] == []
+
+        # 提取结束后关闭各线程打开的PDF句柄，反复提取不会泄漏文件描述符；同一个提取器可以再次提取
+        extractor = ThreadedExtractor(pdf_path, ocr=False, workers=4)
+        open_fds = len(os.listdir('/proc/self/fd'))
+        for _ in range(5):
+            assert extractor.extract()['failed_pages'] == [5]
+        assert len(os.listdir('/proc/self/fd')) <= open_fds and extractor._opened == []
+
+        # 单页出错只影响该页：先回退到pdfplumber，全部失败时记录错误，其余页照常提取
+        result = FlakyExtractor(pdf_path, ocr=False, workers=3).extract()
+        assert result['texts'][2].strip() == "Page 3 text" and result['texts'][4] == ''
+        assert result['texts'][5].strip() == "Page 6 text"
+        assert result['page_methods'] == {'pypdf': 38, 'pdfplumber': 1, 'failed': 1}
+        assert result['failed_pages'] == [5]
+        errors = {item['page']: item for item in result['page_errors']}
+        assert errors[3]['method'] == 'pdfplumber' and 'corrupt page 3' in errors[3]['errors']['pypdf']
+        assert errors[5]['method'] is None and set(errors[5]['errors']) == {'pypdf', 'pdfplumber'}
+
+        # 加载器：页码表与逐页提取的结果一致，元数据记录各方法的页数和失败页
+        document = load_file(pdf_path, page_workers=4)
+        assert document.metadata['total_pages'] == 40 and document.metadata['page_methods'] == {'pypdf': 40}
+        page_map = PageMap.from_document(document)
+        offset = document.page_content.index("Page 17 text")
+        assert page_map.page_at(offset) == 17
+
+        # 加密文件：密码错误时给出明确的错误；只设置权限密码的文件不需要密码
+        locked = os.path.join(temp_dir, 'locked.pdf')
+        encrypt(pdf_path, locked, 'secret', 'owner')
+        for password in (None, 'wrong'):
+            try:
+                load_file(locked, password=password)
+                assert False, "应当提示密码错误"
+            except PDFPasswordError as e:
+                assert '加密' in str(e)
+        assert load_file(locked, password='secret').metadata['total_pages'] == 40
+        owner_only = os.path.join(temp_dir, 'owner_only.pdf')
+        encrypt(pdf_path, owner_only, '', 'owner')
+        assert "Page 40 text" in load_file(owner_only).page_content
+
+    print("PDF逐页提取测试通过")
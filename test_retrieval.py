@@ -0,0 +1,120 @@
+from src.retrieval.index import ExactIndex, IVFIndex, load_index
+from src.retrieval.retrieval import update_index, embedder_for_index, query_index
+from src.embeddings.embeddings import HashEmbedder, embed_document
+from src.embeddings.vector_cache import EmbeddingCache
+from src.loaders.loaders import load_file
+from src.chunkers.chunkers import chunk_document
+import numpy as np
+import tempfile
+import os
+
+def clustered_vectors(count, dimension, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension))
+    labels = rng.integers(0, clusters, count)
+    return (centers[labels] + 0.3 * rng.normal(size=(count, dimension))).astype(np.float32)
+
+def brute_force(vectors, queries, k):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    return np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+
+if __name__ == '__main__':
+    vectors = clustered_vectors(5000, 32, 50)
+    queries = clustered_vectors(50, 32, 50, seed=1)
+    ids = [f'c{i}' for i in range(len(vectors))]
+    expected = brute_force(vectors, queries, 10)
+
+    # 精确检索：分块扫描的结果与暴力计算一致（float16存储带来的微小误差除外）
+    exact = ExactIndex(32, model='test', block_rows=777)
+    exact.add(ids[:3000], vectors[:3000], [{'n': i} for i in range(3000)])
+    exact.add(ids[3000:], vectors[3000:], [{'n': i} for i in range(3000, 5000)])
+    results = exact.search_batch(queries, top_k=10)
+    recall = np.mean([len({r['n'] for r in result} & set(row)) / 10 for result, row in zip(results, expected)])
+    assert recall >= 0.98, recall
+    assert all(result[0]['score'] >= result[-1]['score'] for result in results)
+
+    # 删除和更新
+    top_id = results[0][0]['chunk_id']
+    assert exact.delete([top_id]) == 1 and top_id not in exact
+    assert top_id not in [r['chunk_id'] for r in exact.search(queries[0], top_k=10)]
+    exact.add([top_id], -queries[:1], [{'n': -1}])
+    assert exact.search(-queries[0], top_k=1)[0]['chunk_id'] == top_id
+    assert len(exact) == 5000 and exact.rows == 5001
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # 持久化：重新加载后结果一致，追加保存只写新增部分
+        index_dir = os.path.join(temp_dir, 'exact')
+        exact.save(index_dir)
+        loaded = load_index(index_dir)
+        assert isinstance(loaded, ExactIndex) and len(loaded) == 5000
+        assert [r['chunk_id'] for r in loaded.search(queries[3], 5)] == [r['chunk_id'] for r in exact.search(queries[3], 5)]
+        vector_file = os.path.join(index_dir, 'vectors.f16')
+        size = os.path.getsize(vector_file)
+        loaded.add(['new'], queries[5:6], [{'n': 'new'}])
+        loaded.save()
+        assert os.path.getsize(vector_file) == size + 32 * 2
+        reloaded = load_index(index_dir)
+        assert reloaded.search(queries[5], 1)[0]['chunk_id'] == 'new' and reloaded.get_record('new') == {'n': 'new'}
+
+        # 大量删除后保存时压缩
+        reloaded.delete(ids[:2000])
+        reloaded.save()
+        assert load_index(index_dir).rows == len(reloaded) == 3001
+
+        # IVF：探测更多簇时召回率更高，全部探测时与精确检索一致
+        ivf = IVFIndex(32, model='test', nlist=50)
+        ivf.add(ids, vectors, [{'n': i} for i in range(len(vectors))])
+        assert ivf.search(queries[0], 3)
+        ivf.train()
+        recalls = {}
+        for nprobe in (1, 8, 50):
+            results = ivf.search_batch(queries, top_k=10, nprobe=nprobe)
+            recalls[nprobe] = np.mean([len({r['n'] for r in result} & set(row)) / 10
+                                       for result, row in zip(results, expected)])
+        print(f"IVF召回率: {recalls}")
+        assert recalls[1] <= recalls[8] <= recalls[50] and recalls[8] >= 0.9 and recalls[50] >= 0.98
+        ivf_dir = os.path.join(temp_dir, 'ivf')
+        ivf.save(ivf_dir)
+        loaded = load_index(ivf_dir)
+        assert isinstance(loaded, IVFIndex) and loaded.trained
+        loaded.add(['late'], queries[7:8])
+        assert loaded.search(queries[7], 1, nprobe=1)[0]['chunk_id'] == 'late'
+
+        # 从已嵌入的文档建立索引并查询
+        documents = []
+        topics = {'a.txt': "机器学习模型需要大量标注数据进行训练。", 'b.txt': "今天的天气晴朗，适合外出散步和运动。",
+                  'c.txt': "数据库索引可以显著加快查询速度。"}
+        embedder = HashEmbedder(dimension=128)
+        cache = EmbeddingCache(os.path.join(temp_dir, 'embeddings'), embedder.model_name)
+        for name, sentence in topics.items():
+            file_path = os.path.join(temp_dir, name)
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write("\n\n".join(sentence * 3 for _ in range(5)))
+            chunked = chunk_document(load_file(file_path), 'paragraph', chunk_size=100, chunk_overlap=0)
+            documents.append(embed_document(chunked, embedder, cache))
+        corpus_dir = os.path.join(temp_dir, 'corpus_index')
+        stats = update_index(corpus_dir, documents)
+        assert stats['documents'] == 3 and stats['size'] == sum(len(d.chunks) for d in documents)
+        index = load_index(corpus_dir)
+        query_embedder = embedder_for_index(index)
+        assert query_embedder.model_name == embedder.model_name
+        hits = query_index(index, query_embedder, ["如何加快数据库查询"], top_k=3)[0]
+        assert hits[0]['file_name'] == 'c.txt' and "数据库索引" in hits[0]['text']
+
+        # 同一文档再次加入时替换旧块
+        stats = update_index(corpus_dir, documents[:1])
+        assert stats['removed'] == stats['added'] == len(documents[0].chunks)
+        assert len(load_index(corpus_dir)) == sum(len(d.chunks) for d in documents)
+
+        # Web查询只能使用输出目录内的索引
+        import app as web
+        web.app.config['OUTPUT_FOLDER'] = temp_dir
+        with web.app.test_client() as http:
+            response = http.get('/query', query_string={'q': '数据库查询', 'index': 'corpus_index'})
+            assert response.get_json()['results'][0]['file_name'] == 'c.txt'
+            for escape in ('../corpus_index', corpus_dir, 'corpus_index/../..'):
+                response = http.get('/query', query_string={'q': '数据库查询', 'index': escape})
+                assert response.status_code == 400 and not response.get_json()['success']
+
+    print("向量检索测试通过")
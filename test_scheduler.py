@@ -0,0 +1,80 @@
+from src.pipeline.scheduler import PriorityScheduler
+import threading
+import time
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "等待超时"
+        time.sleep(0.005)
+
+def run_job(scheduler, priority, size, name, order, release):
+    """分到槽位后记录名称，等待release事件后归还"""
+    def target():
+        with scheduler.slot(priority, size):
+            order.append(name)
+            release.wait()
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+def queued(scheduler, priority):
+    return scheduler.stats()['classes'][priority]['queued']
+
+if __name__ == '__main__':
+    # 批量任务最多占用 workers-1 个槽位，交互任务始终有空闲槽位
+    scheduler = PriorityScheduler(workers=3)
+    order, release = [], threading.Event()
+    bulk = [run_job(scheduler, 'bulk', 100, f'bulk{i}', order, release) for i in range(4)]
+    wait_until(lambda: len(order) == 2 and queued(scheduler, 'bulk') == 2)
+    interactive = run_job(scheduler, 'interactive', 100, 'upload', order, release)
+    wait_until(lambda: 'upload' in order)
+    stats = scheduler.stats()
+    assert stats['running'] == 3 and stats['classes']['bulk']['running'] == 2
+    assert stats['classes']['bulk']['queued'] == 2 and stats['classes']['bulk']['queued_bytes'] == 200
+    assert stats['classes']['bulk']['oldest_wait'] > 0
+    release.set()
+    for thread in bulk + [interactive]:
+        thread.join(5)
+    stats = scheduler.stats()
+    assert stats['running'] == 0 and stats['classes']['bulk']['completed'] == 4
+    assert stats['classes']['bulk']['wait_max'] >= stats['classes']['bulk']['wait_p50'] > 0
+
+    # 交互任务小文件优先，批量任务按到达顺序；有交互任务排队时先调度交互任务
+    scheduler = PriorityScheduler(workers=1)
+    order, hold, release = [], threading.Event(), threading.Event()
+    first = run_job(scheduler, 'interactive', 1, 'first', order, hold)
+    wait_until(lambda: order == ['first'])
+    threads = []
+    for name, priority, size in (('bulk_a', 'bulk', 10), ('large', 'interactive', 10_000_000),
+                                 ('bulk_b', 'bulk', 1), ('small', 'interactive', 1_000)):
+        threads.append(run_job(scheduler, priority, size, name, order, release))
+        wait_until(lambda: queued(scheduler, 'bulk') + queued(scheduler, 'interactive') == len(threads))
+    release.set()
+    hold.set()
+    for thread in threads + [first]:
+        thread.join(5)
+    assert order == ['first', 'small', 'large', 'bulk_a', 'bulk_b'], order
+
+    # 交互任务等待超过上限后按到达顺序调度，大文件不会一直被插队
+    scheduler = PriorityScheduler(workers=1, interactive_max_wait=0.0)
+    order, hold, release = [], threading.Event(), threading.Event()
+    first = run_job(scheduler, 'interactive', 1, 'first', order, hold)
+    wait_until(lambda: order == ['first'])
+    threads = []
+    for name, size in (('large', 10_000_000), ('small', 1)):
+        threads.append(run_job(scheduler, 'interactive', size, name, order, release))
+        wait_until(lambda: queued(scheduler, 'interactive') == len(threads))
+    release.set()
+    hold.set()
+    for thread in threads + [first]:
+        thread.join(5)
+    assert order == ['first', 'large', 'small'], order
+
+    try:
+        scheduler.acquire('realtime')
+        assert False, "应当拒绝未知的优先级"
+    except ValueError:
+        pass
+
+    print("优先级调度测试通过")
@@ -0,0 +1,45 @@
+from src.chunkers.sentence_splitter import SentenceSplitter, SentenceTextSplitter
+from src.chunkers.chunkers import chunk_document
+from src.utils.models import Document, Chunk
+
+splitter = SentenceSplitter()
+
+# 中英文混合断句，拼接后与原文一致
+text = '他说：“今天下雨了！”我们走吧。Dr. Smith arrived at 3.14 p.m. today. 然后呢？好的；继续'
+sentences = splitter.split(text)
+print(f"断句结果: {sentences}")
+assert ''.join(sentences) == text
+assert sentences[0] == '他说：“今天下雨了！”'
+assert sentences[2] == 'Dr. Smith arrived at 3.14 p.m. today. '
+assert sentences[-1] == '继续'
+
+# 句子打包为块，块大小不超过chunk_size
+chunks = SentenceTextSplitter(chunk_size=30, chunk_overlap=0).split_text(text * 5)
+print(f"句子分块数: {len(chunks)}")
+assert all(len(chunk) <= 30 for chunk in chunks)
+
+# 通过分块工厂使用句子策略
+content = '第一句话。第二句话！第三句话？' * 20
+document = Document(
+    page_content=content,
+    document_id="doc_1",
+    file_name="test.txt",
+    file_type="txt",
+    file_path="/path/to/test.txt",
+    chunks=[Chunk(
+        page_content=content,
+        chunk_id="chunk_1",
+        chunk_size=len(content),
+        chunk_overlap=0,
+        chunk_method="whole_document",
+        metadata={}
+    )],
+    total_chunks=1,
+    total_size=len(content),
+    metadata={},
+    loader_used="TextLoader",
+    loader_params={}
+)
+chunked = chunk_document(document, 'sentence', chunk_size=50, chunk_overlap=0)
+print(f"sentence策略块数: {chunked.total_chunks}")
+assert all(chunk.page_content[-1] in '。！？' for chunk in chunked.chunks)
@@ -0,0 +1,108 @@
+from src.service.service import ProcessingDaemon, DaemonClient, DaemonError, daemon_available
+from src.utils.cache_utils import ResultsIndex
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import logging
+import tempfile
+import socket
+import json
+import os
+
+def start_daemon(socket_path, **kwargs):
+    daemon = ProcessingDaemon(socket_path, **kwargs)
+    daemon.start()
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    daemon.ready.wait()
+    return daemon, thread
+
+if __name__ == '__main__':
+    # 服务只转发已启用级别的日志，与main.py一致使用INFO
+    logging.basicConfig(level=logging.INFO)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        socket_path = os.path.join(temp_dir, 'rag.sock')
+        # 上次异常退出留下的套接字文件在启动时清理
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(socket_path)
+        stale.close()
+        assert not daemon_available(socket_path)
+
+        daemon, thread = start_daemon(socket_path, workers=2)
+        assert set(daemon.warmup_results) == {'chunkers', 'parsers', 'layout_model', 'tesseract'}
+        assert daemon.warmup_results['chunkers']['ok']
+        assert daemon_available(socket_path)
+        # 同一套接字上不能再启动第二个服务
+        try:
+            ProcessingDaemon(socket_path, warm=False).start()
+            assert False, "应当拒绝重复启动"
+        except DaemonError:
+            pass
+
+        text_path = os.path.join(temp_dir, 'sample.txt')
+        with open(text_path, 'w', encoding='utf-8') as f:
+            f.write("\n\n".join(f"第{i}段：常驻服务处理的示例文本，用于检查流式返回的分块结果。" for i in range(20)))
+
+        # 处理请求：依次收到排队、进度、日志和块事件，最后返回输出路径和各阶段耗时
+        client = DaemonClient(socket_path, timeout=60)
+        events = []
+        output_dir = os.path.join(temp_dir, 'out')
+        result = client.process(text_path, output_dir, on_event=events.append, chunk_strategy='paragraph',
+                                chunk_size=100, chunk_overlap=0, stream_chunks=True, chunk_limit=3)
+        kinds = [event['event'] for event in events]
+        assert kinds[0] == 'queued' and 'log' in kinds
+        assert [event['stage'] for event in events if event['event'] == 'progress'] == ['load', 'chunk', 'save']
+        chunks = [event['chunk'] for event in events if event['event'] == 'chunk']
+        assert len(chunks) == 3 < result['total_chunks'] and chunks[0]['chunk_index'] == 0
+        with open(result['final_path'], encoding='utf-8-sig') as f:
+            saved = json.load(f)
+        assert len(saved['chunks']) == result['total_chunks'] and chunks[1]['chunk_id'] == saved['chunks'][1]['chunk_id']
+        assert set(result['timings']) == {'load', 'chunk', 'save', 'wait'}
+
+        # 并发请求受workers限制，全部成功
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: client.process(text_path, output_dir), range(4)))
+        assert all(r['total_chunks'] > 0 for r in results)
+        client.process(text_path, output_dir, priority='bulk')
+        status = client.ping()
+        assert status['completed'] == 6 and status['scheduler']['running'] == 0
+        assert status['scheduler']['classes']['interactive']['completed'] == 5
+        assert status['scheduler']['classes']['bulk']['completed'] == 1
+
+        # 错误以DaemonError返回，服务继续运行
+        try:
+            client.process(os.path.join(temp_dir, 'missing.txt'), output_dir)
+            assert False, "应当返回错误"
+        except DaemonError as e:
+            assert '文件不存在' in str(e)
+        try:
+            client.process(text_path, output_dir, priority='realtime')
+            assert False, "应当拒绝未知的优先级"
+        except DaemonError as e:
+            assert '优先级' in str(e)
+        assert daemon_available(socket_path)
+
+        # Web端：服务在线时任务交给服务处理，进度和块转为任务事件
+        import app as web
+        web.app.config['OUTPUT_FOLDER'] = os.path.join(temp_dir, 'web')
+        web.app.config['DAEMON_SOCKET'] = socket_path
+        web.results_index = ResultsIndex(web.app.config['OUTPUT_FOLDER'])
+        job = web.ProcessJob('job1', text_path, {'chunk_type': 'fixed_size', 'chunk_size': 200, 'overlap': 20})
+        web.run_process_job(job)
+        assert job.status == 'done', job.result
+        assert job.result['total_chunks'] == job.chunk_count and job.result['json_files']
+        assert any(event == 'progress' and data['stage'] == '分块处理' for event, data in job.events)
+        assert web.run_process(text_path, 'paragraph', 100, 0)['success']
+        with web.app.test_client() as http:
+            queues = http.get('/scheduler').get_json()
+        assert queues['daemon']['classes']['interactive']['completed'] == 7 and queues['local']['running'] == 0
+
+        client.shutdown()
+        thread.join(timeout=10)
+        assert not thread.is_alive() and not os.path.exists(socket_path)
+        try:
+            DaemonClient(socket_path).ping()
+            assert False, "服务已停止"
+        except DaemonError:
+            pass
+
+    print("常驻处理服务测试通过")
@@ -0,0 +1,77 @@
+from src.utils.shared_text import (SharedDocument, SharedDocumentView, ensure_resource_tracker,
+                                   unlink_shared_document)
+from src.utils.resource_limits import ResourceBudget
+from src.pipeline.governance import load_document_governed
+from src.pipeline.batch import chunk_shared_stage
+from src.loaders.loaders import load_file
+from src.utils.models import Chunk
+from concurrent.futures import ProcessPoolExecutor
+import tempfile
+import pickle
+import time
+import json
+import os
+
+def shm_segments():
+    return set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else set()
+
+def read_in_worker(handle):
+    with SharedDocumentView(handle) as view:
+        document = view.document()
+        # 按字节偏移切片不复制
+        head = bytes(view.buffer[:7]).decode('utf-8')
+        return view.size, head, document.page_content == view.text(), len(document.chunks)
+
+if __name__ == '__main__':
+    ensure_resource_tracker()
+    before = shm_segments()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, 'doc.txt')
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write("\n\n".join(f"第{i}段，用于测试共享内存交接。Shared memory handoff." * 3 for i in range(200)))
+        document = load_file(file_path)
+        table = Chunk(chunk_id='table_0', page_content='| a | b |', metadata={'atomic': True},
+                      chunk_size=9, chunk_overlap=0, chunk_method='table')
+        document = document.copy(update={'chunks': document.chunks + [table]})
+
+        # 其他进程通过句柄读取正文和骨架，原子块随骨架保留
+        with SharedDocument(document) as shared:
+            assert len(pickle.dumps(shared.handle)) < len(document.page_content)
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                size, head, same, chunks = executor.submit(read_in_worker, shared.handle).result()
+            assert size == len(document.page_content.encode('utf-8'))
+            assert head == "第0段" and same and chunks == 2
+
+            # 分块任务从共享内存取文档并追加OCR结果，由提交方释放
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                result = executor.submit(chunk_shared_stage, shared.handle, ["图像中的文字"], 0, 'fixed_size',
+                                         {'chunk_size': 200, 'chunk_overlap': 20}).result()
+            payload = json.loads(result['payload'])
+            assert "图像中的文字" in payload['page_content'] and payload['metadata']['ocr_images'] == 1
+            assert any(chunk['chunk_id'] == 'table_0' for chunk in payload['chunks'])
+            assert 'attach' in result['timings']
+            unlink_shared_document(shared.handle)
+            # 重复释放不报错
+            unlink_shared_document(shared.handle)
+
+        # 预算子进程经共享内存交回文档，结果与直接加载一致，共享内存被释放
+        governed, _ = load_document_governed(file_path, budget=ResourceBudget(time_limit=30))
+        assert governed.page_content == document.page_content
+        assert governed.metadata['processing_path'] == 'load'
+
+    assert shm_segments() - before == set(), shm_segments() - before
+
+    # 对比：大文档经pickle传递与共享内存传递的耗时
+    big = document.copy(update={'page_content': document.page_content * 200})
+    big = big.copy(update={'chunks': [big.chunks[0].copy(update={'page_content': big.page_content})]})
+    start = time.perf_counter()
+    pickle.loads(pickle.dumps(big))
+    pickled = time.perf_counter() - start
+    with SharedDocument(big) as shared:
+        start = time.perf_counter()
+        with SharedDocumentView(pickle.loads(pickle.dumps(shared.handle))) as view:
+            view.document()
+        attached = time.perf_counter() - start
+    print(f"{len(big.page_content)} 字符: pickle往返 {pickled * 1000:.1f}ms, 共享内存读取 {attached * 1000:.1f}ms")
+
+    print("共享文档测试通过")
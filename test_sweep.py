@@ -0,0 +1,35 @@
+from src.pipeline.sweep import build_grid, run_sweep, format_sweep_table
+from src.utils.shared_text import SharedText, read_shared_text
+import tempfile
+import os
+
+if __name__ == '__main__':
+    # 测试参数网格：重叠不小于块大小的组合被跳过，段落策略只保留一个配置
+    grid = build_grid(['fixed_size', 'paragraph'], [100, 500], [0, 200])
+    print(f"网格配置数: {len(grid)}")
+    assert len(grid) == 4
+    assert {'strategy': 'fixed_size', 'chunk_size': 100, 'chunk_overlap': 200} not in grid
+
+    # 测试共享文本读写
+    text = "中文与English混合的共享文本。" * 100
+    with SharedText(text) as shared:
+        assert read_shared_text(shared.handle) == text
+        print(f"共享文本字节数: {shared.handle[1]}")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, 'sample.txt')
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write("\n\n".join(f"第{i}段。这是用于参数扫描测试的段落内容，包含多个句子。" * 3 for i in range(50)))
+
+        # 并行与串行结果的块数应一致
+        parallel = run_sweep([file_path], ['fixed_size', 'sentence'], [100, 300], [0, 50], workers=2)
+        serial = run_sweep([file_path], ['fixed_size', 'sentence'], [100, 300], [0, 50], workers=1)
+        print(format_sweep_table(parallel))
+        assert [s['total_chunks'] for s in parallel] == [s['total_chunks'] for s in serial]
+        assert all(s['max'] >= s['p95'] >= s['p50'] > 0 for s in parallel)
+
+        # 层级分块只统计存有文本的叶子块，父块（空文本）不拉低分位数
+        hierarchical = run_sweep([file_path], ['hierarchical'], [200], [0], workers=1)[0]
+        assert hierarchical['total_chunks'] > 0 and hierarchical['p50'] > 0
+
+    print("参数扫描测试通过")
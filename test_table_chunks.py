@@ -0,0 +1,101 @@
+from langchain_core.documents import Document as LangChainDocument
+from src.parsers.parsers import LangChainDocumentParser
+from src.chunkers.chunkers import chunk_document
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+import tempfile
+import os
+
+# 表格在PDF中的位置（pdfplumber坐标系：左上角为原点，单位为点）
+TABLE_LEFT, TABLE_TOP, CELL_WIDTH, CELL_HEIGHT = 72, 300, 150, 20
+ROWS = [['Region', 'Quarter', 'Revenue'], ['North', 'Q1', '1200'], ['South', 'Q1', '950'], ['West', 'Q2', '1730']]
+# unstructured元素坐标使用的版面尺寸（页面的2倍，用于验证坐标换算）
+LAYOUT_SCALE = 2
+
+def make_pdf(path):
+    """第1页有带边框的表格，第2页没有"""
+    page_width, page_height = letter
+    pdf = canvas.Canvas(path, pagesize=letter)
+    for row_index, row in enumerate(ROWS):
+        for col_index, cell in enumerate(row):
+            x = TABLE_LEFT + col_index * CELL_WIDTH
+            top = TABLE_TOP + row_index * CELL_HEIGHT
+            pdf.rect(x, page_height - top - CELL_HEIGHT, CELL_WIDTH, CELL_HEIGHT)
+            pdf.drawString(x + 4, page_height - top - CELL_HEIGHT + 6, cell)
+    pdf.showPage()
+    pdf.drawString(72, 700, 'Second page text.')
+    pdf.showPage()
+    pdf.save()
+
+def element(text, page_number, box=None, category='NarrativeText'):
+    """模拟UnstructuredPDFLoader elements模式返回的元素，box为页面坐标 [x0, top, x1, bottom]"""
+    metadata = {'page_number': page_number, 'category': category}
+    if box is not None:
+        x0, top, x1, bottom = [value * LAYOUT_SCALE for value in box]
+        metadata['coordinates'] = {
+            'points': [[x0, top], [x0, bottom], [x1, bottom], [x1, top]],
+            'system': 'PixelSpace',
+            'layout_width': letter[0] * LAYOUT_SCALE,
+            'layout_height': letter[1] * LAYOUT_SCALE
+        }
+    return LangChainDocument(page_content=text, metadata=metadata)
+
+class StubLoader:
+    def __init__(self, elements):
+        self.elements = elements
+
+    def load(self):
+        return self.elements
+
+class StubParser(LangChainDocumentParser):
+    """用给定的元素代替unstructured的解析结果，表格仍由pdfplumber从PDF中提取"""
+    elements = []
+
+    def _create_loader(self):
+        return StubLoader(self.elements)
+
+if __name__ == '__main__':
+    table_bottom = TABLE_TOP + CELL_HEIGHT * len(ROWS)
+    row_texts = [' '.join(row) for row in ROWS]
+    body = "Results for the period are summarised below. " * 8
+    StubParser.elements = [
+        element(body, 1, [72, 100, 540, 280]),
+        # hi_res策略识别出的表格元素，以及fast策略下被当作普通文本的表格行
+        element('\n'.join(row_texts), 1, [TABLE_LEFT, TABLE_TOP, TABLE_LEFT + 450, table_bottom], category='Table'),
+        element(row_texts[1], 1, [TABLE_LEFT, TABLE_TOP + CELL_HEIGHT, TABLE_LEFT + 450, TABLE_TOP + 2 * CELL_HEIGHT]),
+        element("Sales grew in every area but one. " * 6, 1, [72, 500, 540, 600]),
+        element("Second page text.", 2),
+        # 第2页没有检测到表格，该页的Table元素保留在正文中
+        element("Unmatched Table 42", 2, [72, 100, 300, 120], category='Table'),
+    ]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = os.path.join(temp_dir, 'report.pdf')
+        make_pdf(pdf_path)
+        document = StubParser(pdf_path, process_images=False).parse()
+
+        table_chunks = [chunk for chunk in document.chunks if chunk.metadata.get('chunk_type') == 'table']
+        assert len(table_chunks) == 1 and table_chunks[0].metadata['page_number'] == 1
+        table_lines = [[cell.strip() for cell in line.strip('|').split('|')]
+                       for line in table_chunks[0].page_content.split('\n')]
+        assert [table_lines[0]] + table_lines[2:] == ROWS
+
+        # 表格内容只出现在表格块中，正文保留表格前后的段落和其他页
+        assert 'summarised below' in document.page_content and 'but one' in document.page_content
+        assert 'Unmatched Table 42' in document.page_content
+        assert document.metadata['total_pages'] == 2 and document.metadata['extracted_tables'] == 1
+        for cell in ('Region', 'North', '1200', '1730'):
+            assert cell not in document.page_content, cell
+
+        # 分块后没有任何文本块包含表格行的片段，表格块保持完整
+        for strategy in ('fixed_size', 'sentence', 'paragraph'):
+            chunked = chunk_document(document, chunking_strategy=strategy, chunk_size=60, chunk_overlap=10)
+            text_chunks = [chunk for chunk in chunked.chunks if not chunk.metadata.get('atomic')]
+            assert len(text_chunks) > 1
+            for chunk in text_chunks:
+                assert not any(cell in chunk.page_content for row in ROWS for cell in row), \
+                    (strategy, chunk.page_content)
+            assert [chunk.page_content for chunk in chunked.chunks if chunk.metadata.get('atomic')] == \
+                   [table_chunks[0].page_content]
+
+    print("表格块去重测试通过")
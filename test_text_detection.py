@@ -0,0 +1,72 @@
+from src.utils.text_detection import (detect_text_profile, detect_language, count_tokens, read_samples,
+                                      PREFIX_SAMPLE_BYTES, SUFFIX_SAMPLE_BYTES)
+from src.loaders.loaders import load_file
+from src.chunkers.chunkers import chunk_document
+import tempfile
+import os
+
+ZH = "这是一个用于测试编码检测的中文段落，包含常见的汉字和标点符号。机器学习与自然语言处理。\n"
+TW = "這是一個用於測試編碼檢測的繁體中文段落，包含常見的漢字和標點符號。機器學習與自然語言處理。\n"
+JA = "これは日本語のテキストです。エンコーディングの検出をテストします。\n"
+EN = "This is an English paragraph with café and naïve words for testing the detector.\n"
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cases = [
+            ('gbk.txt', ZH * 500, 'gbk', 'gb18030', 'cjk'),
+            ('utf8.txt', ZH * 500, 'utf-8', 'utf-8', 'cjk'),
+            ('big5.txt', TW * 500, 'big5', 'big5', 'cjk'),
+            ('sjis.txt', JA * 500, 'shift_jis', 'shift_jis', 'cjk'),
+            ('utf16.txt', ZH * 500, 'utf-16', 'utf-16', 'cjk'),
+            ('latin1.txt', EN * 500, 'latin-1', 'latin-1', 'latin'),
+            ('english.txt', EN * 500, 'utf-8', 'utf-8', 'latin'),
+            ('short_gbk.txt', ZH[:10], 'gbk', 'gb18030', 'cjk'),
+        ]
+        for name, text, write_encoding, expected_encoding, expected_language in cases:
+            file_path = os.path.join(temp_dir, name)
+            with open(file_path, 'wb') as f:
+                f.write(text.encode(write_encoding))
+            profile = detect_text_profile(file_path)
+            print(f"{name}: {profile}")
+            assert profile['encoding'] == expected_encoding, (name, profile)
+            assert profile['language'] == expected_language, (name, profile)
+
+            # 加载器按检测到的编码解码，并把编码和语言写入元数据
+            document = load_file(file_path)
+            assert document.page_content.strip() == text.strip()
+            assert document.metadata['encoding'] == expected_encoding
+            assert document.metadata['language'] == expected_language
+
+        # 大文件只读取开头和结尾的样本；结尾样本从多字节字符中间开始也能解码
+        big_path = os.path.join(temp_dir, 'big_gbk.txt')
+        with open(big_path, 'wb') as f:
+            f.write(b"ASCII header line for the big file.\n" * 10)
+            for _ in range(200):
+                f.write((ZH * 100).encode('gbk'))
+            f.write(b'x')
+        prefix, suffix = read_samples(big_path)
+        assert len(prefix) == PREFIX_SAMPLE_BYTES and len(suffix) == SUFFIX_SAMPLE_BYTES
+        assert detect_text_profile(big_path)['encoding'] == 'gb18030'
+
+        # 显式指定的编码优先
+        document = load_file(os.path.join(temp_dir, 'english.txt'), encoding='latin-1')
+        assert document.metadata['encoding'] == 'latin-1' and 'encoding_method' not in document.metadata
+
+        # 按语言选择单位：英文按词计，中文按字符计
+        english = load_file(os.path.join(temp_dir, 'english.txt'))
+        chunked = chunk_document(english, 'fixed_size', chunk_size=100, chunk_overlap=0, unit='auto')
+        params = chunked.chunks[0].metadata['chunking_params']
+        assert params['unit'] == 'tokens' and params['language'] == 'latin'
+        assert all(count_tokens(chunk.page_content) <= 100 for chunk in chunked.chunks)
+        assert max(len(chunk.page_content) for chunk in chunked.chunks) > 100
+        chinese = load_file(os.path.join(temp_dir, 'gbk.txt'))
+        chunked = chunk_document(chinese, 'fixed_size', chunk_size=100, chunk_overlap=0, unit='auto')
+        assert chunked.chunks[0].metadata['chunking_params']['unit'] == 'characters'
+        assert max(len(chunk.page_content) for chunk in chunked.chunks) <= 100
+
+    assert detect_language("机器学习 machine learning 是人工智能的一个分支")['language'] == 'cjk'
+    assert detect_language("Transformer models (如BERT) are widely used in NLP tasks today")['language'] == 'latin'
+    assert detect_language("12345 !!!")['language'] == 'unknown'
+    assert count_tokens("自然语言 processing, v2") == 6
+
+    print("编码与语言检测测试通过")
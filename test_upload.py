@@ -0,0 +1,127 @@
+from src.utils.upload_utils import ChunkedUploadManager, UploadError, MIN_PART_SIZE
+from src.utils.cache_utils import ResultsIndex
+import tempfile
+import io
+import hashlib
+import time
+import os
+
+def expect_error(func, status_code=400):
+    try:
+        func()
+    except UploadError as e:
+        assert e.status_code == status_code, (e.message, e.status_code)
+        return e.message
+    assert False, "应当抛出UploadError"
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as temp_dir:
+        manager = ChunkedUploadManager(temp_dir, part_size=MIN_PART_SIZE * 2, max_upload_size=10 * 1024 * 1024)
+        data = os.urandom(MIN_PART_SIZE * 5 + 123)
+
+        # 参数校验：非整数、非正数和过小的分片大小返回400，超过上限返回413
+        for size, part_size in (('x', None), (0, None), (-5, None), (len(data), 'abc'), (len(data), -1),
+                                (len(data), 0), (len(data), 1024), (len(data), True)):
+            expect_error(lambda: manager.init_upload('a.txt', size, part_size=part_size))
+        expect_error(lambda: manager.init_upload('a.txt', 11 * 1024 * 1024), 413)
+        # 分片大小不超过服务端上限；小文件可以用与文件等大的分片
+        assert manager.init_upload('a.txt', len(data), part_size=10 ** 9)['part_size'] == MIN_PART_SIZE * 2
+        assert manager.init_upload('tiny.txt', 100, part_size='100')['total_parts'] == 1
+
+        # 上传部分分片后中断，查询状态得到缺失的分片并续传
+        status = manager.init_upload('../报告.txt', str(len(data)), options={'chunk_size': 500}, part_size=MIN_PART_SIZE)
+        assert status['filename'] == '报告.txt' and status['total_parts'] == 6
+        upload_id, part_size = status['upload_id'], status['part_size']
+        parts = [data[i:i + part_size] for i in range(0, len(data), part_size)]
+        for number in (0, 2, 5):
+            manager.write_part(upload_id, number, io.BytesIO(parts[number]),
+                               expected_sha256=hashlib.sha256(parts[number]).hexdigest())
+        assert manager.get_status(upload_id)['missing_parts'] == [1, 3, 4]
+        # 每个分片只写自己的标记文件，不改写会话状态
+        session_path = os.path.join(temp_dir, '.parts', upload_id, 'session.json')
+        with open(session_path, 'rb') as f:
+            session_bytes = f.read()
+        assert sorted(name for name in os.listdir(os.path.dirname(session_path)) if name.endswith('.json')) == \
+               ['part_000000.json', 'part_000002.json', 'part_000005.json', 'session.json']
+        expect_error(lambda: manager.finalize(upload_id), 409)
+        expect_error(lambda: manager.write_part(upload_id, 1, io.BytesIO(parts[1]), expected_sha256='0' * 64))
+        expect_error(lambda: manager.write_part(upload_id, 1, io.BytesIO(parts[1][:-1])))
+        expect_error(lambda: manager.write_part(upload_id, 6, io.BytesIO(b'x')))
+        for number in manager.get_status(upload_id)['missing_parts']:
+            manager.write_part(upload_id, number, io.BytesIO(parts[number]))
+        with open(session_path, 'rb') as f:
+            assert f.read() == session_bytes
+        assert manager.get_status(upload_id)['received_parts'] == list(range(6))
+        result = manager.finalize(upload_id)
+        assert result['sha256'] == hashlib.sha256(data).hexdigest() and not result['deduplicated']
+        with open(result['file_path'], 'rb') as f:
+            assert f.read() == data
+        assert result['options'] == {'chunk_size': 500}
+        expect_error(lambda: manager.get_status(upload_id), 404)
+
+        # 内容相同的文件只保留一份
+        again = manager.init_upload('copy.txt', len(data))
+        for number in range(again['total_parts']):
+            start = number * again['part_size']
+            manager.write_part(again['upload_id'], number, io.BytesIO(data[start:start + again['part_size']]))
+        duplicate = manager.finalize(again['upload_id'])
+        assert duplicate['deduplicated'] and duplicate['file_path'] == result['file_path']
+
+        # 分片很多时查询状态仍是线性时间
+        many = ChunkedUploadManager(os.path.join(temp_dir, 'many'), part_size=MIN_PART_SIZE,
+                                    max_upload_size=4 * 1024 * 1024 * 1024)
+        big = many.init_upload('big.bin', MIN_PART_SIZE * 32768)
+        for number in range(0, 32768, 2):
+            many._write_json(many._marker_path(many._session_dir(big['upload_id']), number),
+                             {'size': MIN_PART_SIZE, 'sha256': ''})
+        start = time.perf_counter()
+        status = many.get_status(big['upload_id'])
+        assert len(status['missing_parts']) == 16384 and status['missing_parts'][:2] == [1, 3]
+        assert time.perf_counter() - start < 5
+
+        # 长时间没有活动的会话被清理，活跃会话保留
+        abandoned = manager.init_upload('old.txt', len(data))['upload_id']
+        active = manager.init_upload('new.txt', len(data))['upload_id']
+        manager.write_part(abandoned, 0, io.BytesIO(data[:MIN_PART_SIZE * 2]))
+        past = time.time() - 2 * 24 * 3600
+        session_dir = os.path.join(temp_dir, '.parts', abandoned)
+        for name in os.listdir(session_dir) + ['']:
+            os.utime(os.path.join(session_dir, name), (past, past))
+        assert abandoned in manager.cleanup_expired()
+        assert not os.path.exists(session_dir) and manager.get_status(active)['missing_parts']
+        expect_error(lambda: manager.get_status(abandoned), 404)
+
+        # Web接口：错误的参数返回400而不是500
+        import app as web
+        web.upload_manager = ChunkedUploadManager(os.path.join(temp_dir, 'web'), part_size=MIN_PART_SIZE)
+        web.app.config['OUTPUT_FOLDER'] = os.path.join(temp_dir, 'output')
+        web.results_index = ResultsIndex(web.app.config['OUTPUT_FOLDER'])
+        with web.app.test_client() as http:
+            for payload in ({'filename': 'a.txt', 'size': 'x'}, {'filename': 'a.txt', 'size': 10, 'part_size': 'abc'},
+                            {'filename': 'a.txt', 'size': 10, 'part_size': -1},
+                            {'filename': 'a.txt', 'size': 10, 'chunk_size': 'big'},
+                            {'filename': 'a.txt', 'size': 10, 'chunk_size': 100, 'overlap': 100},
+                            {'filename': 'a.txt', 'size': 10, 'priority': 'realtime'}):
+                response = http.post('/upload/init', json=payload)
+                assert response.status_code == 400 and not response.get_json()['success'], payload
+            assert http.post('/upload/init', json={'filename': 'a.exe', 'size': 10}).status_code == 400
+
+            text = "分片上传的测试文本。\n\n".encode('utf-8') * 200
+            status = http.post('/upload/init', json={'filename': 'web.txt', 'size': len(text), 'chunk_size': '300',
+                                                     'overlap': 0, 'chunk_type': 'fixed_size'}).get_json()
+            for number in range(status['total_parts']):
+                start = number * status['part_size']
+                response = http.put(f"/upload/{status['upload_id']}/part/{number}",
+                                    data=text[start:start + status['part_size']])
+                assert response.get_json()['success']
+            assert http.get(f"/upload/{status['upload_id']}").get_json()['missing_parts'] == []
+            finalized = http.post(f"/upload/{status['upload_id']}/finalize").get_json()
+            assert finalized['success'] and finalized['job_id']
+            assert http.get('/upload/' + 'f' * 32).status_code == 404
+            deadline = time.time() + 120
+            while web.jobs[finalized['job_id']].status not in ('done', 'failed'):
+                assert time.time() < deadline, "处理超时"
+                time.sleep(0.1)
+            assert web.jobs[finalized['job_id']].status == 'done'
+
+    print("分片上传测试通过")